@@ -23,26 +23,104 @@ import os
 import sys
 import json
 import logging
-from datetime import datetime, date
+from contextlib import ExitStack
+from datetime import datetime
 import azure.functions as func
 
 # Agregar shared al path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from shared.utils.payload import extract_opportunity_data  # noqa: E402
+from shared.utils.serialization import DateTimeEncoder  # noqa: E402
+from shared.utils.tracing import traced_http  # noqa: E402
+
 logging.basicConfig(level=logging.INFO, force=True)
 
 
-class DateTimeEncoder(json.JSONEncoder):
-    """JSON encoder que maneja datetime objects"""
-    def default(self, obj):
-        try:
-            if isinstance(obj, (datetime, date)):
-                return obj.isoformat()
-            return super().default(obj)
-        except Exception:
-            return str(obj)
+def _ndjson_requested(req: func.HttpRequest) -> bool:
+    """?stream=ndjson o header `Accept: application/x-ndjson`"""
+    if (req.params.get("stream") or "").strip().lower() == "ndjson":
+        return True
+    return "application/x-ndjson" in (req.headers.get("Accept") or "").lower()
+
+
+def _superseded_response(
+    req: func.HttpRequest,
+    opportunity_data: dict,
+    final_payload: dict,
+    job_id: str
+) -> func.HttpResponse:
+    """Respuesta de un evento reemplazado por uno posterior de la misma ráfaga"""
+    status_url = f"{req.url.split('?')[0].rstrip('/')}/{job_id}"
+    logging.info(f"🧮 Evento reemplazado: el análisis final queda en el job {job_id}")
+
+    return func.HttpResponse(
+        json.dumps({
+            "success": True,
+            "status": "superseded",
+            "opportunity_id": opportunity_data.get("opportunityid"),
+            "superseded_by": {
+                "job_id": job_id,
+                "status_url": status_url,
+                "modifiedon": final_payload.get("modifiedon"),
+            },
+            "retry_suggested": False,
+        }, ensure_ascii=False, indent=2),
+        status_code=200,
+        headers={"Location": status_url},
+        mimetype="application/json",
+        charset="utf-8"
+    )
+
+
+def _overloaded_response(opportunity_data: dict, rejection) -> func.HttpResponse:
+    """429 con Retry-After: la instancia no tiene cupo para iniciar otro análisis"""
+    return func.HttpResponse(
+        json.dumps({
+            "success": False,
+            "opportunity_id": opportunity_data.get("opportunityid"),
+            "error": {
+                "code": "OVERLOADED",
+                "message": str(rejection),
+                "reason": rejection.reason,
+            },
+            "retry_suggested": True,
+            "retry_after_seconds": rejection.retry_after,
+        }, ensure_ascii=False, indent=2),
+        status_code=429,
+        headers={"Retry-After": str(rejection.retry_after)},
+        mimetype="application/json",
+        charset="utf-8"
+    )
+
+
+async def _submit_job(req: func.HttpRequest, opportunity_data: dict) -> func.HttpResponse:
+    """Encola el análisis y retorna 202 Accepted con la URL de consulta"""
+    from shared.core.jobs import JobManager, get_job_manager
+
+    manager = get_job_manager()
+    job_id = JobManager.build_job_id(opportunity_data, req.headers.get("Idempotency-Key"))
+    job = await manager.submit(opportunity_data, job_id)
 
+    status_url = f"{req.url.split('?')[0].rstrip('/')}/{job['job_id']}"
+    logging.info(f"📨 Análisis encolado: {job['job_id']} ({job['status']})")
 
+    return func.HttpResponse(
+        json.dumps({
+            "success": True,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": status_url,
+            "opportunity_id": job.get("opportunity_id"),
+        }, ensure_ascii=False, indent=2),
+        status_code=202,
+        headers={"Location": status_url, "Retry-After": "10"},
+        mimetype="application/json",
+        charset="utf-8"
+    )
+
+
+@traced_http("/api/analyze")
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     """
     HTTP Trigger principal para análisis de oportunidades.
@@ -63,6 +141,33 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
     },
     "teams_id": "ID del equipo de Teams",
     "channel_id": "ID del canal de Teams"
+
+    Header opcional `Idempotency-Key`: si no se envía, los reintentos se
+    identifican por opportunityid + modifiedon.
+
+    Modo asíncrono (`?mode=async` o `Prefer: respond-async`): retorna 202 con
+    `job_id` y `status_url` (GET /api/analyze/{job_id}).
+
+    Con COALESCE_WINDOW_SECONDS > 0, los eventos de una misma oportunidad que
+    llegan dentro de la ventana se agrupan: solo el último se analiza y los
+    anteriores responden `status: superseded` con la URL del resultado final.
+
+    Modo NDJSON (`?stream=ndjson` o `Accept: application/x-ndjson`): el body es
+    un evento JSON por línea (validated, teams_loaded, analysis_ready,
+    card_ready, pdf_ready, saved) seguido de `completed` o `error`. Con
+    OPENAI_STREAMING, `card_preview` trae la card preliminar antes de que el
+    modelo termine.
+
+    Header opcional `X-Profile: true` (con PROFILE_REQUESTS=header): perfila la
+    invocación y retorna la ubicación de los artefactos en `metadata.profile`.
+
+    Con ADMISSION_MAX_IN_FLIGHT > 0, si la instancia ya tiene ese número de
+    análisis en curso y la cola de espera está llena (o la espera se agota),
+    responde 429 con `Retry-After` sin iniciar el análisis.
+
+    Header opcional `X-Request-Timeout` (segundos): acota el tiempo total de la
+    petición por debajo de REQUEST_DEADLINE_SECONDS. Si no alcanza para el PDF
+    o Cosmos, se omiten y `metadata.degraded` indica qué partes faltan.
     """
     logging.info("=" * 60)
     logging.info("🚀 AGENTE DE ANÁLISIS INTELIGENTE - Función iniciada")
@@ -70,6 +175,8 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info(f"📍 sys.path: {sys.path[:3]}")
     logging.info("=" * 60)
 
+    # Recursos de la invocación que se liberan al responder (el lease del orquestador)
+    invocation = ExitStack()
     try:
         # Validar método
         if req.method != "POST":
@@ -115,27 +222,10 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
 
-        # Extraer estructura: body, teams_id, channel_id
-        # Soporta ambos formatos:
-        # 1. Nuevo: { "body": {...}, "teams_id": "...", "channel_id": "..." }
-        # 2. Legacy: { "opportunityid": "...", ... } (todo flat)
-
-        if "body" in payload and isinstance(payload["body"], dict):
-            # Nuevo formato estructurado
-            opportunity_data = payload["body"]
-            teams_id = payload.get("teams_id") or payload.get("teamsId")
-            channel_id = payload.get("channel_id") or payload.get("channelId")
-            logging.info("📦 Payload estructurado detectado (body + teams_id + channel_id)")
-        else:
-            # Formato legacy (flat)
-            opportunity_data = payload
-            teams_id = payload.get("teams_id") or payload.get("teamsId")
-            channel_id = payload.get("channel_id") or payload.get("channelId")
-            logging.info("📦 Payload flat detectado (legacy)")
-
-        # Agregar teams_id y channel_id al opportunity_data para el orquestador
-        opportunity_data["teams_id"] = teams_id
-        opportunity_data["channel_id"] = channel_id
+        # Extraer estructura: body, teams_id, channel_id (formato nuevo o legacy)
+        opportunity_data = extract_opportunity_data(payload)
+        teams_id = opportunity_data["teams_id"]
+        channel_id = opportunity_data["channel_id"]
 
         # Validar campos requeridos
         if "opportunityid" not in opportunity_data:
@@ -158,10 +248,16 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
         logging.info(f"📥 Channel ID: {channel_id or 'N/A'}")
 
         # Importar orquestador de forma perezosa para evitar fallos en tiempo de carga
-        logging.info("⚙️ Inicializando orquestador (import perezoso)...")
+        logging.info("⚙️ Obteniendo orquestador (import perezoso)...")
         try:
-            from shared.core.orchestrator import OpportunityOrchestrator
-            logging.info("✅ OpportunityOrchestrator importado exitosamente")
+            from shared.core.registry import lease_orchestrator
+            from shared.core.idempotency import EXECUTED
+            from shared.core.coalescer import SUPERSEDED
+            from shared.core.admission import AdmissionRejected, admitted
+            from shared.core.jobs import async_mode_requested, get_job_manager
+            from shared.utils.profiling import PROFILE_HEADER, header_requested
+            from shared.utils.deadline import DEADLINE_HEADER, deadline_scope, request_deadline
+            logging.info("✅ Registro de orquestador importado exitosamente")
         except Exception as e:
             logging.error(f"❌ Error importando OpportunityOrchestrator: {str(e)}")
             import traceback
@@ -183,9 +279,66 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
                 charset="utf-8"
             )
 
+        # Modo asíncrono: encolar y responder 202 con la URL de estado
+        if async_mode_requested(req.params.get("mode"), req.headers.get("Prefer")):
+            return await _submit_job(req, opportunity_data)
+
         logging.info("🔄 Procesando oportunidad...")
-        orchestrator = OpportunityOrchestrator()
-        result = await orchestrator.process_opportunity(opportunity_data)
+        # El presupuesto de tiempo corre desde la llegada: incluye la espera de ráfaga y de cupo
+        deadline = request_deadline(req.headers.get(DEADLINE_HEADER))
+
+        # Instancia compartida por el proceso: reutiliza clientes y catálogo entre invocaciones.
+        # Si la configuración cambia durante la invocación, no se cierra hasta que esta termina
+        orchestrator = invocation.enter_context(lease_orchestrator())
+
+        # Modo NDJSON: un evento por paso completado (validated, analysis_ready, card_ready, ...)
+        stream = _ndjson_requested(req)
+        events = []
+
+        async def record_event(event):
+            events.append(event)
+
+        on_event = record_event if stream else None
+
+        # Ráfagas de Update: solo el último evento de la ventana se analiza
+        outcome = None
+        if orchestrator.coalescer:
+            outcome = await orchestrator.coalescer.submit(opportunity_data.get("opportunityid"), opportunity_data)
+            if outcome.status == SUPERSEDED:
+                return _superseded_response(req, opportunity_data, outcome.payload, outcome.burst_id)
+
+        # X-Profile: true perfila esta invocación si PROFILE_REQUESTS=header
+        profile = header_requested(req.headers.get(PROFILE_HEADER))
+
+        async def analyze():
+            with deadline_scope(deadline):
+                async with admitted(orchestrator.admission):
+                    return await orchestrator.process_opportunity(opportunity_data, on_event, profile)
+
+        async def analyze_and_track():
+            # Los eventos reemplazados de la ráfaga apuntan a este job
+            return await get_job_manager().track(outcome.burst_id, opportunity_data, analyze)
+
+        compute = analyze_and_track if outcome and outcome.superseded else analyze
+
+        # Reintentos de Power Automate: misma oportunidad + modifiedon (o header Idempotency-Key)
+        store = orchestrator.idempotency_store
+        idempotency_key = store.build_key(opportunity_data, req.headers.get("Idempotency-Key")) if store else None
+        try:
+            if idempotency_key:
+                result, idempotency_status = await store.run(idempotency_key, compute)
+                if idempotency_status != EXECUTED:
+                    result = dict(result)
+                    result["metadata"] = {
+                        **result.get("metadata", {}),
+                        "idempotency": {"key": idempotency_key[:16], "status": idempotency_status}
+                    }
+                    # El duplicado no ejecutó los pasos: solo recibe el evento final
+                    events = [{"event": "completed" if result.get("success") else "error", "data": result}]
+            else:
+                result = await compute()
+        except AdmissionRejected as rejection:
+            return _overloaded_response(opportunity_data, rejection)
 
         # Determinar código de respuesta
         # Evitar reintentos automáticos desde Power Automate/consumidores externos
@@ -211,6 +364,14 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
             logging.error("❌ PROCESAMIENTO FALLIDO")
         logging.info("=" * 60)
 
+        if stream:
+            return func.HttpResponse(
+                "".join(json.dumps(event, cls=DateTimeEncoder, ensure_ascii=False) + "\n" for event in events),
+                status_code=status_code,
+                mimetype="application/x-ndjson",
+                charset="utf-8"
+            )
+
         return func.HttpResponse(
             json.dumps(result, cls=DateTimeEncoder, ensure_ascii=False, indent=2),
             status_code=status_code,
@@ -243,3 +404,5 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json",
             charset="utf-8"
         )
+    finally:
+        invocation.close()
@@ -0,0 +1,118 @@
+"""
+Azure Function: AnalyzeOpportunityBatch
+
+Analiza un lote de oportunidades en una sola invocación (re-scoring nocturno).
+
+Endpoint: POST /api/analyze/batch
+Payload: [ {...}, {...} ] o { "items": [...], "concurrency": 8 }
+
+Response:
+{
+    "success": true,
+    "summary": {"total": 2, "succeeded": 2, "failed": 0, ...},
+    "results": [
+        {"index": 0, "opportunity_id": "...", "success": true, "result": {...}},
+        {"index": 1, "opportunity_id": "...", "success": false, "error": {...}}
+    ]
+}
+
+El modo síncrono admite hasta BATCH_SYNC_MAX_ITEMS oportunidades (todas
+comparten el deadline HTTP). Los lotes grandes deben usar `?mode=async`: cada
+oportunidad se encola como un job propio, la respuesta es 202 con `status_url`
+(GET /api/analyze/{job_id}) y el lote agrupa el estado de sus elementos.
+"""
+
+import os
+import sys
+import json
+import logging
+import azure.functions as func
+
+# Agregar shared al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.utils.tracing import traced_http  # noqa: E402
+from shared.utils.serialization import DateTimeEncoder  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, force=True)
+
+
+def _error(code: str, message: str, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"success": False, "error": {"code": code, "message": message}}, ensure_ascii=False),
+        status_code=status_code,
+        mimetype="application/json",
+        charset="utf-8"
+    )
+
+
+@traced_http("/api/analyze/batch")
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """HTTP Trigger de análisis por lotes"""
+    logging.info("🚀 AGENTE DE ANÁLISIS INTELIGENTE - Lote iniciado")
+
+    try:
+        payload = req.get_json()
+    except ValueError as e:
+        logging.error(f"❌ Error parseando JSON: {str(e)}")
+        return _error("INVALID_JSON", "El body de la petición no es un JSON válido", 400)
+
+    from shared.core.batch import batch_settings, parse_batch_request, process_batch
+    from shared.core.jobs import JobManager, async_mode_requested, get_job_manager
+    from shared.core.registry import lease_orchestrator
+    from shared.utils.deadline import DEADLINE_HEADER, deadline_scope, request_deadline
+
+    try:
+        batch = parse_batch_request(payload)
+    except (TypeError, ValueError) as e:
+        return _error("INVALID_BATCH", str(e), 400)
+
+    settings = batch_settings()
+    if not batch["items"]:
+        return _error("EMPTY_PAYLOAD", "El lote no contiene oportunidades", 400)
+    if len(batch["items"]) > settings["max_items"]:
+        return _error("BATCH_TOO_LARGE", f"El lote admite como máximo {settings['max_items']} oportunidades", 413)
+
+    if async_mode_requested(req.params.get("mode"), req.headers.get("Prefer")):
+        job_id = JobManager.build_job_id({}, req.headers.get("Idempotency-Key"))
+        job = await get_job_manager().submit_batch(batch["items"], job_id)
+
+        # /api/analyze/batch -> /api/analyze/{job_id}
+        base_url = req.url.split("?")[0].rstrip("/")
+        status_url = f"{base_url[:-len('/batch')] if base_url.endswith('/batch') else base_url}/{job['job_id']}"
+        logging.info(f"📨 Lote encolado: {job['job_id']} ({len(batch['items'])} oportunidades)")
+
+        return func.HttpResponse(
+            json.dumps({
+                "success": True,
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "status_url": status_url,
+                "total": len(batch["items"]),
+            }, ensure_ascii=False, indent=2),
+            status_code=202,
+            headers={"Location": status_url, "Retry-After": "30"},
+            mimetype="application/json",
+            charset="utf-8"
+        )
+
+    if len(batch["items"]) > settings["sync_max_items"]:
+        return _error(
+            "BATCH_TOO_LARGE",
+            f"El lote síncrono admite como máximo {settings['sync_max_items']} oportunidades; "
+            "para lotes mayores use ?mode=async",
+            413
+        )
+
+    # Un solo presupuesto para todo el lote: los últimos elementos omiten PDF/Cosmos si no alcanza
+    deadline = request_deadline(req.headers.get(DEADLINE_HEADER))
+    with deadline_scope(deadline), lease_orchestrator() as orchestrator:
+        result = await process_batch(orchestrator, batch["items"], batch["concurrency"])
+
+    # 200 aunque haya elementos fallidos: el detalle va en results[]
+    return func.HttpResponse(
+        json.dumps(result, cls=DateTimeEncoder, ensure_ascii=False),
+        status_code=200,
+        mimetype="application/json",
+        charset="utf-8"
+    )
@@ -0,0 +1,61 @@
+"""
+Azure Function: AnalyzeOpportunityStatus
+
+Consulta el estado de un análisis encolado en modo asíncrono.
+
+Endpoint: GET /api/analyze/{job_id}
+
+Response:
+{
+    "job_id": "...",
+    "status": "queued | running | succeeded | failed",
+    "result": {...}     # respuesta de /api/analyze cuando finaliza
+}
+"""
+
+import os
+import sys
+import json
+import logging
+import azure.functions as func
+
+# Agregar shared al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.utils.tracing import traced_http  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, force=True)
+
+
+@traced_http("/api/analyze/{job_id}")
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """HTTP Trigger de consulta de jobs (404 si el job no existe)"""
+    job_id = req.route_params.get("job_id", "")
+
+    from shared.core.jobs import JobManager, QUEUED, RUNNING, get_job_manager
+
+    job = await get_job_manager().get(job_id) if job_id else None
+    if job is None:
+        return func.HttpResponse(
+            json.dumps({
+                "success": False,
+                "error": {
+                    "code": "JOB_NOT_FOUND",
+                    "message": f"No existe el job '{job_id}'"
+                }
+            }),
+            status_code=404,
+            mimetype="application/json"
+        )
+
+    headers = {}
+    if job["status"] in (QUEUED, RUNNING):
+        headers["Retry-After"] = "10"
+
+    return func.HttpResponse(
+        json.dumps(JobManager.public_view(job), ensure_ascii=False, indent=2, default=str),
+        status_code=200,
+        headers=headers,
+        mimetype="application/json",
+        charset="utf-8"
+    )
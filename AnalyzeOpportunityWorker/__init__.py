@@ -0,0 +1,39 @@
+"""
+Azure Function: AnalyzeOpportunityWorker
+
+Consume la cola ANALYZE_QUEUE_NAME (default `analyze-jobs`) y ejecuta los análisis encolados en modo
+asíncrono. El mensaje solo contiene el job_id; el payload se lee del
+documento de estado del job.
+"""
+
+import os
+import sys
+import json
+import logging
+import azure.functions as func
+
+# Agregar shared al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO, force=True)
+
+
+async def main(msg: func.QueueMessage) -> None:
+    """Queue Trigger: ejecuta el job indicado en el mensaje"""
+    body = msg.get_body().decode("utf-8")
+    try:
+        job_id = json.loads(body)["job_id"]
+    except (ValueError, KeyError, TypeError):
+        job_id = body.strip()
+
+    logging.info(f"📬 Mensaje recibido: job {job_id} (intento {msg.dequeue_count})")
+
+    from shared.core.jobs import QUEUE_MAX_DEQUEUE_COUNT, get_job_manager
+
+    # Sin cupo de admisión run() lanza AdmissionRejected: la invocación falla y el mensaje
+    # vuelve a la cola tras visibilityTimeout (host.json), salvo en el último intento
+    final_attempt = msg.dequeue_count >= QUEUE_MAX_DEQUEUE_COUNT
+    job = await get_job_manager().run(job_id, final_attempt)
+    if job is None:
+        # Sin documento de estado no hay nada que reintentar
+        logging.error(f"❌ Job descartado: {job_id}")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Re-análisis masivo de oportunidades históricas desde una exportación de Dataverse.
+
+Lee el archivo (JSONL, arreglo JSON o exportación OData con `value`) de forma
+incremental y ejecuta OpportunityOrchestrator directamente con un pool de
+workers asíncronos y límite de peticiones por minuto. Los resultados se
+escriben a medida que terminan y el avance queda en un checkpoint, así una
+ejecución interrumpida se retoma con el mismo comando.
+
+Uso:
+    python scripts/backfill.py export.jsonl --output results.jsonl --workers 8 --rpm 120
+    python scripts/backfill.py export.json --output results.jsonl --limit 100 --skip-cosmos
+
+Requiere las mismas variables de entorno que la Function (AZURE_OPENAI_*, AZURE_SEARCH_*, ...).
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Optional, Set
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.core.orchestrator import OpportunityOrchestrator  # noqa: E402
+from shared.utils.jsonstream import iter_records  # noqa: E402
+from shared.utils.payload import extract_opportunity_data  # noqa: E402
+from shared.utils.ratelimit import AsyncRateLimiter  # noqa: E402
+from shared.utils.serialization import DateTimeEncoder  # noqa: E402
+
+
+class Checkpoint:
+    """
+    Avance de la ejecución: todos los registros con índice menor que `watermark`
+    están procesados; `done` contiene los procesados por encima de esa marca
+    (los workers terminan fuera de orden).
+    """
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        self.source = source
+        self.watermark = 0
+        self.done: Set[int] = set()
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("source") != self.source:
+            raise SystemExit(f"❌ El checkpoint {self.path} pertenece a otro archivo: {data.get('source')}")
+        self.watermark = data["watermark"]
+        self.done = set(data.get("done", []))
+        return True
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done
+
+    def mark(self, index: int):
+        self.done.add(index)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "source": self.source,
+                "watermark": self.watermark,
+                "done": sorted(self.done),
+                "updated_at": datetime.utcnow().isoformat(),
+            }, f)
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    """Contadores y reporte periódico de throughput y ETA"""
+
+    def __init__(self, total_bytes: int, interval: float):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.first_offset: Optional[int] = None
+        self.offset = 0
+
+    def record(self, success: bool, offset: int):
+        if success:
+            self.ok += 1
+        else:
+            self.failed += 1
+        if self.first_offset is None:
+            self.first_offset = offset
+        self.offset = max(self.offset, offset)
+
+    def report(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+
+        elapsed = now - self.start
+        processed = self.ok + self.failed
+        rate = processed / elapsed if elapsed else 0.0
+
+        # ETA por bytes: el tamaño de los registros es más estable que su cantidad desconocida
+        eta = "?"
+        done_bytes = self.offset - (self.first_offset or 0)
+        if done_bytes > 0 and self.total_bytes:
+            remaining = (self.total_bytes - self.offset) / (done_bytes / elapsed)
+            eta = f"{remaining / 60:.1f} min"
+        pct = 100.0 * self.offset / self.total_bytes if self.total_bytes else 0.0
+
+        print(
+            f"📊 {processed} procesadas ({self.ok} ok, {self.failed} con error, {self.skipped} omitidas) | "
+            f"{rate * 60:.1f}/min | {pct:.1f}% | ETA {eta}",
+            flush=True
+        )
+
+
+def build_orchestrator(args) -> OpportunityOrchestrator:
+    orchestrator = OpportunityOrchestrator()
+    if not orchestrator.openai_service:
+        raise SystemExit("❌ Azure OpenAI no está configurado (AZURE_OPENAI_ENDPOINT / AZURE_OPENAI_KEY)")
+    if args.skip_cosmos:
+        orchestrator.cosmos_enabled = False
+    return orchestrator
+
+
+async def run_backfill(args) -> Progress:
+    source = os.path.abspath(args.input)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.output}.checkpoint.json", source)
+    if checkpoint.load():
+        print(f"↩️  Retomando desde el registro {checkpoint.watermark} ({len(checkpoint.done)} adicionales)")
+
+    orchestrator = build_orchestrator(args)
+    limiter = AsyncRateLimiter.per_minute(args.rpm, burst=args.workers) if args.rpm > 0 else AsyncRateLimiter(0)
+    progress = Progress(os.path.getsize(args.input), args.progress_interval)
+
+    # Cola acotada: el lector nunca se adelanta más de 2 registros por worker
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.workers * 2)
+    output = open(args.output, "a", encoding="utf-8")
+    pending_saves = 0
+
+    await orchestrator.warm_teams_catalog()
+
+    async def producer():
+        queued = 0
+        for index, record, offset in iter_records(args.input):
+            if args.limit and queued >= args.limit:
+                break
+            if checkpoint.is_done(index):
+                progress.skipped += 1
+                continue
+            await queue.put((index, record, offset))
+            queued += 1
+        for _ in range(args.workers):
+            await queue.put(None)
+
+    async def worker():
+        nonlocal pending_saves
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, record, offset = item
+
+            await limiter.acquire()
+            opportunity_data = extract_opportunity_data(dict(record))
+            try:
+                result = await orchestrator.process_opportunity(opportunity_data)
+            except Exception as e:
+                result = {"success": False, "error": {"code": "PROCESSING_ERROR", "message": str(e)}}
+
+            line = {
+                "index": index,
+                "opportunity_id": opportunity_data.get("opportunityid"),
+                "success": bool(result.get("success")),
+            }
+            if line["success"]:
+                line["result"] = result
+            else:
+                line["error"] = result.get("error")
+
+            output.write(json.dumps(line, cls=DateTimeEncoder, ensure_ascii=False) + "\n")
+            progress.record(line["success"], offset)
+            checkpoint.mark(index)
+
+            # Resultado antes que checkpoint: un corte nunca marca como hecho algo no escrito
+            pending_saves += 1
+            if pending_saves >= args.checkpoint_every:
+                output.flush()
+                checkpoint.save()
+                pending_saves = 0
+            progress.report()
+
+    try:
+        await asyncio.gather(producer(), *(worker() for _ in range(args.workers)))
+    finally:
+        output.flush()
+        output.close()
+        checkpoint.save()
+        orchestrator.close()
+        progress.report(force=True)
+
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Exportación de oportunidades (.jsonl, .json o OData con 'value')")
+    parser.add_argument("--output", required=True, help="Archivo JSONL de resultados (se agrega al final)")
+    parser.add_argument("--checkpoint", help="Archivo de checkpoint (default: <output>.checkpoint.json)")
+    parser.add_argument("--workers", type=int, default=8, help="Análisis simultáneos")
+    parser.add_argument("--rpm", type=float, default=120, help="Peticiones por minuto al modelo (0 = sin límite)")
+    parser.add_argument("--limit", type=int, default=0, help="Procesar como máximo N registros pendientes")
+    parser.add_argument("--skip-cosmos", action="store_true", help="No guardar los análisis en Cosmos DB")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Guardar el checkpoint cada N resultados")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Segundos entre reportes de avance")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los logs del orquestador")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    print("=" * 70)
+    print("🔁 BACKFILL - Re-análisis de oportunidades")
+    print("=" * 70)
+    print(f"Entrada: {args.input} | Salida: {args.output} | Workers: {args.workers} | RPM: {args.rpm or '∞'}\n")
+
+    try:
+        progress = asyncio.run(run_backfill(args))
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrumpido: vuelva a ejecutar el mismo comando para continuar")
+        sys.exit(130)
+
+    print(f"\n✅ Backfill finalizado: {progress.ok} ok, {progress.failed} con error")
+    sys.exit(1 if progress.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concurrencia del orquestador: análisis por worker antes/después
+de la capa de servicios asíncrona.
+
+Ejecuta N análisis simultáneos sobre un mismo event loop (como hace el worker
+de Azure Functions) usando servicios simulados con latencia configurable:
+
+- "bloqueante": los servicios simulan el comportamiento anterior (llamadas
+  síncronas del SDK dentro de process_opportunity) con time.sleep.
+- "async": los servicios ceden el event loop mientras esperan (asyncio.sleep),
+  igual que AsyncAzureOpenAI y los clientes azure.*.aio.
+
+Uso:
+    python scripts/benchmark_concurrency.py --concurrency 32 --llm-latency 2.0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.core.orchestrator import OpportunityOrchestrator  # noqa: E402
+
+DATA_FILE = Path(__file__).parent.parent / "data" / "torres_data_prod.json"
+
+
+async def _wait(seconds: float, blocking: bool):
+    """Simula la espera de red: bloqueando el hilo o cediendo el event loop"""
+    if blocking:
+        time.sleep(seconds)
+    else:
+        await asyncio.sleep(seconds)
+
+
+class FakeOpenAIService:
+    PROMPT_VERSION = "benchmark"
+    deployment = "fake"
+
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+
+    async def analyze_opportunity_async(self, opportunity_text, available_teams):
+        await _wait(self.latency, self.blocking)
+        team = available_teams[0] if available_teams else {}
+        return {
+            "executive_summary": "Resumen de benchmark",
+            "required_towers": [team.get("tower", "Torre IA")],
+            "team_recommendations": [{
+                "tower": team.get("tower", "Torre IA"),
+                "team_name": team.get("name", "IA"),
+                "relevance_score": 0.9,
+            }],
+            "risks": [],
+            "overall_risk_level": "Bajo",
+            "analysis_confidence": 0.8,
+        }
+
+    def close(self):
+        pass
+
+
+class FakeSearchService:
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+        with open(DATA_FILE, encoding="utf-8") as f:
+            self.teams = [
+                {
+                    "id": t["id"],
+                    "name": t["team_name"],
+                    "tower": t["tower"],
+                    "leader": t["team_lead"],
+                    "leader_email": t["team_lead_email"],
+                    "skills": t.get("skills", []),
+                    "description": t.get("description", ""),
+                }
+                for t in json.load(f)
+            ]
+
+    async def get_all_teams_async(self):
+        await _wait(self.latency, self.blocking)
+        return list(self.teams)
+
+    def close(self):
+        pass
+
+
+class FakeBlobStorageService:
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+
+    async def upload_pdf_async(self, pdf_bytes, blob_name):
+        await _wait(self.latency, self.blocking)
+        return f"https://benchmark.local/{blob_name}"
+
+    def close(self):
+        pass
+
+
+class FakeCosmosDBService:
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+
+    async def save_analysis_async(self, record):
+        await _wait(self.latency, self.blocking)
+        return record
+
+    async def set_pdf_url_async(self, record_id, opportunity_id, pdf_url):
+        await _wait(self.latency, self.blocking)
+        return True
+
+    def close(self):
+        pass
+
+
+def build_orchestrator(args, blocking: bool) -> OpportunityOrchestrator:
+    """Orquestador con servicios simulados (sin APP SETTINGS reales)"""
+    orchestrator = OpportunityOrchestrator()
+    orchestrator.openai_service = FakeOpenAIService(args.llm_latency, blocking)
+    orchestrator.search_service = FakeSearchService(args.io_latency, blocking)
+    orchestrator.blob_service = FakeBlobStorageService(args.io_latency, blocking)
+    orchestrator.cosmos_service = FakeCosmosDBService(args.io_latency, blocking)
+    orchestrator.openai_enabled = orchestrator.search_enabled = True
+    orchestrator.blob_enabled = orchestrator.cosmos_enabled = True
+    # Forzar la consulta del catálogo en cada análisis, como antes del registro caliente
+    orchestrator.teams_catalog_ttl = 0
+    return orchestrator
+
+
+async def run_round(orchestrator: OpportunityOrchestrator, concurrency: int) -> float:
+    """Lanza `concurrency` análisis a la vez y retorna el tiempo total"""
+    payloads = [
+        {
+            "opportunityid": f"bench-{i:04d}",
+            "name": f"Oportunidad de benchmark {i}",
+            "description": "Plataforma de datos con modelos de IA generativa sobre Azure.",
+            "SdkMessage": "Create",
+        }
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(orchestrator.process_opportunity(p) for p in payloads))
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if not r.get("success")]
+    if failed:
+        raise RuntimeError(f"{len(failed)} análisis fallaron: {failed[0].get('error')}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="Análisis simultáneos por worker")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="Latencia simulada de OpenAI (s)")
+    parser.add_argument("--io-latency", type=float, default=0.15, help="Latencia simulada de Search/Blob/Cosmos (s)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    # Sin credenciales reales: el orquestador arranca con los servicios deshabilitados
+    for key in ("AZURE_OPENAI_ENDPOINT", "AZURE_SEARCH_ENDPOINT",
+                "AZURE_STORAGE_CONNECTION_STRING", "COSMOS_ENDPOINT"):
+        os.environ.pop(key, None)
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK DE CONCURRENCIA - OpportunityOrchestrator")
+    print("=" * 70)
+    print(f"Concurrencia: {args.concurrency} | LLM: {args.llm_latency}s | I/O: {args.io_latency}s\n")
+
+    rows = []
+    for label, blocking in (("antes (SDK síncrono)", True), ("después (SDK async)", False)):
+        elapsed = asyncio.run(run_round(build_orchestrator(args, blocking), args.concurrency))
+        throughput = args.concurrency / elapsed
+        rows.append((label, elapsed, throughput))
+        print(f"{label:<24} total {elapsed:8.2f}s   {throughput:8.2f} análisis/s")
+
+    speedup = rows[1][2] / rows[0][2]
+    print(f"\n🚀 Mejora de throughput por worker: x{speedup:.1f}")
+
+
+if __name__ == "__main__":
+    main()
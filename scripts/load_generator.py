@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Generador de carga sintética para el endpoint /api/analyze.
+
+Sintetiza payloads realistas de Dataverse (HTML en los campos cr807,
+descripciones largas, mezcla de Create/Update y reintentos duplicados) y los
+envía a un endpoint local o desplegado:
+
+- `--concurrency 1,2,4,8`: lazo cerrado, N peticiones en vuelo por etapa.
+- `--rps 0.5,1,2`: lazo abierto, llegadas a tasa fija sin esperar respuestas
+  (la cola crece si el worker no da abasto, como en un pico real).
+
+Cada etapa dura `--stage-duration` segundos. Se informa throughput y
+latencia por intervalo, y al final un histograma de latencias, las clases de
+error y el codo de concurrencia (la última etapa que todavía aumentó el
+throughput de forma apreciable).
+
+Uso:
+    python scripts/load_generator.py --concurrency 1,2,4,8,16 --stage-duration 60
+    python scripts/load_generator.py --url https://func-analyzer-prod.azurewebsites.net/api/analyze --rps 0.5,1
+    python scripts/load_generator.py --sample 3      # solo imprime payloads de ejemplo
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.utils.ratelimit import AsyncRateLimiter  # noqa: E402
+
+DEFAULT_URL = "http://localhost:7071/api/analyze"
+
+# Límites del histograma de latencias (ms); el último intervalo es abierto
+HISTOGRAM_BOUNDS_MS = [250, 500, 1_000, 2_000, 5_000, 10_000, 20_000, 30_000, 60_000, 120_000]
+
+# Ganancia mínima de throughput entre etapas para considerar que aún no se llegó al codo
+KNEE_MIN_GAIN = 0.10
+
+
+# ============================================================
+# Payloads sintéticos
+# ============================================================
+
+_CUSTOMERS = [
+    "Banco Andino S.A.", "Retail Pacífico", "Minera del Sur", "Aseguradora Horizonte",
+    "Ministerio de Transporte", "Clínica San Rafael", "Energía Verde Ltda.", "Telecom Austral",
+]
+
+_TOPICS = [
+    ("plataforma de datos", "Data Lake en Azure con ingesta desde SAP y Salesforce"),
+    ("asistente con IA generativa", "chatbot sobre Azure OpenAI con RAG sobre documentos internos"),
+    ("migración a la nube", "migración de 40 VMs on-premise a Azure con landing zone"),
+    ("portal de autoservicio", "portal web React + APIs .NET con SSO de Entra ID"),
+    ("automatización de procesos", "RPA y Power Automate para conciliaciones contables"),
+    ("analítica avanzada", "modelos de churn y tableros Power BI para el área comercial"),
+    ("ciberseguridad", "SOC gestionado, SIEM en Sentinel y hardening de endpoints"),
+    ("app móvil", "aplicación iOS/Android para fuerza de ventas con modo offline"),
+]
+
+# Fragmentos con el marcado que genera el editor enriquecido de Dynamics
+_HTML_BLOCKS = [
+    '<div data-wrapper="true" style="font-family:\'Segoe UI\',\'Helvetica Neue\',sans-serif;font-size:9pt">'
+    "<p><span style=\"font-size:11pt\"><b>Contexto:</b>&nbsp;{detail}.</span></p></div>",
+    "<p>El cliente solicita <strong>{topic}</strong> con los siguientes entregables:</p>"
+    "<ul><li>Levantamiento&nbsp;de requerimientos</li><li>Diseño de arquitectura</li>"
+    "<li>Implementación y pruebas</li><li>Capacitación &amp; soporte post-salida</li></ul>",
+    '<table border="1" cellpadding="4" style="border-collapse:collapse;width:100%">'
+    "<tr><th>Fase</th><th>Duración</th><th>Equipo</th></tr>"
+    "<tr><td>Descubrimiento</td><td>3 semanas</td><td>Arquitectura</td></tr>"
+    "<tr><td>Construcción</td><td>12 semanas</td><td>Desarrollo&nbsp;+&nbsp;QA</td></tr></table>",
+    "<p><span style=\"color:rgb(68,68,68)\">Restricciones: datos sensibles bajo normativa local, "
+    "disponibilidad 99.9%, integración con {detail}.</span></p><p><br></p>",
+    "<ol><li><em>Requisito funcional:</em> perfiles por rol y auditoría.</li>"
+    "<li><em>Requisito técnico:</em> despliegue con IaC (Bicep/Terraform) y CI/CD.</li></ol>",
+]
+
+
+def _html_text(rng: random.Random, topic: str, detail: str, chars: int) -> str:
+    """Texto HTML de aproximadamente `chars` caracteres armado con bloques del editor de Dynamics"""
+    parts: List[str] = []
+    size = 0
+    while size < chars:
+        block = rng.choice(_HTML_BLOCKS).format(topic=topic, detail=detail)
+        parts.append(block)
+        size += len(block)
+    return "".join(parts)
+
+
+@dataclass
+class PayloadMix:
+    """Proporciones de la carga sintética"""
+    update_ratio: float = 0.4
+    duplicate_ratio: float = 0.1
+    long_ratio: float = 0.1
+    long_chars: int = 40_000
+    wrapped_ratio: float = 0.5
+
+
+class PayloadFactory:
+    """
+    Genera payloads de oportunidad con la forma que envía Power Automate.
+
+    - Create: oportunidad nueva.
+    - Update: oportunidad ya enviada con un cambio de estado, monto o texto.
+    - Duplicado: reenvío idéntico (mismo opportunityid + modifiedon) de un evento anterior.
+    """
+
+    def __init__(self, mix: PayloadMix, seed: Optional[int] = None):
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.known: Dict[str, Dict[str, Any]] = {}
+        self.sent: List[Dict[str, Any]] = []
+        self.clock = datetime(2026, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+    def _tick(self) -> str:
+        self.clock += timedelta(seconds=self.rng.randint(1, 90))
+        return self.clock.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _create(self) -> Dict[str, Any]:
+        rng = self.rng
+        topic, detail = rng.choice(_TOPICS)
+        long_text = rng.random() < self.mix.long_ratio
+        functional_chars = self.mix.long_chars if long_text else rng.randint(400, 4_000)
+        value = rng.randrange(20_000, 2_000_000, 5_000)
+        customer = rng.choice(_CUSTOMERS)
+        created = self._tick()
+        return {
+            "opportunityid": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": f"{topic[0].upper()}{topic[1:]} - {customer}",
+            "description": _html_text(rng, topic, detail, functional_chars // 4 if long_text else 300),
+            "cr807_descripciondelrequerimientofuncional": _html_text(rng, topic, detail, functional_chars),
+            "cr807_descripciondelrequerimientotecnico": _html_text(rng, topic, detail, functional_chars // 2),
+            "estimatedclosedate": (self.clock + timedelta(days=rng.randint(30, 180))).strftime("%Y-%m-%d"),
+            "estimatedvalue": value,
+            "budgetamount": round(value * rng.uniform(0.8, 1.2), 2),
+            "statecode": 0,
+            "statuscode": 1,
+            "customerid": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "_customerid_value": customer,
+            "_ownerid_value": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "ownername": rng.choice(["Carla Méndez", "Jorge Soto", "Lucía Pérez", "Andrés Rojas"]),
+            "SdkMessage": "Create",
+            "createdon": created,
+            "modifiedon": created,
+        }
+
+    def _update(self, previous: Dict[str, Any]) -> Dict[str, Any]:
+        rng = self.rng
+        data = {**previous, "SdkMessage": "Update", "modifiedon": self._tick()}
+        change = rng.choice(["status", "status", "monetary", "text"])
+        if change == "status":
+            data["statuscode"] = rng.choice([2, 3, 200000001])
+        elif change == "monetary":
+            data["estimatedvalue"] = previous["estimatedvalue"] + rng.randrange(-10_000, 50_000, 5_000)
+        else:
+            topic, detail = rng.choice(_TOPICS)
+            data["cr807_descripciondelrequerimientotecnico"] += _html_text(rng, topic, detail, 600)
+        return data
+
+    def _wrap(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """La mitad de los flujos envían el registro dentro de {body, teams_id, channel_id}"""
+        if self.rng.random() < self.mix.wrapped_ratio:
+            return {"body": data, "teams_id": "team-load-test", "channel_id": "19:load-test@thread.tacv2"}
+        return data
+
+    def next(self) -> Dict[str, Any]:
+        roll = self.rng.random()
+        if self.sent and roll < self.mix.duplicate_ratio:
+            return self.rng.choice(self.sent[-50:])
+        if self.known and roll < self.mix.duplicate_ratio + self.mix.update_ratio:
+            data = self._update(self.known[self.rng.choice(list(self.known))])
+        else:
+            data = self._create()
+        self.known[data["opportunityid"]] = data
+        body = self._wrap(data)
+        self.sent.append(body)
+        return body
+
+
+# ============================================================
+# Medición
+# ============================================================
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil por rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(p / 100 * len(ordered))) - 1]
+
+
+@dataclass
+class Sample:
+    started: float
+    latency_ms: float
+    outcome: str
+
+
+@dataclass
+class StageResult:
+    """Muestras de una etapa (un nivel de concurrencia o de RPS)"""
+    mode: str
+    level: float
+    samples: List[Sample] = field(default_factory=list)
+    started: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> List[Sample]:
+        return [s for s in self.samples if s.outcome in ("ok", "superseded", "duplicate")]
+
+    def throughput(self) -> float:
+        return len(self.ok) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = [s.latency_ms for s in self.ok]
+        return {
+            "mode": self.mode,
+            "level": self.level,
+            "requests": len(self.samples),
+            "ok": len(latencies),
+            "throughput_rps": round(self.throughput(), 3),
+            "latency_ms": {f"p{p}": round(percentile(latencies, p), 1) for p in (50, 95, 99)},
+            "outcomes": dict(Counter(s.outcome for s in self.samples)),
+        }
+
+
+def classify(status: int, body: Optional[Dict[str, Any]]) -> str:
+    """Clase del resultado: ok, superseded, duplicate, app:<código>, http_<status>"""
+    if body is None:
+        return f"http_{status}" if status != 200 else "invalid_body"
+    if status == 429:
+        return "http_429"
+    if body.get("status") == "superseded":
+        return "superseded"
+    if body.get("success") or status == 202:
+        metadata = body.get("metadata") or {}
+        if (metadata.get("idempotency") or {}).get("status"):
+            return "duplicate"
+        return "ok"
+    code = (body.get("error") or {}).get("code")
+    if code:
+        return f"app:{code}"
+    return f"http_{status}"
+
+
+def histogram(latencies: List[float]) -> List[Dict[str, Any]]:
+    buckets = Counter()
+    for value in latencies:
+        bound = next((b for b in HISTOGRAM_BOUNDS_MS if value <= b), None)
+        buckets[bound] += 1
+    rows = []
+    lower = 0
+    for bound in HISTOGRAM_BOUNDS_MS + [None]:
+        label = f"≤{bound / 1000:g}s" if bound else f">{lower / 1000:g}s"
+        rows.append({"bucket": label, "count": buckets.get(bound, 0)})
+        lower = bound or lower
+    return rows
+
+
+def find_knee(stages: List[StageResult]) -> Optional[StageResult]:
+    """Última etapa cuyo throughput superó en KNEE_MIN_GAIN al de la etapa anterior"""
+    knee = stages[0] if stages else None
+    for previous, current in zip(stages, stages[1:]):
+        if current.throughput() < previous.throughput() * (1 + KNEE_MIN_GAIN):
+            break
+        knee = current
+    return knee
+
+
+# ============================================================
+# Envío
+# ============================================================
+
+class LoadRunner:
+    def __init__(self, args, factory: PayloadFactory):
+        self.args = args
+        self.factory = factory
+        self.headers = {"Content-Type": "application/json"}
+        if args.key:
+            self.headers["x-functions-key"] = args.key
+        self.timeline: List[Dict[str, Any]] = []
+
+    async def send(self, session: aiohttp.ClientSession, stage: StageResult):
+        body = json.dumps(self.factory.next(), ensure_ascii=False).encode("utf-8")
+        start = time.perf_counter()
+        try:
+            async with session.post(self.args.url, data=body, headers=self.headers) as response:
+                raw = await response.read()
+                try:
+                    parsed = json.loads(raw)
+                except ValueError:
+                    parsed = None
+                outcome = classify(response.status, parsed if isinstance(parsed, dict) else None)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+        except aiohttp.ClientConnectionError:
+            outcome = "connection"
+        except aiohttp.ClientError as e:
+            outcome = f"client:{type(e).__name__}"
+        stage.samples.append(Sample(start, (time.perf_counter() - start) * 1000, outcome))
+
+    async def closed_loop(self, session, stage: StageResult, deadline: float):
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.send(session, stage)
+
+        await asyncio.gather(*(worker() for _ in range(int(stage.level))))
+
+    async def open_loop(self, session, stage: StageResult, deadline: float):
+        limiter = AsyncRateLimiter(stage.level)
+        in_flight = set()
+        while time.perf_counter() < deadline:
+            await limiter.acquire()
+            task = asyncio.ensure_future(self.send(session, stage))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        # Las peticiones en vuelo al cierre cuentan para la etapa (drenado)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def report_progress(self, stage: StageResult):
+        """Throughput y latencia de las peticiones completadas en cada intervalo"""
+        seen = 0
+        while True:
+            await asyncio.sleep(self.args.interval)
+            window = stage.samples[seen:]
+            seen += len(window)
+            latencies = [s.latency_ms for s in window if s.outcome == "ok"]
+            errors = sum(1 for s in window if s.outcome not in ("ok", "superseded", "duplicate"))
+            point = {
+                "t": round(time.perf_counter() - stage.started, 1),
+                "mode": stage.mode,
+                "level": stage.level,
+                "completed": len(window),
+                "rps": round(len(window) / self.args.interval, 2),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "errors": errors,
+            }
+            self.timeline.append(point)
+            print(
+                f"   t={point['t']:>6}s | {point['completed']:>4} completadas | {point['rps']:>6} req/s | "
+                f"p95 {point['p95_ms']:>8}ms | {errors} errores",
+                flush=True
+            )
+
+    async def run_stage(self, session, mode: str, level: float) -> StageResult:
+        stage = StageResult(mode, level, started=time.perf_counter())
+        label = f"{int(level)} en vuelo" if mode == "concurrency" else f"{level:g} req/s"
+        print(f"\n🚀 Etapa {mode}={level:g} ({label}) durante {self.args.stage_duration:g}s")
+
+        reporter = asyncio.ensure_future(self.report_progress(stage))
+        deadline = stage.started + self.args.stage_duration
+        try:
+            if mode == "concurrency":
+                await self.closed_loop(session, stage, deadline)
+            else:
+                await self.open_loop(session, stage, deadline)
+        finally:
+            reporter.cancel()
+        stage.elapsed = time.perf_counter() - stage.started
+        return stage
+
+    async def run(self) -> List[StageResult]:
+        mode = "rps" if self.args.rps else "concurrency"
+        levels = parse_levels(self.args.rps or self.args.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=0)
+        stages = []
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            for level in levels:
+                stages.append(await self.run_stage(session, mode, level))
+                if self.args.pause:
+                    await asyncio.sleep(self.args.pause)
+        return stages
+
+
+def parse_levels(value: str) -> List[float]:
+    return [float(level) for level in value.split(",") if level.strip()]
+
+
+# ============================================================
+# Reporte
+# ============================================================
+
+def print_report(stages: List[StageResult]):
+    print("\n" + "=" * 70)
+    print("📊 RESUMEN POR ETAPA")
+    print("=" * 70)
+    for stage in stages:
+        summary = stage.summary()
+        latency = summary["latency_ms"]
+        print(
+            f"{stage.mode}={stage.level:<6g} | {summary['throughput_rps']:>7} req/s | "
+            f"p50 {latency['p50']:>8}ms  p95 {latency['p95']:>8}ms  p99 {latency['p99']:>8}ms | "
+            f"{summary['requests']} peticiones"
+        )
+
+    all_samples = [s for stage in stages for s in stage.samples]
+    print("\n⏱️  Histograma de latencias (respuestas exitosas)")
+    rows = histogram([s.latency_ms for s in all_samples if s.outcome in ("ok", "superseded", "duplicate")])
+    widest = max((row["count"] for row in rows), default=0) or 1
+    for row in rows:
+        print(f"   {row['bucket']:>7} | {'█' * round(40 * row['count'] / widest):<40} {row['count']}")
+
+    print("\n🧾 Resultados por clase")
+    for outcome, count in Counter(s.outcome for s in all_samples).most_common():
+        print(f"   {outcome:<32} {count}")
+
+    knee = find_knee(stages)
+    if knee and len(stages) > 1:
+        print(
+            f"\n📈 Codo estimado: {knee.mode}={knee.level:g} "
+            f"({knee.throughput():.2f} req/s; las etapas siguientes no ganan más de {KNEE_MIN_GAIN:.0%})"
+        )
+
+
+def build_report(stages: List[StageResult], timeline: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    knee = find_knee(stages)
+    return {
+        "url": args.url,
+        "generated_at": datetime.utcnow().isoformat(),
+        "stages": [stage.summary() for stage in stages],
+        "histogram": histogram([s.latency_ms for stage in stages for s in stage.ok]),
+        "timeline": timeline,
+        "knee": {"mode": knee.mode, "level": knee.level} if knee else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("LOAD_TARGET_URL", DEFAULT_URL), help="Endpoint de análisis")
+    parser.add_argument("--key", default=os.getenv("AZURE_FUNCTION_KEY"), help="Function key (x-functions-key)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Niveles de concurrencia (lazo cerrado)")
+    parser.add_argument("--rps", help="Niveles de peticiones por segundo (lazo abierto; reemplaza --concurrency)")
+    parser.add_argument("--stage-duration", type=float, default=60.0, help="Segundos por etapa")
+    parser.add_argument("--pause", type=float, default=0.0, help="Segundos de pausa entre etapas")
+    parser.add_argument("--interval", type=float, default=10.0, help="Segundos entre reportes de throughput")
+    parser.add_argument("--timeout", type=float, default=230.0, help="Timeout por petición (s)")
+    parser.add_argument("--update-ratio", type=float, default=0.4, help="Proporción de eventos Update")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1, help="Proporción de reenvíos idénticos")
+    parser.add_argument("--long-ratio", type=float, default=0.1, help="Proporción de oportunidades con texto largo")
+    parser.add_argument("--long-chars", type=int, default=40_000, help="Caracteres del texto funcional largo")
+    parser.add_argument("--seed", type=int, help="Semilla para reproducir la misma secuencia de payloads")
+    parser.add_argument("--sample", type=int, default=0, help="Imprimir N payloads y salir sin enviar nada")
+    parser.add_argument("--report", help="Archivo JSON con resumen, histograma y serie temporal")
+    args = parser.parse_args()
+
+    factory = PayloadFactory(
+        PayloadMix(args.update_ratio, args.duplicate_ratio, args.long_ratio, args.long_chars),
+        args.seed
+    )
+
+    if args.sample:
+        for _ in range(args.sample):
+            print(json.dumps(factory.next(), ensure_ascii=False, indent=2))
+        return
+
+    print("=" * 70)
+    print("🔥 GENERADOR DE CARGA - AnalyzeOpportunity")
+    print("=" * 70)
+    print(f"Destino: {args.url} | Modo: {'rps=' + args.rps if args.rps else 'concurrency=' + args.concurrency}")
+
+    runner = LoadRunner(args, factory)
+    try:
+        stages = asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrumpido")
+        sys.exit(130)
+
+    print_report(stages)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(build_report(stages, runner.timeline, args), f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Reporte guardado en {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,20 +9,24 @@ import os
 from datetime import datetime
 
 # Configuración PRODUCCIÓN
-FUNCTION_URL = "https://func-analyzer-prod.azurewebsites.net/api/AnalyzeOpportunity"
+FUNCTION_URL = "https://func-analyzer-prod.azurewebsites.net/api/analyze"
 API_KEY = os.environ.get("AZURE_FUNCTION_KEY", "<TU_FUNCTION_KEY>")
 
 
 def test_analyze_opportunity():
     """Test básico de la función AnalyzeOpportunity"""
 
-    # Payload de ejemplo
+    # Payload de ejemplo (mismo formato que envía Power Automate)
     payload = {
-        "opportunity_description": "Proyecto de análisis de datos con IA para optimización de procesos",
-        "torres_needed": ["IA", "DATA"],
-        "priority": "high",
-        "client_name": "Acme Corp",
-        "estimated_budget": 50000
+        "opportunityid": "2f1511d1-0b08-42bc-aeea-62f0f539194b",
+        "name": "Análisis de datos con IA - Acme Corp",
+        "description": "Proyecto de análisis de datos con IA para optimización de procesos",
+        "cr807_descripciondelrequerimientofuncional": "<p>Tableros de <b>predicción de demanda</b></p>",
+        "cr807_descripciondelrequerimientotecnico": "<p>Data Lake en Azure con ingesta diaria desde SAP.</p>",
+        "_customerid_value": "Acme Corp",
+        "estimatedvalue": 50000,
+        "SdkMessage": "Create",
+        "modifiedon": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
     }
 
     # Headers
@@ -43,7 +47,7 @@ def test_analyze_opportunity():
 
     try:
         print("\n⏳ Enviando solicitud...")
-        response = requests.post(url_with_key, json=payload, headers=headers, timeout=30)
+        response = requests.post(url_with_key, json=payload, headers=headers, timeout=230)
 
         print(f"\n✅ Status Code: {response.status_code}")
         print(f"📝 Response Headers: {dict(response.headers)}")
@@ -56,11 +60,11 @@ def test_analyze_opportunity():
 
             # Verificar estructura
             if response.status_code == 200:
-                if 'body' in data and 'outputs' in data['body']:
+                if data.get('success') and 'outputs' in data:
                     print("\n✅ Estructura correcta detectada")
-                    if 'adaptive_card' in data['body']['outputs']:
+                    if 'adaptive_card' in data['outputs']:
                         print("✅ Adaptive Card presente")
-                    if 'analysis' in data['body']:
+                    if 'analysis' in data:
                         print("✅ Análisis presente")
                 else:
                     print("\n⚠️ Estructura diferente a la esperada")
@@ -70,7 +74,7 @@ def test_analyze_opportunity():
         return response.status_code == 200
 
     except requests.exceptions.Timeout:
-        print("\n❌ Error: Timeout (30s)")
+        print("\n❌ Error: Timeout (230s)")
         return False
     except requests.exceptions.ConnectionError as e:
         print(f"\n❌ Error de conexión: {e}")
@@ -3,5 +3,6 @@ Core modules para el Agente de Análisis Inteligente
 """
 
 from .orchestrator import OpportunityOrchestrator
+from .registry import OrchestratorRegistry, get_orchestrator
 
-__all__ = ["OpportunityOrchestrator"]
+__all__ = ["OpportunityOrchestrator", "OrchestratorRegistry", "get_orchestrator"]
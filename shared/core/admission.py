@@ -0,0 +1,225 @@
+"""
+Control de admisión del endpoint de análisis
+Limita los análisis simultáneos por instancia y acota la cola de espera; el
+exceso se rechaza de inmediato con 429 + Retry-After en lugar de iniciar
+trabajo que terminaría en timeout
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+import weakref
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from ..utils.metrics import counter, histogram, observable_gauge
+
+
+# Motivos de rechazo
+QUEUE_FULL = "queue_full"         # la cola de espera está llena
+QUEUE_TIMEOUT = "queue_timeout"   # esperó más de queue_timeout_seconds sin obtener un cupo
+
+# Tope del Retry-After sugerido (segundos)
+MAX_RETRY_AFTER_SECONDS = 300
+
+# Peso de la última duración en el promedio móvil del tiempo de servicio
+_EWMA_WEIGHT = 0.2
+
+# Controladores vivos del proceso (el registro recrea el orquestador al cambiar la
+# configuración y el anterior sigue atendiendo lo que tenía en vuelo)
+_controllers: "weakref.WeakSet[AdmissionController]" = weakref.WeakSet()
+_gauges_registered = False
+
+
+def _register_gauges():
+    """Registra los gauges una sola vez por proceso; suman los controladores vivos"""
+    global _gauges_registered
+    if _gauges_registered:
+        return
+    _gauges_registered = True
+    observable_gauge("analyze.admission.in_flight",
+                     lambda: [(sum(c.in_flight for c in list(_controllers)), {})],
+                     description="Análisis en ejecución")
+    observable_gauge("analyze.admission.queue_depth",
+                     lambda: [(sum(c.queued for c in list(_controllers)), {})],
+                     description="Peticiones esperando cupo")
+
+
+class AdmissionRejected(Exception):
+    """La petición no fue admitida; `retry_after` es la espera sugerida en segundos"""
+
+    def __init__(self, reason: str, retry_after: int, snapshot: Dict[str, Any]):
+        super().__init__(f"Capacidad de análisis agotada ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+        self.snapshot = snapshot
+
+
+class AdmissionController:
+    """
+    Semáforo con cola FIFO acotada para los análisis de una instancia.
+
+    - Hasta `max_in_flight` análisis se ejecutan a la vez.
+    - Hasta `max_queue` peticiones esperan un cupo, como máximo
+      `queue_timeout_seconds` cada una.
+    - El resto se rechaza con AdmissionRejected. El Retry-After se estima con
+      el tiempo de servicio promedio y la cola actual.
+
+    Los contadores son por proceso (todas las invocaciones comparten el event loop del worker).
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int = 0,
+        queue_timeout_seconds: float = 60.0,
+        retry_after_seconds: int = 5
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_seconds: Optional[float] = None
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+
+        self._rejections = counter("analyze.admission.rejected", description="Peticiones rechazadas con 429")
+        self._queue_wait = histogram("analyze.admission.queue_wait", description="Espera en cola hasta obtener cupo")
+        _controllers.add(self)
+        _register_gauges()
+
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionController"]:
+        """
+        Construye el controlador según ADMISSION_MAX_IN_FLIGHT (0 = deshabilitado),
+        ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_SECONDS y ADMISSION_RETRY_AFTER_SECONDS.
+        """
+        max_in_flight = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+        if max_in_flight <= 0:
+            return None
+        max_queue = int(os.getenv("ADMISSION_MAX_QUEUE", str(max_in_flight)))
+        queue_timeout = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "60"))
+        retry_after = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "5"))
+        logging.info(
+            f"✅ Control de admisión: {max_in_flight} análisis simultáneos, "
+            f"cola {max_queue} (espera máx. {queue_timeout}s)"
+        )
+        return cls(max_in_flight, max_queue, queue_timeout, retry_after)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos: lo que tardaría en vaciarse la cola actual, con un mínimo configurable"""
+        service = self._service_seconds or self.queue_timeout_seconds
+        backlog = (self.queued + 1) / self.max_in_flight
+        estimate = math.ceil(service * backlog)
+        return int(min(max(self.retry_after_seconds, estimate), MAX_RETRY_AFTER_SECONDS))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        self._rejections.add(1, {"reason": reason})
+        error = AdmissionRejected(reason, self.retry_after(), self.snapshot())
+        logging.warning(
+            f"🚦 Petición rechazada ({reason}): {self.in_flight} en curso, {self.queued} en cola; "
+            f"Retry-After {error.retry_after}s",
+            extra={"custom_dimensions": {"reason": reason, "retry_after": error.retry_after, **error.snapshot}}
+        )
+        return error
+
+    async def _acquire(self):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+        if self.queued >= self.max_queue:
+            raise self._reject(QUEUE_FULL)
+
+        # El cupo se transfiere directamente al primero de la cola (ver _release)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                waiter.cancel()
+                raise self._reject(QUEUE_TIMEOUT)
+        except asyncio.CancelledError:
+            # Invocación cancelada: devolver el cupo si ya se había transferido
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _observe(self, seconds: float):
+        if self._service_seconds is None:
+            self._service_seconds = seconds
+        else:
+            self._service_seconds += _EWMA_WEIGHT * (seconds - self._service_seconds)
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Ocupa un cupo durante el bloque, esperando en la cola si hace falta.
+
+        Raises:
+            AdmissionRejected: si la cola está llena o la espera supera queue_timeout_seconds
+        """
+        queued_at = time.monotonic()
+        await self._acquire()
+        started = time.monotonic()
+        self.admitted += 1
+        self._queue_wait.record((started - queued_at) * 1000)
+        try:
+            yield
+        finally:
+            self._observe(time.monotonic() - started)
+            self._release()
+
+
+def overloaded_error(rejection: AdmissionRejected) -> Dict[str, Any]:
+    """Error OVERLOADED para un análisis sin cupo (elementos de lote y jobs)"""
+    return {
+        "code": "OVERLOADED",
+        "message": str(rejection),
+        "reason": rejection.reason,
+        "retry_after_seconds": rejection.retry_after,
+    }
+
+
+@asynccontextmanager
+async def admitted(controller: Optional[AdmissionController]):
+    """Cupo de `controller` durante el bloque; sin límite si el control de admisión está deshabilitado"""
+    if controller is None:
+        yield
+        return
+    async with controller.admit():
+        yield
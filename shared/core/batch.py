@@ -0,0 +1,125 @@
+"""
+Análisis por lotes
+Procesa un arreglo de oportunidades en una sola invocación con concurrencia
+acotada, reutilizando el orquestador caliente y un catálogo de equipos precargado
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..utils.payload import extract_opportunity_data
+from .admission import AdmissionRejected, admitted, overloaded_error
+
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_ITEMS = 500
+
+# Lote síncrono: todo el lote comparte el deadline HTTP (220 s). Con análisis de
+# 20-60 s caben unas 3 rondas de BATCH_CONCURRENCY; los lotes mayores van en modo asíncrono
+DEFAULT_SYNC_MAX_ITEMS = 24
+
+
+def batch_settings() -> Dict[str, int]:
+    """BATCH_CONCURRENCY, BATCH_MAX_ITEMS y BATCH_SYNC_MAX_ITEMS"""
+    return {
+        "concurrency": max(1, int(os.getenv("BATCH_CONCURRENCY", str(DEFAULT_CONCURRENCY)))),
+        "max_items": max(1, int(os.getenv("BATCH_MAX_ITEMS", str(DEFAULT_MAX_ITEMS)))),
+        "sync_max_items": max(1, int(os.getenv("BATCH_SYNC_MAX_ITEMS", str(DEFAULT_SYNC_MAX_ITEMS)))),
+    }
+
+
+def parse_batch_request(payload: Any) -> Dict[str, Any]:
+    """
+    Normaliza el body de un lote.
+
+    Soporta:
+    1. Arreglo de oportunidades: [ {...}, {...} ]
+    2. Objeto: { "items": [ {...} ], "concurrency": 8 }
+
+    Raises:
+        ValueError: si el body no contiene un arreglo de oportunidades
+    """
+    if isinstance(payload, list):
+        items, concurrency = payload, None
+    elif isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        items, concurrency = payload["items"], payload.get("concurrency")
+    else:
+        raise ValueError("El body debe ser un arreglo de oportunidades o un objeto con 'items'")
+
+    if concurrency is not None:
+        concurrency = int(concurrency)
+    return {"items": items, "concurrency": concurrency}
+
+
+async def process_batch(
+    orchestrator,
+    items: List[Dict[str, Any]],
+    concurrency: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Ejecuta process_opportunity para cada elemento con a lo sumo `concurrency`
+    análisis simultáneos (acotado por BATCH_CONCURRENCY).
+
+    Returns:
+        Resumen del lote con un resultado (o error) por elemento, en el orden de entrada
+    """
+    # BATCH_CONCURRENCY es el máximo; el cliente solo puede pedir menos
+    max_concurrency = batch_settings()["concurrency"]
+    limit = max(1, min(concurrency or max_concurrency, max_concurrency))
+    semaphore = asyncio.Semaphore(limit)
+    start = time.perf_counter()
+
+    # Un solo catálogo para todo el lote: una consulta a Search y claves de caché consistentes
+    teams = await orchestrator.warm_teams_catalog()
+    logging.info(f"📦 Lote de {len(items)} oportunidades (concurrencia {limit}, {len(teams)} equipos)")
+
+    async def run_item(index: int, item: Any) -> Dict[str, Any]:
+        if not isinstance(item, dict):
+            return {
+                "index": index,
+                "success": False,
+                "error": {"code": "INVALID_ITEM", "message": "Cada elemento debe ser un objeto JSON"}
+            }
+
+        opportunity_data = extract_opportunity_data(dict(item))
+        entry = {"index": index, "opportunity_id": opportunity_data.get("opportunityid")}
+        async with semaphore:
+            try:
+                # Cada elemento ocupa un cupo de admisión, como una petición individual
+                async with admitted(orchestrator.admission):
+                    result = await orchestrator.process_opportunity(opportunity_data)
+            except AdmissionRejected as rejection:
+                result = {"success": False, "error": overloaded_error(rejection)}
+            except Exception as e:
+                logging.error(f"❌ Error en elemento {index} del lote: {str(e)}")
+                result = {"success": False, "error": {"code": "PROCESSING_ERROR", "message": str(e)}}
+
+        entry["success"] = bool(result.get("success"))
+        if entry["success"]:
+            entry["result"] = result
+        else:
+            entry["error"] = result.get("error")
+        return entry
+
+    results = await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+
+    succeeded = sum(1 for r in results if r["success"])
+    elapsed = time.perf_counter() - start
+    logging.info(f"✅ Lote finalizado: {succeeded}/{len(results)} exitosos en {elapsed:.1f}s")
+
+    return {
+        "success": succeeded == len(results),
+        "summary": {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "concurrency": limit,
+            "processing_time_seconds": round(elapsed, 2),
+            "processed_at": datetime.utcnow().isoformat(),
+        },
+        "results": results,
+    }
@@ -0,0 +1,102 @@
+"""
+Detección de cambios por campo en eventos Update
+Compara el payload recibido con la versión guardada junto al último análisis
+para decidir qué partes del resultado deben recalcularse
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..models.opportunity import OpportunityPayload
+
+
+# Tipo de cambio, de menor a mayor impacto
+NEW = "new"                 # sin versión previa comparable: análisis completo
+UNCHANGED = "unchanged"     # ningún campo relevante cambió
+IRRELEVANT = "irrelevant"   # solo estado/propietario: se reutilizan análisis y PDF
+MONETARY = "monetary"       # solo valores monetarios: se reutiliza el análisis, se regeneran card y PDF
+TEXTUAL = "textual"         # cambió el texto analizado: análisis completo
+
+IRRELEVANT_FIELDS = ("statecode", "statuscode", "ownerid", "ownername")
+MONETARY_FIELDS = ("estimatedvalue", "budgetamount")
+TEXTUAL_FIELDS = (
+    "name",
+    "description",
+    "cr807_descripciondelrequerimientofuncional",
+    "cr807_descripciondelrequerimientotecnico",
+    "customername",
+    "estimatedclosedate",
+)
+SNAPSHOT_FIELDS = TEXTUAL_FIELDS + MONETARY_FIELDS + IRRELEVANT_FIELDS
+
+
+@dataclass
+class ChangeSet:
+    """Clasificación de los cambios respecto de la versión analizada anteriormente"""
+    kind: str
+    fields: List[str] = field(default_factory=list)
+    previous_record_id: Optional[str] = None
+
+    @property
+    def reuses_analysis(self) -> bool:
+        return self.kind in (UNCHANGED, IRRELEVANT, MONETARY)
+
+    @property
+    def reuses_pdf(self) -> bool:
+        return self.kind in (UNCHANGED, IRRELEVANT)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "fields": self.fields, "previous_record_id": self.previous_record_id}
+
+
+def change_detection_enabled() -> bool:
+    return os.getenv("CHANGE_DETECTION_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def build_snapshot(opportunity: OpportunityPayload) -> Dict[str, Any]:
+    """Campos de la oportunidad que se guardan con el análisis para comparar futuros Update"""
+    return {name: _normalize(getattr(opportunity, name, None)) for name in SNAPSHOT_FIELDS}
+
+
+def classify_changes(
+    opportunity: OpportunityPayload,
+    previous_record: Optional[Dict[str, Any]],
+    prompt_version: str
+) -> ChangeSet:
+    """
+    Clasifica los cambios de un Update respecto del último registro guardado.
+
+    Un registro sin snapshot, con otra versión del prompt o sin análisis se
+    considera NEW (no es comparable).
+    """
+    if (
+        not previous_record
+        or not previous_record.get("snapshot")
+        or not previous_record.get("analysis")
+        or previous_record.get("prompt_version") != prompt_version
+    ):
+        return ChangeSet(NEW)
+
+    previous = previous_record["snapshot"]
+    current = build_snapshot(opportunity)
+    changed = [name for name in SNAPSHOT_FIELDS if _normalize(previous.get(name)) != current[name]]
+
+    if any(name in TEXTUAL_FIELDS for name in changed):
+        kind = TEXTUAL
+    elif any(name in MONETARY_FIELDS for name in changed):
+        kind = MONETARY
+    elif changed:
+        kind = IRRELEVANT
+    else:
+        kind = UNCHANGED
+
+    return ChangeSet(kind, changed, previous_record.get("id"))
@@ -0,0 +1,133 @@
+"""
+Agrupación de ráfagas de eventos por oportunidad
+Una sesión de edición en Dynamics genera varios Update en pocos segundos;
+solo el último payload de la ráfaga se analiza y los anteriores reciben un
+puntero al resultado final
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+# Rol de una petición dentro de su ráfaga
+LEADER = "leader"           # payload más reciente: se analiza
+SUPERSEDED = "superseded"   # reemplazado por un evento posterior
+
+
+@dataclass
+class CoalesceOutcome:
+    """
+    Resultado de EventCoalescer.submit.
+
+    Attributes:
+        status: LEADER o SUPERSEDED
+        payload: Payload final de la ráfaga (el que se analiza)
+        burst_id: Identificador de la ráfaga (job_id del resultado final)
+        superseded: Eventos reemplazados por el payload final
+    """
+    status: str
+    payload: Dict[str, Any]
+    burst_id: str
+    superseded: int = 0
+
+
+class _Burst:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.started_at = time.monotonic()
+        self.latest: Optional[object] = None
+        self.latest_payload: Dict[str, Any] = {}
+        self.count = 0
+        self.changed = asyncio.Event()
+        self.closed: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.closer: Optional[asyncio.Task] = None
+
+
+class EventCoalescer:
+    """
+    Retiene los eventos de cada opportunityid durante una ventana de silencio.
+
+    La ventana se reinicia con cada evento nuevo y se cierra tras
+    `window_seconds` sin eventos, o como máximo `max_wait_seconds` después del
+    primero (una edición continua no pospone el análisis indefinidamente).
+    La agrupación es por proceso: con varias instancias cada una agrupa los
+    eventos que recibe.
+    """
+
+    def __init__(self, window_seconds: float, max_wait_seconds: float = 30.0):
+        self.window_seconds = window_seconds
+        self.max_wait_seconds = max(max_wait_seconds, window_seconds)
+        self._bursts: Dict[str, _Burst] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["EventCoalescer"]:
+        """
+        Construye el agrupador según COALESCE_WINDOW_SECONDS (0 = deshabilitado)
+        y COALESCE_MAX_WAIT_SECONDS.
+        """
+        window = float(os.getenv("COALESCE_WINDOW_SECONDS", "0"))
+        if window <= 0:
+            return None
+        max_wait = float(os.getenv("COALESCE_MAX_WAIT_SECONDS", "30"))
+        logging.info(f"✅ Agrupación de eventos: ventana {window}s (máx. {max_wait}s)")
+        return cls(window, max_wait)
+
+    @staticmethod
+    def _is_newer(payload: Dict[str, Any], current: Dict[str, Any]) -> bool:
+        """Un evento con modifiedon anterior al vigente (llegó desordenado) no lo reemplaza"""
+        new_ts, current_ts = payload.get("modifiedon"), current.get("modifiedon")
+        if new_ts and current_ts:
+            return str(new_ts) >= str(current_ts)
+        return True
+
+    async def submit(self, key: Optional[str], payload: Dict[str, Any]) -> CoalesceOutcome:
+        """
+        Registra un evento y espera el cierre de su ráfaga.
+
+        Returns:
+            LEADER con el payload a analizar, o SUPERSEDED con el payload final
+        """
+        if not key:
+            return CoalesceOutcome(LEADER, payload, uuid.uuid4().hex)
+
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = _Burst()
+            burst.closer = asyncio.ensure_future(self._close_when_quiet(key, burst))
+
+        token = object()
+        burst.count += 1
+        if burst.latest is None or self._is_newer(payload, burst.latest_payload):
+            burst.latest = token
+            burst.latest_payload = payload
+        burst.changed.set()
+
+        latest, final_payload, count = await asyncio.shield(burst.closed)
+        if latest is token:
+            if count > 1:
+                logging.info(f"🧮 Ráfaga {key}: {count - 1} eventos reemplazados por el último")
+            return CoalesceOutcome(LEADER, final_payload, burst.id, count - 1)
+        return CoalesceOutcome(SUPERSEDED, final_payload, burst.id)
+
+    async def _close_when_quiet(self, key: str, burst: _Burst):
+        """Cierra la ráfaga tras la ventana de silencio o el tiempo máximo"""
+        try:
+            while True:
+                burst.changed.clear()
+                remaining = burst.started_at + self.max_wait_seconds - time.monotonic()
+                timeout = min(self.window_seconds, remaining)
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(burst.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            self._bursts.pop(key, None)
+            if not burst.closed.done():
+                burst.closed.set_result((burst.latest, burst.latest_payload, burst.count))
@@ -0,0 +1,154 @@
+"""
+Manejo idempotente de peticiones
+Power Automate reintenta el mismo POST cuando una ejecución expira o retorna 500;
+los duplicados se acoplan a la ejecución en curso o reciben la respuesta guardada
+"""
+
+import os
+import copy
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..services.analysis_cache import CosmosCacheBackend, DiskCacheBackend, MemoryCacheBackend
+
+
+# Estados de una petición respecto a la idempotencia
+EXECUTED = "executed"   # primera ejecución
+JOINED = "joined"       # duplicado acoplado a una ejecución en curso
+REPLAYED = "replayed"   # duplicado respondido con el resultado guardado
+
+
+class IdempotencyStore:
+    """
+    Registro de ejecuciones por clave de idempotencia.
+
+    - En curso: futuros en memoria del proceso (los duplicados esperan el mismo resultado).
+    - Completadas: respuestas exitosas en un backend de caché (memoria, disco o Cosmos).
+
+    Las respuestas fallidas no se guardan para que un reintento posterior vuelva a ejecutar.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def build_key(opportunity_data: Dict[str, Any], header_key: Optional[str] = None) -> Optional[str]:
+        """
+        Clave de idempotencia: header Idempotency-Key o bien opportunityid + modifiedon.
+
+        Returns:
+            Hash de la clave o None si la petición no es identificable
+        """
+        if header_key:
+            raw = f"header|{header_key.strip()}"
+        elif opportunity_data.get("opportunityid") and opportunity_data.get("modifiedon"):
+            raw = f"opp|{opportunity_data['opportunityid']}|{opportunity_data['modifiedon']}"
+        else:
+            return None
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_env(cls, cosmos_service=None) -> Optional["IdempotencyStore"]:
+        """
+        Construye el registro según IDEMPOTENCY_BACKEND (memory | disk | cosmos | none).
+
+        Returns:
+            El registro configurado o None si está deshabilitado
+        """
+        backend_name = os.getenv("IDEMPOTENCY_BACKEND", "memory").strip().lower()
+        ttl = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+        if backend_name in ("", "none", "off", "disabled"):
+            logging.info("⏭️ Idempotencia deshabilitada")
+            return None
+
+        if backend_name == "disk":
+            directory = os.getenv("IDEMPOTENCY_DIR", os.path.join(".cache", "idempotency"))
+            backend = DiskCacheBackend(directory, ttl)
+        elif backend_name == "cosmos" and cosmos_service is not None:
+            container = os.getenv("COSMOS_CACHE_CONTAINER_NAME", "analysis-cache")
+            backend = CosmosCacheBackend(cosmos_service, container, ttl)
+        else:
+            if backend_name == "cosmos":
+                logging.warning("⚠️ IDEMPOTENCY_BACKEND=cosmos sin Cosmos DB configurado: se usa memoria")
+            backend = MemoryCacheBackend(int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1024")), ttl)
+
+        logging.info(f"✅ Idempotencia: {type(backend).__name__}")
+        return cls(backend)
+
+    async def run(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Ejecuta `compute` una sola vez por clave.
+
+        Returns:
+            (respuesta, estado) donde estado es EXECUTED, JOINED o REPLAYED
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            logging.info(f"🔗 Petición duplicada en curso ({key[:16]}): esperando la ejecución original")
+            result = await asyncio.shield(in_flight)
+            return copy.deepcopy(result), JOINED
+
+        # Se registra antes de leer el backend: la lectura cede el event loop (disco,
+        # Cosmos) y un duplicado que llegue mientras tanto debe acoplarse, no ejecutar
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+
+        try:
+            stored = await self.backend.get(key)
+        except asyncio.CancelledError:
+            future.cancel()
+            self._release(key, future)
+            raise
+        except Exception as e:
+            logging.warning(f"⚠️ Error leyendo registro de idempotencia: {str(e)}")
+            stored = None
+        if stored is not None:
+            logging.info(f"♻️ Petición duplicada completada ({key[:16]}): se retorna la respuesta guardada")
+            future.set_result(stored)
+            self._release(key, future)
+            return stored, REPLAYED
+
+        # La tarea sobrevive aunque se cancele la invocación original, así los
+        # duplicados acoplados siempre reciben un resultado y este queda guardado
+        task = asyncio.ensure_future(self._execute(key, compute))
+        task.add_done_callback(lambda done: self._settle(key, future, done))
+        result = await asyncio.shield(task)
+        return result, EXECUTED
+
+    async def _execute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Ejecuta `compute` y guarda la respuesta exitosa antes de liberar la clave:
+        un reintento nunca encuentra la clave libre sin el resultado guardado
+        """
+        result = await compute()
+        if isinstance(result, dict) and result.get("success"):
+            try:
+                await self.backend.set(key, result)
+            except Exception as e:
+                logging.warning(f"⚠️ Error guardando registro de idempotencia: {str(e)}")
+        return result
+
+    def _settle(self, key: str, future: asyncio.Future, task: asyncio.Future):
+        """Traslada el resultado de la ejecución a los duplicados acoplados y libera la clave"""
+        if not future.done():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+                # Sin duplicados acoplados nadie lo lee: evita el aviso "exception was never retrieved"
+                future.exception()
+            else:
+                future.set_result(task.result())
+        self._release(key, future)
+
+    def _release(self, key: str, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
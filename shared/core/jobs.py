@@ -0,0 +1,522 @@
+"""
+Modo asíncrono (202 Accepted) del análisis de oportunidades
+La petición HTTP encola un job y retorna de inmediato; un worker ejecuta el
+orquestador y el estado/resultado se consulta en GET /api/analyze/{job_id}
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from azure.core.exceptions import ResourceExistsError
+
+from ..utils.deadline import deadline_scope, job_deadline
+from ..utils.tracing import extract_context, inject_context, start_span
+from ..services.analysis_cache import CosmosCacheBackend, DiskCacheBackend, MemoryCacheBackend
+from ..utils.payload import extract_opportunity_data
+from .admission import AdmissionRejected, admitted, overloaded_error
+from .batch import batch_settings
+from .idempotency import IdempotencyStore
+from .registry import get_orchestrator, lease_orchestrator
+
+
+# Estados de un job
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Tipos de job
+ANALYSIS = "analysis"
+BATCH = "batch"
+
+DEFAULT_QUEUE_NAME = "analyze-jobs"
+
+# App setting con la conexión de la cola: el mismo nombre va en "connection" de
+# AnalyzeOpportunityWorker/function.json, y el nombre de la cola en "%ANALYZE_QUEUE_NAME%"
+QUEUE_CONNECTION_SETTING = "AzureWebJobsStorage"
+
+# Intentos por mensaje antes de pasar a la cola poison (extensions.queues.maxDequeueCount
+# en host.json); en el último, un job sin cupo de admisión se marca FAILED con OVERLOADED
+QUEUE_MAX_DEQUEUE_COUNT = 5
+
+# Lecturas y escrituras simultáneas del estado al registrar o consultar los elementos de un lote
+_BATCH_IO_CONCURRENCY = 16
+
+
+def async_mode_requested(mode: Optional[str], prefer: Optional[str]) -> bool:
+    """?mode=async, header `Prefer: respond-async` o ANALYZE_ASYNC_MODE=true"""
+    mode = (mode or "").strip().lower()
+    if mode:
+        return mode == "async"
+    if "respond-async" in (prefer or "").lower():
+        return True
+    return os.getenv("ANALYZE_ASYNC_MODE", "false").strip().lower() in ("1", "true", "yes")
+
+
+# ============================================================
+# Almacenamiento del estado de los jobs
+# ============================================================
+
+class BlobJobBackend:
+    """Documentos de estado como blobs JSON (jobs/{job_id}.json)"""
+
+    def __init__(self, blob_service, prefix: str = "jobs"):
+        self.blob_service = blob_service
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await self.blob_service.download_json_async(f"{self.prefix}/{key}.json")
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        if not await self.blob_service.upload_json_async(value, f"{self.prefix}/{key}.json"):
+            raise RuntimeError(f"No se pudo guardar el estado del job {key}")
+
+
+def build_job_backend(orchestrator):
+    """Backend de estado según JOB_STORE_BACKEND (blob | cosmos | disk | memory)"""
+    default = "blob" if getattr(orchestrator, "blob_service", None) else "memory"
+    backend_name = os.getenv("JOB_STORE_BACKEND", default).strip().lower()
+    ttl = float(os.getenv("JOB_TTL_SECONDS", str(7 * 86400)))
+
+    if backend_name == "blob" and getattr(orchestrator, "blob_service", None):
+        return BlobJobBackend(orchestrator.blob_service)
+    if backend_name == "cosmos" and getattr(orchestrator, "cosmos_service", None):
+        container = os.getenv("COSMOS_CACHE_CONTAINER_NAME", "analysis-cache")
+        return CosmosCacheBackend(orchestrator.cosmos_service, container, ttl)
+    if backend_name == "disk":
+        return DiskCacheBackend(os.getenv("JOB_STORE_DIR", os.path.join(".cache", "jobs")), ttl)
+
+    if backend_name not in ("memory", ""):
+        logging.warning(f"⚠️ JOB_STORE_BACKEND={backend_name} no disponible: se usa memoria")
+    return MemoryCacheBackend(int(os.getenv("JOB_STORE_MAX_ENTRIES", "1024")), ttl)
+
+
+# ============================================================
+# Colas
+# ============================================================
+
+class StorageJobQueue:
+    """Azure Storage Queue consumida por la función AnalyzeOpportunityWorker"""
+
+    def __init__(self, connection_string: str, queue_name: str):
+        from azure.storage.queue import TextBase64EncodePolicy
+        from azure.storage.queue.aio import QueueClient
+
+        # El trigger de Azure Functions espera mensajes en base64
+        self.client = QueueClient.from_connection_string(
+            connection_string,
+            queue_name,
+            message_encode_policy=TextBase64EncodePolicy()
+        )
+        self._queue_checked = False
+
+    async def enqueue(self, job_id: str):
+        if not self._queue_checked:
+            try:
+                await self.client.create_queue()
+            except ResourceExistsError:
+                pass
+            self._queue_checked = True
+        await self.client.send_message(json.dumps({"job_id": job_id}))
+
+
+class InProcessJobQueue:
+    """Sustituto local: ejecuta el job como tarea del mismo event loop"""
+
+    def __init__(self, handler: Callable[[str], Awaitable[Any]], concurrency: Optional[int] = None):
+        self.handler = handler
+        # Referencias fuertes para que el recolector no cancele las tareas
+        self._tasks: set = set()
+        # Jobs simultáneos (un lote encola un job por elemento); None = sin límite
+        self._semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def enqueue(self, job_id: str):
+        self._spawn(self._handle(job_id))
+
+    async def _handle(self, job_id: str):
+        if self._semaphore is None:
+            return await self._call(job_id)
+        async with self._semaphore:
+            return await self._call(job_id)
+
+    async def _call(self, job_id: str):
+        # Sin cupo de admisión el job sigue QUEUED: reintentar tras el Retry-After sugerido
+        while True:
+            try:
+                return await self.handler(job_id)
+            except AdmissionRejected as rejection:
+                await asyncio.sleep(rejection.retry_after)
+
+
+class FileJobQueue(InProcessJobQueue):
+    """
+    Sustituto local persistente: cada mensaje es un archivo en un directorio.
+
+    Los mensajes pendientes (p. ej. tras reiniciar `func start`) se procesan
+    en el siguiente enqueue.
+    """
+
+    def __init__(self, handler: Callable[[str], Awaitable[Any]], directory: str):
+        super().__init__(handler)
+        self.directory = directory
+        self._in_progress: set = set()
+        os.makedirs(directory, exist_ok=True)
+
+    async def enqueue(self, job_id: str):
+        path = os.path.join(self.directory, f"{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}-{job_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"job_id": job_id}, f)
+        self._spawn(self.drain())
+
+    async def drain(self):
+        """Procesa en orden los mensajes pendientes del directorio"""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json") or name in self._in_progress:
+                continue
+            self._in_progress.add(name)
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    job_id = json.load(f)["job_id"]
+                await self._call(job_id)
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            finally:
+                self._in_progress.discard(name)
+
+
+# ============================================================
+# Gestor de jobs
+# ============================================================
+
+class JobManager:
+    """Encola, ejecuta y consulta jobs de análisis"""
+
+    def __init__(self, backend, queue=None, orchestrator_provider=get_orchestrator):
+        self.backend = backend
+        self.orchestrator_provider = orchestrator_provider
+        self.queue = queue if queue is not None else InProcessJobQueue(self.run, batch_settings()["concurrency"])
+
+    @classmethod
+    def from_env(cls, orchestrator) -> "JobManager":
+        """
+        Construye el gestor según JOB_QUEUE_BACKEND (storage | file | inprocess).
+
+        La cola de Storage requiere un estado compartido entre procesos (blob,
+        cosmos o disk); con estado en memoria se usa la cola en proceso.
+        """
+        # El gestor queda ligado al orquestador con el que se construyó (su backend usa esos clientes)
+        manager = cls(build_job_backend(orchestrator), orchestrator_provider=lambda: orchestrator)
+
+        connection_string = os.getenv(QUEUE_CONNECTION_SETTING)
+        default = "storage" if connection_string else "inprocess"
+        backend_name = os.getenv("JOB_QUEUE_BACKEND", default).strip().lower()
+
+        if backend_name == "storage" and connection_string and isinstance(manager.backend, MemoryCacheBackend):
+            # El worker de la cola corre en otro proceso y no vería el estado en memoria de este
+            logging.warning(
+                "⚠️ Cola de Storage con estado de jobs en memoria: el worker no encontraría los jobs. "
+                "Se usa la cola en proceso; configure JOB_STORE_BACKEND=blob|cosmos para usar la cola de Storage"
+            )
+        elif backend_name == "storage" and connection_string:
+            queue_name = os.getenv("ANALYZE_QUEUE_NAME", DEFAULT_QUEUE_NAME)
+            manager.queue = StorageJobQueue(connection_string, queue_name)
+        elif backend_name == "file":
+            manager.queue = FileJobQueue(manager.run, os.getenv("JOB_QUEUE_DIR", os.path.join(".cache", "queue")))
+
+        logging.info(
+            f"✅ Modo asíncrono: cola {type(manager.queue).__name__}, estado {type(manager.backend).__name__}"
+        )
+        return manager
+
+    @staticmethod
+    def build_job_id(opportunity_data: Dict[str, Any], header_key: Optional[str] = None) -> str:
+        """
+        Id determinista cuando la petición es identificable (un reintento
+        recibe el mismo job); si no, un UUID nuevo.
+        """
+        key = IdempotencyStore.build_key(opportunity_data, header_key)
+        return key[:32] if key else uuid.uuid4().hex
+
+    async def submit(
+        self,
+        opportunity_data: Dict[str, Any],
+        job_id: Optional[str] = None,
+        batch: Optional[Tuple[str, int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Registra y encola un job. Si ya existe un job activo o exitoso con el
+        mismo id se retorna sin volver a encolarlo.
+
+        `batch` es (id del lote, índice) para los elementos de submit_batch.
+        """
+        job_id = job_id or uuid.uuid4().hex
+
+        existing = await self.backend.get(job_id)
+        if existing and existing.get("status") != FAILED:
+            logging.info(f"🔗 Job {job_id} ya registrado ({existing['status']})")
+            return existing
+
+        job = self._new_job(job_id, opportunity_data, ANALYSIS, QUEUED)
+        if batch is not None:
+            job["batch_id"], job["index"] = batch
+        await self.backend.set(job_id, job)
+        await self.queue.enqueue(job_id)
+
+        logging.info(f"📨 Job encolado: {job_id}")
+        return job
+
+    async def submit_batch(self, items: List[Any], job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Registra un lote como un job por elemento, cada uno con su propio
+        deadline en el worker, y un job padre (kind=BATCH) que los agrupa.
+        El estado del padre se calcula con el de sus elementos (ver get).
+        """
+        job_id = job_id or uuid.uuid4().hex
+
+        existing = await self.backend.get(job_id)
+        if existing and existing.get("status") != FAILED:
+            logging.info(f"🔗 Lote {job_id} ya registrado ({existing['status']})")
+            return existing
+
+        children = [f"{job_id}-{index}" for index in range(len(items))]
+        job = self._new_job(job_id, {}, BATCH, QUEUED)
+        job["children"] = children
+        await self.backend.set(job_id, job)
+
+        semaphore = asyncio.Semaphore(_BATCH_IO_CONCURRENCY)
+
+        async def submit_item(index: int, child_id: str, item: Any):
+            async with semaphore:
+                if not isinstance(item, dict):
+                    child = self._new_job(child_id, {}, ANALYSIS, FAILED)
+                    child.update(batch_id=job_id, index=index, error={
+                        "code": "INVALID_ITEM", "message": "Cada elemento debe ser un objeto JSON"
+                    })
+                    await self.backend.set(child_id, child)
+                    return
+                await self.submit(extract_opportunity_data(dict(item)), child_id, batch=(job_id, index))
+
+        await asyncio.gather(*(submit_item(index, children[index], item) for index, item in enumerate(items)))
+        return job
+
+    @staticmethod
+    def _new_job(job_id: str, opportunity_data: Dict[str, Any], kind: str, status: str) -> Dict[str, Any]:
+        now = datetime.utcnow().isoformat()
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "opportunity_id": opportunity_data.get("opportunityid"),
+            "opportunity_name": opportunity_data.get("name"),
+            "created_at": now,
+            "updated_at": now,
+            # El payload va en el documento de estado y no en el mensaje (límite de 64 KB de la cola)
+            "payload": opportunity_data,
+            # Progreso: un evento por paso y sus salidas parciales (la card antes que el PDF)
+            "events": [],
+            "partial": {},
+            "result": None,
+            "error": None,
+            # traceparent de la petición que creó el job: el worker continúa la misma traza
+            "trace_context": inject_context(),
+        }
+
+    async def track(
+        self,
+        job_id: str,
+        opportunity_data: Dict[str, Any],
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta `compute` en la petición actual registrando su estado como job,
+        para que otras peticiones puedan apuntar a su resultado (p. ej. los
+        eventos reemplazados de una ráfaga). Un error del almacenamiento no
+        afecta al análisis.
+        """
+        job = self._new_job(job_id, opportunity_data, ANALYSIS, RUNNING)
+        try:
+            await self.backend.set(job_id, job)
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo registrar el job {job_id}: {str(e)}")
+
+        try:
+            result = await compute()
+        except Exception as e:
+            # El job no queda en RUNNING para siempre si el análisis no llega a ejecutarse
+            try:
+                await self._update(job, status=FAILED, error={"code": type(e).__name__, "message": str(e)})
+            except Exception as update_error:
+                logging.warning(f"⚠️ No se pudo guardar el error del job {job_id}: {str(update_error)}")
+            raise
+
+        try:
+            status = SUCCEEDED if result.get("success") else FAILED
+            await self._update(job, status=status, result=result, error=result.get("error"))
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo guardar el resultado del job {job_id}: {str(e)}")
+        return result
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.backend.get(job_id)
+        if job and job.get("kind") == BATCH and job["status"] in (QUEUED, RUNNING):
+            job = await self._aggregate_batch(job)
+        return job
+
+    async def _aggregate_batch(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Estado de un lote según sus elementos. Al terminar todos, el resumen
+        (mismo formato que el lote síncrono) se guarda en el job padre y las
+        consultas siguientes ya no leen los elementos.
+        """
+        semaphore = asyncio.Semaphore(_BATCH_IO_CONCURRENCY)
+
+        async def read(child_id: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.backend.get(child_id)
+
+        children = await asyncio.gather(*(read(child_id) for child_id in job["children"]))
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        results = []
+        for index, (child_id, child) in enumerate(zip(job["children"], children)):
+            if child is None:
+                error = {"code": "JOB_NOT_FOUND", "message": f"No existe el job '{child_id}'"}
+                child = {"status": FAILED, "error": error}
+            counts[child["status"]] += 1
+            entry = {"index": index, "job_id": child_id, "opportunity_id": child.get("opportunity_id")}
+            if child["status"] == SUCCEEDED:
+                entry.update(success=True, result=child["result"])
+            elif child["status"] == FAILED:
+                entry.update(success=False, error=child.get("error"))
+            else:
+                entry["status"] = child["status"]
+            results.append(entry)
+
+        job = dict(job, progress={"total": len(results), **counts})
+        if counts[QUEUED] or counts[RUNNING]:
+            job["status"] = RUNNING if counts[QUEUED] < len(results) else QUEUED
+            return job
+
+        # Un lote completado es exitoso aunque tenga elementos con error (ver results[])
+        result = {
+            "success": counts[FAILED] == 0,
+            "summary": {
+                "total": len(results),
+                "succeeded": counts[SUCCEEDED],
+                "failed": counts[FAILED],
+                "processed_at": datetime.utcnow().isoformat(),
+            },
+            "results": results,
+        }
+        await self._update(job, status=SUCCEEDED, result=result, error=None)
+        logging.info(f"✅ Lote {job['job_id']} finalizado: {counts[SUCCEEDED]}/{len(results)} exitosos")
+        return job
+
+    async def _update(self, job: Dict[str, Any], **changes):
+        job.update(changes, updated_at=datetime.utcnow().isoformat())
+        await self.backend.set(job["job_id"], job)
+
+    async def run(self, job_id: str, final_attempt: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Ejecuta el análisis de un job (invocado por el worker de la cola).
+
+        Raises:
+            AdmissionRejected: si no hay cupo de admisión y no es el último intento; el job
+                sigue QUEUED y la cola reintenta el mensaje
+        """
+        # El lease evita que el orquestador (y los clientes del estado) se cierren mientras corre el job
+        with lease_orchestrator(self.orchestrator_provider()):
+            return await self._run(job_id, final_attempt)
+
+    async def _run(self, job_id: str, final_attempt: bool) -> Optional[Dict[str, Any]]:
+        job = await self.backend.get(job_id)
+        if job is None:
+            logging.error(f"❌ Job no encontrado: {job_id}")
+            return None
+        if job["status"] == SUCCEEDED:
+            logging.info(f"⏭️ Job {job_id} ya completado")
+            return job
+        if job.get("kind") == BATCH:
+            # Los elementos del lote son jobs propios; el padre solo agrupa su estado
+            logging.warning(f"⚠️ El lote {job_id} no se ejecuta como job: se ejecutan sus elementos")
+            return job
+
+        orchestrator = self.orchestrator_provider()
+        try:
+            # Cada job ocupa un cupo de admisión, como una petición individual
+            async with admitted(orchestrator.admission):
+                result = await self._execute(job, orchestrator)
+        except AdmissionRejected as rejection:
+            if not final_attempt:
+                logging.warning(f"🚦 Job {job_id} sin cupo de admisión; se reintentará")
+                raise
+            result = {"success": False, "error": overloaded_error(rejection)}
+
+        if result.get("success"):
+            await self._update(job, status=SUCCEEDED, result=result, error=None)
+        else:
+            await self._update(job, status=FAILED, result=result, error=result.get("error"))
+
+        logging.info(f"✅ Job {job_id} finalizado: {job['status']}")
+        return job
+
+    async def _execute(self, job: Dict[str, Any], orchestrator) -> Dict[str, Any]:
+        """Marca el job RUNNING y ejecuta el análisis, guardando el progreso por paso"""
+        job_id = job["job_id"]
+        await self._update(job, status=RUNNING, started_at=datetime.utcnow().isoformat())
+        logging.info(f"⚙️ Ejecutando job {job_id}...")
+
+        async def record_progress(event: Dict[str, Any]):
+            if event["event"] in ("completed", "error"):
+                return  # el resultado final se guarda al terminar
+            job.setdefault("events", []).append({
+                "event": event["event"],
+                "status": event["status"],
+                "elapsed_seconds": event["elapsed_seconds"],
+            })
+            job.setdefault("partial", {}).update(event["data"])
+            await self._update(job)
+
+        try:
+            parent = extract_context(job.get("trace_context"))
+            span_name = f"job {job.get('kind')}"
+            with start_span(span_name, "consumer", {"app.job_id": job_id}, parent), deadline_scope(job_deadline()):
+                return await orchestrator.process_opportunity(dict(job["payload"]), record_progress)
+        except Exception as e:
+            logging.error(f"❌ Error ejecutando job {job_id}: {str(e)}")
+            return {"success": False, "error": {"code": "PROCESSING_ERROR", "message": str(e)}}
+
+    @staticmethod
+    def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Documento de estado sin el payload original, el contexto de traza ni los ids de los elementos"""
+        return {key: value for key, value in job.items() if key not in ("payload", "trace_context", "children")}
+
+
+_lock = threading.Lock()
+_manager: Optional[JobManager] = None
+_manager_orchestrator = None
+
+
+def get_job_manager() -> JobManager:
+    """Gestor de jobs del proceso (se recrea si el orquestador compartido cambia)"""
+    global _manager, _manager_orchestrator
+
+    orchestrator = get_orchestrator()
+    with _lock:
+        if _manager is None or _manager_orchestrator is not orchestrator:
+            _manager = JobManager.from_env(orchestrator)
+            _manager_orchestrator = orchestrator
+        return _manager
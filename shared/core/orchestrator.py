@@ -3,339 +3,832 @@ Orquestador principal para el análisis inteligente de oportunidades
 Coordina el flujo completo desde la recepción del payload hasta la respuesta
 """
 
+import os
+import json
+import time
+import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, Callable, List, Optional
 
 from ..models.opportunity import OpportunityPayload
 from ..services.openai_service import OpenAIService
 from ..services.search_service import SearchService
 from ..services.blob_storage_service import BlobStorageService
 from ..services.cosmos_service import CosmosDBService
+from ..services.analysis_cache import AnalysisCache, catalog_version
 from ..generators.adaptive_card import generate_opportunity_card
 from ..generators.pdf_generator import PDFGenerator
+from ..utils.circuit import CIRCUIT_OPEN_STATUS
+from ..utils.deadline import Deadline, current_deadline, deadline_scope, request_deadline
+from ..utils.profiling import ProfilingSettings, RequestProfiler, save_profile
+from ..utils.timing import RequestTimings, collect_timings, track_call
+from ..utils.tracing import start_span
+from .pipeline import PipelineAbort, PipelineExecutor, PipelineStep, StepResult
+from .changes import NEW, ChangeSet, build_snapshot, change_detection_enabled, classify_changes
+from .coalescer import EventCoalescer
+from .admission import AdmissionController
+from .idempotency import IdempotencyStore
+
+
+# Callback de progreso: recibe un evento {"event", "step", "status", "elapsed_seconds", "data"}
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
 
 
 class OpportunityOrchestrator:
     """
     Orquestador para el análisis de oportunidades de Dynamics 365.
 
-    Flujo:
+    Flujo (ver _build_pipeline: los pasos independientes corren en paralelo):
     1. Recibir payload de Power Automate
     2. Validar y parsear datos de oportunidad
     3. Buscar equipos relevantes en Azure AI Search
-    4. Analizar con DeepSeek-R1
+    4. Analizar con GPT-4o-mini
     5. Generar PDF del análisis
     6. Guardar en Cosmos DB
     7. Generar Adaptive Card para Teams
     8. Retornar respuesta estructurada
     """
 
+    # Servicios externos: (nombre, atributo del servicio, atributo de habilitación, clase)
+    _SERVICES = (
+        ("OpenAIService", "openai_service", "openai_enabled", OpenAIService),
+        ("SearchService", "search_service", "search_enabled", SearchService),
+        ("BlobStorageService", "blob_service", "blob_enabled", BlobStorageService),
+        # Cosmos DB es opcional
+        ("CosmosDBService", "cosmos_service", "cosmos_enabled", CosmosDBService),
+    )
+
     def __init__(self):
         """Inicializa los servicios necesarios"""
         # Inicializar servicios con manejo de errores para entornos sin APP SETTINGS
-        try:
-            self.openai_service = OpenAIService()
-            self.openai_enabled = True
-        except Exception as e:
-            logging.warning(f"⚠️ OpenAIService no inicializado: {str(e)}")
-            self.openai_service = None
-            self.openai_enabled = False
+        self._failed_services: Dict[str, str] = {}
+        for name, service_attr, enabled_attr, service_cls in self._SERVICES:
+            self._init_service(name, service_attr, enabled_attr, service_cls)
 
-        try:
-            self.search_service = SearchService()
-            self.search_enabled = True
-        except Exception as e:
-            logging.warning(f"⚠️ SearchService no inicializado: {str(e)}")
-            self.search_service = None
-            self.search_enabled = False
+        # Catálogo de equipos cacheado entre invocaciones (ver _get_teams_catalog)
+        self.teams_catalog_ttl = float(os.getenv("TEAMS_CATALOG_TTL_SECONDS", "300"))
+        self._teams_catalog: List[Dict[str, Any]] = []
+        self._teams_catalog_loaded_at: Optional[float] = None
+        self._teams_catalog_task: Optional[asyncio.Task] = None
 
-        try:
-            self.blob_service = BlobStorageService()
-            self.blob_enabled = True
-        except Exception as e:
-            logging.warning(f"⚠️ BlobStorageService no inicializado: {str(e)}")
-            self.blob_service = None
-            self.blob_enabled = False
+        # Caché de análisis por hash de contenido (ver ANALYSIS_CACHE_BACKEND)
+        self.analysis_cache = AnalysisCache.from_env(cosmos_service=self.cosmos_service)
 
-        # Cosmos DB es opcional
+        # Deduplicación de reintentos de Power Automate (ver IDEMPOTENCY_BACKEND)
+        self.idempotency_store = IdempotencyStore.from_env(cosmos_service=self.cosmos_service)
+
+        # Agrupación de ráfagas de Update por oportunidad (ver COALESCE_WINDOW_SECONDS)
+        self.coalescer = EventCoalescer.from_env()
+
+        # Límite de análisis simultáneos y cola de espera (ver ADMISSION_MAX_IN_FLIGHT)
+        self.admission = AdmissionController.from_env()
+
+        # Profiling por invocación (ver PROFILE_REQUESTS y el header X-Profile)
+        self.profiling = ProfilingSettings.from_env()
+
+        # Tiempo reservado para construir y serializar la respuesta al final del deadline
+        self.deadline_margin = float(os.getenv("DEADLINE_MARGIN_SECONDS", "5"))
+
+        logging.info("✅ OpportunityOrchestrator inicializado")
+
+    def _init_service(self, name: str, service_attr: str, enabled_attr: str, service_cls) -> bool:
+        """Instancia un servicio; si falla queda deshabilitado y registrado para reintento"""
         try:
-            self.cosmos_service = CosmosDBService()
-            self.cosmos_enabled = True
+            setattr(self, service_attr, service_cls())
+            setattr(self, enabled_attr, True)
+            self._failed_services.pop(name, None)
+            return True
         except Exception as e:
-            logging.warning(f"⚠️ Cosmos DB no configurado: {str(e)}")
-            self.cosmos_service = None
-            self.cosmos_enabled = False
+            logging.warning(f"⚠️ {name} no inicializado: {str(e)}")
+            setattr(self, service_attr, None)
+            setattr(self, enabled_attr, False)
+            self._failed_services[name] = str(e)
+            return False
+
+    @property
+    def failed_services(self) -> Dict[str, str]:
+        """Servicios que no pudieron inicializarse (nombre -> error)"""
+        return dict(getattr(self, "_failed_services", {}))
+
+    def retry_failed_services(self) -> List[str]:
+        """
+        Reintenta inicializar los servicios que fallaron previamente.
 
-        logging.info("✅ OpportunityOrchestrator inicializado")
+        Returns:
+            Lista con los nombres de los servicios recuperados
+        """
+        recovered = []
+        for name, service_attr, enabled_attr, service_cls in self._SERVICES:
+            if name not in self._failed_services:
+                continue
+            if self._init_service(name, service_attr, enabled_attr, service_cls):
+                logging.info(f"♻️ {name} recuperado")
+                recovered.append(name)
+        return recovered
+
+    def close(self):
+        """Libera los clientes HTTP de los servicios inicializados"""
+        for name, service_attr, _, _ in self._SERVICES:
+            service = getattr(self, service_attr, None)
+            if service is None:
+                continue
+            try:
+                service.close()
+            except Exception as e:
+                logging.warning(f"⚠️ Error cerrando {name}: {str(e)}")
 
-    async def process_opportunity(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    async def _get_teams_catalog(self) -> List[Dict[str, Any]]:
+        """
+        Retorna el catálogo completo de equipos, cacheado durante
+        TEAMS_CATALOG_TTL_SECONDS para no consultar Azure Search en cada petición.
+        """
+        now = time.monotonic()
+        if (
+            self._teams_catalog
+            and self._teams_catalog_loaded_at is not None
+            and now - self._teams_catalog_loaded_at < self.teams_catalog_ttl
+        ):
+            return self._teams_catalog
+
+        # Una sola consulta en vuelo: las peticiones concurrentes esperan la misma
+        loop = asyncio.get_running_loop()
+        task = self._teams_catalog_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self.search_service.get_all_teams_async())
+            self._teams_catalog_task = task
+
+        teams = await asyncio.shield(task)
+        # No cachear un catálogo vacío: suele indicar un error transitorio
+        if teams:
+            self._teams_catalog = teams
+            self._teams_catalog_loaded_at = now
+        return teams
+
+    async def warm_teams_catalog(self) -> List[Dict[str, Any]]:
+        """Precarga el catálogo de equipos (p. ej. antes de un lote); vacío si Search no está disponible"""
+        if not self.search_service:
+            return []
+        try:
+            return await self._get_teams_catalog()
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo precargar el catálogo de equipos: {str(e)}")
+            return []
+
+    # Timeouts por paso (segundos). El análisis con IA queda acotado por functionTimeout.
+    _STEP_TIMEOUTS = {
+        "load_teams": 30.0,
+        "detect_changes": 10.0,
+        "save_cosmos": 30.0,
+        "generate_pdf": 120.0,
+        "link_pdf": 10.0,
+        "adaptive_card": 30.0,
+    }
+
+    # Tiempo mínimo restante para iniciar un paso opcional; con menos se omite
+    # y la respuesta lo informa en metadata.degraded
+    _STEP_MIN_BUDGETS = {
+        "save_cosmos": 5.0,
+        "generate_pdf": 20.0,
+    }
+
+    def _build_pipeline(self) -> PipelineExecutor:
+        """
+        Define el pipeline de 10 pasos como un DAG.
+
+        validate ─┬→ prepare_text ───┐
+                  └→ detect_changes ─┤ (opcional, solo Update)
+        load_teams ──────────────────┴→ analyze → enrich ─┬→ save_cosmos ──┬→ link_pdf  (opcionales)
+                                                          ├→ generate_pdf ─┘
+                                                          ├→ adaptive_card
+                                                          └→ tower_leaders
+        """
+        t, b = self._STEP_TIMEOUTS, self._STEP_MIN_BUDGETS
+        return PipelineExecutor([
+            PipelineStep("validate", self._step_validate, ("payload",), ("opportunity",)),
+            PipelineStep("prepare_text", self._step_prepare_text, ("opportunity",), ("analysis_text",)),
+            PipelineStep("load_teams", self._step_load_teams, (), ("all_teams",),
+                         timeout=t["load_teams"], required=False),
+            PipelineStep("detect_changes", self._step_detect_changes, ("opportunity",),
+                         ("previous_record", "change_set"), timeout=t["detect_changes"], required=False),
+            PipelineStep("analyze", self._step_analyze,
+                         ("opportunity", "analysis_text", "all_teams", "previous_record", "change_set"),
+                         ("analysis_result", "analysis_cache")),
+            PipelineStep("enrich", self._step_enrich, ("analysis_result", "all_teams"),
+                         ("analysis", "enriched_teams")),
+            # El registro se guarda en paralelo con el PDF (no espera al render) y la URL
+            # se agrega después, para reutilizarla en Update sin cambios relevantes
+            PipelineStep("save_cosmos", self._step_save_cosmos, ("opportunity", "analysis", "change_set"),
+                         ("cosmos_id",), timeout=t["save_cosmos"], required=False, min_budget=b["save_cosmos"]),
+            PipelineStep("generate_pdf", self._step_generate_pdf,
+                         ("opportunity", "analysis", "previous_record", "change_set"), ("pdf_url",),
+                         timeout=t["generate_pdf"], required=False, min_budget=b["generate_pdf"]),
+            PipelineStep("link_pdf", self._step_link_pdf, ("opportunity", "cosmos_id", "pdf_url"), (),
+                         timeout=t["link_pdf"], required=False),
+            PipelineStep("adaptive_card", self._step_adaptive_card, ("opportunity", "analysis"),
+                         ("adaptive_card",), timeout=t["adaptive_card"]),
+            PipelineStep("tower_leaders", self._step_tower_leaders, ("enriched_teams",), ("tower_leaders",)),
+        ], initial_keys=("payload",))
+
+    # Eventos de progreso emitidos al completar cada paso (ver process_opportunity)
+    _STEP_EVENTS = {
+        "validate": "validated",
+        "load_teams": "teams_loaded",
+        "enrich": "analysis_ready",
+        "adaptive_card": "card_ready",
+        "generate_pdf": "pdf_ready",
+        "save_cosmos": "saved",
+    }
+
+    async def process_opportunity(
+        self,
+        payload: Dict[str, Any],
+        on_event: Optional[EventCallback] = None,
+        profile: bool = False
+    ) -> Dict[str, Any]:
         """
         Procesa una oportunidad recibida desde Power Automate
 
         Args:
             payload: Datos de la oportunidad desde Dataverse/Power Automate
+            on_event: Corrutina opcional que recibe los eventos de progreso
+                (validated, teams_loaded, analysis_ready, card_ready, pdf_ready,
+                saved; con OPENAI_STREAMING también card_preview durante el
+                análisis) y al final `completed` o `error` con la respuesta
+            profile: Profiling solicitado por el llamador (header X-Profile);
+                se aplica según PROFILE_REQUESTS
+
+        El tiempo disponible es el deadline del llamador (ver deadline_scope) o,
+        si no hay uno, REQUEST_DEADLINE_SECONDS desde ahora. Los pasos opcionales
+        (PDF, Cosmos) se omiten cuando el tiempo no alcanza, de modo que el
+        análisis y la card se retornan a tiempo.
 
         Returns:
             Diccionario con el resultado del análisis
         """
         start_time = datetime.utcnow()
-
-        try:
-            # ========================================
-            # PASO 1: Validar y parsear payload
-            # ========================================
-            logging.info("📥 Paso 1: Validando payload...")
+        started = time.perf_counter()
+        # El ejecutor completa este contexto a medida que avanzan los pasos
+        context: Dict[str, Any] = {"payload": payload}
+        if on_event:
+            context["emit_event"] = self._step_event_emitter(on_event, started)
+
+        profiler = None
+        if self.profiling.should_profile(payload.get("opportunityid"), profile):
+            profiler = RequestProfiler(self.profiling.top)
+            if not profiler.start():
+                profiler = None
+
+        # Los servicios registran sus llamadas externas en este colector (ver utils/timing)
+        span_attributes = {
+            "app.opportunity_id": payload.get("opportunityid"),
+            "app.event_type": payload.get("SdkMessage"),
+        }
+        # Se reserva DEADLINE_MARGIN_SECONDS para construir la respuesta
+        deadline = (current_deadline() or request_deadline()).reserve(self.deadline_margin)
+        with collect_timings() as timings, deadline_scope(deadline), start_span(
+            "process_opportunity", attributes=span_attributes
+        ) as span:
+
+            async def on_step(result: StepResult, ctx: Dict[str, Any]):
+                timings.record_step(result.name, result.duration_seconds, result.status)
+                event = self._STEP_EVENTS.get(result.name)
+                if event and on_event:
+                    await on_event(self._progress_event(event, result, ctx, started))
 
             try:
-                opportunity = OpportunityPayload(**payload)
+                try:
+                    run = await self._build_pipeline().run(context, on_step, deadline)
+                finally:
+                    profile_result = profiler.stop() if profiler else None
+
+                # ========================================
+                # PASO 10: Construir respuesta
+                # ========================================
+                response = self._build_response(run.context, start_time)
+                self._attach_degradation(response, run.steps, deadline)
+
+            except PipelineAbort as e:
+                opportunity = context.get("opportunity")
+                response = self._error_response(
+                    e.code,
+                    e.message,
+                    opportunity.opportunityid if opportunity else payload.get("opportunityid", "unknown"),
+                    opportunity.name if opportunity else payload.get("name", "Unknown")
+                )
+
             except Exception as e:
-                logging.error(f"❌ Error validando payload: {str(e)}")
-                return self._error_response(
-                    "VALIDATION_ERROR",
-                    f"Error validando datos de oportunidad: {str(e)}",
+                logging.error(f"❌ Error procesando oportunidad: {str(e)}")
+                import traceback
+                logging.error(f"❌ Traceback: {traceback.format_exc()}")
+
+                response = self._error_response(
+                    "DEADLINE_EXCEEDED" if deadline.expired else "PROCESSING_ERROR",
+                    str(e),
                     payload.get("opportunityid", "unknown"),
                     payload.get("name", "Unknown")
                 )
 
-            logging.info(f"✅ Oportunidad validada: {opportunity.name}")
+            if profiler:
+                await self._attach_profile(response, profile_result, payload.get("opportunityid", "unknown"))
+            self._attach_skipped_dependencies(response, timings)
+            self._attach_timings(response, payload, timings)
+            if not response.get("success"):
+                span.mark_error(response["error"]["code"])
 
-            # ========================================
-            # PASO 2: Preparar texto para análisis
-            # ========================================
-            logging.info("📝 Paso 2: Preparando texto para análisis...")
+        if on_event:
+            try:
+                await on_event({
+                    "event": "completed" if response.get("success") else "error",
+                    "elapsed_seconds": round(time.perf_counter() - started, 3),
+                    "data": response,
+                })
+            except Exception as e:
+                logging.warning(f"⚠️ Error notificando el resultado final: {str(e)}")
 
-            analysis_text = opportunity.format_for_analysis()
-            logging.info(f"📝 Texto preparado: {len(analysis_text)} caracteres")
+        return response
 
-            # ========================================
-            # PASO 3: Buscar equipos relevantes
-            # ========================================
-            logging.info("🔍 Paso 3: Buscando equipos relevantes...")
+    async def _attach_profile(self, response: Dict[str, Any], profile_result: Dict[str, Any], opportunity_id: str):
+        """Guarda los artefactos del profiler y agrega su ubicación en metadata.profile"""
+        try:
+            location = await save_profile(
+                profile_result["artifacts"],
+                opportunity_id,
+                getattr(self, "blob_service", None),
+                self.profiling.directory,
+            )
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudieron guardar los artefactos de profiling: {str(e)}")
+            location = {"storage": None, "error": str(e)}
+        response.setdefault("metadata", {})["profile"] = {**profile_result["summary"], **location}
+        logging.info(f"🔬 Profiling guardado: {location}")
+
+    def _attach_degradation(self, response: Dict[str, Any], steps: Dict[str, StepResult], deadline: Deadline):
+        """Agrega metadata.deadline y metadata.degraded (pasos opcionales omitidos, vencidos o fallidos)"""
+        degraded = [
+            {"step": name, "status": result.status, "reason": result.error}
+            for name, result in steps.items()
+            if result.status != "ok"
+        ]
+        metadata = response.setdefault("metadata", {})
+        metadata["deadline"] = {**deadline.to_dict(), "margin_seconds": self.deadline_margin}
+        metadata["degraded"] = degraded
+        if degraded:
+            logging.warning(f"⏳ Respuesta degradada: {', '.join(d['step'] + '=' + d['status'] for d in degraded)}")
+
+    @staticmethod
+    def _attach_skipped_dependencies(response: Dict[str, Any], timings: RequestTimings):
+        """Agrega metadata.skipped_dependencies: llamadas omitidas por un circuit breaker abierto"""
+        skipped = [
+            {
+                "dependency": call.dependency,
+                "operation": call.operation,
+                "retry_in_seconds": call.extra.get("retry_in_seconds"),
+            }
+            for call in timings.calls
+            if call.status == CIRCUIT_OPEN_STATUS
+        ]
+        response.setdefault("metadata", {})["skipped_dependencies"] = skipped
+        if skipped:
+            logging.warning(
+                f"🔌 Dependencias omitidas por circuito abierto: "
+                f"{', '.join(s['dependency'] + '.' + s['operation'] for s in skipped)}"
+            )
 
-            # Validar que el servicio de búsqueda esté disponible
-            if not getattr(self, "search_service", None):
-                logging.warning(
-                    "⚠️ SearchService no configurado: "
-                    "no se podrán obtener equipos desde Azure Search"
-                )
-                teams = []
-                all_teams = []
-            else:
-                # Obtener TODOS los equipos (dataset pequeño ~10)
-                # para que la IA tenga contexto completo y el
-                # enriquecimiento siempre encuentre datos reales.
-                try:
-                    all_teams = self.search_service.get_all_teams()
-                except Exception as e:
-                    logging.warning(
-                        f"⚠️ Error obteniendo todos los equipos: {e}"
-                    )
-                    all_teams = []
-
-                teams = all_teams  # pasar todos a la IA
-
-            logging.info(f"✅ {len(teams)} equipos encontrados")
-
-            # ========================================
-            # PASO 4: Análisis con IA
-            # ========================================
-            logging.info("🧠 Paso 4: Analizando con DeepSeek-R1...")
-
-            # Verificar OpenAI configurado
-            if not getattr(self, "openai_service", None):
-                logging.error(
-                    "❌ OpenAIService no configurado: "
-                    "verifique las APP SETTINGS de la Function (AZURE_OPENAI_*)"
-                )
-                return self._error_response(
-                    "SERVICE_NOT_CONFIGURED",
-                    "OpenAI/Azure OpenAI no está configurado. "
-                    "Configure AZURE_OPENAI_ENDPOINT y AZURE_OPENAI_KEY en las App Settings.",
-                    opportunity.opportunityid,
-                    opportunity.name
-                )
+    @staticmethod
+    def _attach_timings(response: Dict[str, Any], payload: Dict[str, Any], timings: RequestTimings):
+        """Agrega metadata.timings (pasos, llamadas externas y tamaños) y los datos registrados con record_metadata"""
+        data = timings.to_dict()
+        data["request_bytes"] = len(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+        data["response_bytes"] = len(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8"))
+        metadata = response.setdefault("metadata", {})
+        metadata.update(timings.metadata)
+        metadata["timings"] = data
+        timings.log(response.get("opportunity_id"))
+
+    @staticmethod
+    def _step_event_emitter(on_event: EventCallback, started: float):
+        """Emisor para los pasos en curso (p. ej. card_preview durante el análisis); sus errores se ignoran"""
+        async def emit(event: str, step: str, data: Dict[str, Any]):
+            try:
+                await on_event({
+                    "event": event,
+                    "step": step,
+                    "status": "running",
+                    "elapsed_seconds": round(time.perf_counter() - started, 3),
+                    "data": data,
+                })
+            except Exception as e:
+                logging.warning(f"⚠️ Error notificando el evento '{event}': {str(e)}")
+
+        return emit
+
+    @staticmethod
+    def _progress_event(event: str, result: StepResult, ctx: Dict[str, Any], started: float) -> Dict[str, Any]:
+        """Evento de progreso con las salidas útiles del paso completado"""
+        if event == "validated":
+            data = {"opportunity_id": ctx["opportunity"].opportunityid, "opportunity_name": ctx["opportunity"].name}
+        elif event == "teams_loaded":
+            data = {"teams_count": len(ctx.get("all_teams") or [])}
+        elif event == "analysis_ready":
+            data = {"analysis": ctx.get("analysis"), "analysis_cache": ctx.get("analysis_cache")}
+        elif event == "card_ready":
+            data = {"adaptive_card": ctx.get("adaptive_card")}
+        elif event == "pdf_ready":
+            data = {"pdf_url": ctx.get("pdf_url")}
+        else:
+            data = {"cosmos_record_id": ctx.get("cosmos_id")}
+
+        return {
+            "event": event,
+            "step": result.name,
+            "status": result.status,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "data": data,
+        }
+
+    # ========================================
+    # PASO 1: Validar y parsear payload
+    # ========================================
+    async def _step_validate(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        logging.info("📥 Paso 1: Validando payload...")
 
-            analysis_result = self.openai_service.analyze_opportunity(
-                opportunity_text=analysis_text,
-                available_teams=teams
+        try:
+            opportunity = OpportunityPayload(**ctx["payload"])
+        except Exception as e:
+            logging.error(f"❌ Error validando payload: {str(e)}")
+            raise PipelineAbort(
+                "VALIDATION_ERROR",
+                f"Error validando datos de oportunidad: {str(e)}"
             )
 
-            if not analysis_result:
-                logging.error("❌ El análisis de IA no retornó resultados")
-                return self._error_response(
-                    "AI_ANALYSIS_ERROR",
-                    "No se pudo completar el análisis con IA",
-                    opportunity.opportunityid,
-                    opportunity.name
-                )
+        logging.info(f"✅ Oportunidad validada: {opportunity.name}")
+        return {"opportunity": opportunity}
+
+    # ========================================
+    # PASO 2: Preparar texto para análisis
+    # ========================================
+    async def _step_prepare_text(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        logging.info("📝 Paso 2: Preparando texto para análisis...")
+
+        analysis_text = ctx["opportunity"].format_for_analysis()
+        logging.info(f"📝 Texto preparado: {len(analysis_text)} caracteres")
+        return {"analysis_text": analysis_text}
+
+    # ========================================
+    # PASO 2b: Detectar cambios respecto del último análisis (Update)
+    # ========================================
+    async def _step_detect_changes(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        opportunity = ctx["opportunity"]
+        if (
+            opportunity.event_type != "Update"
+            or not change_detection_enabled()
+            or not (self.cosmos_enabled and self.cosmos_service)
+            or not getattr(self, "openai_service", None)
+        ):
+            return {"previous_record": None, "change_set": ChangeSet(NEW)}
+
+        logging.info("🔎 Paso 2b: Comparando con el último análisis guardado...")
+        previous_record = await self.cosmos_service.get_latest_analysis_async(opportunity.opportunityid)
+        change_set = classify_changes(opportunity, previous_record, self.openai_service.PROMPT_VERSION)
+
+        logging.info(f"✅ Cambios: {change_set.kind} {change_set.fields}")
+        return {"previous_record": previous_record, "change_set": change_set}
+
+    # ========================================
+    # PASO 3: Buscar equipos relevantes
+    # ========================================
+    async def _step_load_teams(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        logging.info("🔍 Paso 3: Buscando equipos relevantes...")
+
+        # Validar que el servicio de búsqueda esté disponible
+        if not getattr(self, "search_service", None):
+            logging.warning(
+                "⚠️ SearchService no configurado: "
+                "no se podrán obtener equipos desde Azure Search"
+            )
+            return {"all_teams": []}
 
-            logging.info("✅ Análisis completado")
+        # Obtener TODOS los equipos (dataset pequeño ~10)
+        # para que la IA tenga contexto completo y el
+        # enriquecimiento siempre encuentre datos reales.
+        try:
+            all_teams = await self._get_teams_catalog()
+        except Exception as e:
+            logging.warning(
+                f"⚠️ Error obteniendo todos los equipos: {e}"
+            )
+            all_teams = []
+
+        logging.info(f"✅ {len(all_teams)} equipos encontrados")
+        return {"all_teams": all_teams}
+
+    # ========================================
+    # PASO 4: Análisis con IA
+    # ========================================
+    async def _step_analyze(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        logging.info("🧠 Paso 4: Analizando con IA...")
+
+        # Verificar OpenAI configurado
+        if not getattr(self, "openai_service", None):
+            logging.error(
+                "❌ OpenAIService no configurado: "
+                "verifique las APP SETTINGS de la Function (AZURE_OPENAI_*)"
+            )
+            raise PipelineAbort(
+                "SERVICE_NOT_CONFIGURED",
+                "OpenAI/Azure OpenAI no está configurado. "
+                "Configure AZURE_OPENAI_ENDPOINT y AZURE_OPENAI_KEY en las App Settings."
+            )
 
-            # ========================================
-            # PASO 5: Procesar torres recomendadas
-            # ========================================
-            logging.info("🏗️ Paso 5: Procesando torres recomendadas...")
+        teams = ctx["all_teams"] or []
 
-            # Normalizar torres del análisis
-            required_towers = analysis_result.get("required_towers", [])
-            team_recommendations = analysis_result.get("team_recommendations", [])
+        # Update sin cambios de texto: el análisis guardado sigue vigente
+        change_set = ctx["change_set"]
+        if change_set and change_set.reuses_analysis:
+            logging.info(f"♻️ Cambios '{change_set.kind}': se reutiliza el análisis de {change_set.previous_record_id}")
+            return {
+                "analysis_result": ctx["previous_record"]["analysis"],
+                "analysis_cache": {"hit": True, "key": None, "source": "previous_record"},
+            }
 
-            # Enriquecer con datos de equipos encontrados
-            # Usar all_teams (completo) para el enriquecimiento
-            enriched_teams = self._enrich_team_recommendations(
-                team_recommendations,
-                all_teams,
+        # Reutilizar el análisis si el contenido, el catálogo, el prompt y el modo
+        # de análisis (dos etapas, documento largo) no cambiaron
+        cache_key = None
+        if self.analysis_cache:
+            service = self.openai_service
+            two_stage = getattr(service, "two_stage", False)
+            long_document = getattr(service, "long_document", False)
+            cache_key = AnalysisCache.build_key(
+                ctx["analysis_text"],
+                catalog_version(teams),
+                f"{service.PROMPT_VERSION}:{service.deployment}"
+                f":two_stage={int(two_stage)}:long_document={int(long_document)}",
             )
-            analysis_result["team_recommendations"] = enriched_teams
-
-            logging.info(f"✅ {len(required_towers)} torres requeridas, {len(enriched_teams)} equipos recomendados")
+            cached = await self.analysis_cache.get(cache_key)
+            if cached:
+                logging.info("♻️ Análisis obtenido de caché: se omite la llamada al modelo")
+                return {
+                    "analysis_result": cached,
+                    "analysis_cache": {"hit": True, "key": cache_key[:16]},
+                }
 
-            # ========================================
-            # PASO 6: Guardar en Cosmos DB (opcional)
-            # ========================================
-            cosmos_id = None
-            if self.cosmos_enabled and self.cosmos_service:
-                logging.info("💾 Paso 6: Guardando en Cosmos DB...")
+        # Pasar todos los equipos a la IA (con OPENAI_TWO_STAGE el servicio elige las
+        # torres candidatas). En streaming o en dos etapas, la card preliminar se
+        # emite en cuanto el modelo completa los campos que necesita.
+        streaming_kwargs = {}
+        service = self.openai_service
+        if (getattr(service, "streaming", False) or getattr(service, "two_stage", False)) and ctx.get("emit_event"):
+            streaming_kwargs["on_field"] = self._card_preview_callback(ctx, teams)
+        analysis_result = await self.openai_service.analyze_opportunity_async(
+            opportunity_text=ctx["analysis_text"],
+            available_teams=teams,
+            **streaming_kwargs
+        )
+
+        if not analysis_result:
+            deadline = current_deadline()
+            if deadline and deadline.expired:
+                logging.error("❌ El análisis de IA no terminó antes del deadline")
+                raise PipelineAbort("DEADLINE_EXCEEDED", "El análisis con IA no terminó en el tiempo disponible")
+            logging.error("❌ El análisis de IA no retornó resultados")
+            raise PipelineAbort("AI_ANALYSIS_ERROR", "No se pudo completar el análisis con IA")
+
+        if cache_key:
+            await self.analysis_cache.set(cache_key, analysis_result)
+
+        logging.info("✅ Análisis completado")
+        return {
+            "analysis_result": analysis_result,
+            "analysis_cache": {"hit": False, "key": cache_key[:16] if cache_key else None},
+        }
 
-                try:
-                    record = {
-                        "id": f"opp-{opportunity.opportunityid}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
-                        "opportunity_id": opportunity.opportunityid,
-                        "opportunity_name": opportunity.name,
-                        "event_type": opportunity.event_type,
-                        "analysis": analysis_result,
-                        "processed_at": datetime.utcnow().isoformat(),
-                        "source": "power_automate"
-                    }
-
-                    result = self.cosmos_service.save_analysis(record)
-                    cosmos_id = result.get("id") if result else None
-                    logging.info(f"✅ Guardado en Cosmos: {cosmos_id}")
-                except Exception as e:
-                    logging.warning(f"⚠️ Error guardando en Cosmos: {str(e)}")
-            else:
-                logging.info("⏭️ Paso 6: Cosmos DB no habilitado, saltando...")
+    # Campos del análisis necesarios para la card preliminar (streaming)
+    _PREVIEW_FIELDS = ("executive_summary", "required_towers", "team_recommendations")
 
-            # ========================================
-            # PASO 7: Generar PDF
-            # ========================================
-            logging.info("📄 Paso 7: Generando PDF...")
-            pdf_url = None
+    def _card_preview_callback(self, ctx: Dict[str, Any], teams: List[Dict[str, Any]]):
+        """
+        Callback de campos del streaming: acumula el análisis parcial y, cuando
+        llegan los _PREVIEW_FIELDS, enriquece los equipos y emite `card_preview`
+        con la card preliminar, mientras el modelo sigue generando.
+        """
+        opportunity = ctx["opportunity"]
+        partial: Dict[str, Any] = {}
+        emitted = False
+
+        async def on_field(name: str, value: Any):
+            nonlocal emitted
+            partial[name] = value
+            if emitted or not all(key in partial for key in self._PREVIEW_FIELDS):
+                return
+            emitted = True
             try:
-                pdf_generator = PDFGenerator()
-                pdf_bytes = pdf_generator.generate(
-                    title=f"Análisis: {opportunity.name}",
-                    analysis=analysis_result,
-                    metadata={
-                        "opportunity_id": opportunity.opportunityid,
-                        "opportunity_name": opportunity.name,
-                        "generated_at": datetime.utcnow().isoformat()
-                    }
+                preview = dict(partial)
+                preview["team_recommendations"] = self._enrich_team_recommendations(
+                    partial["team_recommendations"], teams
+                )
+                card = generate_opportunity_card(
+                    opportunity_id=opportunity.opportunityid,
+                    opportunity_name=opportunity.name,
+                    analysis_data=preview
                 )
-
-                # Subir a Blob Storage si está disponible
-                if getattr(self, "blob_service", None):
-                    ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                    blob_name = f"opportunity-analysis/{opportunity.opportunityid}/{ts}.pdf"
-                    pdf_url = self.blob_service.upload_pdf(pdf_bytes, blob_name)
-                    logging.info(f"✅ PDF subido: {blob_name}")
-                else:
-                    logging.warning("⚠️ BlobStorageService no configurado: se omitirá subida del PDF")
-
             except Exception as e:
-                logging.warning(f"⚠️ Error generando PDF: {str(e)}")
-
-            # ========================================
-            # PASO 8: Generar Adaptive Card
-            # ========================================
-            logging.info("🎨 Paso 8: Generando Adaptive Card...")
+                logging.warning(f"⚠️ No se pudo generar la card preliminar: {str(e)}")
+                return
+            logging.info(f"⚡ Card preliminar lista con {len(partial)} campos del análisis")
+            await ctx["emit_event"]("card_preview", "analyze", {"adaptive_card": card, "analysis_partial": preview})
+
+        return on_field
+
+    # ========================================
+    # PASO 5: Procesar torres recomendadas
+    # ========================================
+    async def _step_enrich(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        logging.info("🏗️ Paso 5: Procesando torres recomendadas...")
+
+        analysis_result = dict(ctx["analysis_result"])
+        required_towers = analysis_result.get("required_towers", [])
+
+        # Enriquecer con datos de equipos encontrados
+        # Usar all_teams (completo) para el enriquecimiento
+        enriched_teams = self._enrich_team_recommendations(
+            analysis_result.get("team_recommendations", []),
+            ctx["all_teams"] or [],
+        )
+        analysis_result["team_recommendations"] = enriched_teams
+
+        logging.info(f"✅ {len(required_towers)} torres requeridas, {len(enriched_teams)} equipos recomendados")
+        return {"analysis": analysis_result, "enriched_teams": enriched_teams}
+
+    # ========================================
+    # PASO 6: Guardar en Cosmos DB (opcional)
+    # ========================================
+    async def _step_save_cosmos(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        if not (self.cosmos_enabled and self.cosmos_service):
+            logging.info("⏭️ Paso 6: Cosmos DB no habilitado, saltando...")
+            return {"cosmos_id": None}
+
+        logging.info("💾 Paso 6: Guardando en Cosmos DB...")
+        opportunity = ctx["opportunity"]
+        record = {
+            "id": f"opp-{opportunity.opportunityid}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
+            "opportunity_id": opportunity.opportunityid,
+            "opportunity_name": opportunity.name,
+            "event_type": opportunity.event_type,
+            "analysis": ctx["analysis"],
+            # Se completa en link_pdf cuando el PDF está subido
+            "pdf_url": None,
+            # Versión analizada: base de la detección de cambios del próximo Update
+            "snapshot": build_snapshot(opportunity),
+            "prompt_version": getattr(self.openai_service, "PROMPT_VERSION", None),
+            "change_detection": ctx["change_set"].to_dict() if ctx["change_set"] else None,
+            "processed_at": datetime.utcnow().isoformat(),
+            "source": "power_automate"
+        }
 
+        result = await self.cosmos_service.save_analysis_async(record)
+        cosmos_id = result.get("id") if result else None
+        logging.info(f"✅ Guardado en Cosmos: {cosmos_id}")
+        return {"cosmos_id": cosmos_id}
+
+    async def _step_link_pdf(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """Agrega la URL del PDF al registro de Cosmos cuando ambos pasos terminaron"""
+        if not (ctx["cosmos_id"] and ctx["pdf_url"]):
+            return {}
+        linked = await self.cosmos_service.set_pdf_url_async(
+            ctx["cosmos_id"], ctx["opportunity"].opportunityid, ctx["pdf_url"]
+        )
+        if linked:
+            logging.info(f"🔗 PDF asociado al registro {ctx['cosmos_id']}")
+        return {}
+
+    # ========================================
+    # PASO 7: Generar PDF
+    # ========================================
+    async def _step_generate_pdf(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        opportunity = ctx["opportunity"]
+
+        # Solo cambió estado/propietario: el PDF anterior sigue siendo válido
+        change_set = ctx["change_set"]
+        if change_set and change_set.reuses_pdf and ctx["previous_record"].get("pdf_url"):
+            logging.info("⏭️ Paso 7: se reutiliza el PDF del análisis anterior")
+            return {"pdf_url": ctx["previous_record"]["pdf_url"]}
+
+        logging.info("📄 Paso 7: Generando PDF...")
+
+        # ReportLab es CPU-bound: se ejecuta en un hilo para no bloquear el event loop
+        pdf_generator = PDFGenerator()
+        with track_call("pdf", "render") as call:
+            pdf_bytes = await asyncio.to_thread(
+                pdf_generator.generate,
+                title=f"Análisis: {opportunity.name}",
+                analysis=ctx["analysis"],
+                metadata={
+                    "opportunity_id": opportunity.opportunityid,
+                    "opportunity_name": opportunity.name,
+                    "generated_at": datetime.utcnow().isoformat()
+                }
+            )
+            call.response_bytes = len(pdf_bytes)
+
+        # Subir a Blob Storage si está disponible
+        if not getattr(self, "blob_service", None):
+            logging.warning("⚠️ BlobStorageService no configurado: se omitirá subida del PDF")
+            return {"pdf_url": None}
+
+        ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        blob_name = f"opportunity-analysis/{opportunity.opportunityid}/{ts}.pdf"
+        pdf_url = await self.blob_service.upload_pdf_async(pdf_bytes, blob_name)
+        logging.info(f"✅ PDF subido: {blob_name}")
+        return {"pdf_url": pdf_url}
+
+    # ========================================
+    # PASO 8: Generar Adaptive Card
+    # ========================================
+    async def _step_adaptive_card(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        logging.info("🎨 Paso 8: Generando Adaptive Card...")
+        opportunity = ctx["opportunity"]
+
+        # La card no depende del PDF, por eso se genera en paralelo con él
+        with track_call("card", "generate"):
             adaptive_card = generate_opportunity_card(
                 opportunity_id=opportunity.opportunityid,
                 opportunity_name=opportunity.name,
-                analysis_data=analysis_result,
-                pdf_url=pdf_url
+                analysis_data=ctx["analysis"]
             )
 
-            logging.info("✅ Adaptive Card generado")
-
-            # ========================================
-            # PASO 9: Extraer líderes de torre únicos
-            # ========================================
-            tower_leaders = []
-            seen_leaders = set()
-            for team in enriched_teams:
-                leader = team.get("team_lead", "")
-                email = team.get("team_lead_email", "")
-                tower = team.get("tower", "")
-                team_name = team.get("team_name", "")
-
-                if leader and leader not in seen_leaders:
-                    seen_leaders.add(leader)
-                    tower_leaders.append({
-                        "tower": tower,
-                        "team_name": team_name,
-                        "leader_name": leader,
-                        "leader_email": email
-                    })
-
-            logging.info(f"✅ {len(tower_leaders)} líderes de torre identificados")
-
-            # ========================================
-            # PASO 10: Construir respuesta
-            # ========================================
-            processing_time = (datetime.utcnow() - start_time).total_seconds()
-
-            response = {
-                "success": True,
-                "opportunity_id": opportunity.opportunityid,
-                "opportunity_name": opportunity.name,
-                "event_type": opportunity.event_type,
-
-                "analysis": {
-                    "executive_summary": analysis_result.get("executive_summary"),
-                    "key_requirements": analysis_result.get("key_requirements", []),
-                    "required_towers": required_towers,
-                    "team_recommendations": enriched_teams,
-                    "overall_risk_level": analysis_result.get("overall_risk_level"),
-                    "risks": analysis_result.get("risks", []),
-                    "timeline_estimate": analysis_result.get("timeline_estimate"),
-                    "effort_estimate": analysis_result.get("effort_estimate"),
-                    "recommendations": analysis_result.get("recommendations", []),
-                    "next_steps": analysis_result.get("next_steps", []),
-                    "clarification_questions": analysis_result.get("clarification_questions", []),
-                    "confidence": analysis_result.get("analysis_confidence", 0.0)
-                },
-
-                "outputs": {
-                    "adaptive_card": adaptive_card,
-                    "pdf_url": pdf_url,
-                    "cosmos_record_id": cosmos_id
-                },
-
-                "metadata": {
-                    "processed_at": datetime.utcnow().isoformat(),
-                    "processing_time_seconds": round(processing_time, 2),
-                    "model_used": "GPT-4o-mini",
-                    "teams_evaluated": len(teams)
-                }
-            }
+        logging.info("✅ Adaptive Card generado")
+        return {"adaptive_card": adaptive_card}
+
+    # ========================================
+    # PASO 9: Extraer líderes de torre únicos
+    # ========================================
+    async def _step_tower_leaders(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        tower_leaders = []
+        seen_leaders = set()
+        for team in ctx["enriched_teams"]:
+            leader = team.get("team_lead", "")
+            email = team.get("team_lead_email", "")
+            tower = team.get("tower", "")
+            team_name = team.get("team_name", "")
+
+            if leader and leader not in seen_leaders:
+                seen_leaders.add(leader)
+                tower_leaders.append({
+                    "tower": tower,
+                    "team_name": team_name,
+                    "leader_name": leader,
+                    "leader_email": email
+                })
 
-            logging.info(f"✅ Procesamiento completado en {processing_time:.2f}s")
-            return response
+        logging.info(f"✅ {len(tower_leaders)} líderes de torre identificados")
+        return {"tower_leaders": tower_leaders}
+
+    def _build_response(self, ctx: Dict[str, Any], start_time: datetime) -> Dict[str, Any]:
+        """Construye la respuesta final a partir del contexto del pipeline"""
+        opportunity = ctx["opportunity"]
+        analysis_result = ctx["analysis"]
+        processing_time = (datetime.utcnow() - start_time).total_seconds()
+
+        response = {
+            "success": True,
+            "opportunity_id": opportunity.opportunityid,
+            "opportunity_name": opportunity.name,
+            "event_type": opportunity.event_type,
+
+            "analysis": {
+                "executive_summary": analysis_result.get("executive_summary"),
+                "key_requirements": analysis_result.get("key_requirements", []),
+                "required_towers": analysis_result.get("required_towers", []),
+                "team_recommendations": ctx["enriched_teams"],
+                "overall_risk_level": analysis_result.get("overall_risk_level"),
+                "risks": analysis_result.get("risks", []),
+                "timeline_estimate": analysis_result.get("timeline_estimate"),
+                "effort_estimate": analysis_result.get("effort_estimate"),
+                "recommendations": analysis_result.get("recommendations", []),
+                "next_steps": analysis_result.get("next_steps", []),
+                "clarification_questions": analysis_result.get("clarification_questions", []),
+                "confidence": analysis_result.get("analysis_confidence", 0.0)
+            },
 
-        except Exception as e:
-            logging.error(f"❌ Error procesando oportunidad: {str(e)}")
-            import traceback
-            logging.error(f"❌ Traceback: {traceback.format_exc()}")
-
-            return self._error_response(
-                "PROCESSING_ERROR",
-                str(e),
-                payload.get("opportunityid", "unknown"),
-                payload.get("name", "Unknown")
-            )
+            "outputs": {
+                "adaptive_card": ctx["adaptive_card"],
+                "pdf_url": ctx["pdf_url"],
+                "cosmos_record_id": ctx["cosmos_id"]
+            },
+
+            "metadata": {
+                "processed_at": datetime.utcnow().isoformat(),
+                "processing_time_seconds": round(processing_time, 2),
+                "model_used": "GPT-4o-mini",
+                "teams_evaluated": len(ctx["all_teams"] or []),
+                "analysis_cache": ctx["analysis_cache"],
+                "change_detection": ctx["change_set"].to_dict() if ctx["change_set"] else None
+            }
+        }
+
+        logging.info(f"✅ Procesamiento completado en {processing_time:.2f}s")
+        return response
 
     def _enrich_team_recommendations(
         self,
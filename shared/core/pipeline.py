@@ -0,0 +1,222 @@
+"""
+Ejecutor de pipeline basado en un grafo de dependencias (DAG)
+Cada paso declara qué claves del contexto consume y cuáles produce;
+los pasos independientes se ejecutan de forma concurrente
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..utils.deadline import Deadline
+from ..utils.tracing import start_span
+
+
+StepFunc = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class PipelineStep:
+    """
+    Paso declarativo del pipeline.
+
+    Attributes:
+        name: Nombre único del paso
+        func: Corrutina que recibe el contexto y retorna un dict con sus salidas
+        inputs: Claves del contexto que necesita antes de ejecutarse
+        outputs: Claves que agrega al contexto
+        timeout: Tiempo máximo en segundos (None = sin límite)
+        required: Si falla un paso requerido se aborta el pipeline; si falla
+            uno opcional sus salidas quedan en None y el resto continúa
+        min_budget: Segundos que deben quedar en el deadline para iniciar un
+            paso opcional; con menos se omite (status "skipped")
+    """
+    name: str
+    func: StepFunc
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    required: bool = True
+    min_budget: float = 0.0
+
+
+@dataclass
+class StepResult:
+    """Resultado de la ejecución de un paso"""
+    name: str
+    status: str  # "ok" | "failed" | "timeout" | "skipped"
+    duration_seconds: float
+    error: Optional[str] = None
+
+
+StepCallback = Callable[[StepResult, Dict[str, Any]], Awaitable[None]]
+
+
+@dataclass
+class PipelineRun:
+    """Contexto final y resultados por paso de una ejecución"""
+    context: Dict[str, Any]
+    steps: Dict[str, StepResult] = field(default_factory=dict)
+
+
+class PipelineAbort(Exception):
+    """Lanzada por un paso para terminar el pipeline con un error de negocio"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class StepFailedError(Exception):
+    """Un paso requerido falló o excedió su timeout"""
+
+    def __init__(self, step: str, error: str):
+        super().__init__(f"Paso '{step}' falló: {error}")
+        self.step = step
+        self.error = error
+
+
+class PipelineExecutor:
+    """
+    Ejecuta un conjunto de PipelineStep respetando sus dependencias.
+
+    Un paso se lanza en cuanto todas sus entradas están disponibles en el
+    contexto, por lo que los pasos sin dependencias entre sí corren en paralelo.
+    """
+
+    def __init__(self, steps: List[PipelineStep], initial_keys: Tuple[str, ...] = ()):
+        self.steps = list(steps)
+        self._validate(initial_keys)
+
+    def _validate(self, initial_keys: Tuple[str, ...]):
+        """Verifica nombres y salidas únicas, entradas resolubles y ausencia de ciclos"""
+        names = [step.name for step in self.steps]
+        if len(names) != len(set(names)):
+            raise ValueError("Los nombres de los pasos deben ser únicos")
+
+        producers: Dict[str, str] = {key: "<contexto inicial>" for key in initial_keys}
+        for step in self.steps:
+            for key in step.outputs:
+                if key in producers:
+                    raise ValueError(f"La salida '{key}' la producen '{producers[key]}' y '{step.name}'")
+                producers[key] = step.name
+
+        for step in self.steps:
+            missing = [key for key in step.inputs if key not in producers]
+            if missing:
+                raise ValueError(f"El paso '{step.name}' requiere entradas sin productor: {missing}")
+
+        # Ordenamiento topológico: si no se pueden resolver todos los pasos hay un ciclo
+        available = set(initial_keys)
+        pending = list(self.steps)
+        while pending:
+            ready = [step for step in pending if all(key in available for key in step.inputs)]
+            if not ready:
+                raise ValueError(f"Ciclo de dependencias entre: {[step.name for step in pending]}")
+            for step in ready:
+                available.update(step.outputs)
+                pending.remove(step)
+
+    async def run(
+        self,
+        context: Dict[str, Any],
+        on_step: Optional[StepCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> PipelineRun:
+        """
+        Ejecuta el pipeline sobre el contexto dado.
+
+        Args:
+            context: Contexto inicial; el ejecutor agrega las salidas de cada paso
+            on_step: Corrutina opcional invocada como on_step(resultado, contexto) al
+                completar cada paso, después de lanzar los pasos que quedaron listos
+            deadline: Límite de la petición: acota el timeout de cada paso y omite
+                los opcionales cuyo min_budget ya no alcanza
+
+        Raises:
+            PipelineAbort: Si un paso aborta el flujo
+            StepFailedError: Si un paso requerido falla
+        """
+        run = PipelineRun(context=context)
+        pending = list(self.steps)
+        running: Dict[asyncio.Task, PipelineStep] = {}
+        completed: List[StepResult] = []
+
+        try:
+            while pending or running:
+                for step in [s for s in pending if all(key in context for key in s.inputs)]:
+                    pending.remove(step)
+                    running[asyncio.create_task(self._run_step(step, context, deadline))] = step
+
+                await self._notify(on_step, completed, context)
+
+                if not running:
+                    raise StepFailedError(pending[0].name, "entradas no disponibles")
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step = running.pop(task)
+                    result, outputs = task.result()
+                    run.steps[step.name] = result
+
+                    if result.status != "ok":
+                        if step.required:
+                            raise StepFailedError(step.name, result.error or result.status)
+                        logging.warning(f"⚠️ Paso opcional '{step.name}' omitido: {result.error}")
+                        outputs = {key: None for key in step.outputs}
+
+                    for key in step.outputs:
+                        context[key] = outputs.get(key)
+                    completed.append(result)
+
+            await self._notify(on_step, completed, context)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return run
+
+    @staticmethod
+    async def _notify(on_step: Optional[StepCallback], completed: List[StepResult], context: Dict[str, Any]):
+        """Entrega los pasos completados al callback; sus errores no afectan al pipeline"""
+        if on_step is None:
+            completed.clear()
+            return
+        while completed:
+            result = completed.pop(0)
+            try:
+                await on_step(result, context)
+            except Exception as e:
+                logging.warning(f"⚠️ Error notificando el paso '{result.name}': {str(e)}")
+
+    async def _run_step(self, step: PipelineStep, context: Dict[str, Any], deadline: Optional[Deadline] = None):
+        """Ejecuta un paso aplicando su timeout (acotado por el deadline); PipelineAbort se propaga sin capturar"""
+        if deadline is not None and not step.required and not deadline.allows(step.min_budget):
+            error = f"presupuesto insuficiente ({deadline.remaining():.1f}s restantes, requiere {step.min_budget}s)"
+            return StepResult(step.name, "skipped", 0.0, error), {}
+
+        timeout = deadline.timeout(step.timeout) if deadline is not None else step.timeout
+        with start_span(f"step {step.name}", attributes={"app.step.required": step.required}) as span:
+            start = time.perf_counter()
+            try:
+                outputs = await asyncio.wait_for(step.func(context), timeout=timeout)
+                status, error = "ok", None
+            except PipelineAbort as e:
+                span.set_attribute("app.abort_code", e.code)
+                raise
+            except asyncio.TimeoutError:
+                outputs, status, error = {}, "timeout", f"timeout tras {timeout:.1f}s"
+            except Exception as e:
+                logging.error(f"❌ Error en paso '{step.name}': {str(e)}")
+                outputs, status, error = {}, "failed", str(e)
+
+            duration = time.perf_counter() - start
+            span.set_attribute("app.step.status", status)
+            if error:
+                span.mark_error(error)
+        return StepResult(step.name, status, duration, error), (outputs or {})
@@ -0,0 +1,201 @@
+"""
+Registro a nivel de proceso del orquestador
+Mantiene un OpportunityOrchestrator "caliente" entre invocaciones de la Function
+para reutilizar clientes, pools de conexiones HTTP y el catálogo de equipos
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .orchestrator import OpportunityOrchestrator
+
+
+# Variables de entorno que se leen al construir el orquestador (clientes, cachés,
+# idempotencia, ráfagas, admisión, profiling, deadline y parámetros del análisis)
+# y el gestor de jobs que depende de él. Si alguna cambia (p. ej. rotación de
+# claves en App Settings) se recrea el orquestador.
+SETTINGS_KEYS = (
+    # Clientes
+    "AZURE_OPENAI_ENDPOINT",
+    "AZURE_OPENAI_KEY",
+    "AZURE_OPENAI_API_KEY",
+    "AZURE_OPENAI_DEPLOYMENT_NAME",
+    "AZURE_OPENAI_API_VERSION",
+    "AZURE_SEARCH_ENDPOINT",
+    "AZURE_SEARCH_KEY",
+    "AZURE_SEARCH_INDEX_TEAMS",
+    "AZURE_STORAGE_CONNECTION_STRING",
+    "AZURE_STORAGE_CONTAINER_NAME",
+    "COSMOS_ENDPOINT",
+    "COSMOS_KEY",
+    "COSMOS_DATABASE_NAME",
+    "COSMOS_CONTAINER_NAME",
+    "TEAMS_CATALOG_TTL_SECONDS",
+    # Análisis (OpenAIService)
+    "OPENAI_STREAMING",
+    "OPENAI_PROMPT_TOKEN_BUDGET",
+    "OPENAI_CONTEXT_WINDOW_TOKENS",
+    "OPENAI_MAX_OUTPUT_TOKENS",
+    "OPENAI_LONG_DOCUMENT",
+    "OPENAI_SUMMARY_DEPLOYMENT_NAME",
+    "OPENAI_SUMMARY_CONCURRENCY",
+    "OPENAI_SUMMARY_CACHE_MAX_ENTRIES",
+    "OPENAI_TWO_STAGE",
+    "OPENAI_TRIAGE_MAX_TEAMS",
+    # Caché de análisis e idempotencia
+    "ANALYSIS_CACHE_BACKEND",
+    "ANALYSIS_CACHE_TTL_SECONDS",
+    "ANALYSIS_CACHE_DIR",
+    "ANALYSIS_CACHE_MAX_ENTRIES",
+    "COSMOS_CACHE_CONTAINER_NAME",
+    "IDEMPOTENCY_BACKEND",
+    "IDEMPOTENCY_TTL_SECONDS",
+    "IDEMPOTENCY_DIR",
+    "IDEMPOTENCY_MAX_ENTRIES",
+    # Ráfagas, admisión, profiling y deadline
+    "COALESCE_WINDOW_SECONDS",
+    "COALESCE_MAX_WAIT_SECONDS",
+    "ADMISSION_MAX_IN_FLIGHT",
+    "ADMISSION_MAX_QUEUE",
+    "ADMISSION_QUEUE_TIMEOUT_SECONDS",
+    "ADMISSION_RETRY_AFTER_SECONDS",
+    "PROFILE_REQUESTS",
+    "PROFILE_OPPORTUNITY_IDS",
+    "PROFILE_DIR",
+    "PROFILE_TOP_ENTRIES",
+    "DEADLINE_MARGIN_SECONDS",
+    # Gestor de jobs (se recrea junto con el orquestador)
+    "JOB_STORE_BACKEND",
+    "JOB_STORE_DIR",
+    "JOB_STORE_MAX_ENTRIES",
+    "JOB_TTL_SECONDS",
+    "JOB_QUEUE_BACKEND",
+    "JOB_QUEUE_DIR",
+    "ANALYZE_QUEUE_NAME",
+    "AzureWebJobsStorage",
+    "BATCH_CONCURRENCY",
+)
+
+
+def settings_fingerprint() -> str:
+    """Hash de la configuración actual (no expone los valores de las claves)"""
+    digest = hashlib.sha256()
+    for key in SETTINGS_KEYS:
+        digest.update(f"{key}={os.getenv(key, '')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class OrchestratorRegistry:
+    """
+    Mantiene una única instancia de OpportunityOrchestrator por proceso.
+
+    - Se inicializa de forma perezosa en la primera invocación.
+    - Se recrea si cambia la configuración (ver SETTINGS_KEYS). El anterior
+      se cierra cuando terminan las invocaciones que lo usan (ver lease).
+    - Reintenta los servicios que fallaron al inicializar, como máximo
+      una vez cada SERVICE_RETRY_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, retry_interval_seconds: Optional[float] = None):
+        if retry_interval_seconds is None:
+            retry_interval_seconds = float(os.getenv("SERVICE_RETRY_INTERVAL_SECONDS", "60"))
+        self.retry_interval_seconds = retry_interval_seconds
+
+        self._lock = threading.Lock()
+        self._orchestrator: Optional[OpportunityOrchestrator] = None
+        self._fingerprint: Optional[str] = None
+        self._last_retry: float = 0.0
+        # Invocaciones en curso por orquestador y orquestadores reemplazados que esperan cerrarse
+        self._leases: Dict[int, int] = {}
+        self._retiring: Dict[int, OpportunityOrchestrator] = {}
+
+    def get(self) -> OpportunityOrchestrator:
+        """Retorna el orquestador caliente, creándolo o recuperándolo si hace falta"""
+        fingerprint = settings_fingerprint()
+        with self._lock:
+            return self._current(fingerprint)
+
+    @contextmanager
+    def lease(self, orchestrator: Optional[OpportunityOrchestrator] = None) -> Iterator[OpportunityOrchestrator]:
+        """
+        Marca un orquestador (por defecto el actual) en uso durante una invocación.
+
+        Si la configuración cambia mientras tanto, el orquestador reemplazado no
+        se cierra hasta que termina la última invocación que lo usa.
+        """
+        fingerprint = settings_fingerprint()
+        with self._lock:
+            if orchestrator is None:
+                orchestrator = self._current(fingerprint)
+            self._leases[id(orchestrator)] = self._leases.get(id(orchestrator), 0) + 1
+        try:
+            yield orchestrator
+        finally:
+            retired = None
+            with self._lock:
+                key = id(orchestrator)
+                self._leases[key] -= 1
+                if self._leases[key] == 0:
+                    del self._leases[key]
+                    retired = self._retiring.pop(key, None)
+            if retired is not None:
+                logging.info("🔒 Cerrando orquestador reemplazado: terminaron sus invocaciones")
+                retired.close()
+
+    def _current(self, fingerprint: str) -> OpportunityOrchestrator:
+        """Orquestador vigente (requiere self._lock)"""
+        if self._orchestrator is None or fingerprint != self._fingerprint:
+            if self._orchestrator is not None:
+                logging.info("🔄 Configuración modificada: recreando orquestador...")
+                self._retire(self._orchestrator)
+            else:
+                logging.info("⚙️ Creando orquestador (arranque en frío)...")
+
+            self._orchestrator = OpportunityOrchestrator()
+            self._fingerprint = fingerprint
+            self._last_retry = time.monotonic()
+
+        elif self._orchestrator.failed_services:
+            now = time.monotonic()
+            if now - self._last_retry >= self.retry_interval_seconds:
+                self._last_retry = now
+                logging.info(
+                    "♻️ Reintentando servicios no inicializados: "
+                    f"{', '.join(self._orchestrator.failed_services)}"
+                )
+                self._orchestrator.retry_failed_services()
+
+        return self._orchestrator
+
+    def _retire(self, orchestrator: OpportunityOrchestrator):
+        """Cierra el orquestador reemplazado, o lo deja pendiente si hay invocaciones en curso (requiere self._lock)"""
+        if self._leases.get(id(orchestrator)):
+            self._retiring[id(orchestrator)] = orchestrator
+        else:
+            orchestrator.close()
+
+    def reset(self):
+        """Descarta el orquestador actual (se recreará en la siguiente invocación)"""
+        with self._lock:
+            if self._orchestrator is not None:
+                self._retire(self._orchestrator)
+            self._orchestrator = None
+            self._fingerprint = None
+
+
+_registry = OrchestratorRegistry()
+
+
+def get_orchestrator() -> OpportunityOrchestrator:
+    """Retorna el orquestador compartido del proceso"""
+    return _registry.get()
+
+
+def lease_orchestrator(orchestrator: Optional[OpportunityOrchestrator] = None):
+    """Context manager: orquestador compartido en uso durante una invocación (ver OrchestratorRegistry.lease)"""
+    return _registry.lease(orchestrator)
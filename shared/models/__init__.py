@@ -10,7 +10,11 @@ from .analysis import (
     TimelinePhase,
     OpportunityAnalysis,
     AnalysisResponse,
-    ErrorResponse
+    ErrorResponse,
+    AnalysisOutput,
+    ANALYSIS_SECTIONS,
+    analysis_response_format,
+    analysis_section_response_format
 )
 
 __all__ = [
@@ -25,4 +29,10 @@ __all__ = [
     'OpportunityAnalysis',
     'AnalysisResponse',
     'ErrorResponse',
+
+    # Salida estructurada del modelo
+    'AnalysisOutput',
+    'ANALYSIS_SECTIONS',
+    'analysis_response_format',
+    'analysis_section_response_format',
 ]
@@ -2,8 +2,9 @@
 Modelos de análisis para el agente de análisis inteligente
 """
 
-from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
+from typing import Annotated, Any, List, Literal, Optional, Dict, Set, Tuple
+
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, TypeAdapter
 
 
 class TeamRecommendation(BaseModel):
@@ -103,3 +104,223 @@ class ErrorResponse(BaseModel):
     success: bool = Field(default=False)
     error: Dict = Field(..., description="Detalles del error")
     metadata: Optional[Dict] = Field(None, description="Metadata adicional")
+
+
+# ============================================================
+# Salida estructurada del modelo (response_format json_schema)
+# ============================================================
+#
+# Reflejan el JSON que consumen el orquestador, la Adaptive Card y el PDF.
+# El esquema se envía en modo estricto: el modelo solo puede generar JSON
+# válido para estos modelos, por lo que la respuesta se valida sin heurísticas.
+
+def _unit_interval(value: float) -> float:
+    """Acota un score al rango 0-1 (el modo estricto no admite minimum/maximum)"""
+    return min(1.0, max(0.0, value))
+
+
+Score = Annotated[float, AfterValidator(_unit_interval)]
+
+RiskLevel = Literal["Bajo", "Medio", "Alto", "Crítico"]
+
+
+class _StrictModel(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class TechnologyStack(_StrictModel):
+    """Tecnologías identificadas o sugeridas por capa"""
+    frontend: List[str] = Field(default_factory=list)
+    backend: List[str] = Field(default_factory=list)
+    databases: List[str] = Field(default_factory=list)
+    cloud: List[str] = Field(default_factory=list, description="Servicios cloud (Azure, AWS, etc.)")
+    ai_ml: List[str] = Field(default_factory=list, description="Tecnologías de IA/ML si aplica")
+    integrations: List[str] = Field(default_factory=list)
+    other: List[str] = Field(default_factory=list)
+
+
+class TeamRecommendationOutput(_StrictModel):
+    """Equipo recomendado; los datos del equipo se copian de la lista de equipos disponibles"""
+    tower: str = Field(..., description="Torre del equipo, copiada exactamente de la lista")
+    team_name: str = Field(..., description="Nombre del equipo, copiado exactamente de la lista")
+    team_lead: str = Field(..., description="Líder del equipo, copiado exactamente de la lista")
+    team_lead_email: str = Field(..., description="Email del líder, copiado exactamente de la lista")
+    relevance_score: Score = Field(..., description="Relevancia del equipo para la oportunidad (0-1)")
+    matched_skills: List[str] = Field(default_factory=list)
+    justification: str = Field(..., description="Por qué este equipo es necesario")
+    estimated_involvement: Literal["Full-time", "Part-time", "Consultoría"]
+
+
+class RiskOutput(_StrictModel):
+    """Riesgo identificado con su mitigación"""
+    category: Literal["Técnico", "Comercial", "Recursos", "Timeline"]
+    description: str
+    level: RiskLevel
+    probability: Score = Field(..., description="Probabilidad de ocurrencia (0-1)")
+    impact: str = Field(..., description="Impacto potencial")
+    mitigation: str = Field(..., description="Estrategia de mitigación")
+
+
+class TimelinePhaseOutput(_StrictModel):
+    """Fase del cronograma"""
+    phase_name: str = Field(..., description="Discovery & Diseño, Desarrollo, Testing & QA, Despliegue & Go-Live...")
+    duration: str = Field(..., description="Duración, p. ej. '4 semanas' o '3 meses'")
+    activities: List[str] = Field(default_factory=list)
+
+
+class TimelineEstimate(_StrictModel):
+    """Cronograma estimado"""
+    total_duration: str = Field(..., description="Duración total, p. ej. '6-8 meses'")
+    phases: List[TimelinePhaseOutput] = Field(default_factory=list)
+
+
+class EffortEstimate(_StrictModel):
+    """Esfuerzo estimado en horas"""
+    min_hours: int
+    max_hours: int
+    complexity: Literal["Baja", "Media", "Alta", "Muy Alta"]
+    team_size_recommended: str = Field(..., description="Tamaño de equipo, p. ej. '5-7 personas'")
+    assumptions: List[str] = Field(default_factory=list)
+
+
+class AnalysisOutput(_StrictModel):
+    """Análisis de una oportunidad tal como lo genera el modelo"""
+    executive_summary: str = Field(
+        ...,
+        description="Resumen ejecutivo (3-4 párrafos): qué solicita el cliente, complejidad, viabilidad y recomendación"
+    )
+    key_requirements: List[str] = Field(default_factory=list)
+    technical_assessment: str = Field(
+        ...,
+        description="Qué implica técnicamente el proyecto, arquitectura posible y consideraciones importantes"
+    )
+    technology_stack: TechnologyStack = Field(default_factory=TechnologyStack)
+    required_towers: List[str] = Field(
+        default_factory=list,
+        description="Torres requeridas, con el nombre exacto de la lista de equipos (p. ej. 'Torre IA')"
+    )
+    team_recommendations: List[TeamRecommendationOutput] = Field(default_factory=list)
+    risks: List[RiskOutput] = Field(default_factory=list)
+    overall_risk_level: RiskLevel
+    timeline_estimate: TimelineEstimate
+    effort_estimate: EffortEstimate
+    recommendations: List[str] = Field(default_factory=list, description="Recomendaciones estratégicas o tácticas")
+    clarification_questions: List[str] = Field(
+        default_factory=list,
+        description="Preguntas para el cliente que ayudan a refinar la propuesta"
+    )
+    next_steps: List[str] = Field(default_factory=list)
+    analysis_confidence: Score = Field(..., description="Confianza en el análisis (0-1)")
+
+
+_FIELD_ADAPTERS: Dict[str, TypeAdapter] = {}
+
+
+def validate_analysis_field(name: str, value: Any) -> Any:
+    """
+    Valida un campo de primer nivel de AnalysisOutput por separado (streaming):
+    permite descartar una respuesta inválida antes de recibirla completa.
+
+    Returns:
+        El valor validado, como tipos nativos de Python
+
+    Raises:
+        ValueError: si el campo no existe en el esquema o su valor no es válido
+    """
+    adapter = _FIELD_ADAPTERS.get(name)
+    if adapter is None:
+        field = AnalysisOutput.model_fields.get(name)
+        if field is None:
+            raise ValueError(f"Campo desconocido en el análisis: {name}")
+        annotation = Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+        adapter = _FIELD_ADAPTERS[name] = TypeAdapter(annotation)
+    return adapter.dump_python(adapter.validate_python(value))
+
+
+def _strict_schema(node: Any) -> Any:
+    """
+    Adapta el JSON schema de Pydantic al modo estricto de Structured Outputs:
+    todas las propiedades requeridas, sin propiedades adicionales ni defaults.
+    Los títulos se omiten: el esquema cuenta como tokens del prompt.
+    """
+    if isinstance(node, list):
+        return [_strict_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    strict = {}
+    for key, value in node.items():
+        if key in ("default", "title"):
+            continue
+        if key in ("properties", "$defs"):
+            # Claves con nombres de campo o de modelo, no palabras clave del esquema
+            strict[key] = {name: _strict_schema(sub) for name, sub in value.items()}
+        else:
+            strict[key] = _strict_schema(value)
+    if strict.get("type") == "object" and "properties" in strict:
+        strict["required"] = list(strict["properties"])
+        strict["additionalProperties"] = False
+    return strict
+
+
+def analysis_response_format() -> Dict[str, Any]:
+    """Parámetro `response_format` de chat.completions con el esquema estricto de AnalysisOutput"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "opportunity_analysis",
+            "strict": True,
+            "schema": _strict_schema(AnalysisOutput.model_json_schema()),
+        },
+    }
+
+
+# Secciones independientes del análisis en dos etapas: cada una se genera en su
+# propia completion, en paralelo, y los resultados se combinan en AnalysisOutput
+ANALYSIS_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "overview": (
+        "executive_summary", "key_requirements", "technical_assessment", "technology_stack",
+        "recommendations", "clarification_questions", "next_steps", "analysis_confidence",
+    ),
+    "teams": ("required_towers", "team_recommendations"),
+    "risks": ("risks", "overall_risk_level"),
+    "planning": ("timeline_estimate", "effort_estimate"),
+}
+
+
+def _schema_refs(node: Any) -> Set[str]:
+    """Nombres de $defs referenciados en un nodo del esquema"""
+    if isinstance(node, list):
+        return set().union(*(_schema_refs(item) for item in node)) if node else set()
+    if not isinstance(node, dict):
+        return set()
+    refs = {node["$ref"].rsplit("/", 1)[-1]} if isinstance(node.get("$ref"), str) else set()
+    return refs.union(*(_schema_refs(value) for value in node.values()))
+
+
+def analysis_section_response_format(section: str) -> Dict[str, Any]:
+    """`response_format` estricto con solo los campos de una sección de ANALYSIS_SECTIONS"""
+    full = _strict_schema(AnalysisOutput.model_json_schema())
+    fields = ANALYSIS_SECTIONS[section]
+    schema: Dict[str, Any] = {
+        "type": "object",
+        "properties": {name: full["properties"][name] for name in fields},
+        "required": list(fields),
+        "additionalProperties": False,
+    }
+
+    # Solo las definiciones que usa la sección (el esquema cuenta como tokens del prompt)
+    defs: Dict[str, Any] = {}
+    pending = _schema_refs(schema)
+    while pending:
+        name = pending.pop()
+        if name not in defs:
+            defs[name] = full["$defs"][name]
+            pending |= _schema_refs(defs[name]) - set(defs)
+    if defs:
+        schema["$defs"] = defs
+
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": f"opportunity_analysis_{section}", "strict": True, "schema": schema},
+    }
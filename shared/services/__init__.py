@@ -6,10 +6,12 @@ from .openai_service import OpenAIService
 from .search_service import SearchService
 from .blob_storage_service import BlobStorageService
 from .cosmos_service import CosmosDBService
+from .analysis_cache import AnalysisCache
 
 __all__ = [
     'OpenAIService',
     'SearchService',
     'BlobStorageService',
     'CosmosDBService',
+    'AnalysisCache',
 ]
@@ -0,0 +1,193 @@
+"""
+Caché de análisis por hash de contenido
+Evita llamar al modelo cuando el texto analizado, el catálogo de equipos
+y la versión del prompt no cambiaron (p. ej. eventos Update de Dataverse
+que solo modifican statuscode, propietario o modifiedon)
+"""
+
+import os
+import copy
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from azure.cosmos import exceptions
+
+from ..utils.deadline import timeout_kwargs
+
+
+def catalog_version(teams: List[Dict[str, Any]]) -> str:
+    """Versión del catálogo de equipos: hash estable de su contenido"""
+    canonical = json.dumps(teams, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class MemoryCacheBackend:
+    """LRU en memoria del proceso con expiración por TTL"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.time() + self.ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class DiskCacheBackend:
+    """Un archivo JSON por clave en un directorio local"""
+
+    def __init__(self, directory: str, ttl_seconds: float = 86400):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            os.remove(self._path(key))
+            return None
+        return entry.get("value")
+
+    def _write(self, key: str, value: Dict[str, Any]):
+        # Escritura atómica: evita lecturas de archivos a medio escribir
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": time.time() + self.ttl_seconds, "value": value}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        await asyncio.to_thread(self._write, key, value)
+
+
+class CosmosCacheBackend:
+    """
+    Contenedor de Cosmos DB compartido entre instancias.
+
+    El contenedor debe tener partition key /id y TTL habilitado
+    (el campo "ttl" de cada item controla su expiración).
+    """
+
+    def __init__(self, cosmos_service, container_name: str, ttl_seconds: float = 86400):
+        self.ttl_seconds = ttl_seconds
+        self._container = None
+        self._cosmos_service = cosmos_service
+        self._container_name = container_name
+
+    @property
+    def container(self):
+        if self._container is None:
+            self._container = self._cosmos_service.get_async_container(self._container_name)
+        return self._container
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = await self.container.read_item(item=key, partition_key=key, **timeout_kwargs())
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        return item.get("value")
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        await self.container.upsert_item(
+            body={"id": key, "value": value, "ttl": int(self.ttl_seconds)}, **timeout_kwargs()
+        )
+
+
+class AnalysisCache:
+    """
+    Fachada de la caché de análisis con backend intercambiable.
+
+    Los errores del backend nunca interrumpen el análisis: se registran y
+    se trata la consulta como un fallo de caché.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def build_key(analysis_text: str, teams_version: str, prompt_version: str) -> str:
+        """Clave = hash(texto analizado + versión del catálogo + versión del prompt)"""
+        digest = hashlib.sha256()
+        for part in (analysis_text, teams_version, prompt_version):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    @classmethod
+    def from_env(cls, cosmos_service=None) -> Optional["AnalysisCache"]:
+        """
+        Construye la caché según ANALYSIS_CACHE_BACKEND (memory | disk | cosmos | none).
+
+        Returns:
+            La caché configurada o None si está deshabilitada
+        """
+        backend_name = os.getenv("ANALYSIS_CACHE_BACKEND", "memory").strip().lower()
+        ttl = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+
+        if backend_name in ("", "none", "off", "disabled"):
+            logging.info("⏭️ Caché de análisis deshabilitada")
+            return None
+
+        if backend_name == "disk":
+            directory = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(".cache", "analysis"))
+            backend = DiskCacheBackend(directory, ttl)
+        elif backend_name == "cosmos":
+            if cosmos_service is None:
+                logging.warning("⚠️ ANALYSIS_CACHE_BACKEND=cosmos sin Cosmos DB configurado: se usa memoria")
+                backend = MemoryCacheBackend(int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256")), ttl)
+            else:
+                container = os.getenv("COSMOS_CACHE_CONTAINER_NAME", "analysis-cache")
+                backend = CosmosCacheBackend(cosmos_service, container, ttl)
+        else:
+            backend = MemoryCacheBackend(int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256")), ttl)
+
+        logging.info(f"✅ Caché de análisis: {type(backend).__name__}")
+        return cls(backend)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"⚠️ Error leyendo caché de análisis: {str(e)}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            logging.warning(f"⚠️ Error escribiendo caché de análisis: {str(e)}")
@@ -4,11 +4,19 @@ Almacenamiento de PDFs y documentos generados
 """
 
 import os
+import json
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 from azure.storage.blob import BlobServiceClient, ContentSettings
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
 from datetime import datetime, timedelta
 
+from ..utils.aio import schedule_close
+from ..utils.circuit import CircuitOpenError, circuit_breaker
+from ..utils.deadline import timeout_kwargs
+from ..utils.timing import count_attempts, track_call
+
 
 class BlobStorageService:
     """Servicio para Azure Blob Storage"""
@@ -24,13 +32,35 @@ class BlobStorageService:
             self.connection_string
         )
 
-        # Asegurar que el contenedor existe
-        self._ensure_container_exists()
+        # Cliente asíncrono (se crea en el primer uso, dentro del event loop)
+        self._async_blob_service_client: Optional[AsyncBlobServiceClient] = None
+
+        # La existencia del contenedor se verifica una sola vez, en la primera subida
+        self._container_checked = False
 
         logging.info(f"✅ BlobStorageService inicializado: {self.container_name}")
 
+    @property
+    def async_blob_service_client(self) -> AsyncBlobServiceClient:
+        """Cliente asíncrono de Blob Storage"""
+        if self._async_blob_service_client is None:
+            self._async_blob_service_client = AsyncBlobServiceClient.from_connection_string(
+                self.connection_string
+            )
+        return self._async_blob_service_client
+
+    def close(self):
+        """Cierra los pools de conexiones HTTP de los clientes"""
+        self.blob_service_client.close()
+        if self._async_blob_service_client is not None:
+            schedule_close(self._async_blob_service_client)
+            self._async_blob_service_client = None
+
     def _ensure_container_exists(self):
-        """Crea el contenedor si no existe"""
+        """Crea el contenedor si no existe (una vez por instancia del servicio)"""
+        if self._container_checked:
+            return
+
         try:
             container_client = self.blob_service_client.get_container_client(
                 self.container_name
@@ -40,9 +70,32 @@ class BlobStorageService:
                 container_client.create_container()
                 logging.info(f"✅ Contenedor creado: {self.container_name}")
 
+            self._container_checked = True
+
         except Exception as e:
             logging.error(f"❌ Error creando contenedor: {str(e)}")
 
+    async def _ensure_container_exists_async(self, **kwargs):
+        """
+        Versión no bloqueante de _ensure_container_exists.
+
+        Se ejecuta dentro de la llamada protegida por el circuit breaker de Blob:
+        los errores se propagan (y cuentan como falla de la dependencia) y
+        `kwargs` lleva el timeout acotado por el deadline de la petición.
+        """
+        if self._container_checked:
+            return
+
+        container_client = self.async_blob_service_client.get_container_client(self.container_name)
+        if not await container_client.exists(**kwargs):
+            try:
+                await container_client.create_container(**kwargs)
+                logging.info(f"✅ Contenedor creado: {self.container_name}")
+            except ResourceExistsError:
+                pass  # creado por otra invocación en paralelo
+
+        self._container_checked = True
+
     def upload_pdf(
         self,
         pdf_bytes: bytes,
@@ -62,6 +115,8 @@ class BlobStorageService:
 
             logging.info(f"📤 Subiendo PDF: {blob_name}")
 
+            self._ensure_container_exists()
+
             blob_client = self.blob_service_client.get_blob_client(
                 container=self.container_name,
                 blob=blob_name
@@ -87,6 +142,46 @@ class BlobStorageService:
             logging.error(f"❌ Error subiendo PDF: {str(e)}")
             return None
 
+    async def upload_pdf_async(
+        self,
+        pdf_bytes: bytes,
+        blob_name: str
+    ) -> Optional[str]:
+        """Versión no bloqueante de upload_pdf"""
+        try:
+
+            logging.info(f"📤 Subiendo PDF: {blob_name}")
+
+            blob_client = self.async_blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            )
+
+            with track_call("blob", "upload_pdf", len(pdf_bytes)) as call, circuit_breaker("blob").guard(call):
+                # Con el circuito abierto tampoco se consulta el contenedor
+                await self._ensure_container_exists_async(**timeout_kwargs("read_timeout"))
+                # read_timeout: límite del transporte por intento según el tiempo restante
+                await blob_client.upload_blob(
+                    pdf_bytes,
+                    overwrite=True,
+                    content_settings=ContentSettings(content_type='application/pdf'),
+                    raw_response_hook=count_attempts(call),
+                    **timeout_kwargs("read_timeout")
+                )
+
+            # La firma SAS se calcula localmente (sin llamadas de red)
+            url = self._generate_blob_url_with_sas(blob_name, days=90)
+
+            logging.info(f"✅ PDF subido: {url}")
+            return url
+
+        except CircuitOpenError as e:
+            logging.warning(f"🔌 {str(e)}")
+            return None
+        except Exception as e:
+            logging.error(f"❌ Error subiendo PDF: {str(e)}")
+            return None
+
     def _generate_blob_url_with_sas(self, blob_name: str, days: int = 90) -> str:
         """
         Genera URL con SAS token para acceso público
@@ -158,3 +253,64 @@ class BlobStorageService:
         except Exception as e:
             logging.error(f"❌ Error descargando blob: {str(e)}")
             return None
+
+    async def upload_json_async(self, data: Dict[str, Any], blob_name: str) -> bool:
+        """
+        Guarda un documento JSON (p. ej. el estado de un job asíncrono)
+
+        Args:
+            data: Documento serializable a JSON
+            blob_name: Nombre/ruta del blob
+
+        Returns:
+            True si se guardó correctamente
+        """
+        return await self.upload_bytes_async(
+            json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"),
+            blob_name,
+            'application/json'
+        )
+
+    async def upload_bytes_async(self, data: bytes, blob_name: str, content_type: str) -> bool:
+        """
+        Guarda un blob arbitrario (p. ej. artefactos de profiling)
+
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            await self._ensure_container_exists_async(**timeout_kwargs("read_timeout"))
+
+            blob_client = self.async_blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            )
+            await blob_client.upload_blob(
+                data,
+                overwrite=True,
+                content_settings=ContentSettings(content_type=content_type),
+                **timeout_kwargs("read_timeout")
+            )
+            return True
+
+        except Exception as e:
+            logging.error(f"❌ Error guardando blob {blob_name}: {str(e)}")
+            return False
+
+    async def download_json_async(self, blob_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Lee un documento JSON guardado con upload_json_async
+
+        Returns:
+            El documento o None si no existe
+        """
+        try:
+            blob_client = self.async_blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            )
+            download_stream = await blob_client.download_blob(**timeout_kwargs("read_timeout"))
+            return json.loads(await download_stream.readall())
+
+        except ResourceNotFoundError:
+            return None
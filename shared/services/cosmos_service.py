@@ -3,14 +3,35 @@ Servicio para interactuar con Azure Cosmos DB
 Adaptado para oportunidades de Dynamics 365
 """
 import os
+import json
 import logging
 import uuid
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from azure.cosmos import CosmosClient, exceptions
+from azure.cosmos.aio import CosmosClient as AsyncCosmosClient
 from azure.cosmos.database import DatabaseProxy
 from azure.cosmos.container import ContainerProxy
 
+from ..utils.aio import schedule_close
+from ..utils.circuit import CircuitOpenError, circuit_breaker
+from ..utils.deadline import timeout_kwargs
+from ..utils.timing import CallTiming, track_call
+
+
+def _request_charge_hook(call: CallTiming):
+    """
+    response_hook de azure-cosmos: acumula las RU de cada página y los
+    reintentos por throttling (429) que el SDK registra en las cabeceras.
+    """
+    call.extra["request_charge"] = 0.0
+
+    def hook(headers, _result):
+        call.extra["request_charge"] += float(headers.get("x-ms-request-charge", 0) or 0)
+        call.retries = int(headers.get("x-ms-throttle-retry-count", call.retries) or 0)
+
+    return hook
+
 
 class CosmosDBService:
     """
@@ -49,12 +70,41 @@ class CosmosDBService:
             self._database: Optional[DatabaseProxy] = None
             self._container: Optional[ContainerProxy] = None
 
+            # Cliente asíncrono (se crea en el primer uso, dentro del event loop)
+            self._async_client: Optional[AsyncCosmosClient] = None
+            self._async_container = None
+
             logging.info("✅ CosmosDBService inicializado")
 
         except Exception as e:
             logging.error(f"❌ Error inicializando CosmosDBService: {str(e)}")
             raise
 
+    def close(self):
+        """Cierra los pools de conexiones HTTP de los clientes"""
+        self.client.close()
+        if self._async_client is not None:
+            schedule_close(self._async_client)
+            self._async_client = None
+            self._async_container = None
+
+    @property
+    def async_container(self):
+        """Contenedor de análisis sobre el cliente asíncrono de Cosmos DB"""
+        if self._async_container is None:
+            self._async_container = self.get_async_container(self.container_name)
+        return self._async_container
+
+    def get_async_container(self, container_name: str):
+        """Obtiene un contenedor de la base de datos sobre el cliente asíncrono"""
+        if self._async_client is None:
+            self._async_client = AsyncCosmosClient(url=self.endpoint, credential=self.key)
+        return (
+            self._async_client
+            .get_database_client(self.database_name)
+            .get_container_client(container_name)
+        )
+
     @property
     def database(self) -> DatabaseProxy:
         """Obtiene o crea la base de datos"""
@@ -117,6 +167,64 @@ class CosmosDBService:
             logging.error(f"❌ Error guardando en Cosmos DB: {str(e)}")
             return None
 
+    async def save_analysis_async(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Versión no bloqueante de save_analysis"""
+        try:
+            logging.info("💾 Guardando análisis en Cosmos DB...")
+
+            record.setdefault("id", str(uuid.uuid4()))
+            record.setdefault("opportunity_id", record["id"])
+            record.setdefault("processed_at", datetime.utcnow().isoformat())
+
+            request_bytes = len(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8"))
+            with track_call("cosmos", "save_analysis", request_bytes) as call, circuit_breaker("cosmos").guard(call):
+                # timeout: límite del cliente para la operación completa, reintentos incluidos
+                created_item = await self.async_container.create_item(
+                    body=record, response_hook=_request_charge_hook(call), **timeout_kwargs()
+                )
+
+            logging.info(f"✅ Análisis guardado en Cosmos DB: {record['id']}")
+            return created_item
+
+        except CircuitOpenError as e:
+            logging.warning(f"🔌 {str(e)}")
+            return None
+        except exceptions.CosmosHttpResponseError as e:
+            logging.error(f"❌ Error HTTP de Cosmos DB: {e.status_code} - {e.message}")
+            return None
+        except Exception as e:
+            logging.error(f"❌ Error guardando en Cosmos DB: {str(e)}")
+            return None
+
+    async def set_pdf_url_async(self, record_id: str, opportunity_id: str, pdf_url: str) -> bool:
+        """
+        Agrega la URL del PDF a un registro ya guardado (patch de un campo), de
+        modo que el registro no espera al render ni a la subida del PDF.
+
+        Returns:
+            True si el registro se actualizó
+        """
+        operations = [{"op": "set", "path": "/pdf_url", "value": pdf_url}]
+        try:
+            with track_call("cosmos", "set_pdf_url") as call, circuit_breaker("cosmos").guard(call):
+                await self.async_container.patch_item(
+                    item=record_id,
+                    partition_key=opportunity_id,
+                    patch_operations=operations,
+                    response_hook=_request_charge_hook(call),
+                    **timeout_kwargs()
+                )
+            return True
+        except CircuitOpenError as e:
+            logging.warning(f"🔌 {str(e)}")
+            return False
+        except exceptions.CosmosHttpResponseError as e:
+            logging.error(f"❌ Error HTTP de Cosmos DB: {e.status_code} - {e.message}")
+            return False
+        except Exception as e:
+            logging.error(f"❌ Error actualizando el PDF del registro en Cosmos DB: {str(e)}")
+            return False
+
     def get_analysis_by_opportunity(self, opportunity_id: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene el análisis más reciente para una oportunidad
@@ -148,6 +256,23 @@ class CosmosDBService:
             logging.error(f"❌ Error consultando Cosmos DB: {str(e)}")
             return None
 
+    async def get_latest_analysis_async(self, opportunity_id: str) -> Optional[Dict[str, Any]]:
+        """Versión no bloqueante de get_analysis_by_opportunity (solo el registro más reciente)"""
+        query = "SELECT TOP 1 * FROM c WHERE c.opportunity_id = @opportunity_id ORDER BY c.processed_at DESC"
+        parameters = [{"name": "@opportunity_id", "value": opportunity_id}]
+
+        # El cliente aio consulta entre particiones por defecto
+        with track_call("cosmos", "get_latest_analysis") as call, circuit_breaker("cosmos").guard(call):
+            items = self.async_container.query_items(
+                query=query, parameters=parameters, response_hook=_request_charge_hook(call), **timeout_kwargs()
+            )
+            async for item in items:
+                call.extra["items"] = 1
+                logging.info(f"📊 Análisis previo encontrado para oportunidad {opportunity_id}")
+                return item
+            call.extra["items"] = 0
+        return None
+
     def get_recent_analyses(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Obtiene los análisis más recientes
@@ -5,16 +5,130 @@ Optimizado para bajo costo y respuestas concretas
 """
 
 import os
-import logging
 import json
-import re
-from typing import List, Dict, Any, Optional
-from openai import AzureOpenAI
+import math
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from pydantic import ValidationError
+
+from .analysis_cache import MemoryCacheBackend
+from ..models.analysis import (
+    ANALYSIS_SECTIONS,
+    AnalysisOutput,
+    analysis_response_format,
+    analysis_section_response_format,
+    validate_analysis_field,
+)
+from ..utils.aio import schedule_close
+from ..utils.deadline import timeout_kwargs
+from ..utils.jsonstream import JsonObjectStream
+from ..utils.metrics import counter, histogram
+from ..utils.timing import CallTiming, record_metadata, track_call
+from ..utils.triage import triage_teams
+from ..utils.tokens import (
+    PromptPlan,
+    PromptSection,
+    count_tokens,
+    plan_prompt,
+    split_into_chunks,
+    truncate_to_tokens,
+)
+
+
+# Callback de streaming: recibe cada campo de primer nivel del análisis en cuanto se completa
+FieldCallback = Callable[[str, Any], Awaitable[None]]
+
+# El prompt se arma como un prefijo estable (instrucciones, esquema y catálogo de
+# equipos, en el mensaje de sistema) seguido de la oportunidad (mensaje de usuario):
+# Azure OpenAI cachea los prefijos repetidos de 1024+ tokens y no vuelve a procesarlos
+_SYSTEM_PROMPT = """Eres un experto analista de oportunidades comerciales y propuestas técnicas empresariales.
+Analiza en profundidad la oportunidad que envía el usuario y genera un análisis completo para apoyar la toma de decisiones comerciales y técnicas."""
+
+_PROMPT_RULES = """INSTRUCCIONES:
+Responde con el esquema JSON "opportunity_analysis"; la descripción de cada campo indica su contenido.
+
+REGLAS IMPORTANTES:
+1. Para "required_towers", USA EXACTAMENTE los nombres de torre de la lista de equipos disponibles (ejemplo: "Torre IA", "Torre DATA")
+2. Para cada equipo recomendado, COPIA EXACTAMENTE: tower, team_name, team_lead y team_lead_email del equipo correspondiente de la lista de EQUIPOS/TORRES DISPONIBLES. NUNCA inventes nombres de líder ni emails.
+3. Si un equipo no aparece en la lista de EQUIPOS/TORRES DISPONIBLES, NO lo incluyas en las recomendaciones
+4. Sé realista con las estimaciones basándote en la complejidad descrita
+5. Identifica riesgos reales y mitigaciones prácticas
+6. Las preguntas de clarificación deben ayudar a refinar la propuesta
+7. El equipo de QA (Torre Quality Assurance) y PMO (Torre PMO) son OBLIGATORIOS en proyectos medianos/grandes — búscalos en la lista de equipos disponibles
+8. El cronograma incluye normalmente las fases Discovery & Diseño, Desarrollo, Testing & QA y Despliegue & Go-Live
+"""
+
+_SUMMARY_PROMPT = """Resume el siguiente fragmento de una oportunidad comercial para que un analista pueda evaluarla sin leer el original.
+Conserva TODOS los requerimientos funcionales y técnicos, tecnologías, integraciones, volúmenes, cifras, fechas, plazos, restricciones y nombres propios.
+Omite solo redacción repetida o genérica. Responde en texto plano, con viñetas cuando ayuden, sin agregar información que no esté en el fragmento."""
+
+
+def _record_usage(call: CallTiming, usage) -> None:
+    """
+    Registra los tokens de la respuesta en la llamada y en las métricas.
+
+    `cached_tokens` son los tokens del prompt servidos desde la caché de
+    prefijos del proveedor; la tasa de aciertos es cached_tokens / prompt_tokens.
+    """
+    if not usage:
+        return
+    call.extra["prompt_tokens"] = usage.prompt_tokens
+    call.extra["completion_tokens"] = usage.completion_tokens
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    call.extra["cached_tokens"] = cached
+
+    attributes = {"operation": call.operation}
+    counter("openai.tokens.prompt", description="Tokens de prompt enviados").add(usage.prompt_tokens, attributes)
+    counter("openai.tokens.cached", description="Tokens de prompt servidos desde la caché de prefijos").add(
+        cached, attributes
+    )
 
 
 class OpenAIService:
     """Servicio para Azure OpenAI (GPT-4o-mini)"""
 
+    # Incrementar al modificar el prompt o los parámetros del análisis:
+    # forma parte de la clave de la caché de análisis.
+    PROMPT_VERSION = "2026-10.4"
+
+    # Salida estructurada: esquema estricto derivado de models/analysis.AnalysisOutput
+    RESPONSE_FORMAT = analysis_response_format()
+
+    # Semilla de muestreo (best effort en Azure OpenAI) para respuestas reproducibles
+    SEED = 42
+
+    # Tokens reservados para la oportunidad aunque el catálogo de equipos sea grande
+    OPPORTUNITY_MIN_TOKENS = 2000
+
+    # Salida mínima: el presupuesto de entrada nunca la invade
+    MIN_OUTPUT_TOKENS = 4000
+
+    # Documento largo: tamaño base de cada fragmento y rondas máximas de resúmenes.
+    # Con más fragmentos que summary_concurrency * SUMMARY_ROUNDS se agrandan los
+    # fragmentos, de modo que la latencia no crece con el tamaño de la entrada
+    SUMMARY_CHUNK_TOKENS = 4000
+    SUMMARY_ROUNDS = 2
+
+    # Análisis en dos etapas: torres que siempre llegan al análisis (regla 7 del prompt)
+    TRIAGE_MANDATORY_TOWERS = ("Torre Quality Assurance", "Torre PMO")
+
+    # Ver OPENAI_STREAMING, OPENAI_*_TOKENS, OPENAI_LONG_DOCUMENT y OPENAI_TWO_STAGE en __init__
+    streaming = False
+    prompt_token_budget = 12000
+    context_window = 128000
+    max_output_tokens = 12000
+    long_document = False
+    summary_deployment: Optional[str] = None
+    summary_concurrency = 4
+    _summary_cache: Optional[MemoryCacheBackend] = None
+    two_stage = False
+    triage_max_teams = 12
+
     def __init__(self):
         self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         self.key = os.getenv("AZURE_OPENAI_KEY") or os.getenv("AZURE_OPENAI_API_KEY")
@@ -31,8 +145,48 @@ class OpenAIService:
             api_version=self.api_version
         )
 
+        # Cliente asíncrono (se crea en el primer uso, dentro del event loop)
+        self._async_client: Optional[AsyncAzureOpenAI] = None
+
+        # Completion en streaming con parseo incremental (ver analyze_opportunity_async)
+        self.streaming = os.getenv("OPENAI_STREAMING", "false").strip().lower() in ("1", "true", "yes")
+
+        # Presupuesto de tokens del prompt y ventana de contexto del deployment (ver _plan_prompt)
+        self.prompt_token_budget = int(os.getenv("OPENAI_PROMPT_TOKEN_BUDGET", "12000"))
+        self.context_window = int(os.getenv("OPENAI_CONTEXT_WINDOW_TOKENS", "128000"))
+        self.max_output_tokens = int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "12000"))
+
+        # Documento largo: la oportunidad que no entra en el prompt se resume por
+        # fragmentos con un deployment más barato (ver _condense_long_document)
+        self.long_document = os.getenv("OPENAI_LONG_DOCUMENT", "false").strip().lower() in ("1", "true", "yes")
+        self.summary_deployment = os.getenv("OPENAI_SUMMARY_DEPLOYMENT_NAME") or self.deployment
+        self.summary_concurrency = max(1, int(os.getenv("OPENAI_SUMMARY_CONCURRENCY", "4")))
+        self._summary_cache = MemoryCacheBackend(int(os.getenv("OPENAI_SUMMARY_CACHE_MAX_ENTRIES", "1024")))
+
+        # Dos etapas: triage local de torres y secciones del análisis en paralelo (ver _analyze_sections)
+        self.two_stage = os.getenv("OPENAI_TWO_STAGE", "false").strip().lower() in ("1", "true", "yes")
+        self.triage_max_teams = int(os.getenv("OPENAI_TRIAGE_MAX_TEAMS", "12"))
+
         logging.info(f"✅ OpenAIService inicializado: {self.deployment}")
 
+    @property
+    def async_client(self) -> AsyncAzureOpenAI:
+        """Cliente asíncrono de Azure OpenAI"""
+        if self._async_client is None:
+            self._async_client = AsyncAzureOpenAI(
+                azure_endpoint=self.endpoint,
+                api_key=self.key,
+                api_version=self.api_version
+            )
+        return self._async_client
+
+    def close(self):
+        """Cierra los pools de conexiones HTTP de los clientes"""
+        self.client.close()
+        if self._async_client is not None:
+            schedule_close(self._async_client)
+            self._async_client = None
+
     def analyze_opportunity(
         self,
         opportunity_text: str,
@@ -51,154 +205,73 @@ class OpenAIService:
         try:
             logging.info("🧠 Iniciando análisis de oportunidad con IA...")
 
-            # Preparar contexto de equipos
-            teams_context = self._format_teams_context(available_teams)
-
-            prompt = f"""Eres un experto analista de oportunidades comerciales y propuestas técnicas empresariales.
-Analiza la siguiente oportunidad en profundidad y genera un análisis completo para apoyar la toma de decisiones comerciales y técnicas.
-
-OPORTUNIDAD:
-{opportunity_text[:25000]}
-
-EQUIPOS/TORRES DISPONIBLES:
-{teams_context}
-
-INSTRUCCIONES:
-Analiza la oportunidad siguiendo este formato JSON EXACTO:
-
-{{
-  "executive_summary": "Resumen ejecutivo conciso del análisis (3-4 párrafos). Incluye: qué solicita el cliente, complejidad estimada, viabilidad y recomendación general.",
-
-  "key_requirements": ["Requerimiento clave 1", "Requerimiento clave 2", "Requerimiento clave 3"],
-
-  "technical_assessment": "Evaluación técnica detallada. Qué implica técnicamente este proyecto, qué arquitectura podría necesitar, qué consideraciones técnicas son importantes.",
-
-  "technology_stack": {{
-    "frontend": ["tecnologías frontend identificadas o sugeridas"],
-    "backend": ["tecnologías backend"],
-    "databases": ["bases de datos"],
-    "cloud": ["servicios cloud Azure, AWS, etc"],
-    "ai_ml": ["tecnologías IA/ML si aplica"],
-    "integrations": ["integraciones necesarias"],
-    "other": ["otras tecnologías relevantes"]
-  }},
-
-  "required_towers": ["Torre TORRE1", "Torre TORRE2"],
-
-  "team_recommendations": [
-    {{
-      "tower": "(COPIAR EXACTAMENTE la torre del equipo de la lista)",
-      "team_name": "(COPIAR EXACTAMENTE el nombre del equipo de la lista)",
-      "team_lead": "(COPIAR EXACTAMENTE el líder del equipo de la lista)",
-      "team_lead_email": "(COPIAR EXACTAMENTE el email del equipo de la lista)",
-      "relevance_score": 0.85,
-      "matched_skills": ["skill1", "skill2"],
-      "justification": "Por qué este equipo es necesario",
-      "estimated_involvement": "Full-time / Part-time / Consultoría"
-    }}
-  ],
-
-  "risks": [
-    {{
-      "category": "Técnico/Comercial/Recursos/Timeline",
-      "description": "Descripción del riesgo",
-      "level": "Bajo/Medio/Alto/Crítico",
-      "probability": 0.6,
-      "impact": "Impacto potencial",
-      "mitigation": "Estrategia de mitigación"
-    }}
-  ],
-  "overall_risk_level": "Bajo/Medio/Alto",
-
-  "timeline_estimate": {{
-    "total_duration": "X-Y meses",
-    "phases": [
-      {{
-        "phase_name": "Discovery & Diseño",
-        "duration": "X semanas",
-        "activities": ["Actividad 1", "Actividad 2"]
-      }},
-      {{
-        "phase_name": "Desarrollo",
-        "duration": "X meses",
-        "activities": ["Actividad 1", "Actividad 2"]
-      }},
-      {{
-        "phase_name": "Testing & QA",
-        "duration": "X semanas",
-        "activities": ["Actividad 1", "Actividad 2"]
-      }},
-      {{
-        "phase_name": "Despliegue & Go-Live",
-        "duration": "X semanas",
-        "activities": ["Actividad 1", "Actividad 2"]
-      }}
-    ]
-  }},
-
-  "effort_estimate": {{
-    "min_hours": 500,
-    "max_hours": 800,
-    "complexity": "Baja/Media/Alta/Muy Alta",
-    "team_size_recommended": "X-Y personas",
-    "assumptions": ["Asunción 1", "Asunción 2"]
-  }},
-
-  "recommendations": [
-    "Recomendación estratégica o táctica 1",
-    "Recomendación 2",
-    "Recomendación 3"
-  ],
-
-  "clarification_questions": [
-    "Pregunta que necesita aclaración del cliente 1",
-    "Pregunta 2"
-  ],
-
-  "next_steps": [
-    "Paso siguiente 1",
-    "Paso siguiente 2",
-    "Paso siguiente 3"
-  ],
-
-  "analysis_confidence": 0.80
-}}
-
-REGLAS IMPORTANTES:
-1. Responde SOLO con el JSON, sin texto adicional antes o después
-2. Para "required_towers", USA EXACTAMENTE los nombres de torre de la lista de equipos disponibles (ejemplo: "Torre IA", "Torre DATA")
-3. Para cada equipo recomendado, COPIA EXACTAMENTE: tower, team_name, team_lead y team_lead_email del equipo correspondiente de la lista de EQUIPOS/TORRES DISPONIBLES. NUNCA inventes nombres de líder ni emails.
-4. Si un equipo no aparece en la lista de EQUIPOS/TORRES DISPONIBLES arriba, NO lo incluyas en las recomendaciones
-5. Sé realista con las estimaciones basándote en la complejidad descrita
-6. Identifica riesgos reales y mitigaciones prácticas
-7. Las preguntas de clarificación deben ayudar a refinar la propuesta
-8. El equipo de QA (Torre Quality Assurance) y PMO (Torre PMO) son OBLIGATORIOS en proyectos medianos/grandes — búscalos en la lista de equipos disponibles
-"""
-
             response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {"role": "system", "content": "Eres un analista experto en oportunidades comerciales y propuestas técnicas empresariales."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=12000
+                **self._build_completion_kwargs(opportunity_text, available_teams)
             )
 
-            result_text = response.choices[0].message.content.strip()
+            return self._parse_analysis_response(response)
 
-            logging.info(f"📝 Respuesta recibida: {len(result_text)} caracteres")
+        except Exception as e:
+            logging.error(f"❌ Error en análisis con IA: {str(e)}")
+            import traceback
+            logging.error(f"❌ Traceback: {traceback.format_exc()}")
+            return None
 
-            # Extraer JSON de la respuesta
-            result_json = self._extract_json(result_text)
+    async def analyze_opportunity_async(
+        self,
+        opportunity_text: str,
+        available_teams: List[Dict[str, Any]],
+        on_field: Optional[FieldCallback] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Versión no bloqueante de analyze_opportunity (AsyncAzureOpenAI).
 
-            if result_json:
-                logging.info("✅ Análisis de oportunidad completado con éxito")
-                return result_json
-            else:
-                logging.error("❌ No se pudo parsear el JSON de la respuesta")
-                logging.error(f"❌ Primeros 1000 caracteres: {result_text[:1000]}")
-                return None
+        Mientras se espera la respuesta del modelo el event loop queda libre
+        para atender otras invocaciones del mismo worker.
+
+        Args:
+            on_field: Con OPENAI_STREAMING, corrutina que recibe (campo, valor)
+                por cada campo de primer nivel validado, antes de que termine la
+                generación (se ignora sin streaming)
+
+        Con OPENAI_LONG_DOCUMENT, una oportunidad que no entra en el presupuesto
+        del prompt se resume por fragmentos en lugar de recortarse.
+
+        Con OPENAI_TWO_STAGE, el prompt lleva solo los equipos de las torres
+        candidatas y las secciones del análisis se generan en paralelo
+        (on_field recibe los campos de cada sección al completarse).
+        """
+        try:
+            logging.info("🧠 Iniciando análisis de oportunidad con IA (async)...")
+
+            if self.two_stage:
+                available_teams = self._triage(opportunity_text, available_teams)
+
+            if self.long_document:
+                opportunity_text = await self._condense_long_document(opportunity_text, available_teams)
+
+            # En dos etapas los equipos dependen del triage de cada petición: van
+            # fuera del mensaje de sistema para no romper el prefijo cacheable
+            kwargs = self._build_completion_kwargs(opportunity_text, available_teams, teams_in_prefix=not self.two_stage)
+            request_bytes = sum(len(m["content"].encode("utf-8")) for m in kwargs["messages"])
+
+            if self.two_stage:
+                return await self._analyze_sections(kwargs, on_field)
+            if self.streaming:
+                return await self._analyze_streaming(kwargs, request_bytes, on_field)
+
+            with track_call("openai", "chat.completions", request_bytes) as call:
+                # Respuesta cruda: expone el tamaño del cuerpo y los reintentos del SDK.
+                # El timeout de cada intento es el tiempo que le queda a la petición.
+                raw = await self.async_client.chat.completions.with_raw_response.create(
+                    **kwargs, **timeout_kwargs()
+                )
+                response = raw.parse()
+                call.retries = getattr(raw, "retries_taken", 0)
+                call.response_bytes = len(raw.content)
+                _record_usage(call, response.usage)
+
+            return self._parse_analysis_response(response)
 
         except Exception as e:
             logging.error(f"❌ Error en análisis con IA: {str(e)}")
@@ -206,10 +279,388 @@ REGLAS IMPORTANTES:
             logging.error(f"❌ Traceback: {traceback.format_exc()}")
             return None
 
+    async def _analyze_streaming(
+        self,
+        kwargs: Dict[str, Any],
+        request_bytes: int,
+        on_field: Optional[FieldCallback]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Consume la completion en streaming con un parser JSON incremental.
+
+        Cada campo de primer nivel se valida contra AnalysisOutput en cuanto se
+        cierra; ante JSON inválido, un campo fuera de esquema o un rechazo del
+        modelo se corta el stream sin esperar el resto de la generación.
+        """
+        parser = JsonObjectStream()
+        with track_call("openai", "chat.completions.stream", request_bytes) as call:
+            started = time.perf_counter()
+            stream = await self.async_client.chat.completions.create(
+                **kwargs, stream=True, stream_options={"include_usage": True}, **timeout_kwargs()
+            )
+            try:
+                error = await self._consume_stream(stream, parser, call, started, on_field)
+            finally:
+                # Cerrar la respuesta HTTP también corta la generación si se aborta antes de tiempo
+                await stream.close()
+
+            if error is None and not parser.closed:
+                error = "respuesta incompleta"
+            if error:
+                call.status = "error"
+                call.extra["aborted_after_fields"] = len(parser.fields)
+                logging.error(f"❌ Análisis en streaming descartado: {error}")
+                return None
+
+        try:
+            analysis = AnalysisOutput.model_validate(parser.result())
+        except ValidationError as e:
+            logging.error(f"❌ La respuesta no cumple el esquema del análisis ({e.error_count()} errores): {str(e)}")
+            return None
+
+        logging.info(f"✅ Análisis de oportunidad completado con éxito ({len(parser.fields)} campos en streaming)")
+        return analysis.model_dump()
+
+    async def _consume_stream(
+        self,
+        stream,
+        parser: JsonObjectStream,
+        call: CallTiming,
+        started: float,
+        on_field: Optional[FieldCallback]
+    ) -> Optional[str]:
+        """Lee los chunks del stream; retorna el motivo de aborto o None si terminó bien"""
+        response_bytes = 0
+        async for chunk in stream:
+            _record_usage(call, chunk.usage)
+            if not chunk.choices:
+                continue
+
+            choice = chunk.choices[0]
+            delta = choice.delta
+            if delta is not None and getattr(delta, "refusal", None):
+                return f"el modelo rechazó generar el análisis: {delta.refusal}"
+            if delta is not None and delta.content:
+                if response_bytes == 0:
+                    call.extra["time_to_first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                response_bytes += len(delta.content.encode("utf-8"))
+                try:
+                    fields = [(name, validate_analysis_field(name, value)) for name, value in parser.feed(delta.content)]
+                except ValueError as e:
+                    return f"JSON inválido tras {len(parser.fields)} campos: {str(e)}"
+                for name, value in fields:
+                    if on_field:
+                        await on_field(name, value)
+            if choice.finish_reason == "length":
+                return "la respuesta se cortó por max_tokens"
+
+        call.response_bytes = response_bytes
+        if "time_to_first_token_ms" in call.extra:
+            histogram("openai.time_to_first_token", description="Tiempo hasta el primer token del análisis").record(
+                call.extra["time_to_first_token_ms"], {"cache_hit": call.extra.get("cached_tokens", 0) > 0}
+            )
+        return None
+
+    def _build_completion_kwargs(
+        self,
+        opportunity_text: str,
+        available_teams: List[Dict[str, Any]],
+        teams_in_prefix: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Construye los parámetros de chat.completions.create para el análisis.
+
+        Con `teams_in_prefix` el catálogo va en el mensaje de sistema (idéntico
+        entre peticiones); si no, p. ej. con las torres elegidas por el triage,
+        va en el mensaje del usuario antes de la oportunidad, de modo que el
+        mensaje de sistema sigue siendo el mismo prefijo fijo.
+        """
+        plan = self._plan_prompt(opportunity_text, self._format_teams_context(available_teams))
+
+        # Prefijo idéntico byte a byte para el mismo catálogo: solo cambia el mensaje del usuario
+        teams_block = f"EQUIPOS/TORRES DISPONIBLES:\n{plan.texts['teams']}"
+        opportunity_block = f"OPORTUNIDAD:\n{plan.texts['opportunity']}"
+        if teams_in_prefix:
+            system_prompt = f"{_SYSTEM_PROMPT}\n\n{_PROMPT_RULES}{teams_block}"
+            user_prompt = opportunity_block
+        else:
+            system_prompt = f"{_SYSTEM_PROMPT}\n\n{_PROMPT_RULES}"
+            user_prompt = f"{teams_block}\n\n{opportunity_block}"
+
+        return {
+            "model": self.deployment,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            # Esquema estricto: el modelo solo puede generar JSON válido para AnalysisOutput
+            "response_format": self.RESPONSE_FORMAT,
+            # Temperatura 0 y semilla fija: respuestas estables para la caché de análisis
+            "temperature": 0,
+            "seed": self.SEED,
+            "max_tokens": plan.max_tokens
+        }
+
+    def _plan_prompt(self, opportunity_text: str, teams_context: str) -> PromptPlan:
+        """
+        Reparte el presupuesto de tokens del prompt (ver utils/tokens.plan_prompt).
+
+        Instrucciones y esquema van siempre completos. El catálogo de equipos
+        se asigna primero (sin él no hay recomendaciones válidas) y la
+        oportunidad recibe el resto, con al menos OPPORTUNITY_MIN_TOKENS
+        reservados; lo que sobra se recorta en fronteras de párrafo.
+        """
+        plan = plan_prompt(
+            [
+                PromptSection("instructions", _SYSTEM_PROMPT + _PROMPT_RULES, truncatable=False),
+                PromptSection("schema", json.dumps(self.RESPONSE_FORMAT, ensure_ascii=False), truncatable=False),
+                PromptSection("teams", teams_context, priority=0),
+                PromptSection("opportunity", opportunity_text, priority=1, min_tokens=self.OPPORTUNITY_MIN_TOKENS),
+            ],
+            budget_tokens=self.prompt_token_budget,
+            context_window=self.context_window,
+            max_output_tokens=self.max_output_tokens,
+            min_output_tokens=self.MIN_OUTPUT_TOKENS,
+            model=self.deployment,
+        )
+
+        record_metadata("prompt_plan", plan.to_dict())
+        if plan.truncated:
+            logging.warning(
+                f"✂️ Prompt recortado a {plan.budget_tokens} tokens ({plan.tokenizer}): "
+                + ", ".join(
+                    f"{name} {plan.sections[name]['original_tokens']}→{plan.sections[name]['tokens']}"
+                    for name in plan.truncated
+                )
+            )
+        return plan
+
+    async def _condense_long_document(self, opportunity_text: str, available_teams: List[Dict[str, Any]]) -> str:
+        """
+        Map-reduce de una oportunidad que no entra en el presupuesto del prompt.
+
+        Divide el texto en fragmentos por secciones y párrafos, los resume en
+        paralelo con summary_deployment (a lo sumo summary_concurrency llamadas
+        a la vez) y une los resúmenes en un texto que entra en el espacio
+        asignado a la oportunidad. Los resúmenes se cachean por hash del
+        fragmento. Si un resumen falla, ese fragmento se incluye recortado.
+
+        Returns:
+            El texto original si entra completo; si no, el resumen por partes
+        """
+        plan = self._plan_prompt(opportunity_text, self._format_teams_context(available_teams))
+        if not plan.sections["opportunity"]["truncated"]:
+            return opportunity_text
+
+        target_tokens = plan.sections["opportunity"]["tokens"]
+        original_tokens = plan.sections["opportunity"]["original_tokens"]
+        max_chunks = self.summary_concurrency * self.SUMMARY_ROUNDS
+        chunk_tokens = max(self.SUMMARY_CHUNK_TOKENS, math.ceil(original_tokens / max_chunks))
+        chunks = split_into_chunks(opportunity_text, chunk_tokens, self.summary_deployment)
+        while len(chunks) > max_chunks:
+            # Los fragmentos respetan secciones y párrafos y no se llenan del todo
+            chunk_tokens = math.ceil(chunk_tokens * 1.25)
+            chunks = split_into_chunks(opportunity_text, chunk_tokens, self.summary_deployment)
+
+        # Cada resumen recibe una parte igual del espacio de la oportunidad
+        header = f"[Resumen por partes de una descripción extensa ({original_tokens} tokens, {len(chunks)} partes)]"
+        summary_tokens = max(1, (target_tokens - count_tokens(header, self.deployment)) // len(chunks) - 8)
+        logging.info(
+            f"📚 Documento largo ({original_tokens} tokens): {len(chunks)} fragmentos de hasta "
+            f"{chunk_tokens} tokens, resúmenes de {summary_tokens} tokens con {self.summary_deployment}"
+        )
+
+        semaphore = asyncio.Semaphore(self.summary_concurrency)
+
+        async def summarize(chunk: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._summarize_chunk(chunk, summary_tokens)
+
+        results = await asyncio.gather(*(summarize(chunk) for chunk in chunks))
+        digest = "\n\n".join(
+            [header] + [f"### Parte {i}/{len(chunks)}\n{r['summary']}" for i, r in enumerate(results, 1)]
+        )
+
+        record_metadata("long_document", {
+            "original_tokens": original_tokens,
+            "digest_tokens": count_tokens(digest, self.deployment),
+            "chunks": len(chunks),
+            "chunk_tokens": chunk_tokens,
+            "cached": sum(1 for r in results if r["source"] == "cache"),
+            "failed": sum(1 for r in results if r["source"] == "truncated"),
+            "deployment": self.summary_deployment,
+        })
+        return digest
+
+    async def _summarize_chunk(self, chunk: str, max_tokens: int) -> Dict[str, str]:
+        """Resume un fragmento (o lo toma de la caché); ante un error lo retorna recortado"""
+        digest = hashlib.sha256()
+        for part in (self.summary_deployment, _SUMMARY_PROMPT, str(max_tokens), chunk):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        key = digest.hexdigest()
+
+        cached = await self._summary_cache.get(key) if self._summary_cache is not None else None
+        if cached is not None:
+            return {"summary": cached["summary"], "source": "cache"}
+
+        messages = [
+            {"role": "system", "content": _SUMMARY_PROMPT},
+            {"role": "user", "content": chunk},
+        ]
+        request_bytes = sum(len(m["content"].encode("utf-8")) for m in messages)
+        try:
+            with track_call("openai", "chat.completions.summary", request_bytes) as call:
+                raw = await self.async_client.chat.completions.with_raw_response.create(
+                    model=self.summary_deployment,
+                    messages=messages,
+                    temperature=0,
+                    seed=self.SEED,
+                    max_tokens=max_tokens,
+                    **timeout_kwargs()
+                )
+                response = raw.parse()
+                call.retries = getattr(raw, "retries_taken", 0)
+                call.response_bytes = len(raw.content)
+                _record_usage(call, response.usage)
+            summary = (response.choices[0].message.content or "").strip()
+            if not summary:
+                raise ValueError("resumen vacío")
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo resumir un fragmento ({str(e)}): se incluye recortado")
+            return {"summary": truncate_to_tokens(chunk, max_tokens, self.deployment), "source": "truncated"}
+
+        if self._summary_cache is not None:
+            await self._summary_cache.set(key, {"summary": summary})
+        return {"summary": summary, "source": "model"}
+
+    def _triage(self, opportunity_text: str, teams: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Primera etapa: equipos de las torres candidatas según el triage local (utils/triage)"""
+        selected, scores = triage_teams(
+            opportunity_text, teams, self.triage_max_teams, self.TRIAGE_MANDATORY_TOWERS
+        )
+        record_metadata("triage", {
+            "catalog_teams": len(teams),
+            "selected_teams": len(selected),
+            "towers": {tower: round(score, 1) for tower, score in scores.items()} if selected is not teams else {},
+        })
+        if selected is not teams:
+            logging.info(f"🎯 Triage: {len(selected)}/{len(teams)} equipos de {len(scores)} torres candidatas")
+        return selected
+
+    async def _analyze_sections(
+        self,
+        kwargs: Dict[str, Any],
+        on_field: Optional[FieldCallback]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Segunda etapa: una completion por sección de ANALYSIS_SECTIONS, en paralelo.
+
+        Todas comparten el mensaje de sistema (prefijo fijo entre peticiones) y
+        el de usuario con los equipos candidatos y la oportunidad (prefijo común
+        de las secciones); cada una usa el esquema estricto de su sección. El
+        tiempo total es el de la sección más lenta. Si alguna falla, el análisis se descarta.
+        """
+        system, user = kwargs["messages"]
+
+        async def generate(section: str, fields: tuple) -> Optional[Dict[str, Any]]:
+            section_kwargs = {
+                **kwargs,
+                "messages": [system, {
+                    "role": "user",
+                    "content": f"{user['content']}\n\nGenera solo esta parte del análisis: {', '.join(fields)}. "
+                               "Las demás partes se generan por separado."
+                }],
+                "response_format": analysis_section_response_format(section),
+            }
+            request_bytes = sum(len(m["content"].encode("utf-8")) for m in section_kwargs["messages"])
+            with track_call("openai", f"chat.completions.{section}", request_bytes) as call:
+                raw = await self.async_client.chat.completions.with_raw_response.create(
+                    **section_kwargs, **timeout_kwargs()
+                )
+                response = raw.parse()
+                call.retries = getattr(raw, "retries_taken", 0)
+                call.response_bytes = len(raw.content)
+                _record_usage(call, response.usage)
+
+            result = self._parse_section_response(response, section, fields)
+            if result is not None and on_field:
+                for name in fields:
+                    await on_field(name, result[name])
+            return result
+
+        results = await asyncio.gather(*(generate(section, fields) for section, fields in ANALYSIS_SECTIONS.items()))
+        if any(result is None for result in results):
+            return None
+
+        merged: Dict[str, Any] = {}
+        for result in results:
+            merged.update(result)
+        try:
+            analysis = AnalysisOutput.model_validate(merged)
+        except ValidationError as e:
+            logging.error(f"❌ Las secciones combinadas no cumplen el esquema ({e.error_count()} errores): {str(e)}")
+            return None
+
+        logging.info(f"✅ Análisis de oportunidad completado con éxito ({len(results)} secciones en paralelo)")
+        return analysis.model_dump()
+
+    def _parse_section_response(self, response, section: str, fields: tuple) -> Optional[Dict[str, Any]]:
+        """Valida los campos de una sección del análisis en dos etapas"""
+        result_text = self._completion_content(response)
+        if result_text is None:
+            return None
+        try:
+            data = json.loads(result_text)
+            return {name: validate_analysis_field(name, data[name]) for name in fields}
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error(f"❌ La sección '{section}' no cumple el esquema: {str(e)}")
+            return None
+
+    @staticmethod
+    def _completion_content(response) -> Optional[str]:
+        """Contenido de la respuesta, o None si el modelo la rechazó o se cortó por max_tokens"""
+        choice = response.choices[0]
+        message = choice.message
+
+        if getattr(message, "refusal", None):
+            logging.error(f"❌ El modelo rechazó generar el análisis: {message.refusal}")
+            return None
+        if choice.finish_reason == "length":
+            logging.error("❌ La respuesta se cortó por max_tokens: el JSON está incompleto")
+            return None
+        return message.content or ""
+
+    def _parse_analysis_response(self, response) -> Optional[Dict[str, Any]]:
+        """Valida la respuesta estructurada del modelo contra AnalysisOutput"""
+        result_text = self._completion_content(response)
+        if result_text is None:
+            return None
+        logging.info(f"📝 Respuesta recibida: {len(result_text)} caracteres")
+
+        try:
+            analysis = AnalysisOutput.model_validate_json(result_text)
+        except ValidationError as e:
+            logging.error(f"❌ La respuesta no cumple el esquema del análisis ({e.error_count()} errores): {str(e)}")
+            logging.error(f"❌ Primeros 1000 caracteres: {result_text[:1000]}")
+            return None
+
+        logging.info("✅ Análisis de oportunidad completado con éxito")
+        return analysis.model_dump()
+
     def _format_teams_context(self, teams: List[Dict[str, Any]]) -> str:
-        """Formatea el contexto de equipos para el prompt"""
+        """
+        Formatea el contexto de equipos para el prompt.
+
+        Los equipos se ordenan por torre y nombre: el mismo catálogo produce
+        el mismo texto aunque Search los devuelva en otro orden, y el prefijo
+        del prompt sigue siendo cacheable.
+        """
         lines = []
-        for team in teams:
+        ordered = sorted(teams, key=lambda t: (
+            str(t.get('tower') or ''), str(t.get('team_name') or t.get('name') or ''), str(t.get('id') or '')
+        ))
+        for team in ordered:
             # Manejar diferentes estructuras de datos
             name = team.get('team_name') or team.get('name', 'N/A')
             tower = team.get('tower', 'N/A')
@@ -227,43 +678,3 @@ REGLAS IMPORTANTES:
             lines.append(f"  Descripción: {description}")
             lines.append("")
         return "\n".join(lines)
-
-    def _extract_json(self, text: str) -> Optional[Dict[str, Any]]:
-        """Extrae JSON de una respuesta que puede contener texto adicional"""
-        try:
-            # Intentar parsear directo
-            return json.loads(text)
-        except BaseException:
-            pass
-
-        # Remover tags de razonamiento de DeepSeek-R1 si existen
-        text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
-        text = text.strip()
-
-        # Buscar bloque de código JSON
-        json_match = re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group(1))
-            except BaseException:
-                pass
-
-        # Buscar bloque de código sin especificar lenguaje
-        json_match = re.search(r'```\s*(.*?)\s*```', text, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group(1))
-            except BaseException:
-                pass
-
-        # Buscar primer { hasta último }
-        start = text.find('{')
-        end = text.rfind('}')
-        if start != -1 and end != -1:
-            try:
-                json_text = text[start:end + 1]
-                return json.loads(json_text)
-            except Exception as e:
-                logging.error(f"❌ Error parseando JSON extraído: {str(e)}")
-
-        return None
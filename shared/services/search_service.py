@@ -5,10 +5,16 @@ Búsqueda de equipos y conocimiento organizacional
 
 import os
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
 from azure.core.credentials import AzureKeyCredential
 
+from ..utils.aio import schedule_close
+from ..utils.circuit import CircuitOpenError, circuit_breaker
+from ..utils.deadline import timeout_kwargs
+from ..utils.timing import track_call
+
 
 class SearchService:
     """Servicio para Azure AI Search"""
@@ -27,8 +33,29 @@ class SearchService:
             credential=AzureKeyCredential(self.key)
         )
 
+        # Cliente asíncrono (se crea en el primer uso, dentro del event loop)
+        self._async_client: Optional[AsyncSearchClient] = None
+
         logging.info(f"✅ SearchService inicializado: {self.index_name}")
 
+    @property
+    def async_client(self) -> AsyncSearchClient:
+        """Cliente asíncrono de Azure AI Search"""
+        if self._async_client is None:
+            self._async_client = AsyncSearchClient(
+                endpoint=self.endpoint,
+                index_name=self.index_name,
+                credential=AzureKeyCredential(self.key)
+            )
+        return self._async_client
+
+    def close(self):
+        """Cierra los pools de conexiones HTTP de los clientes"""
+        self.client.close()
+        if self._async_client is not None:
+            schedule_close(self._async_client)
+            self._async_client = None
+
     # -----------------------------------------------------------------------
     # Campos que siempre se seleccionan en las búsquedas
     # -----------------------------------------------------------------------
@@ -109,6 +136,55 @@ class SearchService:
             logging.error(f"❌ Error obteniendo equipos: {str(e)}")
             return []
 
+    async def search_teams_async(self, query: str, top: int = 10) -> List[Dict[str, Any]]:
+        """Versión no bloqueante de search_teams"""
+        try:
+            logging.info(f"🔍 Buscando equipos para: {query[:100]}...")
+
+            results = await self.async_client.search(
+                search_text=query,
+                top=top,
+                select=self._SELECT_FIELDS,
+                include_total_count=True,
+                **timeout_kwargs("read_timeout")
+            )
+
+            teams = [self._map_result(r) async for r in results]
+            logging.info(f"✅ {len(teams)} equipos encontrados")
+            return teams
+
+        except Exception as e:
+            logging.error(f"❌ Error buscando equipos: {str(e)}")
+            return []
+
+    async def get_all_teams_async(self) -> List[Dict[str, Any]]:
+        """Versión no bloqueante de get_all_teams"""
+        with track_call("search", "get_all_teams") as call:
+            try:
+                logging.info("📋 Obteniendo todos los equipos...")
+
+                with circuit_breaker("search").guard(call):
+                    # read_timeout: límite del transporte según el tiempo restante, como en Blob
+                    results = await self.async_client.search(
+                        search_text="*",
+                        select=self._SELECT_FIELDS,
+                        top=100,
+                        **timeout_kwargs("read_timeout")
+                    )
+                    teams = [self._map_result(r) async for r in results]
+
+                call.extra["items"] = len(teams)
+                logging.info(f"✅ {len(teams)} equipos totales")
+                return teams
+
+            except CircuitOpenError as e:
+                logging.warning(f"🔌 {str(e)}")
+                return []
+            except Exception as e:
+                call.status = "error"
+                logging.error(f"❌ Error obteniendo equipos: {str(e)}")
+                return []
+
     def search_by_skills(self, skills: List[str], top: int = 10) -> List[Dict[str, Any]]:
         """
         Busca equipos que tengan habilidades específicas
@@ -0,0 +1,22 @@
+"""
+Utilidades para clientes asíncronos de los SDKs de Azure y OpenAI
+"""
+
+import asyncio
+import logging
+
+
+def schedule_close(client) -> None:
+    """
+    Programa el cierre de un cliente asíncrono (cuyo close() es una corrutina)
+    desde código síncrono.
+
+    Si no hay un event loop activo el cliente no puede cerrarse de forma
+    ordenada; se descarta y el recolector libera sus conexiones.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logging.debug("Sin event loop activo: se descarta el cliente asíncrono sin cerrarlo")
+        return
+    loop.create_task(client.close())
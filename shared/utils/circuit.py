@@ -0,0 +1,243 @@
+"""
+Circuit breakers por dependencia (Cosmos DB, Blob Storage, Azure AI Search)
+Cada dependencia lleva la tasa de fallas de sus llamadas en una ventana de
+tiempo; si supera el umbral, el circuito se abre y las llamadas siguientes se
+omiten al instante (sin esperar timeouts) hasta que una llamada de prueba en
+estado semiabierto confirme que la dependencia se recuperó
+"""
+
+import os
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+from .metrics import counter
+from .timing import CallTiming
+
+
+# Estados del circuito
+CLOSED = "closed"         # las llamadas pasan y se contabilizan
+OPEN = "open"             # las llamadas se omiten hasta que pase open_seconds
+HALF_OPEN = "half_open"   # pasan hasta half_open_probes llamadas de prueba
+
+# Estado de CallTiming para una llamada omitida por un circuito abierto
+CIRCUIT_OPEN_STATUS = "circuit_open"
+
+# Códigos HTTP que indican saturación o falla transitoria de la dependencia;
+# el resto de los 4xx son errores del llamador y no abren el circuito
+_TRANSIENT_STATUS_CODES = (408, 429)
+
+
+class CircuitOpenError(Exception):
+    """La llamada se omitió porque el circuito de la dependencia está abierto"""
+
+    def __init__(self, name: str, retry_in_seconds: float):
+        super().__init__(f"Circuito '{name}' abierto: se omite la llamada (reintento en {retry_in_seconds:.1f}s)")
+        self.name = name
+        self.retry_in_seconds = retry_in_seconds
+
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """¿El error indica que la dependencia está degradada? (5xx, throttling, timeouts, red)"""
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int) and 400 <= status_code < 500:
+        return status_code in _TRANSIENT_STATUS_CODES
+    return True
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de una dependencia.
+
+    - Cerrado: abre el circuito cuando, con al menos `min_calls` llamadas en
+      los últimos `window_seconds`, la proporción de fallas llega a `failure_rate`.
+    - Abierto: rechaza las llamadas durante `open_seconds`.
+    - Semiabierto: deja pasar hasta `half_open_probes` llamadas de prueba;
+      si todas terminan bien se cierra, y ante la primera falla vuelve a abrirse.
+
+    Se comparte entre todas las invocaciones del proceso (ver circuit_breaker).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        enabled: bool = True
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.enabled = enabled
+
+        self._state = CLOSED
+        self._opened_at: Optional[float] = None
+        # Resultado de cada llamada en la ventana: (instante, falló)
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+
+        self._transitions = counter("dependency.circuit.transitions", description="Cambios de estado del circuito")
+        self._rejections = counter("dependency.circuit.rejected", description="Llamadas omitidas por circuito abierto")
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        """
+        Construye el breaker según CIRCUIT_BREAKER_ENABLED, CIRCUIT_FAILURE_RATE,
+        CIRCUIT_MIN_CALLS, CIRCUIT_WINDOW_SECONDS, CIRCUIT_OPEN_SECONDS y
+        CIRCUIT_HALF_OPEN_PROBES.
+        """
+        return cls(
+            name,
+            failure_rate=float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),
+            min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "5")),
+            window_seconds=float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60")),
+            open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+            half_open_probes=int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1")),
+            enabled=os.getenv("CIRCUIT_BREAKER_ENABLED", "true").strip().lower() not in ("0", "false", "no"),
+        )
+
+    @property
+    def state(self) -> str:
+        """Estado actual; un circuito abierto pasa a semiabierto al cumplirse open_seconds"""
+        if self._state == OPEN and self.retry_in() <= 0:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_in(self) -> float:
+        """Segundos hasta la próxima llamada de prueba (0 si el circuito no está abierto)"""
+        if self._state != OPEN or self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def _transition(self, state: str):
+        previous, self._state = self._state, state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._opened_at = None
+            self._outcomes.clear()
+        self._transitions.add(1, {"dependency": self.name, "state": state})
+
+        log = logging.warning if state == OPEN else logging.info
+        log(
+            f"🔌 Circuito '{self.name}': {previous} → {state}",
+            extra={"custom_dimensions": {"dependency": self.name, "from": previous, "to": state, **self.snapshot()}}
+        )
+
+    def _prune(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def allow(self) -> bool:
+        """¿Puede ejecutarse una llamada ahora? En semiabierto ocupa un cupo de prueba"""
+        if not self.enabled:
+            return True
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def record(self, failed: bool, probe: bool = False):
+        """Registra el resultado de una llamada admitida"""
+        if probe and self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(CLOSED)
+            return
+
+        # Llamadas iniciadas con el circuito cerrado que terminan con otro estado no cuentan
+        if self._state != CLOSED:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._prune(now)
+        calls = len(self._outcomes)
+        failures = sum(1 for _, f in self._outcomes if f)
+        if failed and calls >= self.min_calls and failures / calls >= self.failure_rate:
+            self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._prune(time.monotonic())
+        return {
+            "state": self._state,
+            "calls": len(self._outcomes),
+            "failures": sum(1 for _, f in self._outcomes if f),
+            "rejected": self.rejected,
+            "retry_in_seconds": round(self.retry_in(), 1),
+        }
+
+    @contextmanager
+    def guard(self, call: Optional[CallTiming] = None) -> Iterator[None]:
+        """
+        Ejecuta el bloque si el circuito lo permite y registra su resultado.
+
+        Args:
+            call: Medición de la llamada (track_call); si se omite queda con
+                status "circuit_open" y sin duración
+
+        Raises:
+            CircuitOpenError: si el circuito está abierto (el bloque no se ejecuta)
+        """
+        if not self.allow():
+            self.rejected += 1
+            self._rejections.add(1, {"dependency": self.name})
+            error = CircuitOpenError(self.name, self.retry_in())
+            if call is not None:
+                call.status = CIRCUIT_OPEN_STATUS
+                call.extra["retry_in_seconds"] = round(error.retry_in_seconds, 1)
+            raise error
+
+        probe = self._state == HALF_OPEN
+        try:
+            yield
+        except Exception as e:
+            self.record(is_dependency_failure(e), probe)
+            raise
+        except BaseException:
+            # Cancelación (p. ej. timeout del paso): libera el cupo de prueba sin juzgar a la dependencia
+            if probe and self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            raise
+        else:
+            self.record(False, probe)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def circuit_breaker(name: str) -> CircuitBreaker:
+    """Breaker de la dependencia `name`, creado en el primer uso y compartido por el proceso"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker.from_env(name)
+    return breaker
+
+
+def circuit_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Estado de los breakers creados hasta ahora (dependencia -> snapshot)"""
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+def reset_circuit_breakers():
+    """Descarta los breakers del proceso; se recrean con la configuración vigente (tests)"""
+    _breakers.clear()
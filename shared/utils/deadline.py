@@ -0,0 +1,128 @@
+"""
+Presupuesto de tiempo por petición
+El llamador (HTTP trigger o worker de jobs) fija un Deadline al recibir la
+petición; el pipeline y los servicios lo leen del contexto para acotar sus
+timeouts y omitir los pasos opcionales cuando el tiempo no alcanza
+"""
+
+import os
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+
+# Header opcional con la paciencia del llamador, en segundos (se acota a REQUEST_DEADLINE_SECONDS)
+DEADLINE_HEADER = "X-Request-Timeout"
+
+# Límite del balanceador de Azure para respuestas HTTP (230 s) con margen para serializar
+DEFAULT_REQUEST_DEADLINE_SECONDS = 220.0
+
+# functionTimeout de host.json (10 min) con margen para guardar el estado del job
+DEFAULT_JOB_DEADLINE_SECONDS = 540.0
+
+
+class Deadline:
+    """
+    Instante límite de una petición.
+
+    Sin presupuesto (`budget_seconds=None`) no hay límite: remaining() es
+    infinito y timeout() retorna el tope recibido.
+    """
+
+    def __init__(self, budget_seconds: Optional[float] = None):
+        self.budget_seconds = budget_seconds
+        self.started_at = time.monotonic()
+        self.expires_at = None if budget_seconds is None else self.started_at + max(0.0, budget_seconds)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.expires_at is None
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        """¿Quedan al menos `seconds` segundos?"""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Timeout para una operación: el tiempo restante, sin superar `cap` (None = sin límite)"""
+        if self.expires_at is None:
+            return cap
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """Deadline que vence `seconds` antes, para dejar tiempo a lo que sigue (p. ej. responder)"""
+        child = Deadline()
+        child.budget_seconds = self.budget_seconds
+        child.started_at = self.started_at
+        if self.expires_at is not None:
+            child.expires_at = max(self.started_at, self.expires_at - seconds)
+        return child
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "budget_seconds": self.budget_seconds,
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+            "remaining_seconds": None if self.unlimited else round(self.remaining(), 3),
+        }
+
+
+def request_deadline(header_value: Optional[str] = None) -> Deadline:
+    """
+    Deadline de una petición HTTP: REQUEST_DEADLINE_SECONDS, o menos si el
+    llamador envía X-Request-Timeout.
+    """
+    budget = float(os.getenv("REQUEST_DEADLINE_SECONDS", str(DEFAULT_REQUEST_DEADLINE_SECONDS)))
+    try:
+        requested = float(header_value) if header_value else None
+    except ValueError:
+        requested = None
+    if requested is not None and requested > 0:
+        budget = min(budget, requested)
+    return Deadline(budget)
+
+
+def job_deadline() -> Deadline:
+    """Deadline de un job ejecutado por el worker de la cola (JOB_DEADLINE_SECONDS)"""
+    return Deadline(float(os.getenv("JOB_DEADLINE_SECONDS", str(DEFAULT_JOB_DEADLINE_SECONDS))))
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline) -> Iterator[Deadline]:
+    """Hace visible `deadline` para el pipeline y los servicios (las tareas hijas lo heredan)"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline de la petición en curso, o None fuera de deadline_scope"""
+    return _current.get()
+
+
+def timeout_kwargs(name: str = "timeout", cap: Optional[float] = None) -> Dict[str, float]:
+    """
+    Argumento de timeout para un cliente del SDK según el tiempo restante
+    (vacío si no hay deadline ni tope).
+    """
+    deadline = current_deadline()
+    value = deadline.timeout(cap) if deadline else cap
+    if value is None:
+        return {}
+    # Los SDK interpretan 0 como "sin timeout": un mínimo simbólico hace fallar rápido
+    return {name: max(value, 0.001)}
@@ -0,0 +1,221 @@
+"""
+Lectura incremental de exportaciones JSON/JSONL y de respuestas en streaming
+Los registros se entregan de a uno sin cargar el archivo completo en memoria;
+los campos de un objeto recibido por fragmentos, en cuanto se cierran
+"""
+
+import re
+import json
+import codecs
+from typing import Any, Dict, Iterator, List, Tuple
+
+CHUNK_SIZE = 1 << 20  # 1 MB
+
+# Exportación OData de Dataverse: {"@odata.context": "...", "value": [ ... ]}
+_ODATA_VALUE = re.compile(r'"value"\s*:\s*\[')
+
+
+def detect_format(path: str) -> str:
+    """
+    Retorna "jsonl" o "json" según la extensión y el primer carácter del archivo.
+
+    `.jsonl`/`.ndjson` son JSONL; un archivo que empieza con `[` es un arreglo JSON;
+    un `.json` que empieza con `{` es una exportación OData con `value`.
+    """
+    lower = path.lower()
+    if lower.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+
+    with open(path, "rb") as f:
+        head = f.read(4096).decode("utf-8-sig", errors="ignore").lstrip()
+    if head.startswith("["):
+        return "json"
+    if head.startswith("{") and lower.endswith(".json"):
+        return "json"
+    return "jsonl"
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[int, Dict[str, Any], int]]:
+    """
+    Itera un archivo JSONL.
+
+    Yields:
+        (índice, registro, bytes leídos hasta el final del registro)
+    """
+    offset = 0
+    index = 0
+    with open(path, "rb") as f:
+        for line in f:
+            offset += len(line)
+            text = line.decode("utf-8-sig").strip()
+            if not text:
+                continue
+            yield index, json.loads(text), offset
+            index += 1
+
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, Dict[str, Any], int]]:
+    """
+    Itera los elementos de un arreglo JSON (o del `value` de una exportación OData)
+    leyendo el archivo por bloques.
+
+    Yields:
+        (índice, registro, bytes leídos del archivo al entregar el registro)
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    pos = 0
+    bytes_read = 0
+    eof = False
+    index = 0
+
+    with open(path, "rb") as f:
+        def read_more() -> bool:
+            nonlocal buffer, pos, bytes_read, eof
+            chunk = f.read(chunk_size)
+            bytes_read += len(chunk)
+            if not chunk:
+                eof = True
+                buffer += text_decoder.decode(b"", final=True)
+                return False
+            # Descartar lo ya consumido para que el buffer no crezca con el archivo
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+            pos = 0
+            return True
+
+        # Ubicar el inicio del arreglo
+        while True:
+            stripped = buffer[pos:].lstrip()
+            if stripped.startswith("["):
+                pos = buffer.index("[", pos) + 1
+                break
+            if stripped.startswith("{"):
+                match = _ODATA_VALUE.search(buffer, pos)
+                if match:
+                    pos = match.end()
+                    break
+            elif stripped:
+                raise ValueError("El archivo no contiene un arreglo JSON")
+            if not read_more():
+                raise ValueError("No se encontró el arreglo de registros en el archivo")
+
+        while True:
+            # Saltar separadores
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                if not read_more():
+                    raise ValueError("El arreglo JSON no está cerrado")
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Registro incompleto: leer otro bloque
+                if eof or not read_more():
+                    raise
+                continue
+
+            yield index, record, bytes_read
+            index += 1
+            pos = end
+
+
+def iter_records(path: str) -> Iterator[Tuple[int, Dict[str, Any], int]]:
+    """Itera un archivo JSONL o JSON según detect_format"""
+    if detect_format(path) == "jsonl":
+        return iter_jsonl(path)
+    return iter_json_array(path)
+
+
+class JsonObjectStream:
+    """
+    Parser incremental de un objeto JSON recibido por fragmentos (p. ej. los
+    tokens de una completion en streaming).
+
+    feed() retorna los miembros de primer nivel que quedaron completos con el
+    fragmento recibido. Un error de sintaxis se detecta al cerrarse el miembro
+    que lo contiene, sin esperar el resto del texto.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.closed = False
+        self._text = ""
+        self._pos = 0
+        self._member_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Agrega un fragmento y retorna los miembros (clave, valor) completados.
+
+        Raises:
+            ValueError: si el texto recibido no puede ser un objeto JSON válido
+        """
+        self._text += chunk
+        text = self._text
+        completed: List[Tuple[str, Any]] = []
+
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self.closed or self._depth == 0:
+                if ch == "{" and not self.closed:
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+                elif not ch.isspace():
+                    raise ValueError(f"Carácter inesperado fuera del objeto JSON: {ch!r}")
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    if ch != "}":
+                        raise ValueError("El objeto JSON se cerró con ']'")
+                    self._complete_member(text[self._member_start:self._pos], completed, last=True)
+                    self.closed = True
+            elif ch == "," and self._depth == 1:
+                self._complete_member(text[self._member_start:self._pos], completed)
+                self._member_start = self._pos + 1
+            self._pos += 1
+
+        # Descartar lo ya entregado para que el buffer no crezca con la respuesta
+        keep_from = self._pos if self.closed or self._depth == 0 else self._member_start
+        self._text = text[keep_from:]
+        self._pos -= keep_from
+        self._member_start = max(0, self._member_start - keep_from)
+        return completed
+
+    def _complete_member(self, member: str, completed: List[Tuple[str, Any]], last: bool = False):
+        if not member.strip():
+            if last and not self.fields:
+                return  # objeto vacío
+            raise ValueError("Miembro vacío en el objeto JSON")
+        (key, value), = json.loads("{" + member + "}").items()
+        self.fields[key] = value
+        completed.append((key, value))
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Objeto completo.
+
+        Raises:
+            ValueError: si el objeto todavía no se cerró (respuesta cortada)
+        """
+        if not self.closed:
+            raise ValueError(f"El objeto JSON está incompleto ({len(self.fields)} campos recibidos)")
+        return dict(self.fields)
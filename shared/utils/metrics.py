@@ -0,0 +1,137 @@
+"""
+Métricas con OpenTelemetry (opcional)
+Si METRICS_EXPORTER no está configurado o el paquete opentelemetry-sdk no está
+instalado, los instrumentos son objetos nulos sin costo
+"""
+
+import os
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .tracing import DEFAULT_SERVICE_NAME
+
+
+# Lectura de un gauge observable: (valor, atributos)
+GaugeReading = Tuple[float, Dict[str, Any]]
+
+
+class _NoopInstrument:
+    """Contador/histograma nulo: mismas operaciones que OpenTelemetry, sin efecto"""
+
+    def add(self, amount: float, attributes: Optional[Dict[str, Any]] = None):
+        pass
+
+    def record(self, amount: float, attributes: Optional[Dict[str, Any]] = None):
+        pass
+
+
+_NOOP_INSTRUMENT = _NoopInstrument()
+
+
+class _MetricsState:
+    configured = False
+    meter = None
+    provider = None
+
+
+_state = _MetricsState()
+
+
+def _build_exporter(kind: str):
+    """Exportador según METRICS_EXPORTER"""
+    if kind == "console":
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter
+        return ConsoleMetricExporter()
+
+    if kind == "otlp":
+        # Endpoint y cabeceras desde OTEL_EXPORTER_OTLP_* (variables estándar)
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        return OTLPMetricExporter()
+
+    if kind == "azure_monitor":
+        from azure.monitor.opentelemetry.exporter import AzureMonitorMetricExporter
+        return AzureMonitorMetricExporter.from_connection_string(
+            os.environ["APPLICATIONINSIGHTS_CONNECTION_STRING"]
+        )
+
+    raise ValueError(f"METRICS_EXPORTER no soportado: {kind}")
+
+
+def configure_metrics(force: bool = False):
+    """
+    Inicializa el meter una vez por proceso según METRICS_EXPORTER
+    (none | console | otlp | azure_monitor), exportando cada
+    METRICS_EXPORT_INTERVAL_SECONDS.
+
+    Returns:
+        El meter de OpenTelemetry, o None si las métricas están deshabilitadas
+    """
+    if _state.configured and not force:
+        return _state.meter
+
+    if _state.provider is not None:
+        _state.provider.shutdown()
+    _state.configured = True
+    _state.meter = _state.provider = None
+
+    kind = os.getenv("METRICS_EXPORTER", "none").strip().lower()
+    if kind in ("", "none"):
+        return None
+
+    try:
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        from opentelemetry.sdk.resources import Resource
+
+        interval = float(os.getenv("METRICS_EXPORT_INTERVAL_SECONDS", "60"))
+        reader = PeriodicExportingMetricReader(_build_exporter(kind), export_interval_millis=interval * 1000)
+        provider = MeterProvider(
+            resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", DEFAULT_SERVICE_NAME)}),
+            metric_readers=[reader],
+        )
+    except ImportError as e:
+        logging.warning(f"⚠️ Métricas '{kind}' no disponibles (instalar opentelemetry-sdk): {str(e)}")
+        return None
+    except Exception as e:
+        logging.warning(f"⚠️ No se pudieron configurar las métricas '{kind}': {str(e)}")
+        return None
+
+    _state.provider = provider
+    _state.meter = provider.get_meter("shared")
+    logging.info(f"✅ Métricas OpenTelemetry habilitadas ({kind})")
+    return _state.meter
+
+
+def counter(name: str, unit: str = "1", description: str = ""):
+    """Contador monotónico (`add`)"""
+    meter = configure_metrics()
+    if meter is None:
+        return _NOOP_INSTRUMENT
+    return meter.create_counter(name, unit=unit, description=description)
+
+
+def histogram(name: str, unit: str = "ms", description: str = ""):
+    """Distribución de valores (`record`)"""
+    meter = configure_metrics()
+    if meter is None:
+        return _NOOP_INSTRUMENT
+    return meter.create_histogram(name, unit=unit, description=description)
+
+
+def observable_gauge(
+    name: str,
+    read: Callable[[], Iterable[GaugeReading]],
+    unit: str = "1",
+    description: str = ""
+):
+    """Gauge leído en cada exportación: `read` retorna pares (valor, atributos)"""
+    meter = configure_metrics()
+    if meter is None:
+        return None
+
+    from opentelemetry.metrics import Observation
+
+    def callback(options):
+        return [Observation(value, attributes) for value, attributes in read()]
+
+    return meter.create_observable_gauge(name, callbacks=[callback], unit=unit, description=description)
@@ -0,0 +1,32 @@
+"""
+Normalización del body enviado por Power Automate
+"""
+
+import logging
+from typing import Any, Dict
+
+
+def extract_opportunity_data(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extrae los datos de la oportunidad del body de la petición.
+
+    Soporta ambos formatos:
+    1. Nuevo: { "body": {...}, "teams_id": "...", "channel_id": "..." }
+    2. Legacy: { "opportunityid": "...", ... } (todo flat)
+
+    Returns:
+        Datos de la oportunidad con teams_id y channel_id agregados para el orquestador
+    """
+    if "body" in payload and isinstance(payload["body"], dict):
+        # Nuevo formato estructurado
+        opportunity_data = payload["body"]
+        logging.info("📦 Payload estructurado detectado (body + teams_id + channel_id)")
+    else:
+        # Formato legacy (flat)
+        opportunity_data = payload
+        logging.info("📦 Payload flat detectado (legacy)")
+
+    # Agregar teams_id y channel_id al opportunity_data para el orquestador
+    opportunity_data["teams_id"] = payload.get("teams_id") or payload.get("teamsId")
+    opportunity_data["channel_id"] = payload.get("channel_id") or payload.get("channelId")
+    return opportunity_data
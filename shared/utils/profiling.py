@@ -0,0 +1,162 @@
+"""
+Profiling opcional por invocación (cProfile + tracemalloc)
+Se activa con el header X-Profile o con PROFILE_REQUESTS / PROFILE_OPPORTUNITY_IDS;
+sin activación no se crea ningún objeto ni se instala ningún hook
+"""
+
+import io
+import os
+import time
+import pstats
+import marshal
+import cProfile
+import logging
+import threading
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+PROFILE_HEADER = "X-Profile"
+
+# Un solo profiler activo por proceso: cProfile no admite perfiles anidados
+_active = threading.Lock()
+
+
+def header_requested(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes", "cpu")
+
+
+class ProfilingSettings:
+    """
+    Cuándo perfilar una invocación de process_opportunity.
+
+    Attributes:
+        mode: "false" (default), "header" (solo peticiones con X-Profile) o "true" (todas)
+        opportunity_ids: Oportunidades que se perfilan siempre (diagnóstico puntual)
+        directory: Directorio local de los artefactos cuando no hay Blob Storage
+        top: Funciones y líneas de asignación incluidas en los reportes
+    """
+
+    def __init__(self, mode: str = "false", opportunity_ids=(), directory: str = ".profiles", top: int = 25):
+        self.mode = mode
+        self.opportunity_ids = frozenset(opportunity_ids)
+        self.directory = directory
+        self.top = top
+
+    @classmethod
+    def from_env(cls) -> "ProfilingSettings":
+        ids = os.getenv("PROFILE_OPPORTUNITY_IDS", "")
+        return cls(
+            mode=os.getenv("PROFILE_REQUESTS", "false").strip().lower(),
+            opportunity_ids=[value.strip() for value in ids.split(",") if value.strip()],
+            directory=os.getenv("PROFILE_DIR", ".profiles"),
+            top=int(os.getenv("PROFILE_TOP_ENTRIES", "25")),
+        )
+
+    def should_profile(self, opportunity_id: Optional[str], requested: bool = False) -> bool:
+        if self.mode == "true" or (opportunity_id and opportunity_id in self.opportunity_ids):
+            return True
+        return requested and self.mode == "header"
+
+
+class RequestProfiler:
+    """
+    cProfile del hilo del event loop + tracemalloc del proceso durante una invocación.
+
+    cProfile mide todo lo que corre en el hilo mientras está activo, incluidas
+    otras peticiones concurrentes del mismo worker; el render del PDF en
+    asyncio.to_thread no aparece en el perfil de CPU pero sí en el de memoria.
+    """
+
+    def __init__(self, top: int = 25):
+        self.top = top
+        self._profile: Optional[cProfile.Profile] = None
+        self._owns_tracemalloc = False
+        self._started = 0.0
+
+    def start(self) -> bool:
+        """Activa el profiler; False si ya hay otro activo en el proceso"""
+        if not _active.acquire(blocking=False):
+            logging.warning("⚠️ Profiling omitido: ya hay una invocación perfilándose")
+            return False
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Detiene el profiler.
+
+        Returns:
+            {"summary": {...}, "artifacts": {nombre: bytes}}
+        """
+        self._profile.disable()
+        wall = time.perf_counter() - self._started
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        _active.release()
+
+        self._profile.create_stats()
+        cpu_report = io.StringIO()
+        pstats.Stats(self._profile, stream=cpu_report).sort_stats("cumulative").print_stats(self.top)
+
+        memory_report = [f"Pico: {peak / 1024:.1f} KiB | En uso al finalizar: {current / 1024:.1f} KiB", ""]
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            memory_report.append(str(stat))
+
+        return {
+            "summary": {
+                "wall_ms": round(wall * 1000, 1),
+                "peak_memory_bytes": peak,
+            },
+            "artifacts": {
+                # Mismo formato que cProfile.Profile.dump_stats (abrir con pstats o snakeviz)
+                "cpu.prof": marshal.dumps(self._profile.stats),
+                "cpu.txt": cpu_report.getvalue().encode("utf-8"),
+                "memory.txt": "\n".join(memory_report).encode("utf-8"),
+            },
+        }
+
+
+_CONTENT_TYPES = {".prof": "application/octet-stream", ".txt": "text/plain; charset=utf-8"}
+
+
+async def save_profile(
+    artifacts: Dict[str, bytes],
+    opportunity_id: str,
+    blob_service=None,
+    directory: str = ".profiles"
+) -> Dict[str, Any]:
+    """
+    Guarda los artefactos en Blob Storage (profiles/{opportunity_id}/{ts}/) o,
+    sin Blob o si la subida falla, en un directorio local.
+
+    Returns:
+        Ubicación de los artefactos para metadata.profile
+    """
+    prefix = f"profiles/{opportunity_id}/{datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')}"
+
+    if blob_service is not None:
+        uploaded = [
+            await blob_service.upload_bytes_async(data, f"{prefix}/{name}", _CONTENT_TYPES[os.path.splitext(name)[1]])
+            for name, data in artifacts.items()
+        ]
+        if all(uploaded):
+            return {"storage": "blob", "container": blob_service.container_name, "prefix": prefix,
+                    "files": sorted(artifacts)}
+        logging.warning("⚠️ No se pudieron subir los artefactos de profiling: se guardan en disco")
+
+    path = os.path.abspath(os.path.join(directory, prefix))
+    os.makedirs(path, exist_ok=True)
+    for name, data in artifacts.items():
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(data)
+    return {"storage": "disk", "path": path, "files": sorted(artifacts)}
@@ -0,0 +1,42 @@
+"""
+Limitador de tasa asíncrono (token bucket)
+"""
+
+import time
+import asyncio
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket para corrutinas del mismo event loop.
+
+    Args:
+        rate: Operaciones por segundo (0 o negativo = sin límite)
+        burst: Operaciones que pueden ejecutarse de inmediato tras un período inactivo
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: int = 1) -> "AsyncRateLimiter":
+        return cls(requests_per_minute / 60.0, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Espera hasta que haya un token disponible y lo consume"""
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,17 @@
+"""
+Serialización JSON de las respuestas de las funciones
+"""
+
+import json
+from datetime import date, datetime
+
+
+class DateTimeEncoder(json.JSONEncoder):
+    """JSON encoder que maneja datetime objects"""
+    def default(self, obj):
+        try:
+            if isinstance(obj, (datetime, date)):
+                return obj.isoformat()
+            return super().default(obj)
+        except Exception:
+            return str(obj)
@@ -0,0 +1,168 @@
+"""
+Medición de latencias por petición
+Los servicios registran sus llamadas externas en el colector de la petición en
+curso (contextvars), sin recibirlo como parámetro; las tareas del pipeline
+heredan el contexto al crearse. Cada llamada abre además un span de
+OpenTelemetry cuando el tracing está habilitado (ver utils/tracing)
+"""
+
+import json
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from .tracing import start_span
+
+
+class CallTiming:
+    """Una llamada a una dependencia externa (OpenAI, Search, Blob, Cosmos, PDF)"""
+
+    def __init__(self, dependency: str, operation: str, request_bytes: Optional[int] = None):
+        self.dependency = dependency
+        self.operation = operation
+        self.request_bytes = request_bytes
+        self.response_bytes: Optional[int] = None
+        self.retries = 0
+        self.status = "ok"
+        self.duration_ms = 0.0
+        # Datos propios de la dependencia (tokens, RU, cantidad de elementos...)
+        self.extra: Dict[str, Any] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "dependency": self.dependency,
+            "operation": self.operation,
+            "duration_ms": round(self.duration_ms, 1),
+            "status": self.status,
+            "retries": self.retries,
+        }
+        if self.request_bytes is not None:
+            data["request_bytes"] = self.request_bytes
+        if self.response_bytes is not None:
+            data["response_bytes"] = self.response_bytes
+        data.update(self.extra)
+        return data
+
+
+class RequestTimings:
+    """Colector de tiempos de una petición: pasos del pipeline y llamadas externas"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.calls: List[CallTiming] = []
+        # Datos de la petición que no son una llamada (p. ej. el plan de tokens del prompt)
+        self.metadata: Dict[str, Any] = {}
+
+    def record_step(self, name: str, duration_seconds: float, status: str):
+        self.steps[name] = {"duration_ms": round(duration_seconds * 1000, 1), "status": status}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "steps": self.steps,
+            "calls": [call.to_dict() for call in self.calls],
+        }
+
+    def log(self, opportunity_id: Optional[str] = None):
+        """
+        Una línea por paso y por llamada con prefijo `⏱️ timing` y campos JSON,
+        consultables en Application Insights (traces | where message startswith "⏱️ timing").
+        """
+        for name, step in self.steps.items():
+            _log_fields({"kind": "step", "name": name, "opportunity_id": opportunity_id, **step})
+        for call in self.calls:
+            _log_fields({"kind": "dependency", "opportunity_id": opportunity_id, **call.to_dict()})
+
+
+def _log_fields(fields: Dict[str, Any]):
+    logging.info(
+        f"⏱️ timing {json.dumps(fields, ensure_ascii=False, default=str)}",
+        extra={"custom_dimensions": fields}
+    )
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def collect_timings() -> Iterator[RequestTimings]:
+    """Activa un colector nuevo para la petición en curso y lo desactiva al salir"""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record_metadata(key: str, value: Any):
+    """Agrega un dato a la metadata de la petición en curso (sin colector se descarta)"""
+    timings = _current.get()
+    if timings is not None:
+        timings.metadata[key] = value
+
+
+@contextmanager
+def track_call(dependency: str, operation: str, request_bytes: Optional[int] = None) -> Iterator[CallTiming]:
+    """
+    Mide una llamada externa con reloj monotónico y la agrega al colector de la
+    petición en curso (si no hay colector la medición se descarta).
+    """
+    call = CallTiming(dependency, operation, request_bytes)
+    with start_span(f"{dependency} {operation}", "client", {"peer.service": dependency}) as span:
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            # Se conserva un estado más específico ya asignado (p. ej. circuit_open)
+            if call.status == "ok":
+                call.status = "error"
+            raise
+        finally:
+            call.duration_ms = (time.perf_counter() - start) * 1000
+            timings = _current.get()
+            if timings is not None:
+                timings.calls.append(call)
+            span.set_attributes(_span_attributes(call))
+            if call.status != "ok":
+                span.mark_error()
+
+
+# Atributos de span con convención semántica de OpenTelemetry; el resto va con prefijo "app."
+_SEMANTIC_ATTRIBUTES = {
+    "prompt_tokens": "gen_ai.usage.input_tokens",
+    "completion_tokens": "gen_ai.usage.output_tokens",
+    "request_charge": "db.cosmosdb.request_charge",
+}
+
+
+def _span_attributes(call: CallTiming) -> Dict[str, Any]:
+    attributes = {
+        "app.request_bytes": call.request_bytes,
+        "app.response_bytes": call.response_bytes,
+        "app.retries": call.retries,
+    }
+    for key, value in call.extra.items():
+        attributes[_SEMANTIC_ATTRIBUTES.get(key, f"app.{key}")] = value
+    return attributes
+
+
+def count_attempts(call: CallTiming):
+    """
+    `raw_response_hook` de azure-core: se invoca en cada intento HTTP, por lo que
+    los reintentos de la política del SDK son intentos - 1.
+    """
+    attempts = {"count": 0}
+
+    def hook(response):
+        attempts["count"] += 1
+        call.retries = max(0, attempts["count"] - 1)
+
+    return hook
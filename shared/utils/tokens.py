@@ -0,0 +1,228 @@
+"""
+Conteo de tokens y presupuesto del prompt
+Usa tiktoken si está instalado; si no, una estimación conservadora por
+caracteres. Los conteos se cachean por texto, de modo que las secciones que
+se repiten entre peticiones (instrucciones, esquema, catálogo de equipos) se
+tokenizan una sola vez por proceso
+"""
+
+import re
+import math
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+
+# Encoding de la familia gpt-4o (se usa también para deployments con nombre propio)
+DEFAULT_ENCODING = "o200k_base"
+
+# Estimación sin tiktoken: el español ronda 4 caracteres por token; 3.5 sobreestima a propósito
+_CHARS_PER_TOKEN = 3.5
+
+# Tokens de formato de los mensajes de chat (rol, separadores) más margen de redondeo
+_MESSAGE_OVERHEAD_TOKENS = 32
+
+# Marca agregada al final de una sección truncada
+TRUNCATION_MARKER = "\n[… contenido truncado por longitud …]"
+
+# Fronteras de corte, de la más gruesa a la más fina: sección markdown, párrafo, línea, oración, palabra
+_BOUNDARIES = (r"\n(?=#{1,6} )", r"\n\s*\n", r"\n", r"(?<=[.!?;:])\s+", r"\s+")
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    """Encoding de tiktoken para el modelo, o None si tiktoken no está instalado"""
+    try:
+        import tiktoken
+    except ImportError:
+        logging.info("ℹ️ tiktoken no instalado: los tokens se estiman por caracteres")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def tokenizer_name(model: str) -> str:
+    encoding = _encoding(model)
+    return f"tiktoken:{encoding.name}" if encoding is not None else "estimate"
+
+
+def _count(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=256)
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Tokens de `text` (cacheado por texto y modelo)"""
+    return _count(text, model)
+
+
+def _split(text: str, boundary: str) -> List[str]:
+    """Divide en fragmentos que conservan su separador final (unirlos reproduce el texto)"""
+    parts = re.split(f"({boundary})", text)
+    return [parts[i] + (parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+
+
+def _fit(text: str, max_tokens: int, model: str, level: int = 0) -> str:
+    """Prefijo de `text` de hasta `max_tokens`, cortado en la frontera más gruesa que lo aprovecha"""
+    if level >= len(_BOUNDARIES) or max_tokens <= 0:
+        return ""
+    kept: List[str] = []
+    used = 0
+    for piece in _split(text, _BOUNDARIES[level]):
+        tokens = _count(piece, model)
+        if used + tokens > max_tokens:
+            # El fragmento que no entra se recorta en una frontera más fina solo si
+            # cortar aquí desperdiciaría más de la mitad del presupuesto
+            if max_tokens - used > max_tokens // 2:
+                kept.append(_fit(piece, max_tokens - used, model, level + 1))
+            break
+        kept.append(piece)
+        used += tokens
+    return "".join(kept)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """
+    Recorta `text` a `max_tokens` sin cortar palabras: prioriza secciones y
+    párrafos completos, luego líneas, oraciones y palabras. Agrega TRUNCATION_MARKER
+    si hubo recorte.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(TRUNCATION_MARKER, model)
+    return _fit(text, budget, model).rstrip() + TRUNCATION_MARKER
+
+
+def split_into_chunks(text: str, max_tokens: int, model: str = "gpt-4o-mini", level: int = 0) -> List[str]:
+    """
+    Divide `text` en fragmentos de hasta `max_tokens` sin perder contenido.
+
+    Agrupa secciones y párrafos completos mientras entren; solo un fragmento
+    que por sí solo supera `max_tokens` se divide en una frontera más fina.
+    """
+    if level >= len(_BOUNDARIES) or _count(text, model) <= max_tokens:
+        return [text.strip()] if text.strip() else []
+
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+
+    def flush():
+        nonlocal used
+        if "".join(current).strip():
+            chunks.append("".join(current).strip())
+        current.clear()
+        used = 0
+
+    for piece in _split(text, _BOUNDARIES[level]):
+        tokens = _count(piece, model)
+        if tokens > max_tokens:
+            flush()
+            chunks.extend(split_into_chunks(piece, max_tokens, model, level + 1))
+            continue
+        if used + tokens > max_tokens:
+            flush()
+        current.append(piece)
+        used += tokens
+    flush()
+    return chunks
+
+
+@dataclass
+class PromptSection:
+    """
+    Sección del prompt.
+
+    Attributes:
+        name: Nombre de la sección (clave en el plan)
+        text: Contenido completo
+        priority: Orden de asignación del presupuesto restante (menor = primero)
+        min_tokens: Tokens reservados para la sección antes de repartir por prioridad
+        truncatable: Las secciones no truncables se incluyen siempre completas
+    """
+    name: str
+    text: str
+    priority: int = 0
+    min_tokens: int = 0
+    truncatable: bool = True
+
+
+@dataclass
+class PromptPlan:
+    """Reparto del presupuesto: tokens por sección, textos finales y max_tokens de la respuesta"""
+    budget_tokens: int
+    prompt_tokens: int
+    max_tokens: int
+    tokenizer: str
+    sections: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    texts: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def truncated(self) -> List[str]:
+        return [name for name, section in self.sections.items() if section["truncated"]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "max_tokens": self.max_tokens,
+            "tokenizer": self.tokenizer,
+            "sections": self.sections,
+        }
+
+
+def plan_prompt(
+    sections: List[PromptSection],
+    budget_tokens: int,
+    context_window: int,
+    max_output_tokens: int,
+    min_output_tokens: int = 0,
+    model: str = "gpt-4o-mini"
+) -> PromptPlan:
+    """
+    Reparte el presupuesto de entrada entre las secciones y elige max_tokens.
+
+    1. Las secciones no truncables se incluyen completas.
+    2. Cada sección truncable recibe su `min_tokens` (si los necesita).
+    3. El resto se asigna por `priority`; la que no entra se recorta en
+       fronteras de párrafo (ver truncate_to_tokens).
+    4. max_tokens es lo que queda de la ventana de contexto, hasta `max_output_tokens`.
+
+    El presupuesto de entrada nunca invade `min_output_tokens` de la ventana.
+    """
+    budget = min(budget_tokens, context_window - min_output_tokens)
+    counts = {section.name: count_tokens(section.text, model) for section in sections}
+    truncatable = [section for section in sections if section.truncatable]
+
+    available = budget - _MESSAGE_OVERHEAD_TOKENS - sum(counts[s.name] for s in sections if not s.truncatable)
+    allocation = {s.name: min(counts[s.name], s.min_tokens) for s in truncatable}
+    available -= sum(allocation.values())
+    for section in sorted(truncatable, key=lambda s: s.priority):
+        extra = max(0, min(counts[section.name] - allocation[section.name], available))
+        allocation[section.name] += extra
+        available -= extra
+
+    plan = PromptPlan(budget_tokens=budget, prompt_tokens=0, max_tokens=0, tokenizer=tokenizer_name(model))
+    for section in sections:
+        text = section.text
+        limit: Optional[int] = allocation.get(section.name)
+        if limit is not None and limit < counts[section.name]:
+            text = truncate_to_tokens(text, limit, model)
+        tokens = count_tokens(text, model)
+        plan.texts[section.name] = text
+        plan.sections[section.name] = {
+            "tokens": tokens,
+            "original_tokens": counts[section.name],
+            "truncated": text is not section.text,
+        }
+        plan.prompt_tokens += tokens
+
+    plan.prompt_tokens += _MESSAGE_OVERHEAD_TOKENS
+    plan.max_tokens = max(min_output_tokens, min(max_output_tokens, context_window - plan.prompt_tokens))
+    return plan
@@ -0,0 +1,226 @@
+"""
+Trazas distribuidas con OpenTelemetry (opcional)
+Si TRACING_EXPORTER no está configurado o el paquete opentelemetry-sdk no está
+instalado, los spans son objetos nulos sin costo
+"""
+
+import os
+import logging
+import functools
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+
+DEFAULT_SERVICE_NAME = "opportunity-analyzer"
+
+
+class _NoopSpan:
+    """Span nulo: mismas operaciones que un span de OpenTelemetry, sin efecto"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Mapping[str, Any]):
+        pass
+
+    def mark_error(self, description: Optional[str] = None):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Envoltorio mínimo sobre un span de OpenTelemetry"""
+
+    def __init__(self, span):
+        self._span = span
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self._span.set_attribute(key, value)
+
+    def set_attributes(self, attributes: Mapping[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def mark_error(self, description: Optional[str] = None):
+        from opentelemetry.trace import Status, StatusCode
+        self._span.set_status(Status(StatusCode.ERROR, description))
+
+
+class _TracingState:
+    configured = False
+    tracer = None
+    provider = None
+    # Archivo del exportador "file": se cierra al reconfigurar o al apagar el tracing
+    output = None
+
+
+_state = _TracingState()
+
+
+def _build_exporter(kind: str):
+    """Exportador según TRACING_EXPORTER; retorna (exportador, procesa en lote)"""
+    if kind == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter(), False
+
+    if kind == "file":
+        # Un span JSON por línea, para inspeccionar trazas sin conexión
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        path = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+        _state.output = open(path, "a", encoding="utf-8")
+        return ConsoleSpanExporter(
+            out=_state.output,
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        ), False
+
+    if kind == "otlp":
+        # Endpoint y cabeceras desde OTEL_EXPORTER_OTLP_* (variables estándar)
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(), True
+
+    if kind == "azure_monitor":
+        from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+        return AzureMonitorTraceExporter.from_connection_string(
+            os.environ["APPLICATIONINSIGHTS_CONNECTION_STRING"]
+        ), True
+
+    raise ValueError(f"TRACING_EXPORTER no soportado: {kind}")
+
+
+def configure_tracing(force: bool = False):
+    """
+    Inicializa el tracer una vez por proceso según TRACING_EXPORTER
+    (none | console | file | otlp | azure_monitor).
+
+    Returns:
+        El tracer de OpenTelemetry, o None si el tracing está deshabilitado
+    """
+    if _state.configured and not force:
+        return _state.tracer
+
+    shutdown_tracing()
+    _state.configured = True
+
+    kind = os.getenv("TRACING_EXPORTER", "none").strip().lower()
+    if kind in ("", "none"):
+        return None
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+
+        exporter, batched = _build_exporter(kind)
+        provider = TracerProvider(resource=Resource.create({
+            "service.name": os.getenv("OTEL_SERVICE_NAME", DEFAULT_SERVICE_NAME),
+        }))
+        provider.add_span_processor(BatchSpanProcessor(exporter) if batched else SimpleSpanProcessor(exporter))
+    except ImportError as e:
+        logging.warning(f"⚠️ Tracing '{kind}' no disponible (instalar opentelemetry-sdk): {str(e)}")
+        _close_output()
+        return None
+    except Exception as e:
+        logging.warning(f"⚠️ No se pudo configurar el tracing '{kind}': {str(e)}")
+        _close_output()
+        return None
+
+    _state.provider = provider
+    _state.tracer = provider.get_tracer("shared")
+    logging.info(f"✅ Tracing OpenTelemetry habilitado ({kind})")
+    return _state.tracer
+
+
+def shutdown_tracing():
+    """
+    Exporta los spans pendientes, cierra el exportador (y su archivo, si lo
+    hay) y deja el tracing sin configurar: el próximo span lo reconfigura.
+    """
+    if _state.provider is not None:
+        _state.provider.shutdown()
+    _close_output()
+    _state.configured = False
+    _state.tracer = _state.provider = None
+
+
+def _close_output():
+    if _state.output is not None:
+        _state.output.close()
+        _state.output = None
+
+
+def extract_context(headers: Optional[Mapping[str, str]]):
+    """Contexto W3C (traceparent/tracestate) de las cabeceras de la petición entrante"""
+    if not headers or configure_tracing() is None:
+        return None
+    from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+    carrier = {key.lower(): value for key, value in headers.items()}
+    return TraceContextTextMapPropagator().extract(carrier)
+
+
+def inject_context() -> Dict[str, str]:
+    """Cabeceras W3C del span activo, para continuar la traza en otra invocación (p. ej. un job)"""
+    carrier: Dict[str, str] = {}
+    if configure_tracing() is not None:
+        from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+        TraceContextTextMapPropagator().inject(carrier)
+    return carrier
+
+
+@contextmanager
+def start_span(
+    name: str,
+    kind: str = "internal",
+    attributes: Optional[Dict[str, Any]] = None,
+    parent=None
+) -> Iterator[Any]:
+    """
+    Abre un span hijo del span activo (o de `parent`, un contexto de extract_context).
+
+    Args:
+        kind: internal | server | client | consumer
+    """
+    tracer = configure_tracing()
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    from opentelemetry.trace import SpanKind
+    span_kind = {
+        "server": SpanKind.SERVER,
+        "client": SpanKind.CLIENT,
+        "consumer": SpanKind.CONSUMER,
+    }.get(kind, SpanKind.INTERNAL)
+    clean = {key: value for key, value in (attributes or {}).items() if value is not None}
+    with tracer.start_as_current_span(name, context=parent, kind=span_kind, attributes=clean) as span:
+        yield _Span(span)
+
+
+def traced_http(route: str):
+    """
+    Decorador para el `main` de un HTTP trigger: abre el span SERVER continuando
+    la traza W3C de la petición y registra el código de respuesta.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(req, *args, **kwargs):
+            # Sin la query string: con authLevel function lleva la clave de la función (?code=...)
+            url = urlsplit(req.url)
+            attributes = {
+                "http.request.method": req.method,
+                "http.route": route,
+                "url.scheme": url.scheme,
+                "server.address": url.hostname,
+                "url.path": url.path,
+            }
+            with start_span(f"{req.method} {route}", "server", attributes, extract_context(req.headers)) as span:
+                response = await handler(req, *args, **kwargs)
+                span.set_attribute("http.response.status_code", response.status_code)
+                if response.status_code >= 500:
+                    span.mark_error()
+                return response
+        return wrapper
+    return decorator
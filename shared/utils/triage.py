@@ -0,0 +1,100 @@
+"""
+Triage local de torres para el análisis en dos etapas
+Puntúa cada torre por la coincidencia entre el texto de la oportunidad y las
+habilidades, nombre y descripción de sus equipos, sin llamar al modelo; el
+análisis recibe solo los equipos de las torres candidatas
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+
+# Palabras frecuentes que no distinguen una torre de otra
+_STOPWORDS = {
+    "para", "con", "los", "las", "del", "que", "una", "uno", "por", "como", "sus", "este", "esta",
+    "estos", "estas", "entre", "sobre", "desde", "hasta", "donde", "cuando", "tambien", "todo",
+    "todos", "cada", "debe", "deben", "ser", "son", "mas", "sin", "the", "and", "for", "with",
+    "equipo", "equipos", "torre", "proyecto", "cliente", "solucion", "soluciones", "servicio", "servicios",
+}
+
+# Peso de una habilidad mencionada literalmente frente a una palabra suelta en común
+_SKILL_WEIGHT = 3.0
+
+_WORD = re.compile(r"[\w#+]+(?:\.[\w#+]+)*")
+
+
+def _normalize(text: str) -> str:
+    """Minúsculas y sin tildes (migración == migracion)"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _terms(text: str) -> Set[str]:
+    return {w for w in _WORD.findall(_normalize(text)) if len(w) >= 3 and w not in _STOPWORDS}
+
+
+def _team_tower(team: Dict[str, Any]) -> str:
+    return team.get("tower") or "N/A"
+
+
+def score_team(normalized_text: str, text_terms: Set[str], team: Dict[str, Any]) -> float:
+    """Habilidades mencionadas en la oportunidad (peso 3) + palabras en común con nombre y descripción"""
+    score = 0.0
+    for skill in team.get("skills") or []:
+        phrase = _normalize(str(skill)).strip()
+        if phrase and re.search(rf"(?<![\w]){re.escape(phrase)}(?![\w])", normalized_text):
+            score += _SKILL_WEIGHT
+    name = team.get("team_name") or team.get("name") or ""
+    words = _terms(" ".join(str(part) for part in (name, _team_tower(team), team.get("description") or "")))
+    return score + len(words & text_terms)
+
+
+def score_towers(opportunity_text: str, teams: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Puntaje de cada torre: el de su mejor equipo (una torre grande no gana por tamaño)"""
+    normalized = _normalize(opportunity_text)
+    text_terms = _terms(opportunity_text)
+    scores: Dict[str, float] = {}
+    for team in teams:
+        tower = _team_tower(team)
+        scores[tower] = max(scores.get(tower, 0.0), score_team(normalized, text_terms, team))
+    return scores
+
+
+def triage_teams(
+    opportunity_text: str,
+    teams: List[Dict[str, Any]],
+    max_teams: int,
+    mandatory_towers: Iterable[str] = ()
+) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Elige las torres candidatas y retorna sus equipos (en el orden del catálogo).
+
+    Se toman torres de mayor a menor puntaje mientras el total de equipos no
+    supere `max_teams` (la primera siempre entra), más las torres obligatorias.
+    Si el catálogo ya entra o ninguna torre coincide, se retorna completo.
+
+    Returns:
+        (equipos seleccionados, puntaje de las torres seleccionadas)
+    """
+    scores = score_towers(opportunity_text, teams)
+    if len(teams) <= max_teams or not any(score > 0 for score in scores.values()):
+        return teams, scores
+
+    sizes: Dict[str, int] = {}
+    for team in teams:
+        sizes[_team_tower(team)] = sizes.get(_team_tower(team), 0) + 1
+
+    selected: List[str] = []
+    total = 0
+    for tower, score in sorted(scores.items(), key=lambda item: -item[1]):
+        if score <= 0 or (selected and total + sizes[tower] > max_teams):
+            continue
+        selected.append(tower)
+        total += sizes[tower]
+
+    mandatory = {_normalize(tower) for tower in mandatory_towers}
+    selected += [tower for tower in scores if _normalize(tower) in mandatory and tower not in selected]
+
+    chosen = set(selected)
+    return [team for team in teams if _team_tower(team) in chosen], {tower: scores[tower] for tower in selected}
@@ -0,0 +1 @@
+# Benchmarks de punta a punta con servicios locales
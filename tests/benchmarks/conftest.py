@@ -0,0 +1,42 @@
+"""
+Fixtures de los benchmarks: orquestador con servicios locales inyectado en el
+registro, de modo que AnalyzeOpportunity.main corre de punta a punta sin red.
+"""
+
+import pytest
+from shared.core import registry
+from shared.core.orchestrator import OpportunityOrchestrator
+from shared.core.registry import SETTINGS_KEYS
+
+from .fakes import FileBlobStorageService, InMemoryCosmosDBService, InMemorySearchService, RecordedOpenAIService
+from .harness import BenchSettings
+
+# Configuración que altera el flujo medido (caché, agrupación, modo asíncrono, profiling, trazas, admisión, circuitos)
+_FLOW_KEYS = (
+    "ANALYSIS_CACHE_BACKEND", "IDEMPOTENCY_BACKEND", "COALESCE_WINDOW_SECONDS", "ANALYZE_ASYNC_MODE",
+    "PROFILE_REQUESTS", "PROFILE_OPPORTUNITY_IDS", "TRACING_EXPORTER", "CHANGE_DETECTION_ENABLED",
+    "ADMISSION_MAX_IN_FLIGHT", "METRICS_EXPORTER", "CIRCUIT_BREAKER_ENABLED",
+)
+
+
+@pytest.fixture(scope="session")
+def bench_settings() -> BenchSettings:
+    return BenchSettings.from_env()
+
+
+@pytest.fixture
+def stand_ins(monkeypatch, tmp_path, bench_settings):
+    """Orquestador con OpenAI grabado, índice en memoria, Blob en disco y Cosmos en memoria."""
+    for key in SETTINGS_KEYS + _FLOW_KEYS:
+        monkeypatch.delenv(key, raising=False)
+
+    orchestrator = OpportunityOrchestrator()
+    orchestrator.openai_service = RecordedOpenAIService(bench_settings.llm_latency)
+    orchestrator.search_service = InMemorySearchService(bench_settings.io_latency)
+    orchestrator.blob_service = FileBlobStorageService(str(tmp_path / "blob"), bench_settings.io_latency)
+    orchestrator.cosmos_service = InMemoryCosmosDBService(bench_settings.io_latency)
+    orchestrator.openai_enabled = orchestrator.search_enabled = True
+    orchestrator.blob_enabled = orchestrator.cosmos_enabled = True
+
+    monkeypatch.setattr(registry, "get_orchestrator", lambda: orchestrator)
+    return orchestrator
@@ -0,0 +1,206 @@
+"""
+Servicios locales para los benchmarks de punta a punta.
+
+OpenAI y Search reemplazan solo el cliente del SDK, de modo que se ejecuta el
+código real de OpenAIService/SearchService (prompt, parseo, mapeo, métricas).
+Blob y Cosmos reemplazan el servicio completo. Todos aceptan una latencia
+inyectada por llamada.
+"""
+
+import os
+import json
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion
+
+from shared.services.openai_service import OpenAIService
+from shared.services.search_service import SearchService
+from shared.utils.timing import track_call
+
+ROOT = Path(__file__).resolve().parents[2]
+TEAMS_FILE = ROOT / "data" / "torres_data_prod.json"
+RECORDING_FILE = Path(__file__).parent / "recordings" / "openai_analysis.json"
+
+
+# ============================================================
+# OpenAI: respuesta grabada
+# ============================================================
+
+class _RawResponse:
+    """Equivalente a la respuesta de `with_raw_response`: cuerpo, parse() y reintentos"""
+
+    def __init__(self, body: bytes):
+        self.content = body
+        self.retries_taken = 0
+
+    def parse(self) -> ChatCompletion:
+        return ChatCompletion.model_validate_json(self.content)
+
+
+class RecordedOpenAIClient:
+    """AsyncAzureOpenAI que responde siempre la misma completion grabada"""
+
+    def __init__(self, recording: Path, latency: float):
+        self.body = recording.read_bytes()
+        self.latency = latency
+        self.requests: List[Dict[str, Any]] = []
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self._create))
+        )
+
+    async def _create(self, **kwargs) -> _RawResponse:
+        self.requests.append(kwargs)
+        await asyncio.sleep(self.latency)
+        return _RawResponse(self.body)
+
+
+class RecordedOpenAIService(OpenAIService):
+    def __init__(self, latency: float = 0.0, recording: Path = RECORDING_FILE):
+        self.endpoint = "https://openai.local"
+        self.key = "benchmark"
+        self.deployment = "gpt-4o-mini"
+        self.api_version = "2024-10-21"
+        self.client = None
+        self._async_client = RecordedOpenAIClient(recording, latency)
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# Search: índice en memoria
+# ============================================================
+
+class _SearchResults:
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class InMemorySearchClient:
+    """SearchClient (aio) sobre los documentos de data/torres_data_prod.json"""
+
+    def __init__(self, documents: List[Dict[str, Any]], latency: float):
+        self.documents = documents
+        self.latency = latency
+        self.queries = 0
+
+    async def search(self, search_text: str = "*", select: Optional[List[str]] = None, top: int = 50, **kwargs):
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        terms = [] if search_text in ("", "*") else search_text.lower().split()
+        hits = [
+            {**doc, "@search.score": 1.0}
+            for doc in self.documents
+            if not terms or any(term in json.dumps(doc, ensure_ascii=False).lower() for term in terms)
+        ]
+        return _SearchResults(hits[:top])
+
+
+class InMemorySearchService(SearchService):
+    def __init__(self, latency: float = 0.0, teams_file: Path = TEAMS_FILE):
+        self.endpoint = "https://search.local"
+        self.key = "benchmark"
+        self.index_name = "teams-index"
+        self.client = None
+        with open(teams_file, encoding="utf-8") as f:
+            self._async_client = InMemorySearchClient(json.load(f), latency)
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# Blob Storage: sistema de archivos
+# ============================================================
+
+class FileBlobStorageService:
+    """BlobStorageService sobre un directorio local"""
+
+    container_name = "benchmark"
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        self.directory = directory
+        self.latency = latency
+
+    def _write(self, blob_name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, blob_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    async def upload_pdf_async(self, pdf_bytes: bytes, blob_name: str) -> Optional[str]:
+        with track_call("blob", "upload_pdf", len(pdf_bytes)):
+            await asyncio.sleep(self.latency)
+            return Path(self._write(blob_name, pdf_bytes)).as_uri()
+
+    async def upload_bytes_async(self, data: bytes, blob_name: str, content_type: str) -> bool:
+        await asyncio.sleep(self.latency)
+        self._write(blob_name, data)
+        return True
+
+    async def upload_json_async(self, data: Dict[str, Any], blob_name: str) -> bool:
+        return await self.upload_bytes_async(
+            json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"), blob_name, "application/json"
+        )
+
+    async def download_json_async(self, blob_name: str) -> Optional[Dict[str, Any]]:
+        await asyncio.sleep(self.latency)
+        path = os.path.join(self.directory, blob_name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# Cosmos DB: en memoria
+# ============================================================
+
+class InMemoryCosmosDBService:
+    """CosmosDBService con los registros en una lista"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.records: List[Dict[str, Any]] = []
+
+    async def save_analysis_async(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        body = json.dumps(record, ensure_ascii=False, default=str).encode("utf-8")
+        with track_call("cosmos", "save_analysis", len(body)) as call:
+            await asyncio.sleep(self.latency)
+            self.records.append(json.loads(body))
+            call.extra["request_charge"] = round(len(body) / 1024 * 5.5, 2)
+            return record
+
+    async def set_pdf_url_async(self, record_id: str, opportunity_id: str, pdf_url: str) -> bool:
+        with track_call("cosmos", "set_pdf_url"):
+            await asyncio.sleep(self.latency)
+            for record in self.records:
+                if record.get("id") == record_id:
+                    record["pdf_url"] = pdf_url
+                    return True
+            return False
+
+    async def get_latest_analysis_async(self, opportunity_id: str) -> Optional[Dict[str, Any]]:
+        with track_call("cosmos", "get_latest_analysis"):
+            await asyncio.sleep(self.latency)
+            matches = [r for r in self.records if r.get("opportunity_id") == opportunity_id]
+            return max(matches, key=lambda r: r.get("processed_at", "")) if matches else None
+
+    def close(self):
+        pass
@@ -0,0 +1,170 @@
+"""
+Ejecución y medición de los escenarios de benchmark.
+
+Cada escenario envía N peticiones a AnalyzeOpportunity.main con una
+concurrencia fija y resume el throughput, la latencia de punta a punta y los
+percentiles por paso (tomados de metadata.timings).
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+
+import azure.functions as func
+
+
+@dataclass
+class BenchSettings:
+    """Parámetros del benchmark (variables BENCH_*)"""
+    requests: int = 24
+    concurrency: int = 8
+    llm_latency: float = 0.05
+    io_latency: float = 0.01
+    tolerance: float = 2.0
+
+    @classmethod
+    def from_env(cls) -> "BenchSettings":
+        return cls(
+            requests=int(os.getenv("BENCH_REQUESTS", cls.requests)),
+            concurrency=int(os.getenv("BENCH_CONCURRENCY", cls.concurrency)),
+            llm_latency=float(os.getenv("BENCH_LLM_LATENCY", cls.llm_latency)),
+            io_latency=float(os.getenv("BENCH_IO_LATENCY", cls.io_latency)),
+            tolerance=float(os.getenv("BENCH_TOLERANCE", cls.tolerance)),
+        )
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """Parámetros que deben coincidir con los del baseline para compararlos"""
+        data = asdict(self)
+        data.pop("tolerance")
+        return data
+
+
+# Tamaño de los textos sintéticos por escenario (caracteres aproximados)
+PAYLOAD_SIZES = {"small": 600, "medium": 8_000, "large": 60_000}
+
+_PARAGRAPH = (
+    "<p>El cliente requiere una <b>plataforma de datos</b> con modelos de IA generativa sobre Azure, "
+    "integrada con su ERP SAP y con un portal de autoservicio para las áreas de negocio.</p>"
+    "<ul><li>Ingesta diaria</li><li>Asistente conversacional</li><li>Control de acceso por rol</li></ul>"
+)
+
+
+def synthetic_payload(index: int, size: str) -> Dict[str, Any]:
+    """Oportunidad única (sin aciertos de caché ni de idempotencia) con texto HTML del tamaño pedido"""
+    chars = PAYLOAD_SIZES[size]
+    html = (_PARAGRAPH * (chars // len(_PARAGRAPH) + 1))[:chars]
+    return {
+        "opportunityid": f"bench-{size}-{index:05d}",
+        "name": f"Plataforma de datos e IA {index}",
+        "description": f"Oportunidad {index}. " + html[: chars // 3],
+        "cr807_descripciondelrequerimientofuncional": html,
+        "cr807_descripciondelrequerimientotecnico": html[: chars // 2],
+        "customername": "Cliente Benchmark S.A.",
+        "estimatedvalue": 250000 + index,
+        "SdkMessage": "Create",
+        "modifiedon": f"2026-03-01T10:00:{index % 60:02d}Z",
+    }
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil por rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(p / 100 * len(ordered))) - 1]
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    return {f"p{p}": round(percentile(values, p), 1) for p in (50, 95, 99)}
+
+
+async def run_scenario(main, size: str, settings: BenchSettings) -> Dict[str, Any]:
+    """Envía `settings.requests` peticiones con `settings.concurrency` en vuelo"""
+    semaphore = asyncio.Semaphore(settings.concurrency)
+    latencies: List[float] = []
+    steps: Dict[str, List[float]] = {}
+    dependencies: Dict[str, List[float]] = {}
+    failures: List[str] = []
+
+    async def send(index: int):
+        request = func.HttpRequest(
+            method="POST",
+            url="http://localhost/api/analyze",
+            headers={"Content-Type": "application/json"},
+            body=json.dumps(synthetic_payload(index, size), ensure_ascii=False).encode("utf-8"),
+        )
+        async with semaphore:
+            start = time.perf_counter()
+            response = await main(request)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        body = json.loads(response.get_body())
+        if response.status_code != 200 or not body.get("success"):
+            failures.append(f"{response.status_code}: {body.get('error')}")
+            return
+        timings = body["metadata"]["timings"]
+        for name, step in timings["steps"].items():
+            steps.setdefault(name, []).append(step["duration_ms"])
+        for call in timings["calls"]:
+            dependencies.setdefault(call["dependency"], []).append(call["duration_ms"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(settings.requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": settings.requests,
+        "failures": failures,
+        "throughput_rps": round(settings.requests / elapsed, 2),
+        "latency_ms": _distribution(latencies),
+        "steps_ms": {name: _distribution(values) for name, values in sorted(steps.items())},
+        "dependencies_ms": {name: _distribution(values) for name, values in sorted(dependencies.items())},
+    }
+
+
+# Margen absoluto para pasos muy rápidos, donde la variación relativa es ruido
+_STEP_FLOOR_MS = 25.0
+
+
+def find_regressions(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Compara los resultados con el baseline y describe cada regresión encontrada"""
+    regressions = []
+    for size, current in results.items():
+        expected = baseline.get(size)
+        if not expected:
+            continue
+        if current["throughput_rps"] < expected["throughput_rps"] / tolerance:
+            regressions.append(
+                f"{size}: throughput {current['throughput_rps']} < {expected['throughput_rps']} / {tolerance}"
+            )
+        if current["latency_ms"]["p95"] > expected["latency_ms"]["p95"] * tolerance:
+            regressions.append(
+                f"{size}: latencia p95 {current['latency_ms']['p95']}ms > "
+                f"{expected['latency_ms']['p95']}ms x {tolerance}"
+            )
+        for step, dist in current["steps_ms"].items():
+            reference = expected["steps_ms"].get(step, {}).get("p95")
+            if reference is None:
+                continue
+            limit = max(reference * tolerance, reference + _STEP_FLOOR_MS)
+            if dist["p95"] > limit:
+                regressions.append(f"{size}: paso {step} p95 {dist['p95']}ms > {limit:.1f}ms")
+    return regressions
+
+
+def format_report(results: Dict[str, Any]) -> str:
+    lines = []
+    for size, result in results.items():
+        latency = result["latency_ms"]
+        lines.append(
+            f"[{size}] {result['throughput_rps']} req/s | latencia p50 {latency['p50']}ms "
+            f"p95 {latency['p95']}ms p99 {latency['p99']}ms"
+        )
+        for group in ("steps_ms", "dependencies_ms"):
+            for name, dist in result[group].items():
+                lines.append(f"    {name:<16} p50 {dist['p50']:>8}  p95 {dist['p95']:>8}  p99 {dist['p99']:>8}")
+    return "\n".join(lines)
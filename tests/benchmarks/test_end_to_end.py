@@ -0,0 +1,72 @@
+"""
+Benchmark de punta a punta de AnalyzeOpportunity.main con servicios locales.
+
+Ejecutar con:
+    BENCH_ENABLED=1 .venv\\Scripts\\python.exe -m pytest tests/benchmarks -v -s
+
+Variables:
+    BENCH_ENABLED          1 para ejecutarlo (se omite por defecto: compara tiempos de
+                           reloj contra un baseline grabado en otra máquina)
+    BENCH_REQUESTS, BENCH_CONCURRENCY, BENCH_LLM_LATENCY, BENCH_IO_LATENCY
+        Carga y latencias inyectadas (deben coincidir con las del baseline)
+    BENCH_TOLERANCE        Factor de regresión admitido (default 2.0)
+    BENCH_UPDATE_BASELINE  1 para reescribir baseline.json con los resultados
+    BENCH_REPORT_PATH      Archivo JSON donde guardar los resultados
+"""
+
+import os
+import json
+import asyncio
+from pathlib import Path
+
+import pytest
+from AnalyzeOpportunity import main
+
+from .harness import PAYLOAD_SIZES, find_regressions, format_report, run_scenario
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+
+pytestmark = pytest.mark.skipif(
+    os.getenv("BENCH_ENABLED") != "1" and os.getenv("BENCH_UPDATE_BASELINE") != "1",
+    reason="benchmark opcional: definir BENCH_ENABLED=1",
+)
+
+
+def _load_baseline():
+    if not BASELINE_FILE.exists():
+        return {"settings": None, "scenarios": {}}
+    return json.loads(BASELINE_FILE.read_text(encoding="utf-8"))
+
+
+def _save_json(path, data):
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+@pytest.mark.parametrize("size", list(PAYLOAD_SIZES))
+def test_throughput_y_latencia_por_paso(size, stand_ins, bench_settings):
+    """Sin errores y sin regresiones de throughput ni de p95 (total y por paso) respecto del baseline."""
+    result = asyncio.run(run_scenario(main, size, bench_settings))
+    print("\n" + format_report({size: result}))
+
+    assert not result["failures"], result["failures"][:3]
+    assert stand_ins.openai_service.async_client.requests, "la llamada al modelo no pasó por OpenAIService"
+
+    report_path = os.getenv("BENCH_REPORT_PATH")
+    if report_path:
+        report = json.loads(Path(report_path).read_text(encoding="utf-8")) if Path(report_path).exists() else {}
+        report[size] = result
+        _save_json(report_path, report)
+
+    baseline = _load_baseline()
+    if os.getenv("BENCH_UPDATE_BASELINE") == "1":
+        if baseline["settings"] != bench_settings.fingerprint():
+            baseline = {"settings": bench_settings.fingerprint(), "scenarios": {}}
+        baseline["scenarios"][size] = {key: value for key, value in result.items() if key != "failures"}
+        _save_json(BASELINE_FILE, baseline)
+        return
+
+    if baseline["settings"] != bench_settings.fingerprint():
+        pytest.skip("Parámetros BENCH_* distintos a los del baseline: no comparables")
+
+    regressions = find_regressions({size: result}, baseline["scenarios"], bench_settings.tolerance)
+    assert not regressions, "\n".join(regressions)
@@ -0,0 +1,150 @@
+"""
+Tests del control de admisión (cupos, cola acotada y Retry-After).
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+import pytest
+from shared.core import admission
+from shared.core.admission import QUEUE_FULL, QUEUE_TIMEOUT, AdmissionController, AdmissionRejected
+from shared.utils import metrics
+
+
+# ============================================================
+# Fixtures
+# ============================================================
+
+@pytest.fixture(autouse=True)
+def sin_metricas(monkeypatch):
+    monkeypatch.delenv("METRICS_EXPORTER", raising=False)
+    metrics.configure_metrics(force=True)
+    yield
+    # Sin exportador al salir: un meter de consola sobreviviría al test escribiendo en un stdout cerrado
+    monkeypatch.delenv("METRICS_EXPORTER", raising=False)
+    metrics.configure_metrics(force=True)
+
+
+async def ocupar(controlador, espera, log=None, nombre=None):
+    async with controlador.admit():
+        if log is not None:
+            log.append(nombre)
+        await asyncio.sleep(espera)
+
+
+# ============================================================
+# Tests
+# ============================================================
+
+class TestAdmissionController:
+    def test_deshabilitado_por_defecto(self, monkeypatch):
+        monkeypatch.delenv("ADMISSION_MAX_IN_FLIGHT", raising=False)
+        assert AdmissionController.from_env() is None
+
+    def test_configuracion_desde_entorno(self, monkeypatch):
+        monkeypatch.setenv("ADMISSION_MAX_IN_FLIGHT", "4")
+        monkeypatch.delenv("ADMISSION_MAX_QUEUE", raising=False)
+        controlador = AdmissionController.from_env()
+        assert controlador.max_in_flight == 4
+        assert controlador.max_queue == 4
+
+    def test_cola_llena_rechaza_de_inmediato(self):
+        """Con el cupo y la cola ocupados, la siguiente petición se rechaza sin esperar."""
+        async def escenario():
+            controlador = AdmissionController(max_in_flight=1, max_queue=1, retry_after_seconds=3)
+            tareas = [asyncio.ensure_future(ocupar(controlador, 0.1)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as error:
+                async with controlador.admit():
+                    pass
+            await asyncio.gather(*tareas)
+            return controlador, error.value
+
+        controlador, rechazo = asyncio.run(escenario())
+        assert rechazo.reason == QUEUE_FULL
+        assert rechazo.retry_after >= 3
+        assert rechazo.snapshot["in_flight"] == 1 and rechazo.snapshot["queued"] == 1
+        assert controlador.admitted == 2
+        assert controlador.rejected == {QUEUE_FULL: 1}
+        assert controlador.in_flight == 0
+
+    def test_espera_agotada_en_cola(self):
+        async def escenario():
+            controlador = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout_seconds=0.05)
+            ocupada = asyncio.ensure_future(ocupar(controlador, 0.2))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as error:
+                async with controlador.admit():
+                    pass
+            assert controlador.queued == 0
+            await ocupada
+            return controlador, error.value
+
+        controlador, rechazo = asyncio.run(escenario())
+        assert rechazo.reason == QUEUE_TIMEOUT
+        assert controlador.in_flight == 0
+
+    def test_cupos_se_asignan_en_orden_de_llegada(self):
+        async def escenario():
+            controlador = AdmissionController(max_in_flight=1, max_queue=3)
+            orden = []
+            tareas = []
+            for nombre in "abcd":
+                tareas.append(asyncio.ensure_future(ocupar(controlador, 0.01, orden, nombre)))
+                await asyncio.sleep(0)
+            await asyncio.gather(*tareas)
+            return orden
+
+        assert asyncio.run(escenario()) == list("abcd")
+
+    def test_retry_after_crece_con_la_cola_y_el_tiempo_de_servicio(self):
+        controlador = AdmissionController(max_in_flight=2, max_queue=10, retry_after_seconds=1)
+        controlador._observe(20.0)
+        vacia = controlador.retry_after()
+        controlador._waiters.extend([object()] * 6)
+        assert controlador.retry_after() > vacia
+        controlador._observe(10_000.0)
+        assert controlador.retry_after() == 300
+
+
+class TestMetricas:
+    def test_instrumentos_nulos_sin_exportador(self):
+        metrics.counter("prueba").add(1)
+        metrics.histogram("prueba_ms").record(1.0)
+        assert metrics.observable_gauge("prueba_gauge", lambda: [(1, {})]) is None
+
+    def test_instrumentos_con_exportador(self, monkeypatch):
+        pytest.importorskip("opentelemetry.sdk.metrics")
+        monkeypatch.setenv("METRICS_EXPORTER", "console")
+        monkeypatch.setenv("METRICS_EXPORT_INTERVAL_SECONDS", "3600")
+        assert metrics.configure_metrics(force=True) is not None
+
+        controlador = AdmissionController(max_in_flight=1, max_queue=0)
+
+        async def escenario():
+            async with controlador.admit():
+                with pytest.raises(AdmissionRejected):
+                    async with controlador.admit():
+                        pass
+
+        asyncio.run(escenario())
+        assert controlador.rejected == {QUEUE_FULL: 1}
+
+    def test_gauges_se_registran_una_vez_por_proceso(self, monkeypatch):
+        """Recrear el orquestador no vuelve a registrar los gauges; suman los controladores vivos."""
+        registrados = {}
+        monkeypatch.setattr(admission, "_gauges_registered", False)
+        monkeypatch.setattr(admission, "_controllers", admission.weakref.WeakSet())
+        monkeypatch.setattr(admission, "observable_gauge",
+                            lambda nombre, leer, **kwargs: registrados.setdefault(nombre, []).append(leer))
+
+        anterior = AdmissionController(max_in_flight=2)
+        actual = AdmissionController(max_in_flight=2)
+        anterior.in_flight, actual.in_flight = 1, 2
+
+        assert {nombre: len(lecturas) for nombre, lecturas in registrados.items()} == {
+            "analyze.admission.in_flight": 1, "analyze.admission.queue_depth": 1,
+        }
+        assert registrados["analyze.admission.in_flight"][0]() == [(3, {})]
@@ -0,0 +1,71 @@
+"""
+Tests de la caché de análisis y sus backends.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+from shared.services.analysis_cache import (
+    AnalysisCache,
+    DiskCacheBackend,
+    MemoryCacheBackend,
+    catalog_version,
+)
+
+
+class TestClaveDeCache:
+    """Tests de la construcción de claves."""
+
+    def test_clave_estable(self):
+        """El mismo contenido produce la misma clave."""
+        assert AnalysisCache.build_key("texto", "v1", "p1") == AnalysisCache.build_key("texto", "v1", "p1")
+
+    def test_clave_cambia_con_catalogo_y_prompt(self):
+        """Cambiar el catálogo o la versión del prompt invalida la clave."""
+        base = AnalysisCache.build_key("texto", "v1", "p1")
+        assert AnalysisCache.build_key("texto", "v2", "p1") != base
+        assert AnalysisCache.build_key("texto", "v1", "p2") != base
+
+    def test_version_de_catalogo_independiente_del_orden_de_claves(self):
+        """El hash del catálogo no depende del orden de las claves de cada equipo."""
+        assert catalog_version([{"a": 1, "b": 2}]) == catalog_version([{"b": 2, "a": 1}])
+
+
+class TestBackends:
+    """Tests de los backends en memoria y en disco."""
+
+    def test_memoria_lru_descarta_la_entrada_mas_antigua(self):
+        backend = MemoryCacheBackend(max_entries=2, ttl_seconds=60)
+
+        async def flujo():
+            await backend.set("a", {"v": 1})
+            await backend.set("b", {"v": 2})
+            await backend.get("a")  # "a" pasa a ser la más reciente
+            await backend.set("c", {"v": 3})
+            return await backend.get("a"), await backend.get("b")
+
+        a, b = asyncio.run(flujo())
+        assert a == {"v": 1}
+        assert b is None
+
+    def test_memoria_respeta_ttl(self):
+        backend = MemoryCacheBackend(ttl_seconds=-1)
+
+        async def flujo():
+            await backend.set("a", {"v": 1})
+            return await backend.get("a")
+
+        assert asyncio.run(flujo()) is None
+
+    def test_disco_persiste_entre_instancias(self, tmp_path):
+        async def flujo():
+            await DiskCacheBackend(str(tmp_path)).set("k", {"resumen": "ñandú"})
+            return await DiskCacheBackend(str(tmp_path)).get("k")
+
+        assert asyncio.run(flujo()) == {"resumen": "ñandú"}
+
+    def test_from_env_deshabilitada(self, monkeypatch):
+        monkeypatch.setenv("ANALYSIS_CACHE_BACKEND", "none")
+        assert AnalysisCache.from_env() is None
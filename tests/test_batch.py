@@ -0,0 +1,99 @@
+"""
+Tests del análisis por lotes.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+import pytest
+from shared.core.admission import AdmissionController
+from shared.core.batch import parse_batch_request, process_batch
+
+
+class OrquestadorFalso:
+    """Registra la concurrencia máxima alcanzada."""
+
+    def __init__(self, espera=0.01, admission=None):
+        self.espera = espera
+        self.admission = admission
+        self.activos = 0
+        self.max_activos = 0
+        self.precargas = 0
+
+    async def warm_teams_catalog(self):
+        self.precargas += 1
+        return [{"name": "IA"}]
+
+    async def process_opportunity(self, payload):
+        self.activos += 1
+        self.max_activos = max(self.max_activos, self.activos)
+        await asyncio.sleep(self.espera)
+        self.activos -= 1
+        if payload.get("name") == "falla":
+            return {"success": False, "error": {"code": "AI_ANALYSIS_ERROR", "message": "x"}}
+        return {"success": True, "opportunity_id": payload["opportunityid"]}
+
+
+def lote(n):
+    return [{"opportunityid": f"opp-{i}", "name": f"Oportunidad {i}"} for i in range(n)]
+
+
+class TestParseBatchRequest:
+    def test_arreglo(self):
+        assert parse_batch_request(lote(2)) == {"items": lote(2), "concurrency": None}
+
+    def test_objeto_con_items(self):
+        assert parse_batch_request({"items": lote(1), "concurrency": "4"})["concurrency"] == 4
+
+    def test_body_invalido(self):
+        with pytest.raises(ValueError):
+            parse_batch_request({"opportunityid": "1"})
+
+
+class TestProcessBatch:
+    def test_concurrencia_acotada(self, monkeypatch):
+        """Nunca hay más análisis simultáneos que BATCH_CONCURRENCY."""
+        monkeypatch.setenv("BATCH_CONCURRENCY", "3")
+        orquestador = OrquestadorFalso()
+
+        result = asyncio.run(process_batch(orquestador, lote(10)))
+
+        assert result["summary"]["succeeded"] == 10
+        assert orquestador.max_activos == 3
+        assert orquestador.precargas == 1
+
+    def test_cliente_no_supera_el_maximo(self, monkeypatch):
+        monkeypatch.setenv("BATCH_CONCURRENCY", "2")
+        result = asyncio.run(process_batch(OrquestadorFalso(), lote(4), concurrency=50))
+        assert result["summary"]["concurrency"] == 2
+
+    def test_errores_por_elemento(self):
+        """Un elemento fallido no interrumpe el lote y conserva el orden."""
+        items = lote(3)
+        items[1]["name"] = "falla"
+        items.append("no es un objeto")
+
+        result = asyncio.run(process_batch(OrquestadorFalso(), items))
+
+        assert [r["index"] for r in result["results"]] == [0, 1, 2, 3]
+        assert [r["success"] for r in result["results"]] == [True, False, True, False]
+        assert result["results"][1]["error"]["code"] == "AI_ANALYSIS_ERROR"
+        assert result["results"][3]["error"]["code"] == "INVALID_ITEM"
+        assert result["summary"]["failed"] == 2
+        assert result["success"] is False
+
+    def test_cada_elemento_ocupa_un_cupo_de_admision(self, monkeypatch):
+        """Sin cupo ni lugar en la cola, el elemento falla con OVERLOADED en vez de iniciarse."""
+        monkeypatch.setenv("BATCH_CONCURRENCY", "4")
+        orquestador = OrquestadorFalso(admission=AdmissionController(max_in_flight=2, max_queue=1))
+
+        result = asyncio.run(process_batch(orquestador, lote(4)))
+
+        errores = [r["error"] for r in result["results"] if not r["success"]]
+        assert orquestador.max_activos == 2
+        assert result["summary"]["succeeded"] == 3
+        assert [e["code"] for e in errores] == ["OVERLOADED"]
+        assert errores[0]["retry_after_seconds"] >= 1
+        assert orquestador.admission.in_flight == 0
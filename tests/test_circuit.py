@@ -0,0 +1,247 @@
+"""
+Tests de los circuit breakers por dependencia (Cosmos DB, Blob Storage, Search).
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+import pytest
+from shared.services.blob_storage_service import BlobStorageService
+from shared.services.cosmos_service import CosmosDBService
+from shared.services.search_service import SearchService
+from shared.utils import circuit
+from shared.utils.circuit import (
+    CIRCUIT_OPEN_STATUS,
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    circuit_breaker,
+)
+from shared.utils.deadline import Deadline, deadline_scope
+from shared.utils.timing import collect_timings
+
+
+# ============================================================
+# Fixtures
+# ============================================================
+
+@pytest.fixture(autouse=True)
+def breakers_limpios(monkeypatch):
+    for key in ("CIRCUIT_BREAKER_ENABLED", "CIRCUIT_FAILURE_RATE", "CIRCUIT_MIN_CALLS",
+                "CIRCUIT_WINDOW_SECONDS", "CIRCUIT_OPEN_SECONDS", "CIRCUIT_HALF_OPEN_PROBES"):
+        monkeypatch.delenv(key, raising=False)
+    circuit.reset_circuit_breakers()
+    yield
+    circuit.reset_circuit_breakers()
+
+
+class ErrorHttp(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def llamar(breaker, error=None):
+    """Ejecuta una llamada protegida; retorna False si el circuito la omitió"""
+    try:
+        with breaker.guard():
+            if error is not None:
+                raise error
+    except CircuitOpenError:
+        return False
+    except Exception:
+        pass
+    return True
+
+
+# ============================================================
+# Dobles de los clientes del SDK
+# ============================================================
+
+class ContenedorCosmosCaido:
+    def __init__(self):
+        self.llamadas = 0
+
+    async def create_item(self, body, **kwargs):
+        self.llamadas += 1
+        raise ErrorHttp(503)
+
+
+class ClienteBlobCaido:
+    """Cuenta de Storage caída: falla ya al consultar si existe el contenedor"""
+
+    def __init__(self):
+        self.llamadas = []
+
+    def get_container_client(self, name):
+        return self
+
+    def get_blob_client(self, container, blob):
+        return self
+
+    async def exists(self, **kwargs):
+        self.llamadas.append(("exists", kwargs))
+        raise ErrorHttp(503)
+
+    async def upload_blob(self, *args, **kwargs):
+        self.llamadas.append(("upload_blob", kwargs))
+
+
+class ResultadosVacios:
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class SearchClientCaido:
+    def __init__(self):
+        self.llamadas = 0
+        self.caido = True
+
+    async def search(self, **kwargs):
+        self.llamadas += 1
+        if self.caido:
+            raise TimeoutError("sin respuesta")
+        return ResultadosVacios()
+
+
+# ============================================================
+# Tests
+# ============================================================
+
+class TestCircuitBreaker:
+    def test_abre_al_superar_la_tasa_de_fallas(self):
+        breaker = CircuitBreaker("cosmos", failure_rate=0.5, min_calls=4)
+        for error in (None, ErrorHttp(503), None):
+            llamar(breaker, error)
+        assert breaker.state == CLOSED
+        llamar(breaker, ErrorHttp(503))
+        assert breaker.state == OPEN
+        assert llamar(breaker) is False
+        assert breaker.rejected == 1
+
+    def test_no_abre_sin_el_minimo_de_llamadas(self):
+        breaker = CircuitBreaker("blob", failure_rate=0.5, min_calls=5)
+        for _ in range(4):
+            llamar(breaker, ErrorHttp(500))
+        assert breaker.state == CLOSED
+
+    def test_errores_del_llamador_no_cuentan(self):
+        """404/409 son respuestas válidas de la dependencia; 429 y timeouts sí son fallas."""
+        breaker = CircuitBreaker("cosmos", failure_rate=0.5, min_calls=2)
+        for _ in range(3):
+            llamar(breaker, ErrorHttp(409))
+        assert breaker.state == CLOSED
+        llamar(breaker, ErrorHttp(429))
+        llamar(breaker, TimeoutError())
+        llamar(breaker, TimeoutError())
+        assert breaker.state == OPEN
+
+    def test_fallas_fuera_de_la_ventana_se_descartan(self, monkeypatch):
+        reloj = [1000.0]
+        monkeypatch.setattr(circuit.time, "monotonic", lambda: reloj[0])
+        breaker = CircuitBreaker("search", failure_rate=0.5, min_calls=2, window_seconds=10)
+        llamar(breaker, ErrorHttp(500))
+        reloj[0] += 11
+        llamar(breaker, ErrorHttp(500))
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["failures"] == 1
+
+    def test_semiabierto_cierra_tras_una_prueba_exitosa(self, monkeypatch):
+        reloj = [1000.0]
+        monkeypatch.setattr(circuit.time, "monotonic", lambda: reloj[0])
+        breaker = CircuitBreaker("blob", min_calls=1, open_seconds=30)
+        llamar(breaker, ErrorHttp(500))
+        assert breaker.state == OPEN and breaker.retry_in() == 30
+
+        reloj[0] += 30
+        assert breaker.state == HALF_OPEN
+        with breaker.guard():
+            # Solo pasa una llamada de prueba a la vez
+            assert llamar(breaker) is False
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["calls"] == 0
+
+    def test_semiabierto_reabre_si_la_prueba_falla(self, monkeypatch):
+        reloj = [1000.0]
+        monkeypatch.setattr(circuit.time, "monotonic", lambda: reloj[0])
+        breaker = CircuitBreaker("blob", min_calls=1, open_seconds=30)
+        llamar(breaker, ErrorHttp(500))
+        reloj[0] += 30
+        assert llamar(breaker, ErrorHttp(502)) is True
+        assert breaker.state == OPEN and breaker.retry_in() == 30
+
+    def test_deshabilitado_no_omite_llamadas(self, monkeypatch):
+        monkeypatch.setenv("CIRCUIT_BREAKER_ENABLED", "false")
+        monkeypatch.setenv("CIRCUIT_MIN_CALLS", "1")
+        breaker = circuit_breaker("cosmos")
+        for _ in range(3):
+            assert llamar(breaker, ErrorHttp(500)) is True
+
+    def test_un_breaker_por_dependencia(self, monkeypatch):
+        monkeypatch.setenv("CIRCUIT_OPEN_SECONDS", "12")
+        assert circuit_breaker("cosmos") is circuit_breaker("cosmos")
+        assert circuit_breaker("cosmos") is not circuit_breaker("blob")
+        assert circuit_breaker("blob").open_seconds == 12
+        assert set(circuit.circuit_snapshot()) == {"cosmos", "blob"}
+
+
+class TestServiciosConCircuito:
+    def test_cosmos_caido_se_omite_al_abrir_el_circuito(self, monkeypatch):
+        monkeypatch.setenv("CIRCUIT_MIN_CALLS", "2")
+        servicio = CosmosDBService.__new__(CosmosDBService)
+        servicio._async_container = ContenedorCosmosCaido()
+
+        async def escenario():
+            with collect_timings() as timings:
+                resultados = [await servicio.save_analysis_async({"id": str(i)}) for i in range(4)]
+            return resultados, timings
+
+        resultados, timings = asyncio.run(escenario())
+        assert resultados == [None] * 4
+        # Las dos primeras llamadas fallan y abren el circuito; las siguientes no llegan al SDK
+        assert servicio._async_container.llamadas == 2
+        assert [c.status for c in timings.calls] == ["error", "error", CIRCUIT_OPEN_STATUS, CIRCUIT_OPEN_STATUS]
+        assert timings.calls[-1].to_dict()["retry_in_seconds"] > 0
+
+    def test_blob_caido_desde_el_inicio_no_consulta_el_contenedor(self, monkeypatch):
+        """La verificación del contenedor también pasa por el circuito y lleva timeout."""
+        monkeypatch.setenv("CIRCUIT_MIN_CALLS", "2")
+        servicio = BlobStorageService.__new__(BlobStorageService)
+        servicio.container_name = "analysis-reports"
+        servicio._container_checked = False
+        servicio._async_blob_service_client = ClienteBlobCaido()
+
+        async def escenario():
+            with deadline_scope(Deadline(30.0)), collect_timings() as timings:
+                urls = [await servicio.upload_pdf_async(b"%PDF", f"{i}.pdf") for i in range(4)]
+            return urls, timings
+
+        urls, timings = asyncio.run(escenario())
+        assert urls == [None] * 4
+        llamadas = servicio._async_blob_service_client.llamadas
+        assert [nombre for nombre, _ in llamadas] == ["exists", "exists"]
+        assert 0 < llamadas[0][1]["read_timeout"] <= 30.0
+        assert [c.status for c in timings.calls] == ["error", "error", CIRCUIT_OPEN_STATUS, CIRCUIT_OPEN_STATUS]
+
+    def test_search_se_recupera_tras_la_prueba(self, monkeypatch):
+        monkeypatch.setenv("CIRCUIT_MIN_CALLS", "1")
+        monkeypatch.setenv("CIRCUIT_OPEN_SECONDS", "0")
+        servicio = SearchService.__new__(SearchService)
+        servicio._async_client = SearchClientCaido()
+
+        async def escenario():
+            assert await servicio.get_all_teams_async() == []
+            assert circuit_breaker("search").state == HALF_OPEN
+            servicio._async_client.caido = False
+            return await servicio.get_all_teams_async()
+
+        assert asyncio.run(escenario()) == []
+        assert circuit_breaker("search").state == CLOSED
+        assert servicio._async_client.llamadas == 2
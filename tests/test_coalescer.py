@@ -0,0 +1,81 @@
+"""
+Tests de la agrupación de ráfagas de eventos por oportunidad.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+from shared.core.coalescer import LEADER, SUPERSEDED, EventCoalescer
+
+
+def evento(modifiedon, opp="opp-1"):
+    return {"opportunityid": opp, "SdkMessage": "Update", "modifiedon": modifiedon}
+
+
+class TestEventCoalescer:
+    """Tests de la ventana de silencio."""
+
+    def test_rafaga_analiza_solo_el_ultimo(self):
+        """Tres Update seguidos: el último lidera y los anteriores quedan reemplazados."""
+        coalescer = EventCoalescer(window_seconds=0.05)
+
+        async def rafaga():
+            tareas = []
+            for i in range(3):
+                tareas.append(asyncio.ensure_future(coalescer.submit("opp-1", evento(f"2026-03-01T10:00:0{i}Z"))))
+                await asyncio.sleep(0.01)
+            return await asyncio.gather(*tareas)
+
+        resultados = asyncio.run(rafaga())
+
+        assert [r.status for r in resultados] == [SUPERSEDED, SUPERSEDED, LEADER]
+        assert resultados[2].superseded == 2
+        assert all(r.payload["modifiedon"] == "2026-03-01T10:00:02Z" for r in resultados)
+        assert len({r.burst_id for r in resultados}) == 1
+
+    def test_evento_desordenado_no_reemplaza_al_mas_reciente(self):
+        coalescer = EventCoalescer(window_seconds=0.05)
+
+        async def rafaga():
+            nuevo = asyncio.ensure_future(coalescer.submit("opp-1", evento("2026-03-01T10:00:05Z")))
+            await asyncio.sleep(0.01)
+            viejo = asyncio.ensure_future(coalescer.submit("opp-1", evento("2026-03-01T10:00:01Z")))
+            return await asyncio.gather(nuevo, viejo)
+
+        nuevo, viejo = asyncio.run(rafaga())
+        assert (nuevo.status, viejo.status) == (LEADER, SUPERSEDED)
+
+    def test_oportunidades_distintas_no_se_agrupan(self):
+        coalescer = EventCoalescer(window_seconds=0.02)
+
+        async def rafaga():
+            return await asyncio.gather(
+                coalescer.submit("opp-1", evento("a", "opp-1")),
+                coalescer.submit("opp-2", evento("a", "opp-2")),
+            )
+
+        assert [r.status for r in asyncio.run(rafaga())] == [LEADER, LEADER]
+
+    def test_espera_maxima_con_edicion_continua(self):
+        """Eventos cada 30ms con ventana de 50ms: la ráfaga se cierra por max_wait."""
+        coalescer = EventCoalescer(window_seconds=0.05, max_wait_seconds=0.1)
+
+        async def rafaga():
+            loop = asyncio.get_running_loop()
+            inicio = loop.time()
+            primero = asyncio.ensure_future(coalescer.submit("opp-1", evento("0")))
+            for i in range(1, 10):
+                await asyncio.sleep(0.03)
+                if primero.done():
+                    break
+                asyncio.ensure_future(coalescer.submit("opp-1", evento(str(i))))
+            await primero
+            return loop.time() - inicio
+
+        assert asyncio.run(rafaga()) < 0.2
+
+    def test_deshabilitado_por_defecto(self, monkeypatch):
+        monkeypatch.delenv("COALESCE_WINDOW_SECONDS", raising=False)
+        assert EventCoalescer.from_env() is None
@@ -0,0 +1,130 @@
+"""
+Tests del presupuesto de tiempo por petición (Deadline).
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import math
+import asyncio
+
+from shared.services.blob_storage_service import BlobStorageService
+from shared.services.search_service import SearchService
+from shared.utils.deadline import (
+    Deadline,
+    current_deadline,
+    deadline_scope,
+    request_deadline,
+    timeout_kwargs,
+)
+
+
+class TestDeadline:
+    def test_sin_presupuesto_no_limita(self):
+        deadline = Deadline()
+        assert deadline.remaining() == math.inf
+        assert deadline.timeout() is None
+        assert deadline.timeout(30.0) == 30.0
+        assert not deadline.expired
+
+    def test_timeout_es_el_menor_entre_tope_y_restante(self):
+        deadline = Deadline(10.0)
+        assert deadline.timeout(120.0) <= 10.0
+        assert deadline.timeout(2.0) == 2.0
+        assert deadline.allows(5.0) and not deadline.allows(11.0)
+
+    def test_reserve_vence_antes_sin_pasar_el_inicio(self):
+        deadline = Deadline(10.0)
+        assert deadline.reserve(4.0).remaining() <= 6.0
+        assert deadline.reserve(60.0).expired
+        assert Deadline().reserve(5.0).unlimited
+
+    def test_header_solo_reduce_el_presupuesto(self, monkeypatch):
+        """X-Request-Timeout acota REQUEST_DEADLINE_SECONDS; no lo amplía ni acepta basura."""
+        monkeypatch.setenv("REQUEST_DEADLINE_SECONDS", "100")
+        assert request_deadline("30").budget_seconds == 30.0
+        assert request_deadline("500").budget_seconds == 100.0
+        assert request_deadline("abc").budget_seconds == 100.0
+        assert request_deadline(None).budget_seconds == 100.0
+
+
+class TestDeadlineScope:
+    def test_timeout_kwargs_usa_el_deadline_activo(self):
+        assert timeout_kwargs() == {}
+        assert timeout_kwargs(cap=3.0) == {"timeout": 3.0}
+        with deadline_scope(Deadline(8.0)):
+            assert 0 < timeout_kwargs("read_timeout")["read_timeout"] <= 8.0
+        assert current_deadline() is None
+
+    def test_deadline_vencido_da_timeout_minimo(self):
+        with deadline_scope(Deadline(0.0)):
+            assert timeout_kwargs() == {"timeout": 0.001}
+
+    def test_las_tareas_hijas_heredan_el_deadline(self):
+        async def leer():
+            return current_deadline()
+
+        async def escenario():
+            with deadline_scope(Deadline(5.0)) as deadline:
+                return await asyncio.create_task(leer()) is deadline
+
+        assert asyncio.run(escenario())
+
+
+class ClienteRegistrador:
+    """Cliente de Blob/Search que guarda los kwargs de cada llamada al SDK."""
+
+    def __init__(self):
+        self.llamadas = []
+
+    def get_container_client(self, name):
+        return self
+
+    def get_blob_client(self, container, blob):
+        return self
+
+    async def exists(self, **kwargs):
+        self.llamadas.append(("exists", kwargs))
+        return True
+
+    async def upload_blob(self, data, **kwargs):
+        self.llamadas.append(("upload_blob", kwargs))
+
+    async def download_blob(self, **kwargs):
+        self.llamadas.append(("download_blob", kwargs))
+        return self
+
+    async def readall(self):
+        return b'{"status": "queued"}'
+
+    async def search(self, **kwargs):
+        self.llamadas.append(("search", kwargs))
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class TestTimeoutsDeLosServicios:
+    def test_json_de_blob_y_catalogo_de_search_llevan_timeout(self):
+        """Todas las llamadas al SDK reciben el timeout derivado del deadline."""
+        blob = BlobStorageService.__new__(BlobStorageService)
+        blob.container_name = "analysis-reports"
+        blob._container_checked = False
+        blob._async_blob_service_client = ClienteRegistrador()
+        search = SearchService.__new__(SearchService)
+        search._async_client = ClienteRegistrador()
+
+        async def escenario():
+            with deadline_scope(Deadline(20.0)):
+                assert await blob.upload_json_async({"status": "queued"}, "jobs/job-1.json")
+                assert await blob.download_json_async("jobs/job-1.json") == {"status": "queued"}
+                assert await search.get_all_teams_async() == []
+
+        asyncio.run(escenario())
+        llamadas = blob._async_blob_service_client.llamadas + search._async_client.llamadas
+        assert [nombre for nombre, _ in llamadas] == ["exists", "upload_blob", "download_blob", "search"]
+        assert all(0 < kwargs["read_timeout"] <= 20.0 for _, kwargs in llamadas)
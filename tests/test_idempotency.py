@@ -0,0 +1,138 @@
+"""
+Tests del registro de idempotencia para reintentos de Power Automate.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+from shared.core.idempotency import EXECUTED, JOINED, REPLAYED, IdempotencyStore
+from shared.services.analysis_cache import MemoryCacheBackend
+
+
+def contador_de_ejecuciones(resultado, espera=0.0):
+    """Retorna (compute, llamadas) donde compute cuenta cuántas veces se ejecutó."""
+    llamadas = []
+
+    async def compute():
+        llamadas.append(1)
+        await asyncio.sleep(espera)
+        return dict(resultado)
+
+    return compute, llamadas
+
+
+class BackendLento(MemoryCacheBackend):
+    """Backend cuya lectura cede el event loop, como DiskCacheBackend (to_thread) o Cosmos"""
+
+    async def get(self, key):
+        await asyncio.sleep(0)
+        return await super().get(key)
+
+
+class BackendEscrituraLenta(MemoryCacheBackend):
+    """Backend cuya escritura cede el event loop varias veces"""
+
+    async def set(self, key, value):
+        await asyncio.sleep(0.02)
+        await super().set(key, value)
+
+
+class TestClaveDeIdempotencia:
+    """Tests de build_key."""
+
+    def test_header_tiene_prioridad(self):
+        data = {"opportunityid": "1", "modifiedon": "2026-01-01"}
+        assert IdempotencyStore.build_key(data, "abc") != IdempotencyStore.build_key(data)
+
+    def test_sin_modifiedon_ni_header_no_hay_clave(self):
+        assert IdempotencyStore.build_key({"opportunityid": "1"}) is None
+
+
+class TestIdempotencyStore:
+    """Tests de la deduplicación de ejecuciones."""
+
+    def test_duplicados_en_curso_se_acoplan(self):
+        """Dos peticiones simultáneas con la misma clave ejecutan una sola vez."""
+        store = IdempotencyStore(MemoryCacheBackend())
+        compute, llamadas = contador_de_ejecuciones({"success": True}, espera=0.05)
+
+        async def flujo():
+            return await asyncio.gather(store.run("k", compute), store.run("k", compute))
+
+        (r1, s1), (r2, s2) = asyncio.run(flujo())
+        assert len(llamadas) == 1
+        assert {s1, s2} == {EXECUTED, JOINED}
+        assert r1 == r2
+
+    def test_duplicados_se_acoplan_aunque_la_lectura_ceda_el_loop(self):
+        """El segundo duplicado llega mientras el primero lee el backend: tampoco ejecuta."""
+        store = IdempotencyStore(BackendLento())
+        compute, llamadas = contador_de_ejecuciones({"success": True}, espera=0.01)
+
+        async def flujo():
+            return await asyncio.gather(*(store.run("k", compute) for _ in range(3)))
+
+        resultados = asyncio.run(flujo())
+        assert len(llamadas) == 1
+        assert sorted(estado for _, estado in resultados) == [EXECUTED, JOINED, JOINED]
+        assert store._in_flight == {}
+
+    def test_duplicado_completado_se_reproduce(self):
+        """Un reintento posterior recibe la respuesta guardada sin ejecutar."""
+        store = IdempotencyStore(MemoryCacheBackend())
+        compute, llamadas = contador_de_ejecuciones({"success": True, "valor": 1})
+
+        async def flujo():
+            await store.run("k", compute)
+            return await store.run("k", compute)
+
+        result, estado = asyncio.run(flujo())
+        assert estado == REPLAYED
+        assert result["valor"] == 1
+        assert len(llamadas) == 1
+
+    def test_fallos_no_se_guardan(self):
+        """Una respuesta fallida no se reproduce: el reintento vuelve a ejecutar."""
+        store = IdempotencyStore(MemoryCacheBackend())
+        compute, llamadas = contador_de_ejecuciones({"success": False})
+
+        async def flujo():
+            await store.run("k", compute)
+            return await store.run("k", compute)
+
+        _, estado = asyncio.run(flujo())
+        assert estado == EXECUTED
+        assert len(llamadas) == 2
+
+    def test_reintento_durante_el_guardado_no_vuelve_a_ejecutar(self):
+        """La clave sigue en curso hasta que el resultado queda guardado."""
+        store = IdempotencyStore(BackendEscrituraLenta())
+        compute, llamadas = contador_de_ejecuciones({"success": True})
+
+        async def flujo():
+            original = asyncio.ensure_future(store.run("k", compute))
+            await asyncio.sleep(0.01)  # compute terminó; el guardado está en curso
+            reintento = await store.run("k", compute)
+            return await original, reintento
+
+        (_, s1), (_, s2) = asyncio.run(flujo())
+        assert len(llamadas) == 1
+        assert (s1, s2) == (EXECUTED, JOINED)
+
+    def test_resultado_se_guarda_aunque_se_cancele_la_invocacion(self):
+        """Si el llamador original se cancela, la ejecución termina y su resultado se guarda."""
+        store = IdempotencyStore(MemoryCacheBackend())
+        compute, llamadas = contador_de_ejecuciones({"success": True}, espera=0.02)
+
+        async def flujo():
+            original = asyncio.ensure_future(store.run("k", compute))
+            await asyncio.sleep(0.005)
+            original.cancel()
+            await asyncio.sleep(0.05)
+            return await store.run("k", compute)
+
+        _, estado = asyncio.run(flujo())
+        assert estado == REPLAYED
+        assert len(llamadas) == 1
@@ -0,0 +1,353 @@
+"""
+Tests del modo asíncrono (202 + consulta de estado).
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import json
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from azure.core.exceptions import ClientAuthenticationError, ResourceExistsError
+from shared.core.admission import AdmissionController, AdmissionRejected
+from shared.core.jobs import (
+    FAILED,
+    QUEUED,
+    SUCCEEDED,
+    FileJobQueue,
+    InProcessJobQueue,
+    QUEUE_CONNECTION_SETTING,
+    QUEUE_MAX_DEQUEUE_COUNT,
+    JobManager,
+    StorageJobQueue,
+)
+from shared.services.analysis_cache import MemoryCacheBackend
+
+
+# ============================================================
+# Dobles
+# ============================================================
+
+class OrquestadorFalso:
+    def __init__(self, resultado=None, espera=0.0, admission=None):
+        self.resultado = resultado or {"success": True, "analysis": {"executive_summary": "ok"}}
+        self.espera = espera
+        self.admission = admission
+        self.recibidos = []
+
+    async def warm_teams_catalog(self):
+        return []
+
+    async def process_opportunity(self, payload, on_event=None):
+        self.recibidos.append(payload)
+        if on_event:
+            await on_event({"event": "card_ready", "step": "adaptive_card", "status": "ok",
+                            "elapsed_seconds": 0.1, "data": {"adaptive_card": {"type": "AdaptiveCard"}}})
+        await asyncio.sleep(self.espera)
+        return dict(self.resultado)
+
+
+class ColaFalsa:
+    def __init__(self):
+        self.mensajes = []
+
+    async def enqueue(self, job_id):
+        self.mensajes.append(job_id)
+
+
+class ClienteColaFalso:
+    def __init__(self, error_al_crear):
+        self.error_al_crear = error_al_crear
+        self.mensajes = []
+
+    async def create_queue(self):
+        raise self.error_al_crear
+
+    async def send_message(self, mensaje):
+        self.mensajes.append(mensaje)
+
+
+CONEXION_STORAGE = (
+    "DefaultEndpointsProtocol=https;AccountName=cuenta;AccountKey=Y2xhdmU=;EndpointSuffix=core.windows.net"
+)
+
+OPORTUNIDAD = {"opportunityid": "opp-1", "name": "Oportunidad", "modifiedon": "2026-03-01T10:00:00Z"}
+
+
+def gestor(orquestador, cola=None):
+    return JobManager(MemoryCacheBackend(), queue=cola, orchestrator_provider=lambda: orquestador)
+
+
+# ============================================================
+# Tests
+# ============================================================
+
+class TestJobManager:
+    """Tests del ciclo de vida de un job."""
+
+    def test_submit_encola_solo_el_id(self):
+        """El mensaje de la cola es el job_id; el payload queda en el estado."""
+        cola = ColaFalsa()
+        manager = gestor(OrquestadorFalso(), cola)
+
+        job = asyncio.run(manager.submit(dict(OPORTUNIDAD), "job-1"))
+
+        assert cola.mensajes == ["job-1"]
+        assert job["status"] == QUEUED
+        assert job["payload"]["opportunityid"] == "opp-1"
+        assert "payload" not in JobManager.public_view(job)
+
+    def test_run_guarda_el_resultado(self):
+        """El worker ejecuta el orquestador y deja el resultado consultable."""
+        orquestador = OrquestadorFalso()
+        manager = gestor(orquestador, ColaFalsa())
+
+        async def flujo():
+            await manager.submit(dict(OPORTUNIDAD), "job-1")
+            await manager.run("job-1")
+            return await manager.get("job-1")
+
+        job = asyncio.run(flujo())
+        assert job["status"] == SUCCEEDED
+        assert job["result"]["analysis"]["executive_summary"] == "ok"
+        assert len(orquestador.recibidos) == 1
+
+    def test_progreso_visible_antes_de_terminar(self):
+        """Las salidas parciales se guardan en cuanto el paso termina."""
+        manager = gestor(OrquestadorFalso(espera=0.05), ColaFalsa())
+
+        async def flujo():
+            await manager.submit(dict(OPORTUNIDAD), "job-1")
+            tarea = asyncio.ensure_future(manager.run("job-1"))
+            await asyncio.sleep(0.02)
+            parcial = dict(await manager.get("job-1"))
+            await tarea
+            return parcial
+
+        parcial = asyncio.run(flujo())
+        assert parcial["status"] == "running"
+        assert parcial["partial"]["adaptive_card"]["type"] == "AdaptiveCard"
+        assert [e["event"] for e in parcial["events"]] == ["card_ready"]
+
+    def test_fallo_del_analisis_marca_el_job(self):
+        orquestador = OrquestadorFalso({"success": False, "error": {"code": "AI_ANALYSIS_ERROR"}})
+        manager = gestor(orquestador, ColaFalsa())
+
+        async def flujo():
+            await manager.submit(dict(OPORTUNIDAD), "job-1")
+            return await manager.run("job-1")
+
+        job = asyncio.run(flujo())
+        assert job["status"] == FAILED
+        assert job["error"]["code"] == "AI_ANALYSIS_ERROR"
+
+    def test_track_marca_el_job_si_el_analisis_no_se_ejecuta(self):
+        """Un análisis rechazado (p. ej. sin cupo) no deja el job en RUNNING."""
+        manager = gestor(OrquestadorFalso(), ColaFalsa())
+
+        async def rechazado():
+            raise RuntimeError("sin cupo")
+
+        async def flujo():
+            with pytest.raises(RuntimeError):
+                await manager.track("job-1", dict(OPORTUNIDAD), rechazado)
+            return await manager.get("job-1")
+
+        job = asyncio.run(flujo())
+        assert job["status"] == FAILED
+        assert job["error"] == {"code": "RuntimeError", "message": "sin cupo"}
+
+    def test_reenvio_no_duplica_el_job(self):
+        """Un reintento con el mismo job_id no vuelve a encolar."""
+        cola = ColaFalsa()
+        manager = gestor(OrquestadorFalso(), cola)
+
+        async def flujo():
+            await manager.submit(dict(OPORTUNIDAD), "job-1")
+            return await manager.submit(dict(OPORTUNIDAD), "job-1")
+
+        asyncio.run(flujo())
+        assert cola.mensajes == ["job-1"]
+
+    def test_job_id_determinista_por_modifiedon(self):
+        assert JobManager.build_job_id(OPORTUNIDAD) == JobManager.build_job_id(dict(OPORTUNIDAD))
+        assert JobManager.build_job_id({"opportunityid": "x"}) != JobManager.build_job_id({"opportunityid": "x"})
+
+    def test_job_sin_cupo_queda_en_cola_hasta_el_ultimo_intento(self):
+        """Sin cupo de admisión el job sigue QUEUED y la cola reintenta; en el último intento falla."""
+        orquestador = OrquestadorFalso(admission=AdmissionController(max_in_flight=1, max_queue=0))
+        manager = gestor(orquestador, ColaFalsa())
+
+        async def flujo():
+            await manager.submit(dict(OPORTUNIDAD), "job-1")
+            async with orquestador.admission.admit():
+                with pytest.raises(AdmissionRejected):
+                    await manager.run("job-1")
+                en_cola = dict(await manager.get("job-1"))
+                final = await manager.run("job-1", final_attempt=True)
+            return en_cola, final
+
+        en_cola, final = asyncio.run(flujo())
+        assert en_cola["status"] == QUEUED
+        assert final["status"] == FAILED
+        assert final["error"]["code"] == "OVERLOADED"
+        assert orquestador.recibidos == []
+
+    def test_cola_en_proceso_reintenta_sin_cupo(self):
+        """La cola en proceso espera el Retry-After y vuelve a ejecutar el job."""
+        admission = AdmissionController(max_in_flight=1, max_queue=0)
+        admission.retry_after = lambda: 0
+        orquestador = OrquestadorFalso(admission=admission)
+        manager = gestor(orquestador)
+
+        async def flujo():
+            async with admission.admit():
+                await manager.submit(dict(OPORTUNIDAD), "job-1")
+                await asyncio.sleep(0.01)
+                assert (await manager.get("job-1"))["status"] == QUEUED
+            await asyncio.gather(*manager.queue._tasks)
+            return await manager.get("job-1")
+
+        assert asyncio.run(flujo())["status"] == SUCCEEDED
+
+    def test_cola_en_proceso_ejecuta_el_job(self):
+        """Sin Storage Queue el job se ejecuta en el mismo event loop."""
+        manager = gestor(OrquestadorFalso(espera=0.01))
+
+        async def flujo():
+            await manager.submit(dict(OPORTUNIDAD), "job-1")
+            await asyncio.gather(*manager.queue._tasks)
+            return await manager.get("job-1")
+
+        assert asyncio.run(flujo())["status"] == SUCCEEDED
+
+    def test_cola_en_archivos(self, tmp_path):
+        """Los mensajes en disco se procesan y se eliminan."""
+        manager = gestor(OrquestadorFalso())
+        manager.queue = FileJobQueue(manager.run, str(tmp_path))
+
+        async def flujo():
+            await manager.submit(dict(OPORTUNIDAD), "job-1")
+            await asyncio.gather(*manager.queue._tasks)
+            return await manager.get("job-1")
+
+        assert asyncio.run(flujo())["status"] == SUCCEEDED
+        assert list(tmp_path.iterdir()) == []
+
+    def test_lote_encola_un_job_por_elemento(self):
+        """Cada elemento es un job propio (con su deadline); el lote agrupa su estado."""
+        orquestador = OrquestadorFalso()
+        cola = ColaFalsa()
+        manager = gestor(orquestador, cola)
+
+        async def flujo():
+            await manager.submit_batch([dict(OPORTUNIDAD), dict(OPORTUNIDAD), "no es un objeto"], "lote-1")
+            await manager.run(cola.mensajes[0])
+            parcial = await manager.get("lote-1")
+            for job_id in cola.mensajes[1:]:
+                await manager.run(job_id)
+            return parcial, await manager.get("lote-1")
+
+        parcial, job = asyncio.run(flujo())
+        assert sorted(cola.mensajes) == ["lote-1-0", "lote-1-1"]
+        assert parcial["status"] == "running"
+        assert parcial["progress"] == {"total": 3, "queued": 1, "running": 0, "succeeded": 1, "failed": 1}
+        assert job["status"] == SUCCEEDED
+        assert job["result"]["summary"]["total"] == 3
+        assert [r["success"] for r in job["result"]["results"]] == [True, True, False]
+        assert job["result"]["results"][2]["error"]["code"] == "INVALID_ITEM"
+        assert len(orquestador.recibidos) == 2
+        assert "children" not in JobManager.public_view(job)
+
+    def test_lote_completado_no_vuelve_a_leer_los_elementos(self):
+        manager = gestor(OrquestadorFalso(), ColaFalsa())
+
+        async def flujo():
+            await manager.submit_batch([dict(OPORTUNIDAD)], "lote-1")
+            await manager.run("lote-1-0")
+            await manager.get("lote-1")
+            del manager.backend._entries["lote-1-0"]
+            return await manager.get("lote-1")
+
+        assert asyncio.run(flujo())["result"]["summary"]["succeeded"] == 1
+
+    def test_cola_en_proceso_acota_los_jobs_simultaneos(self, monkeypatch):
+        """Los elementos de un lote en la cola en proceso respetan BATCH_CONCURRENCY."""
+        monkeypatch.setenv("BATCH_CONCURRENCY", "2")
+        en_curso, maximo = [0], [0]
+
+        class OrquestadorContado(OrquestadorFalso):
+            async def process_opportunity(self, payload, on_event=None):
+                en_curso[0] += 1
+                maximo[0] = max(maximo[0], en_curso[0])
+                await asyncio.sleep(0.01)
+                en_curso[0] -= 1
+                return dict(self.resultado)
+
+        manager = gestor(OrquestadorContado())
+
+        async def flujo():
+            await manager.submit_batch([dict(OPORTUNIDAD) for _ in range(6)], "lote-1")
+            await asyncio.gather(*manager.queue._tasks)
+            return await manager.get("lote-1")
+
+        assert asyncio.run(flujo())["result"]["summary"]["succeeded"] == 6
+        assert maximo[0] == 2
+
+
+class TestConfiguracionDeColas:
+    """Tests de JobManager.from_env y de StorageJobQueue."""
+
+    @pytest.fixture(autouse=True)
+    def entorno(self, monkeypatch):
+        for key in ("JOB_QUEUE_BACKEND", "JOB_STORE_BACKEND", "ANALYZE_QUEUE_NAME"):
+            monkeypatch.delenv(key, raising=False)
+        monkeypatch.setenv("AzureWebJobsStorage", CONEXION_STORAGE)
+
+    def test_cola_de_storage_con_estado_en_memoria_usa_la_cola_en_proceso(self):
+        """El worker de la cola corre en otro proceso: no vería jobs guardados en memoria."""
+        manager = JobManager.from_env(SimpleNamespace(blob_service=None))
+        assert isinstance(manager.backend, MemoryCacheBackend)
+        assert isinstance(manager.queue, InProcessJobQueue)
+
+    def test_cola_de_storage_con_estado_compartido(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("JOB_STORE_BACKEND", "disk")
+        monkeypatch.setenv("JOB_STORE_DIR", str(tmp_path))
+        manager = JobManager.from_env(SimpleNamespace(blob_service=None))
+        assert isinstance(manager.queue, StorageJobQueue)
+
+    def test_productor_y_worker_usan_la_misma_cola(self, monkeypatch, tmp_path):
+        """function.json del worker lee la misma conexión y el mismo nombre de cola que el productor."""
+        monkeypatch.setenv("JOB_STORE_BACKEND", "disk")
+        monkeypatch.setenv("JOB_STORE_DIR", str(tmp_path))
+        monkeypatch.setenv("ANALYZE_QUEUE_NAME", "otra-cola")
+        manager = JobManager.from_env(SimpleNamespace(blob_service=None))
+
+        ruta = Path(__file__).resolve().parent.parent / "AnalyzeOpportunityWorker" / "function.json"
+        trigger = json.loads(ruta.read_text(encoding="utf-8"))["bindings"][0]
+        assert trigger["connection"] == QUEUE_CONNECTION_SETTING
+        assert trigger["queueName"] == "%ANALYZE_QUEUE_NAME%"
+        assert manager.queue.client.queue_name == "otra-cola"
+
+        host = json.loads((ruta.parent.parent / "host.json").read_text(encoding="utf-8"))
+        assert host["extensions"]["queues"]["maxDequeueCount"] == QUEUE_MAX_DEQUEUE_COUNT
+
+    def test_cola_existente_no_es_error(self):
+        cola = StorageJobQueue.__new__(StorageJobQueue)
+        cola.client = ClienteColaFalso(ResourceExistsError("ya existe"))
+        cola._queue_checked = False
+
+        asyncio.run(cola.enqueue("job-1"))
+        assert cola.client.mensajes == ['{"job_id": "job-1"}']
+
+    def test_error_al_crear_la_cola_se_propaga(self):
+        cola = StorageJobQueue.__new__(StorageJobQueue)
+        cola.client = ClienteColaFalso(ClientAuthenticationError("credenciales inválidas"))
+        cola._queue_checked = False
+
+        with pytest.raises(ClientAuthenticationError):
+            asyncio.run(cola.enqueue("job-1"))
+        assert cola.client.mensajes == [] and cola._queue_checked is False
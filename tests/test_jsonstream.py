@@ -0,0 +1,120 @@
+"""
+Tests de la lectura incremental (exportaciones y streaming) y del limitador de tasa.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from shared.utils.jsonstream import JsonObjectStream, detect_format, iter_json_array, iter_records
+from shared.utils.ratelimit import AsyncRateLimiter
+
+
+REGISTROS = [{"opportunityid": str(i), "name": f"Oportunidad {i}", "description": "ñ" * 50} for i in range(25)]
+
+
+class TestJsonStream:
+    """Tests de iter_records sobre los formatos de exportación."""
+
+    def test_jsonl(self, tmp_path):
+        archivo = tmp_path / "export.jsonl"
+        archivo.write_text("\n".join(json.dumps(r) for r in REGISTROS) + "\n\n", encoding="utf-8")
+
+        registros = list(iter_records(str(archivo)))
+
+        assert [r for _, r, _ in registros] == REGISTROS
+        assert [i for i, _, _ in registros] == list(range(25))
+        assert registros[-1][2] == archivo.stat().st_size - 1
+
+    def test_arreglo_json_en_bloques_pequenos(self, tmp_path):
+        """Los registros que cruzan el límite de un bloque se completan con el siguiente."""
+        archivo = tmp_path / "export.json"
+        archivo.write_text(json.dumps(REGISTROS, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        assert detect_format(str(archivo)) == "json"
+        assert [r for _, r, _ in iter_json_array(str(archivo), chunk_size=7)] == REGISTROS
+
+    def test_exportacion_odata(self, tmp_path):
+        archivo = tmp_path / "export.json"
+        archivo.write_text(json.dumps({"@odata.context": "https://org/api", "value": REGISTROS}), encoding="utf-8")
+
+        assert [r for _, r, _ in iter_records(str(archivo))] == REGISTROS
+
+    def test_arreglo_truncado(self, tmp_path):
+        archivo = tmp_path / "export.json"
+        archivo.write_text(json.dumps(REGISTROS)[:-30], encoding="utf-8")
+
+        with pytest.raises(ValueError):
+            list(iter_json_array(str(archivo), chunk_size=64))
+
+
+class TestJsonObjectStream:
+    """Parser incremental de objetos recibidos por fragmentos (completions en streaming)."""
+
+    OBJETO = {
+        "resumen": "Texto con {llaves}, [corchetes], comas y \"comillas\" ñ",
+        "torres": ["Torre IA", "Torre DATA"],
+        "equipos": [{"nombre": "IA", "skills": ["RAG", "LLM"]}],
+        "confianza": 0.8,
+        "vacio": {},
+    }
+
+    def test_entrega_cada_campo_al_cerrarse(self):
+        texto = json.dumps(self.OBJETO, ensure_ascii=False, indent=2)
+        parser = JsonObjectStream()
+        campos = []
+        for i in range(0, len(texto), 3):
+            campos.extend(parser.feed(texto[i:i + 3]))
+
+        assert [clave for clave, _ in campos] == list(self.OBJETO)
+        assert parser.result() == self.OBJETO
+
+    def test_campo_disponible_antes_del_final(self):
+        parser = JsonObjectStream()
+        assert parser.feed('{"resumen": "listo", "torres": ["Torre') == [("resumen", "listo")]
+        assert not parser.closed
+        with pytest.raises(ValueError):
+            parser.result()
+
+    def test_error_de_sintaxis_se_detecta_al_cerrar_el_campo(self):
+        parser = JsonObjectStream()
+        parser.feed('{"resumen": "ok", ')
+        with pytest.raises(ValueError):
+            parser.feed('"torres": [1, 2,], "resto": "')
+
+    def test_texto_fuera_del_objeto(self):
+        with pytest.raises(ValueError):
+            JsonObjectStream().feed("Aquí está el análisis: {")
+        parser = JsonObjectStream()
+        parser.feed("{}")
+        with pytest.raises(ValueError):
+            parser.feed(" {}")
+
+
+class TestAsyncRateLimiter:
+    def test_respeta_la_tasa(self):
+        """Con 20 ops/s y ráfaga 1, cinco adquisiciones tardan al menos ~0.2s."""
+        limiter = AsyncRateLimiter(20, burst=1)
+
+        async def adquirir():
+            for _ in range(5):
+                await limiter.acquire()
+
+        inicio = time.perf_counter()
+        asyncio.run(adquirir())
+        assert time.perf_counter() - inicio >= 0.18
+
+    def test_sin_limite(self):
+        limiter = AsyncRateLimiter(0)
+
+        async def adquirir():
+            for _ in range(1000):
+                await limiter.acquire()
+
+        inicio = time.perf_counter()
+        asyncio.run(adquirir())
+        assert time.perf_counter() - inicio < 0.1
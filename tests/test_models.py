@@ -6,6 +6,13 @@ Ejecutar con:
 """
 
 import pytest
+from pydantic import ValidationError
+from shared.models.analysis import (
+    ANALYSIS_SECTIONS,
+    AnalysisOutput,
+    analysis_response_format,
+    analysis_section_response_format,
+)
 from shared.models.opportunity import OpportunityPayload
 from shared.core.orchestrator import OpportunityOrchestrator
 
@@ -249,3 +256,74 @@ class TestOrchestratorInternos:
         orch = OpportunityOrchestrator.__new__(OpportunityOrchestrator)
         enriched = orch._enrich_team_recommendations(["string", 123, None], [])
         assert enriched == []
+
+
+# ============================================================
+# Tests de la salida estructurada del modelo
+# ============================================================
+
+def _objetos(nodo):
+    """Todos los sub-esquemas de tipo object"""
+    if isinstance(nodo, dict):
+        if nodo.get("type") == "object":
+            yield nodo
+        for valor in nodo.values():
+            yield from _objetos(valor)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            yield from _objetos(valor)
+
+
+class TestAnalysisOutput:
+    """Esquema estricto enviado como response_format y validación de la respuesta."""
+
+    @pytest.fixture
+    def analisis(self):
+        return {
+            "executive_summary": "Resumen",
+            "technical_assessment": "Evaluación",
+            "overall_risk_level": "Medio",
+            "timeline_estimate": {"total_duration": "3 meses", "phases": []},
+            "effort_estimate": {
+                "min_hours": 100, "max_hours": 200, "complexity": "Media", "team_size_recommended": "3 personas",
+            },
+            "team_recommendations": [{
+                "tower": "Torre IA", "team_name": "IA", "team_lead": "Ana", "team_lead_email": "ana@empresa.com",
+                "relevance_score": 1.3, "justification": "IA generativa", "estimated_involvement": "Full-time",
+            }],
+            "analysis_confidence": 0.8,
+        }
+
+    def test_esquema_estricto(self):
+        formato = analysis_response_format()
+        assert formato["type"] == "json_schema"
+        assert formato["json_schema"]["strict"] is True
+
+        objetos = list(_objetos(formato["json_schema"]["schema"]))
+        assert len(objetos) > 5
+        for objeto in objetos:
+            assert objeto["additionalProperties"] is False
+            assert objeto["required"] == list(objeto["properties"])
+        assert "default" not in str(formato) and "'title'" not in str(formato)
+
+    def test_secciones_cubren_el_esquema_sin_repetir(self):
+        campos = [campo for seccion in ANALYSIS_SECTIONS.values() for campo in seccion]
+        assert sorted(campos) == sorted(AnalysisOutput.model_fields)
+
+        esquema = analysis_section_response_format("planning")["json_schema"]["schema"]
+        assert esquema["required"] == ["timeline_estimate", "effort_estimate"]
+        assert set(esquema["$defs"]) == {"TimelineEstimate", "TimelinePhaseOutput", "EffortEstimate"}
+        for objeto in _objetos(esquema):
+            assert objeto["additionalProperties"] is False
+
+    def test_valida_y_completa_listas_vacias(self, analisis):
+        resultado = AnalysisOutput.model_validate(analisis).model_dump()
+        assert resultado["risks"] == [] and resultado["technology_stack"]["cloud"] == []
+        # Los scores fuera de rango se acotan en lugar de descartar la respuesta
+        assert resultado["team_recommendations"][0]["relevance_score"] == 1.0
+
+    def test_rechaza_campos_desconocidos_y_niveles_invalidos(self, analisis):
+        with pytest.raises(ValidationError):
+            AnalysisOutput.model_validate({**analisis, "inventado": True})
+        with pytest.raises(ValidationError):
+            AnalysisOutput.model_validate({**analisis, "overall_risk_level": "Altísimo"})
@@ -0,0 +1,422 @@
+"""
+Tests de OpenAIService: parámetros de la completion y validación de la respuesta.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import json
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from shared.services.analysis_cache import MemoryCacheBackend
+from shared.models.analysis import ANALYSIS_SECTIONS, AnalysisOutput
+from shared.services.openai_service import OpenAIService
+from shared.utils.timing import collect_timings
+from shared.utils.tokens import TRUNCATION_MARKER
+
+GRABACION = Path(__file__).parent / "benchmarks" / "recordings" / "openai_analysis.json"
+
+
+# ============================================================
+# Fixtures
+# ============================================================
+
+@pytest.fixture
+def servicio():
+    """OpenAIService sin clientes: solo se ejercitan el prompt y el parseo."""
+    servicio = OpenAIService.__new__(OpenAIService)
+    servicio.deployment = "gpt-4o-mini"
+    return servicio
+
+
+@pytest.fixture
+def completion_grabada():
+    return json.loads(GRABACION.read_text(encoding="utf-8"))
+
+
+def completion(datos, **mensaje):
+    datos = json.loads(json.dumps(datos))
+    datos["choices"][0]["message"].update(mensaje)
+    return ChatCompletion.model_validate(datos)
+
+
+def chunk(content=None, finish_reason=None, usage=None, **delta):
+    choices = [] if usage else [{"index": 0, "delta": {"content": content, **delta}, "finish_reason": finish_reason}]
+    return ChatCompletionChunk.model_validate({
+        "id": "chatcmpl-prueba", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini",
+        "choices": choices, "usage": usage,
+    })
+
+
+# ============================================================
+# Dobles
+# ============================================================
+
+class StreamFalso:
+    """AsyncStream del SDK: entrega los chunks y registra cuántos se consumieron"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumidos = 0
+        self.cerrado = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumidos >= len(self.chunks):
+            raise StopAsyncIteration
+        self.consumidos += 1
+        await asyncio.sleep(0)
+        return self.chunks[self.consumidos - 1]
+
+    async def close(self):
+        self.cerrado = True
+
+
+def servicio_con_stream(servicio, chunks):
+    stream = StreamFalso(chunks)
+    peticiones = []
+
+    async def create(**kwargs):
+        peticiones.append(kwargs)
+        return stream
+
+    servicio.streaming = True
+    servicio._async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return stream, peticiones
+
+
+class ClienteConResumenes:
+    """chat.completions.with_raw_response del SDK: resúmenes para el deployment barato y el análisis grabado"""
+
+    def __init__(self, completion_grabada, fallar_en=None):
+        self.completion_grabada = completion_grabada
+        self.fallar_en = fallar_en
+        self.resumenes = []
+        self.analisis = []
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self.create)))
+
+    async def create(self, **kwargs):
+        if kwargs["model"] != "resumen-mini":
+            self.analisis.append(kwargs)
+            respuesta = completion(self.completion_grabada)
+        else:
+            fragmento = kwargs["messages"][1]["content"]
+            self.resumenes.append(fragmento)
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+            await asyncio.sleep(0.01)
+            self.en_curso -= 1
+            if self.fallar_en is not None and self.fallar_en in fragmento:
+                raise TimeoutError("sin respuesta")
+            respuesta = completion(self.completion_grabada, content=f"Resumen: {fragmento.split(chr(10))[0][:40]}")
+        return SimpleNamespace(parse=lambda: respuesta, content=b"{}", retries_taken=0)
+
+
+def servicio_documento_largo(servicio, cliente):
+    servicio.long_document = True
+    servicio.summary_deployment = "resumen-mini"
+    servicio.summary_concurrency = 2
+    servicio.prompt_token_budget = 6000
+    servicio._summary_cache = MemoryCacheBackend()
+    servicio._async_client = cliente
+    return servicio
+
+
+class ClienteSecciones:
+    """with_raw_response del SDK: responde cada sección con sus campos del análisis grabado"""
+
+    def __init__(self, completion_grabada, fallar_seccion=None):
+        self.completion_grabada = completion_grabada
+        self.contenido = json.loads(completion_grabada["choices"][0]["message"]["content"])
+        self.fallar_seccion = fallar_seccion
+        self.peticiones = []
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self.create)))
+
+    async def create(self, **kwargs):
+        self.peticiones.append(kwargs)
+        esquema = kwargs["response_format"]["json_schema"]
+        self.en_curso += 1
+        self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        await asyncio.sleep(0.01)
+        self.en_curso -= 1
+        campos = {nombre: self.contenido[nombre] for nombre in esquema["schema"]["properties"]}
+        if esquema["name"].endswith(f"_{self.fallar_seccion}"):
+            campos = {}
+        respuesta = completion(self.completion_grabada, content=json.dumps(campos, ensure_ascii=False))
+        return SimpleNamespace(parse=lambda: respuesta, content=b"{}", retries_taken=0)
+
+
+def rfp(secciones=40):
+    return "\n\n".join(
+        f"## Requerimiento {i}\n" + f"El sistema debe integrar el módulo {i} con SAP y Dynamics. " * 40
+        for i in range(secciones)
+    )
+
+
+def trocear(texto, tamano=40):
+    return [chunk(texto[i:i + tamano]) for i in range(0, len(texto), tamano)]
+
+
+# ============================================================
+# Tests
+# ============================================================
+
+class TestSalidaEstructurada:
+    def test_completion_usa_esquema_estricto_y_es_reproducible(self, servicio):
+        kwargs = servicio._build_completion_kwargs("Oportunidad de prueba", [])
+        assert kwargs["response_format"]["json_schema"]["name"] == "opportunity_analysis"
+        assert kwargs["temperature"] == 0
+        assert kwargs["seed"] == OpenAIService.SEED
+        # El formato va en el esquema, no como ejemplo dentro del prompt
+        assert '"executive_summary":' not in kwargs["messages"][1]["content"]
+
+    def test_oportunidad_larga_se_ajusta_al_presupuesto(self, servicio):
+        servicio.prompt_token_budget = 6000
+        texto = "\n\n".join(f"## Sección {i}\nRequerimiento detallado número {i}. " * 5 for i in range(400))
+
+        with collect_timings() as timings:
+            kwargs = servicio._build_completion_kwargs(texto, [{"team_name": "Equipo IA", "tower": "Torre IA"}])
+
+        plan = timings.metadata["prompt_plan"]
+        assert plan["sections"]["opportunity"]["truncated"] is True
+        assert plan["sections"]["teams"]["truncated"] is False
+        assert plan["prompt_tokens"] <= 6000
+        assert kwargs["max_tokens"] == plan["max_tokens"]
+        assert TRUNCATION_MARKER in kwargs["messages"][1]["content"]
+
+    def test_respuesta_valida(self, servicio, completion_grabada):
+        resultado = servicio._parse_analysis_response(completion(completion_grabada))
+        contenido = json.loads(completion_grabada["choices"][0]["message"]["content"])
+        assert resultado == contenido
+
+    def test_respuesta_fuera_de_esquema(self, servicio, completion_grabada):
+        respuesta = completion(completion_grabada, content='{"executive_summary": 1}')
+        assert servicio._parse_analysis_response(respuesta) is None
+
+    def test_rechazo_del_modelo(self, servicio, completion_grabada):
+        respuesta = completion(completion_grabada, content=None, refusal="No puedo ayudar con eso")
+        assert servicio._parse_analysis_response(respuesta) is None
+
+    def test_respuesta_cortada_por_max_tokens(self, servicio, completion_grabada):
+        completion_grabada["choices"][0]["finish_reason"] = "length"
+        assert servicio._parse_analysis_response(completion(completion_grabada)) is None
+
+
+class TestStreaming:
+    def test_campos_llegan_antes_de_terminar(self, servicio, completion_grabada):
+        contenido = completion_grabada["choices"][0]["message"]["content"]
+        uso = {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}
+        stream, peticiones = servicio_con_stream(
+            servicio, trocear(contenido) + [chunk(finish_reason="stop"), chunk(usage=uso)]
+        )
+        llegadas = []
+
+        async def on_field(nombre, valor):
+            llegadas.append((nombre, stream.consumidos))
+
+        async def escenario():
+            with collect_timings() as timings:
+                resultado = await servicio.analyze_opportunity_async("Oportunidad", [], on_field=on_field)
+            return resultado, timings
+
+        resultado, timings = asyncio.run(escenario())
+
+        assert resultado == json.loads(contenido)
+        assert peticiones[0]["stream"] is True
+        nombres = [nombre for nombre, _ in llegadas]
+        assert nombres[:3] == ["executive_summary", "key_requirements", "technical_assessment"]
+        # El resumen se entrega con una fracción de la respuesta
+        assert llegadas[0][1] < len(stream.chunks) / 4
+        llamada = timings.calls[0].to_dict()
+        assert llamada["operation"] == "chat.completions.stream"
+        assert llamada["completion_tokens"] == 20 and "time_to_first_token_ms" in llamada
+        assert stream.cerrado
+
+    def test_campo_fuera_de_esquema_aborta_temprano(self, servicio):
+        contenido = '{"executive_summary": "ok", "overall_risk_level": "Altísimo", ' + '"x": "' + "relleno " * 500
+        stream, _ = servicio_con_stream(servicio, trocear(contenido, 20))
+
+        resultado = asyncio.run(servicio.analyze_opportunity_async("Oportunidad", []))
+
+        assert resultado is None
+        assert stream.consumidos < len(stream.chunks) / 4
+        assert stream.cerrado
+
+    def test_respuesta_cortada(self, servicio):
+        servicio_con_stream(servicio, [chunk('{"executive_summary": "ok", '), chunk(finish_reason="length")])
+        assert asyncio.run(servicio.analyze_opportunity_async("Oportunidad", [])) is None
+
+    def test_rechazo_en_streaming(self, servicio):
+        servicio_con_stream(servicio, [chunk(refusal="No puedo ayudar con eso")])
+        assert asyncio.run(servicio.analyze_opportunity_async("Oportunidad", [])) is None
+
+
+class TestDocumentoLargo:
+    def test_resume_por_fragmentos_sin_recortar(self, servicio, completion_grabada):
+        cliente = ClienteConResumenes(completion_grabada)
+        servicio_documento_largo(servicio, cliente)
+        texto = rfp()
+
+        async def escenario():
+            with collect_timings() as timings:
+                resultado = await servicio.analyze_opportunity_async(texto, [])
+            return resultado, timings
+
+        resultado, timings = asyncio.run(escenario())
+
+        assert resultado is not None
+        # Cada sección llega completa a algún fragmento y nada se descarta
+        assert "".join(cliente.resumenes).count("## Requerimiento") == 40
+        assert len(cliente.resumenes) <= servicio.summary_concurrency * OpenAIService.SUMMARY_ROUNDS
+        assert cliente.max_en_curso == 2
+        prompt = cliente.analisis[0]["messages"][1]["content"]
+        assert "### Parte 1/" in prompt and TRUNCATION_MARKER not in prompt
+        assert timings.metadata["prompt_plan"]["sections"]["opportunity"]["truncated"] is False
+        assert timings.metadata["long_document"]["chunks"] == len(cliente.resumenes)
+        operaciones = [c.operation for c in timings.calls]
+        assert operaciones.count("chat.completions.summary") == len(cliente.resumenes)
+
+    def test_resumenes_cacheados_por_fragmento(self, servicio, completion_grabada):
+        cliente = ClienteConResumenes(completion_grabada)
+        servicio_documento_largo(servicio, cliente)
+        texto = rfp()
+
+        async def escenario():
+            await servicio.analyze_opportunity_async(texto, [])
+            llamadas = len(cliente.resumenes)
+            with collect_timings() as timings:
+                await servicio.analyze_opportunity_async(texto, [])
+            return llamadas, timings
+
+        llamadas, timings = asyncio.run(escenario())
+        assert len(cliente.resumenes) == llamadas
+        assert timings.metadata["long_document"]["cached"] == llamadas
+
+    def test_fragmento_que_falla_se_incluye_recortado(self, servicio, completion_grabada):
+        cliente = ClienteConResumenes(completion_grabada, fallar_en="## Requerimiento 0\n")
+        servicio_documento_largo(servicio, cliente)
+
+        async def escenario():
+            with collect_timings() as timings:
+                await servicio.analyze_opportunity_async(rfp(), [])
+            return timings
+
+        timings = asyncio.run(escenario())
+        assert timings.metadata["long_document"]["failed"] == 1
+        assert "## Requerimiento 0" in cliente.analisis[0]["messages"][1]["content"]
+
+    def test_texto_que_entra_no_se_resume(self, servicio, completion_grabada):
+        cliente = ClienteConResumenes(completion_grabada)
+        servicio_documento_largo(servicio, cliente)
+
+        assert asyncio.run(servicio.analyze_opportunity_async(rfp(2), [])) is not None
+        assert cliente.resumenes == []
+
+
+class TestPrefijoCacheable:
+    EQUIPOS = [
+        {"team_name": "Equipo Datos", "tower": "Torre DATA", "team_lead": "Ana", "skills": ["Databricks"]},
+        {"team_name": "Equipo IA", "tower": "Torre IA", "team_lead": "Luis", "skills": ["Azure OpenAI"]},
+        {"team_name": "Equipo QA", "tower": "Torre Quality Assurance", "team_lead": "Eva"},
+    ]
+
+    def test_prefijo_identico_entre_oportunidades(self, servicio):
+        primera = servicio._build_completion_kwargs("Migración a la nube", self.EQUIPOS)
+        segunda = servicio._build_completion_kwargs("Chatbot de atención", list(reversed(self.EQUIPOS)))
+
+        assert primera["messages"][0] == segunda["messages"][0]
+        assert "Equipo IA (Torre IA)" in primera["messages"][0]["content"]
+        # Lo variable va al final, en el mensaje del usuario
+        assert primera["messages"][-1]["content"] == "OPORTUNIDAD:\nMigración a la nube"
+        assert "Migración" not in primera["messages"][0]["content"]
+
+    def test_registra_tokens_cacheados(self, servicio, completion_grabada):
+        completion_grabada["usage"]["prompt_tokens_details"] = {"cached_tokens": 3072}
+        respuesta = completion(completion_grabada)
+
+        async def create(**kwargs):
+            return SimpleNamespace(parse=lambda: respuesta, content=b"{}", retries_taken=0)
+
+        servicio._async_client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+        )
+
+        async def escenario():
+            with collect_timings() as timings:
+                await servicio.analyze_opportunity_async("Oportunidad", self.EQUIPOS)
+            return timings
+
+        llamada = asyncio.run(escenario()).calls[0].to_dict()
+        assert llamada["cached_tokens"] == 3072
+        assert llamada["prompt_tokens"] == completion_grabada["usage"]["prompt_tokens"]
+
+
+class TestDosEtapas:
+    CATALOGO = [
+        {"team_name": f"Equipo {torre} {i}", "tower": f"Torre {torre}", "skills": [skill]}
+        for torre, skill in (("IA", "Azure OpenAI"), ("DATA", "Databricks"), ("ERP", "SAP"), ("Apps", "React"))
+        for i in range(5)
+    ] + [{"team_name": "Equipo QA", "tower": "Torre Quality Assurance"}]
+
+    def test_secciones_en_paralelo_con_equipos_candidatos(self, servicio, completion_grabada):
+        cliente = ClienteSecciones(completion_grabada)
+        servicio._async_client = cliente
+        servicio.two_stage = True
+        servicio.triage_max_teams = 6
+        campos = []
+
+        async def on_field(nombre, valor):
+            campos.append(nombre)
+
+        async def escenario():
+            with collect_timings() as timings:
+                resultado = await servicio.analyze_opportunity_async(
+                    "Asistente con Azure OpenAI", self.CATALOGO, on_field=on_field
+                )
+            return resultado, timings
+
+        resultado, timings = asyncio.run(escenario())
+
+        assert resultado == cliente.contenido
+        assert len(cliente.peticiones) == len(ANALYSIS_SECTIONS) == cliente.max_en_curso
+        # El mensaje de sistema es el prefijo fijo; las torres candidatas y las
+        # obligatorias van al inicio del mensaje del usuario, común a las secciones
+        sistemas = {p["messages"][0]["content"] for p in cliente.peticiones}
+        assert len(sistemas) == 1
+        assert "Equipo ERP" not in sistemas.pop()
+        usuario = cliente.peticiones[0]["messages"][1]["content"]
+        assert usuario.startswith("EQUIPOS/TORRES DISPONIBLES:\n")
+        assert "Torre IA" in usuario and "Torre Quality Assurance" in usuario and "Torre ERP" not in usuario
+        assert usuario.index("Torre IA") < usuario.index("OPORTUNIDAD:\nAsistente con Azure OpenAI")
+        assert timings.metadata["triage"]["selected_teams"] == 6
+        assert sorted(campos) == sorted(AnalysisOutput.model_fields)
+        operaciones = {c.operation for c in timings.calls}
+        assert operaciones == {f"chat.completions.{seccion}" for seccion in ANALYSIS_SECTIONS}
+
+    def test_prefijo_fijo_aunque_cambien_las_torres_candidatas(self, servicio, completion_grabada):
+        """El triage de cada petición no altera el mensaje de sistema."""
+        cliente = ClienteSecciones(completion_grabada)
+        servicio._async_client = cliente
+        servicio.two_stage = True
+        servicio.triage_max_teams = 6
+
+        for texto in ("Asistente con Azure OpenAI", "Migración de SAP ERP"):
+            asyncio.run(servicio.analyze_opportunity_async(texto, self.CATALOGO))
+
+        assert len({p["messages"][0]["content"] for p in cliente.peticiones}) == 1
+        assert len({p["messages"][1]["content"].split("OPORTUNIDAD:")[0] for p in cliente.peticiones}) == 2
+
+    def test_seccion_invalida_descarta_el_analisis(self, servicio, completion_grabada):
+        servicio._async_client = ClienteSecciones(completion_grabada, fallar_seccion="risks")
+        servicio.two_stage = True
+        assert asyncio.run(servicio.analyze_opportunity_async("Oportunidad", self.CATALOGO)) is None
@@ -0,0 +1,468 @@
+"""
+Tests del flujo completo del orquestador con servicios simulados.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+import pytest
+from shared.core.orchestrator import OpportunityOrchestrator
+from shared.core.registry import SETTINGS_KEYS
+from shared.services.blob_storage_service import BlobStorageService
+from shared.utils import circuit
+from shared.utils.deadline import Deadline, deadline_scope
+from shared.utils.profiling import ProfilingSettings
+
+
+# ============================================================
+# Servicios simulados
+# ============================================================
+
+EQUIPOS = [
+    {"id": "1", "name": "IA", "tower": "Torre IA", "leader": "María López", "leader_email": "mlopez@empresa.com"},
+    {"id": "2", "name": "PMO", "tower": "Torre PMO", "leader": "Ana Ruiz", "leader_email": "aruiz@empresa.com"},
+]
+
+ANALISIS = {
+    "executive_summary": "Resumen de prueba",
+    "required_towers": ["Torre IA"],
+    "team_recommendations": [{"team_name": "IA", "tower": "Torre IA", "relevance_score": 0.9}],
+    "risks": [],
+    "overall_risk_level": "Bajo",
+    "analysis_confidence": 0.8,
+}
+
+
+class OpenAIFalso:
+    PROMPT_VERSION = "test"
+    deployment = "modelo-falso"
+
+    def __init__(self, espera: float = 0.0):
+        self.espera = espera
+        self.llamadas = 0
+
+    async def analyze_opportunity_async(self, opportunity_text, available_teams):
+        self.llamadas += 1
+        await asyncio.sleep(self.espera)
+        return dict(ANALISIS)
+
+
+class OpenAIStreamingFalso(OpenAIFalso):
+    """Entrega los campos del análisis de a uno, como el streaming de OpenAIService"""
+    streaming = True
+
+    async def analyze_opportunity_async(self, opportunity_text, available_teams, on_field=None):
+        self.llamadas += 1
+        for nombre, valor in ANALISIS.items():
+            await asyncio.sleep(0.01)
+            if on_field:
+                await on_field(nombre, valor)
+        return dict(ANALISIS)
+
+
+class SearchFalso:
+    async def get_all_teams_async(self):
+        return list(EQUIPOS)
+
+
+class BlobFalso:
+    def __init__(self):
+        self.subidas = 0
+
+    async def upload_pdf_async(self, pdf_bytes, blob_name):
+        self.subidas += 1
+        return f"https://blob.local/{blob_name}"
+
+
+class CosmosFalso:
+    def __init__(self):
+        self.registros = []
+
+    async def save_analysis_async(self, record):
+        self.registros.append(record)
+        return record
+
+    async def set_pdf_url_async(self, record_id, opportunity_id, pdf_url):
+        for registro in self.registros:
+            if registro["id"] == record_id:
+                registro["pdf_url"] = pdf_url
+                return True
+        return False
+
+    async def get_latest_analysis_async(self, opportunity_id):
+        registros = [r for r in self.registros if r["opportunity_id"] == opportunity_id]
+        return registros[-1] if registros else None
+
+
+# ============================================================
+# Fixtures
+# ============================================================
+
+@pytest.fixture
+def orquestador(monkeypatch):
+    """Orquestador con los cuatro servicios reemplazados por dobles en memoria."""
+    for key in SETTINGS_KEYS:
+        monkeypatch.delenv(key, raising=False)
+    orch = OpportunityOrchestrator()
+    orch.openai_service = OpenAIFalso()
+    orch.search_service = SearchFalso()
+    orch.blob_service = BlobFalso()
+    orch.cosmos_service = CosmosFalso()
+    orch.openai_enabled = orch.search_enabled = orch.blob_enabled = orch.cosmos_enabled = True
+    return orch
+
+
+@pytest.fixture
+def payload():
+    return {
+        "opportunityid": "2f1511d1-0b08-42bc-aeea-62f0f539194b",
+        "name": "Implementación Sistema de IA",
+        "description": "El cliente requiere un sistema de inteligencia artificial.",
+        "SdkMessage": "Create",
+    }
+
+
+# ============================================================
+# Tests del flujo
+# ============================================================
+
+class TestProcessOpportunity:
+    """Tests de process_opportunity de punta a punta."""
+
+    def test_flujo_exitoso(self, orquestador, payload):
+        """Un análisis exitoso retorna análisis enriquecido, card, PDF y registro."""
+        result = asyncio.run(orquestador.process_opportunity(payload))
+
+        assert result["success"] is True
+        assert result["analysis"]["team_recommendations"][0]["team_lead"] == "María López"
+        assert result["outputs"]["adaptive_card"]
+        assert result["outputs"]["pdf_url"].startswith("https://blob.local/")
+        assert len(orquestador.cosmos_service.registros) == 1
+
+    def test_sin_openai_retorna_error_de_configuracion(self, orquestador, payload):
+        """Sin OpenAI configurado se retorna SERVICE_NOT_CONFIGURED."""
+        orquestador.openai_service = None
+        result = asyncio.run(orquestador.process_opportunity(payload))
+        assert result["error"]["code"] == "SERVICE_NOT_CONFIGURED"
+
+    def test_analisis_concurrentes_no_bloquean_el_event_loop(self, orquestador, payload):
+        """Varias peticiones simultáneas comparten la espera del modelo."""
+        orquestador.openai_service = OpenAIFalso(espera=0.2)
+
+        async def lanzar():
+            return await asyncio.gather(*(orquestador.process_opportunity(dict(payload)) for _ in range(5)))
+
+        loop = asyncio.new_event_loop()
+        try:
+            inicio = loop.time()
+            results = loop.run_until_complete(lanzar())
+            duracion = loop.time() - inicio
+        finally:
+            loop.close()
+
+        assert all(r["success"] for r in results)
+        assert duracion < 0.2 * 5
+
+    def test_update_sin_cambios_de_texto_usa_cache(self, orquestador, payload):
+        """Un Update que solo cambia statuscode/modifiedon no vuelve a llamar al modelo."""
+        primero = asyncio.run(orquestador.process_opportunity(dict(payload)))
+        update = {**payload, "SdkMessage": "Update", "statuscode": 3, "modifiedon": "2026-03-01T10:00:00Z"}
+        segundo = asyncio.run(orquestador.process_opportunity(update))
+
+        assert orquestador.openai_service.llamadas == 1
+        assert primero["metadata"]["analysis_cache"]["hit"] is False
+        assert segundo["metadata"]["analysis_cache"]["hit"] is True
+        assert segundo["analysis"]["executive_summary"] == primero["analysis"]["executive_summary"]
+
+    def test_cambio_de_descripcion_invalida_cache(self, orquestador, payload):
+        """Si cambia el texto analizado se realiza un nuevo análisis."""
+        asyncio.run(orquestador.process_opportunity(dict(payload)))
+        asyncio.run(orquestador.process_opportunity({**payload, "description": "Nuevo alcance"}))
+        assert orquestador.openai_service.llamadas == 2
+
+    @pytest.mark.parametrize("modo", ["two_stage", "long_document"])
+    def test_cambio_de_modo_de_analisis_invalida_cache(self, orquestador, payload, modo):
+        """Un análisis en dos etapas o de documento largo no reutiliza el del modo anterior."""
+        primero = asyncio.run(orquestador.process_opportunity(dict(payload)))
+        setattr(orquestador.openai_service, modo, True)
+        segundo = asyncio.run(orquestador.process_opportunity(dict(payload)))
+
+        assert orquestador.openai_service.llamadas == 2
+        assert segundo["metadata"]["analysis_cache"]["key"] != primero["metadata"]["analysis_cache"]["key"]
+
+    def test_catalogo_se_consulta_una_vez_con_peticiones_concurrentes(self, orquestador, payload):
+        """Las peticiones simultáneas comparten la única consulta del catálogo en vuelo."""
+        consultas = []
+
+        class SearchLento(SearchFalso):
+            async def get_all_teams_async(self):
+                consultas.append(1)
+                await asyncio.sleep(0.05)
+                return list(EQUIPOS)
+
+        orquestador.search_service = SearchLento()
+
+        async def lanzar():
+            return await asyncio.gather(*(orquestador.process_opportunity(dict(payload)) for _ in range(4)))
+
+        assert all(r["success"] for r in asyncio.run(lanzar()))
+        assert len(consultas) == 1
+
+    def test_eventos_de_progreso(self, orquestador, payload):
+        """La card se notifica antes que un PDF lento y el último evento es completed."""
+        class BlobLento(BlobFalso):
+            async def upload_pdf_async(self, pdf_bytes, blob_name):
+                await asyncio.sleep(0.2)
+                return await super().upload_pdf_async(pdf_bytes, blob_name)
+
+        orquestador.blob_service = BlobLento()
+        eventos = []
+
+        async def on_event(evento):
+            eventos.append(evento)
+
+        result = asyncio.run(orquestador.process_opportunity(payload, on_event))
+        nombres = [e["event"] for e in eventos]
+
+        assert nombres[0] == "validated"
+        assert nombres.index("analysis_ready") < nombres.index("card_ready") < nombres.index("pdf_ready")
+        assert nombres[-1] == "completed"
+        assert eventos[-1]["data"] == result
+        card = next(e for e in eventos if e["event"] == "card_ready")
+        assert card["data"]["adaptive_card"] == result["outputs"]["adaptive_card"]
+
+    def test_streaming_emite_card_preliminar_durante_el_analisis(self, orquestador, payload):
+        orquestador.openai_service = OpenAIStreamingFalso()
+        eventos = []
+
+        async def on_event(evento):
+            eventos.append(evento)
+
+        result = asyncio.run(orquestador.process_opportunity(payload, on_event))
+        nombres = [e["event"] for e in eventos]
+
+        assert result["success"] is True
+        assert nombres.index("card_preview") < nombres.index("analysis_ready")
+        preview = eventos[nombres.index("card_preview")]
+        assert preview["step"] == "analyze" and preview["status"] == "running"
+        assert preview["data"]["adaptive_card"]["type"] == "AdaptiveCard"
+        # Los equipos de la card preliminar ya vienen enriquecidos con el catálogo
+        assert preview["data"]["analysis_partial"]["team_recommendations"][0]["team_lead"] == "María López"
+
+    def test_evento_de_error(self, orquestador, payload):
+        orquestador.openai_service = None
+        eventos = []
+
+        async def on_event(evento):
+            eventos.append(evento)
+
+        asyncio.run(orquestador.process_opportunity(payload, on_event))
+        assert eventos[-1]["event"] == "error"
+        assert eventos[-1]["data"]["error"]["code"] == "SERVICE_NOT_CONFIGURED"
+
+    def test_metadata_incluye_tiempos_por_paso_y_dependencia(self, orquestador, payload):
+        """metadata.timings trae la duración de cada paso, el render del PDF y los tamaños."""
+        result = asyncio.run(orquestador.process_opportunity(payload))
+        timings = result["metadata"]["timings"]
+
+        assert set(timings["steps"]) == {
+            "validate", "prepare_text", "load_teams", "detect_changes", "analyze",
+            "enrich", "save_cosmos", "generate_pdf", "link_pdf", "adaptive_card", "tower_leaders",
+        }
+        assert all(step["status"] == "ok" for step in timings["steps"].values())
+        pdf = next(call for call in timings["calls"] if call["dependency"] == "pdf")
+        assert pdf["response_bytes"] > 0
+        assert timings["request_bytes"] > 0 and timings["response_bytes"] > 0
+        assert timings["total_ms"] >= timings["steps"]["generate_pdf"]["duration_ms"]
+
+    def test_profiling_solicitado_agrega_artefactos(self, orquestador, payload, tmp_path):
+        """Con PROFILE_REQUESTS=header y X-Profile la respuesta indica dónde quedó el perfil."""
+        orquestador.profiling = ProfilingSettings("header", directory=str(tmp_path))
+        orquestador.blob_service = None
+
+        sin_header = asyncio.run(orquestador.process_opportunity(dict(payload)))
+        con_header = asyncio.run(orquestador.process_opportunity(dict(payload), profile=True))
+
+        assert "profile" not in sin_header["metadata"]
+        perfil = con_header["metadata"]["profile"]
+        assert perfil["storage"] == "disk"
+        assert perfil["files"] == ["cpu.prof", "cpu.txt", "memory.txt"]
+
+    def test_error_tambien_reporta_tiempos(self, orquestador, payload):
+        orquestador.openai_service = None
+        result = asyncio.run(orquestador.process_opportunity(payload))
+        assert "validate" in result["metadata"]["timings"]["steps"]
+
+
+class TestDeteccionDeCambios:
+    """Update comparados con el snapshot guardado en Cosmos (sin caché de análisis)."""
+
+    @pytest.fixture
+    def sin_cache(self, orquestador):
+        orquestador.analysis_cache = None
+        return orquestador
+
+    def actualizar(self, orquestador, payload, **cambios):
+        update = {**payload, "SdkMessage": "Update", **cambios}
+        return asyncio.run(orquestador.process_opportunity(update))
+
+    def test_cambio_monetario_reutiliza_analisis_y_regenera_pdf(self, sin_cache, payload):
+        asyncio.run(sin_cache.process_opportunity(dict(payload)))
+        result = self.actualizar(sin_cache, payload, estimatedvalue=150000)
+
+        assert sin_cache.openai_service.llamadas == 1
+        assert sin_cache.blob_service.subidas == 2
+        assert result["metadata"]["change_detection"]["kind"] == "monetary"
+        assert result["metadata"]["change_detection"]["fields"] == ["estimatedvalue"]
+
+    def test_cambio_de_estado_reutiliza_analisis_y_pdf(self, sin_cache, payload):
+        primero = asyncio.run(sin_cache.process_opportunity(dict(payload)))
+        result = self.actualizar(sin_cache, payload, statecode=1, _ownerid_value="otro")
+
+        assert sin_cache.openai_service.llamadas == 1
+        assert sin_cache.blob_service.subidas == 1
+        assert result["outputs"]["pdf_url"] == primero["outputs"]["pdf_url"]
+        assert result["metadata"]["change_detection"]["kind"] == "irrelevant"
+
+    def test_cambio_de_texto_reanaliza(self, sin_cache, payload):
+        asyncio.run(sin_cache.process_opportunity(dict(payload)))
+        result = self.actualizar(sin_cache, payload, description="Nuevo alcance con app móvil")
+
+        assert sin_cache.openai_service.llamadas == 2
+        assert result["metadata"]["change_detection"]["kind"] == "textual"
+
+    def test_cambio_de_prompt_reanaliza(self, sin_cache, payload):
+        asyncio.run(sin_cache.process_opportunity(dict(payload)))
+        sin_cache.openai_service.PROMPT_VERSION = "otra"
+        result = self.actualizar(sin_cache, payload, estimatedvalue=1)
+
+        assert sin_cache.openai_service.llamadas == 2
+        assert result["metadata"]["change_detection"]["kind"] == "new"
+
+    def test_registro_guarda_snapshot_y_pdf(self, sin_cache, payload):
+        asyncio.run(sin_cache.process_opportunity(dict(payload)))
+        registro = sin_cache.cosmos_service.registros[0]
+        assert registro["snapshot"]["name"] == payload["name"]
+        assert registro["pdf_url"].startswith("https://blob.local/")
+        assert registro["prompt_version"] == "test"
+
+
+class TestDeadline:
+    """Presupuesto de tiempo: el análisis y la card llegan a tiempo aunque falten PDF o Cosmos."""
+
+    def test_respuesta_informa_deadline_sin_degradacion(self, orquestador, payload):
+        result = asyncio.run(orquestador.process_opportunity(payload))
+        assert result["metadata"]["degraded"] == []
+        assert result["metadata"]["deadline"]["remaining_seconds"] > 0
+
+    def test_pdf_lento_se_corta_y_se_responde_con_card(self, orquestador, payload):
+        class BlobLento(BlobFalso):
+            async def upload_pdf_async(self, pdf_bytes, blob_name):
+                await asyncio.sleep(5)
+
+        orquestador.blob_service = BlobLento()
+        orquestador.deadline_margin = 0.0
+        orquestador._STEP_MIN_BUDGETS = {"generate_pdf": 0.0, "save_cosmos": 0.0}
+
+        async def con_deadline():
+            with deadline_scope(Deadline(1.0)):
+                return await orquestador.process_opportunity(payload)
+
+        result = asyncio.run(con_deadline())
+        degradados = {d["step"]: d["status"] for d in result["metadata"]["degraded"]}
+
+        assert result["success"] is True
+        assert result["outputs"]["adaptive_card"]
+        assert result["outputs"]["pdf_url"] is None
+        assert degradados["generate_pdf"] == "timeout"
+
+    def test_pdf_lento_no_impide_guardar_en_cosmos(self, orquestador, payload):
+        """El registro se guarda en paralelo con el PDF; la URL se agrega solo si el PDF termina."""
+        class BlobLento(BlobFalso):
+            async def upload_pdf_async(self, pdf_bytes, blob_name):
+                await asyncio.sleep(5)
+
+        orquestador.blob_service = BlobLento()
+        orquestador.deadline_margin = 0.0
+        orquestador._STEP_MIN_BUDGETS = {"generate_pdf": 0.0, "save_cosmos": 0.0}
+
+        async def con_deadline():
+            with deadline_scope(Deadline(1.0)):
+                return await orquestador.process_opportunity(payload)
+
+        result = asyncio.run(con_deadline())
+        degradados = {d["step"]: d["status"] for d in result["metadata"]["degraded"]}
+
+        assert "save_cosmos" not in degradados
+        assert result["outputs"]["cosmos_record_id"]
+        [registro] = orquestador.cosmos_service.registros
+        assert registro["pdf_url"] is None
+
+    def test_sin_presupuesto_se_omiten_pdf_y_cosmos(self, orquestador, payload):
+        orquestador.deadline_margin = 0.0
+
+        async def con_deadline():
+            with deadline_scope(Deadline(3.0)):
+                return await orquestador.process_opportunity(payload)
+
+        result = asyncio.run(con_deadline())
+        degradados = {d["step"]: d["status"] for d in result["metadata"]["degraded"]}
+
+        assert result["success"] is True
+        assert degradados == {"generate_pdf": "skipped", "save_cosmos": "skipped"}
+        assert orquestador.blob_service.subidas == 0
+        assert orquestador.cosmos_service.registros == []
+
+    def test_analisis_que_excede_el_deadline(self, orquestador, payload):
+        orquestador.openai_service = OpenAIFalso(espera=1.0)
+        orquestador.deadline_margin = 0.0
+
+        async def con_deadline():
+            with deadline_scope(Deadline(0.2)):
+                return await orquestador.process_opportunity(payload)
+
+        result = asyncio.run(con_deadline())
+        assert result["success"] is False
+        assert result["error"]["code"] == "DEADLINE_EXCEEDED"
+
+
+class TestCircuitBreaker:
+    """Una dependencia con el circuito abierto se omite al instante y se informa en la respuesta."""
+
+    @pytest.fixture(autouse=True)
+    def breakers_limpios(self):
+        circuit.reset_circuit_breakers()
+        yield
+        circuit.reset_circuit_breakers()
+
+    def test_blob_con_circuito_abierto_se_omite(self, orquestador, payload):
+        class ClienteBlob:
+            subidas = 0
+
+            def get_blob_client(self, container, blob):
+                return self
+
+            async def upload_blob(self, *args, **kwargs):
+                ClienteBlob.subidas += 1
+
+        blob = BlobStorageService.__new__(BlobStorageService)
+        blob.container_name = "analysis-reports"
+        blob._container_checked = True
+        blob._async_blob_service_client = ClienteBlob()
+        orquestador.blob_service = blob
+        circuit.circuit_breaker("blob")._transition(circuit.OPEN)
+
+        result = asyncio.run(orquestador.process_opportunity(payload))
+        omitidas = result["metadata"]["skipped_dependencies"]
+
+        assert result["success"] is True
+        assert result["outputs"]["pdf_url"] is None
+        assert ClienteBlob.subidas == 0
+        assert [(o["dependency"], o["operation"]) for o in omitidas] == [("blob", "upload_pdf")]
+        assert omitidas[0]["retry_in_seconds"] > 0
+
+    def test_sin_circuitos_abiertos(self, orquestador, payload):
+        result = asyncio.run(orquestador.process_opportunity(payload))
+        assert result["metadata"]["skipped_dependencies"] == []
@@ -0,0 +1,138 @@
+"""
+Tests del ejecutor de pipeline (DAG de pasos).
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+import time
+
+import pytest
+from shared.core.pipeline import (
+    PipelineAbort,
+    PipelineExecutor,
+    PipelineStep,
+    StepFailedError,
+)
+from shared.utils.deadline import Deadline
+
+
+def paso(nombre, inputs=(), outputs=(), espera=0.0, error=None, **kwargs):
+    """Crea un PipelineStep que espera `espera` segundos y produce sus salidas."""
+    async def func(ctx):
+        await asyncio.sleep(espera)
+        if error:
+            raise error
+        return {key: f"{nombre}:{key}" for key in outputs}
+    return PipelineStep(nombre, func, tuple(inputs), tuple(outputs), **kwargs)
+
+
+class TestPipelineExecutor:
+    """Tests de planificación, timeouts y semántica requerido/opcional."""
+
+    def test_pasos_independientes_corren_en_paralelo(self):
+        """Tres pasos de 0.2s que solo dependen de 'a' deben tardar ~0.2s, no 0.6s."""
+        executor = PipelineExecutor([
+            paso("a", outputs=["a"]),
+            paso("b", ["a"], ["b"], espera=0.2),
+            paso("c", ["a"], ["c"], espera=0.2),
+            paso("d", ["a"], ["d"], espera=0.2),
+        ])
+        inicio = time.perf_counter()
+        run = asyncio.run(executor.run({}))
+        assert time.perf_counter() - inicio < 0.5
+        assert run.context["b"] == "b:b"
+        assert all(r.status == "ok" for r in run.steps.values())
+
+    def test_paso_opcional_fallido_deja_salidas_en_none(self):
+        """Si falla un paso opcional, sus salidas son None y el resto continúa."""
+        executor = PipelineExecutor([
+            paso("a", outputs=["a"], error=RuntimeError("caído"), required=False),
+            paso("b", ["a"], ["b"]),
+        ])
+        run = asyncio.run(executor.run({}))
+        assert run.context["a"] is None
+        assert run.context["b"] == "b:b"
+        assert run.steps["a"].status == "failed"
+
+    def test_paso_requerido_fallido_aborta(self):
+        """Un paso requerido con error lanza StepFailedError."""
+        executor = PipelineExecutor([paso("a", outputs=["a"], error=RuntimeError("caído"))])
+        with pytest.raises(StepFailedError):
+            asyncio.run(executor.run({}))
+
+    def test_timeout_por_paso(self):
+        """Un paso opcional que excede su timeout queda marcado como 'timeout'."""
+        executor = PipelineExecutor([
+            paso("lento", outputs=["x"], espera=1.0, timeout=0.05, required=False),
+        ])
+        run = asyncio.run(executor.run({}))
+        assert run.steps["lento"].status == "timeout"
+        assert run.context["x"] is None
+
+    def test_pipeline_abort_se_propaga(self):
+        """PipelineAbort termina el pipeline con su código de error."""
+        executor = PipelineExecutor([
+            paso("a", outputs=["a"], error=PipelineAbort("VALIDATION_ERROR", "inválido")),
+            paso("b", ["a"], ["b"]),
+        ])
+        with pytest.raises(PipelineAbort) as exc:
+            asyncio.run(executor.run({}))
+        assert exc.value.code == "VALIDATION_ERROR"
+
+    def test_detecta_ciclos(self):
+        """Un ciclo de dependencias se rechaza al construir el ejecutor."""
+        with pytest.raises(ValueError):
+            PipelineExecutor([paso("a", ["b"], ["a"]), paso("b", ["a"], ["b"])])
+
+    def test_detecta_entradas_sin_productor(self):
+        """Una entrada que ningún paso produce se rechaza al construir el ejecutor."""
+        with pytest.raises(ValueError):
+            PipelineExecutor([paso("a", ["inexistente"], ["a"])])
+
+    def test_on_step_notifica_en_orden_de_finalizacion(self):
+        """El callback recibe cada paso al completarse, con sus salidas ya en el contexto."""
+        executor = PipelineExecutor([
+            paso("a", outputs=["a"]),
+            paso("lento", ["a"], ["lento"], espera=0.1),
+            paso("rapido", ["a"], ["rapido"], espera=0.01),
+        ])
+        vistos = []
+
+        async def on_step(result, ctx):
+            vistos.append((result.name, result.name in ctx))
+
+        asyncio.run(executor.run({}, on_step))
+        assert vistos == [("a", True), ("rapido", True), ("lento", True)]
+
+    def test_error_en_on_step_no_aborta(self):
+        executor = PipelineExecutor([paso("a", outputs=["a"]), paso("b", ["a"], ["b"])])
+
+        async def on_step(result, ctx):
+            raise RuntimeError("consumidor caído")
+
+        run = asyncio.run(executor.run({}, on_step))
+        assert run.context["b"] == "b:b"
+
+    def test_deadline_omite_opcionales_sin_presupuesto(self):
+        """Un paso opcional cuyo min_budget supera el tiempo restante se omite sin ejecutarse."""
+        executor = PipelineExecutor([
+            paso("a", outputs=["a"]),
+            paso("pdf", ["a"], ["pdf"], required=False, min_budget=30.0),
+            paso("card", ["a"], ["card"]),
+        ])
+        run = asyncio.run(executor.run({}, deadline=Deadline(5.0)))
+        assert run.steps["pdf"].status == "skipped"
+        assert run.context["pdf"] is None
+        assert run.context["card"] == "card:card"
+
+    def test_deadline_acota_el_timeout_del_paso(self):
+        """El timeout efectivo es el menor entre el del paso y el tiempo restante."""
+        executor = PipelineExecutor([
+            paso("lento", outputs=["x"], espera=1.0, timeout=30.0, required=False),
+        ])
+        inicio = time.perf_counter()
+        run = asyncio.run(executor.run({}, deadline=Deadline(0.1)))
+        assert time.perf_counter() - inicio < 0.5
+        assert run.steps["lento"].status == "timeout"
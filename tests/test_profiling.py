@@ -0,0 +1,86 @@
+"""
+Tests del profiling opcional por invocación.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+import marshal
+
+from shared.utils.profiling import ProfilingSettings, RequestProfiler, header_requested, save_profile
+
+
+class BlobFalso:
+    container_name = "pdfs"
+
+    def __init__(self, falla=False):
+        self.falla = falla
+        self.blobs = {}
+
+    async def upload_bytes_async(self, data, blob_name, content_type):
+        if self.falla:
+            return False
+        self.blobs[blob_name] = data
+        return True
+
+
+class TestProfilingSettings:
+    """Tests de la decisión de perfilar."""
+
+    def test_deshabilitado_por_defecto(self, monkeypatch):
+        for key in ("PROFILE_REQUESTS", "PROFILE_OPPORTUNITY_IDS"):
+            monkeypatch.delenv(key, raising=False)
+        settings = ProfilingSettings.from_env()
+        assert not settings.should_profile("opp-1", requested=True)
+
+    def test_header_solo_en_modo_header(self):
+        assert ProfilingSettings("header").should_profile("opp-1", requested=True)
+        assert not ProfilingSettings("header").should_profile("opp-1", requested=False)
+
+    def test_oportunidades_configuradas_se_perfilan_siempre(self, monkeypatch):
+        monkeypatch.setenv("PROFILE_OPPORTUNITY_IDS", "opp-1, opp-2")
+        settings = ProfilingSettings.from_env()
+        assert settings.should_profile("opp-2")
+        assert not settings.should_profile("opp-3")
+
+    def test_valores_del_header(self):
+        assert header_requested("true") and header_requested("1")
+        assert not header_requested(None) and not header_requested("false")
+
+
+class TestRequestProfiler:
+    def test_genera_perfil_de_cpu_y_memoria(self):
+        profiler = RequestProfiler(top=5)
+        assert profiler.start()
+        datos = [str(i) * 10 for i in range(10000)]
+        resultado = profiler.stop()
+
+        assert len(datos) == 10000
+        assert resultado["summary"]["peak_memory_bytes"] > 0
+        assert isinstance(marshal.loads(resultado["artifacts"]["cpu.prof"]), dict)
+        assert b"Pico:" in resultado["artifacts"]["memory.txt"]
+
+    def test_un_solo_profiler_activo(self):
+        primero, segundo = RequestProfiler(), RequestProfiler()
+        assert primero.start()
+        try:
+            assert not segundo.start()
+        finally:
+            primero.stop()
+        assert segundo.start()
+        segundo.stop()
+
+
+class TestSaveProfile:
+    def test_sube_a_blob(self):
+        blob = BlobFalso()
+        ubicacion = asyncio.run(save_profile({"cpu.txt": b"x"}, "opp-1", blob))
+        assert ubicacion["storage"] == "blob"
+        assert list(blob.blobs) == [f"{ubicacion['prefix']}/cpu.txt"]
+
+    def test_sin_blob_o_con_error_guarda_en_disco(self, tmp_path):
+        ubicacion = asyncio.run(save_profile({"cpu.txt": b"x"}, "opp-1", BlobFalso(falla=True), str(tmp_path)))
+        assert ubicacion["storage"] == "disk"
+        with open(f"{ubicacion['path']}/cpu.txt", "rb") as f:
+            assert f.read() == b"x"
@@ -0,0 +1,122 @@
+"""
+Tests del registro de orquestador a nivel de proceso.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+
+import pytest
+from shared.core import orchestrator as orchestrator_module
+from shared.core.registry import OrchestratorRegistry, SETTINGS_KEYS
+
+
+# ============================================================
+# Fixtures
+# ============================================================
+
+@pytest.fixture
+def entorno_vacio(monkeypatch):
+    """Elimina las APP SETTINGS para que ningún servicio se inicialice."""
+    for key in SETTINGS_KEYS:
+        monkeypatch.delenv(key, raising=False)
+
+
+class SearchServiceFalso:
+    """SearchService en memoria que cuenta las consultas al catálogo."""
+
+    def __init__(self):
+        self.llamadas = 0
+
+    async def get_all_teams_async(self):
+        self.llamadas += 1
+        return [{"name": "TORRE IA", "tower": "Torre IA"}]
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# Tests de OrchestratorRegistry
+# ============================================================
+
+class TestOrchestratorRegistry:
+    """Tests del ciclo de vida del orquestador compartido."""
+
+    def test_reutiliza_la_misma_instancia(self, entorno_vacio):
+        """Invocaciones sucesivas deben recibir el mismo orquestador."""
+        registry = OrchestratorRegistry(retry_interval_seconds=3600)
+        assert registry.get() is registry.get()
+
+    def test_recrea_si_cambia_la_configuracion(self, entorno_vacio, monkeypatch):
+        """Un cambio en las APP SETTINGS debe recrear el orquestador."""
+        registry = OrchestratorRegistry(retry_interval_seconds=3600)
+        primero = registry.get()
+        monkeypatch.setenv("AZURE_SEARCH_INDEX_TEAMS", "otro-indice")
+        assert registry.get() is not primero
+
+    def test_recrea_si_cambia_un_parametro_del_analisis(self, entorno_vacio, monkeypatch):
+        """Los parámetros leídos al construir el orquestador (p. ej. OPENAI_TWO_STAGE) también lo recrean."""
+        registry = OrchestratorRegistry(retry_interval_seconds=3600)
+        primero = registry.get()
+        monkeypatch.setenv("OPENAI_TWO_STAGE", "true")
+        assert registry.get() is not primero
+
+    def test_orquestador_reemplazado_se_cierra_al_terminar_sus_invocaciones(self, entorno_vacio, monkeypatch):
+        """Una invocación en curso sigue usando sus clientes aunque la configuración cambie."""
+        cerrados = []
+        monkeypatch.setattr(orchestrator_module.OpportunityOrchestrator, "close", lambda self: cerrados.append(self))
+        registry = OrchestratorRegistry(retry_interval_seconds=3600)
+
+        with registry.lease() as en_uso:
+            monkeypatch.setenv("AZURE_SEARCH_INDEX_TEAMS", "otro-indice")
+            nuevo = registry.get()
+            assert nuevo is not en_uso
+            assert cerrados == []
+        assert cerrados == [en_uso]
+
+        # Sin invocaciones en curso el reemplazo se cierra de inmediato
+        monkeypatch.setenv("AZURE_SEARCH_INDEX_TEAMS", "tercer-indice")
+        registry.get()
+        assert cerrados == [en_uso, nuevo]
+
+    def test_reintenta_servicios_fallidos(self, entorno_vacio, monkeypatch):
+        """Los servicios que fallaron al iniciar se reintentan pasado el intervalo."""
+        registry = OrchestratorRegistry(retry_interval_seconds=0)
+        orch = registry.get()
+        assert orch.search_enabled is False
+        assert "SearchService" in orch.failed_services
+
+        services = tuple(
+            (name, attr, enabled, SearchServiceFalso if name == "SearchService" else cls)
+            for name, attr, enabled, cls in orchestrator_module.OpportunityOrchestrator._SERVICES
+        )
+        monkeypatch.setattr(orchestrator_module.OpportunityOrchestrator, "_SERVICES", services)
+
+        assert registry.get() is orch
+        assert orch.search_enabled is True
+        assert "SearchService" not in orch.failed_services
+
+
+class TestCatalogoDeEquipos:
+    """Tests de la caché del catálogo de equipos del orquestador."""
+
+    def test_catalogo_cacheado_dentro_del_ttl(self, entorno_vacio):
+        """Dentro del TTL no se vuelve a consultar Azure Search."""
+        orch = OrchestratorRegistry(retry_interval_seconds=3600).get()
+        orch.search_service = SearchServiceFalso()
+
+        asyncio.run(orch._get_teams_catalog())
+        asyncio.run(orch._get_teams_catalog())
+        assert orch.search_service.llamadas == 1
+
+    def test_catalogo_expirado_se_recarga(self, entorno_vacio):
+        """Con TTL 0 cada petición recarga el catálogo."""
+        orch = OrchestratorRegistry(retry_interval_seconds=3600).get()
+        orch.search_service = SearchServiceFalso()
+        orch.teams_catalog_ttl = 0
+
+        asyncio.run(orch._get_teams_catalog())
+        asyncio.run(orch._get_teams_catalog())
+        assert orch.search_service.llamadas == 2
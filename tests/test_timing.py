@@ -0,0 +1,82 @@
+"""
+Tests del colector de tiempos por petición.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import asyncio
+import logging
+
+import pytest
+from shared.utils.timing import collect_timings, count_attempts, current_timings, track_call
+
+
+class TestTrackCall:
+    """Tests de la medición de llamadas externas."""
+
+    def test_registra_llamada_en_el_colector_activo(self):
+        with collect_timings() as timings:
+            with track_call("blob", "upload_pdf", request_bytes=10) as call:
+                call.response_bytes = 20
+                call.extra["items"] = 3
+
+        llamada = timings.to_dict()["calls"][0]
+        assert llamada["dependency"] == "blob"
+        assert (llamada["request_bytes"], llamada["response_bytes"], llamada["items"]) == (10, 20, 3)
+        assert llamada["status"] == "ok" and llamada["duration_ms"] >= 0
+        assert current_timings() is None
+
+    def test_sin_colector_no_falla(self):
+        with track_call("search", "get_all_teams"):
+            pass
+
+    def test_excepcion_marca_error_y_se_propaga(self):
+        with collect_timings() as timings:
+            with pytest.raises(RuntimeError):
+                with track_call("cosmos", "save_analysis"):
+                    raise RuntimeError("429")
+        assert timings.calls[0].status == "error"
+
+    def test_tareas_e_hilos_heredan_el_colector(self):
+        """Los pasos del pipeline corren como tareas y el PDF en un hilo."""
+        async def en_tarea():
+            with track_call("openai", "chat.completions"):
+                await asyncio.sleep(0)
+
+        def en_hilo():
+            with track_call("pdf", "render"):
+                pass
+
+        async def peticion():
+            with collect_timings() as timings:
+                await asyncio.gather(asyncio.create_task(en_tarea()), asyncio.to_thread(en_hilo))
+                return timings
+
+        timings = asyncio.run(peticion())
+        assert sorted(call.dependency for call in timings.calls) == ["openai", "pdf"]
+
+    def test_count_attempts_cuenta_reintentos(self):
+        with collect_timings():
+            with track_call("blob", "upload_pdf") as call:
+                hook = count_attempts(call)
+                for _ in range(3):
+                    hook(object())
+        assert call.retries == 2
+
+
+class TestLogEstructurado:
+    def test_una_linea_por_paso_y_llamada(self, caplog):
+        with collect_timings() as timings:
+            timings.record_step("analyze", 1.5, "ok")
+            with track_call("openai", "chat.completions"):
+                pass
+
+        with caplog.at_level(logging.INFO):
+            timings.log("opp-1")
+
+        lineas = [r for r in caplog.records if r.getMessage().startswith("⏱️ timing")]
+        assert len(lineas) == 2
+        assert lineas[0].custom_dimensions == {
+            "kind": "step", "name": "analyze", "opportunity_id": "opp-1", "duration_ms": 1500.0, "status": "ok",
+        }
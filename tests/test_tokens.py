@@ -0,0 +1,98 @@
+"""
+Tests del conteo de tokens y el presupuesto del prompt.
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+from shared.utils.tokens import (
+    TRUNCATION_MARKER,
+    PromptSection,
+    count_tokens,
+    plan_prompt,
+    split_into_chunks,
+    truncate_to_tokens,
+)
+
+
+def parrafos(cantidad, palabras=60):
+    return "\n\n".join(
+        f"Párrafo {i}. " + " ".join(f"palabra{j}" for j in range(palabras)) + "." for i in range(cantidad)
+    )
+
+
+class TestTruncado:
+    def test_texto_que_entra_no_se_modifica(self):
+        texto = parrafos(2)
+        assert truncate_to_tokens(texto, count_tokens(texto)) is texto
+
+    def test_corta_en_frontera_de_parrafo(self):
+        texto = parrafos(20)
+        recortado = truncate_to_tokens(texto, count_tokens(texto) // 2)
+        assert count_tokens(recortado) <= count_tokens(texto) // 2
+        assert recortado.endswith(TRUNCATION_MARKER)
+        cuerpo = recortado[:-len(TRUNCATION_MARKER)]
+        # Solo se conservan párrafos completos
+        assert texto.startswith(cuerpo)
+        assert all(p.endswith(".") for p in cuerpo.split("\n\n"))
+
+    def test_parrafo_unico_se_corta_en_palabras(self):
+        texto = " ".join(f"palabra{j}" for j in range(2000))
+        recortado = truncate_to_tokens(texto, 100)[:-len(TRUNCATION_MARKER)]
+        assert count_tokens(recortado) <= 100
+        assert recortado and texto.startswith(recortado)
+        assert texto[len(recortado)] == " "
+
+
+class TestFragmentos:
+    def test_fragmentos_por_seccion_sin_perder_contenido(self):
+        texto = "\n\n".join(f"## Sección {i}\n{parrafos(3)}" for i in range(6))
+        fragmentos = split_into_chunks(texto, 1200)
+        assert len(fragmentos) > 1
+        assert all(count_tokens(f) <= 1200 for f in fragmentos)
+        assert all(f.startswith("## Sección") for f in fragmentos)
+        assert " ".join(fragmentos).split() == texto.split()
+
+    def test_parrafo_mayor_al_fragmento_se_divide(self):
+        texto = " ".join(f"palabra{j}" for j in range(3000))
+        fragmentos = split_into_chunks(texto, 500)
+        assert all(count_tokens(f) <= 500 for f in fragmentos)
+        assert " ".join(fragmentos).split() == texto.split()
+
+
+class TestPlanPrompt:
+    def secciones(self, oportunidad, equipos="- Equipo IA (Torre IA)\n"):
+        return [
+            PromptSection("instructions", "Reglas del análisis. " * 20, truncatable=False),
+            PromptSection("teams", equipos, priority=0),
+            PromptSection("opportunity", oportunidad, priority=1, min_tokens=300),
+        ]
+
+    def test_sin_recorte_dentro_del_presupuesto(self):
+        plan = plan_prompt(self.secciones(parrafos(3)), budget_tokens=5000, context_window=128000,
+                           max_output_tokens=12000)
+        assert plan.truncated == []
+        assert plan.max_tokens == 12000
+        assert plan.prompt_tokens <= 5000
+        assert set(plan.to_dict()["sections"]) == {"instructions", "teams", "opportunity"}
+
+    def test_recorta_la_oportunidad_y_respeta_el_presupuesto(self):
+        plan = plan_prompt(self.secciones(parrafos(200)), budget_tokens=3000, context_window=128000,
+                           max_output_tokens=12000)
+        assert plan.truncated == ["opportunity"]
+        assert plan.prompt_tokens <= 3000
+        assert plan.sections["opportunity"]["original_tokens"] > plan.sections["opportunity"]["tokens"]
+
+    def test_la_oportunidad_conserva_su_minimo(self):
+        """Un catálogo de equipos enorme no deja a la oportunidad sin contenido."""
+        plan = plan_prompt(self.secciones(parrafos(50), equipos=parrafos(200)), budget_tokens=3000,
+                           context_window=128000, max_output_tokens=12000)
+        assert set(plan.truncated) == {"teams", "opportunity"}
+        assert 0 < plan.sections["opportunity"]["tokens"] <= 300
+        assert plan.prompt_tokens <= 3000
+
+    def test_max_tokens_se_ajusta_a_la_ventana(self):
+        plan = plan_prompt(self.secciones(parrafos(200)), budget_tokens=12000, context_window=16000,
+                           max_output_tokens=12000, min_output_tokens=4000)
+        assert plan.prompt_tokens <= 16000 - 4000
+        assert 4000 <= plan.max_tokens <= 16000 - plan.prompt_tokens
@@ -0,0 +1,132 @@
+"""
+Tests de las trazas OpenTelemetry (opcionales).
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+import json
+import asyncio
+
+import pytest
+from shared.utils.timing import track_call
+from shared.utils.tracing import _state, configure_tracing, inject_context, shutdown_tracing, start_span, traced_http
+
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+# ============================================================
+# Dobles
+# ============================================================
+
+class PeticionFalsa:
+    method = "POST"
+    url = "https://func.local/api/analyze"
+
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+class RespuestaFalsa:
+    status_code = 200
+
+
+# ============================================================
+# Fixtures
+# ============================================================
+
+@pytest.fixture
+def sin_tracing(monkeypatch):
+    monkeypatch.delenv("TRACING_EXPORTER", raising=False)
+    configure_tracing(force=True)
+    yield
+    configure_tracing(force=True)
+
+
+@pytest.fixture
+def trazas_en_archivo(monkeypatch, tmp_path):
+    """Exportador a archivo: un span JSON por línea."""
+    pytest.importorskip("opentelemetry.sdk")
+    ruta = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("TRACING_EXPORTER", "file")
+    monkeypatch.setenv("TRACING_FILE_PATH", str(ruta))
+    configure_tracing(force=True)
+    yield lambda: [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines()]
+    monkeypatch.delenv("TRACING_EXPORTER")
+    configure_tracing(force=True)
+
+
+# ============================================================
+# Tests
+# ============================================================
+
+class TestTracingDeshabilitado:
+    def test_spans_nulos_sin_exportador(self, sin_tracing):
+        with start_span("paso") as span:
+            span.set_attribute("app.x", 1)
+            span.mark_error()
+        assert inject_context() == {}
+
+    def test_decorador_http_no_altera_la_respuesta(self, sin_tracing):
+        @traced_http("/api/analyze")
+        async def main(req):
+            return RespuestaFalsa()
+
+        assert asyncio.run(main(PeticionFalsa())).status_code == 200
+
+
+class TestTracingConExportador:
+    def test_continua_la_traza_w3c_entrante(self, trazas_en_archivo):
+        """El span del trigger hereda el trace id del traceparent y anida las llamadas externas."""
+        @traced_http("/api/analyze")
+        async def main(req):
+            with track_call("openai", "chat.completions", request_bytes=100) as call:
+                call.extra["prompt_tokens"] = 42
+            return RespuestaFalsa()
+
+        asyncio.run(main(PeticionFalsa({"traceparent": TRACEPARENT})))
+        spans = {span["name"]: span for span in trazas_en_archivo()}
+
+        servidor = spans["POST /api/analyze"]
+        cliente = spans["openai chat.completions"]
+        assert servidor["context"]["trace_id"] == "0x0af7651916cd43dd8448eb211c80319c"
+        assert servidor["parent_id"] == "0xb7ad6b7169203331"
+        assert cliente["parent_id"] == servidor["context"]["span_id"]
+        assert cliente["attributes"]["gen_ai.usage.input_tokens"] == 42
+        assert cliente["attributes"]["app.request_bytes"] == 100
+        assert servidor["attributes"]["http.response.status_code"] == 200
+
+    def test_no_exporta_la_clave_de_la_funcion(self, trazas_en_archivo):
+        """La URL se registra sin query string: ?code=<clave> no llega al exportador."""
+        @traced_http("/api/analyze")
+        async def main(req):
+            return RespuestaFalsa()
+
+        peticion = PeticionFalsa()
+        peticion.url = "https://func.local/api/analyze?code=clave-secreta&mode=async"
+        asyncio.run(main(peticion))
+
+        servidor = trazas_en_archivo()[0]
+        assert servidor["attributes"]["url.path"] == "/api/analyze"
+        assert servidor["attributes"]["server.address"] == "func.local"
+        assert "url.full" not in servidor["attributes"]
+        assert "clave-secreta" not in json.dumps(servidor)
+
+    def test_inject_context_propaga_el_span_activo(self, trazas_en_archivo):
+        with start_span("padre"):
+            carrier = inject_context()
+        assert carrier["traceparent"].startswith("00-")
+
+    def test_reconfigurar_y_apagar_cierran_el_archivo(self, trazas_en_archivo):
+        """Cada configuración abre su archivo y cierra el de la anterior."""
+        anterior = _state.output
+        configure_tracing(force=True)
+        assert anterior.closed and not _state.output.closed
+
+        actual = _state.output
+        with start_span("ultimo"):
+            pass
+        shutdown_tracing()
+        assert actual.closed and _state.output is None
+        assert [span["name"] for span in trazas_en_archivo()] == ["ultimo"]
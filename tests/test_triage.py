@@ -0,0 +1,51 @@
+"""
+Tests del triage local de torres (análisis en dos etapas).
+
+Ejecutar con:
+    .venv\\Scripts\\python.exe -m pytest tests/ -v
+"""
+
+from shared.utils.triage import score_towers, triage_teams
+
+
+def equipo(nombre, torre, skills=(), descripcion=""):
+    return {"team_name": nombre, "tower": torre, "skills": list(skills), "description": descripcion}
+
+
+CATALOGO = [
+    equipo("Equipo IA Generativa", "Torre IA", ["Azure OpenAI", "RAG"], "Asistentes con modelos de lenguaje"),
+    equipo("Equipo ML", "Torre IA", ["Machine Learning", "Python"], "Modelos predictivos"),
+    equipo("Equipo Databricks", "Torre DATA", ["Databricks", "Power BI"], "Plataformas de datos y analítica"),
+    equipo("Equipo SAP", "Torre ERP", ["SAP S/4HANA", "ABAP"], "Implementación de ERP"),
+    equipo("Equipo Mobile", "Torre Apps", ["Flutter", "Kotlin"], "Aplicaciones móviles"),
+    equipo("Equipo Web", "Torre Apps", ["React", "Node.js"], "Portales web"),
+    equipo("Equipo QA", "Torre Quality Assurance", ["Selenium"], "Pruebas automatizadas"),
+    equipo("Equipo PMO", "Torre PMO", ["Scrum"], "Gestión de proyectos"),
+]
+
+OPORTUNIDAD = """# Oportunidad: Asistente virtual para atención al cliente
+## Requerimiento Técnico
+Se requiere un chatbot con Azure OpenAI y RAG sobre los manuales, con tableros en Power BI."""
+
+
+class TestTriage:
+    def test_puntua_por_habilidades_mencionadas(self):
+        puntajes = score_towers(OPORTUNIDAD, CATALOGO)
+        assert puntajes["Torre IA"] > puntajes["Torre DATA"] > 0
+        assert puntajes["Torre ERP"] == 0
+
+    def test_selecciona_torres_candidatas_y_obligatorias(self):
+        equipos, torres = triage_teams(OPORTUNIDAD, CATALOGO, max_teams=4,
+                                       mandatory_towers=("Torre Quality Assurance", "Torre PMO"))
+        assert list(torres) == ["Torre IA", "Torre DATA", "Torre Quality Assurance", "Torre PMO"]
+        assert [e["team_name"] for e in equipos] == [
+            "Equipo IA Generativa", "Equipo ML", "Equipo Databricks", "Equipo QA", "Equipo PMO"
+        ]
+
+    def test_las_tildes_no_afectan_la_coincidencia(self):
+        assert score_towers("Analitica de datos", CATALOGO)["Torre DATA"] == \
+            score_towers("Analítica de datos", CATALOGO)["Torre DATA"] > 0
+
+    def test_catalogo_chico_o_sin_coincidencias_se_conserva(self):
+        assert triage_teams(OPORTUNIDAD, CATALOGO, max_teams=20)[0] is CATALOGO
+        assert triage_teams("Texto sin relación alguna", CATALOGO, max_teams=2)[0] is CATALOGO